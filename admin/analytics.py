@@ -2,16 +2,27 @@
 Hours saved, compliance gaps closed analytics
 """
 from datetime import datetime, timedelta
-from app import db
-from models import AdminLog, Screening, Document, Patient, ScreeningType
+from models import Document, Patient, ScreeningType
+from admin.log_storage import count_events, count_active_users
+from admin import analytics_counters as counters
 import json
 import logging
 
 class HealthPrepAnalytics:
-    """Analytics for measuring HealthPrep system impact"""
+    """Analytics for measuring HealthPrep system impact
     
-    def __init__(self):
+    PERFORMANCE: Document / patient / screening figures are read from the
+    incremental per-org counters in admin/analytics_counters.py and audit
+    figures from the daily audit rollups, so a dashboard load costs O(days)
+    instead of COUNT(*) scans. Counter windows are whole UTC days.
+    
+    Pass org_id to scope every figure to one organization; None reports
+    across all organizations (root admin).
+    """
+    
+    def __init__(self, org_id=None):
         self.logger = logging.getLogger(__name__)
+        self.org_id = org_id
         
         # Time savings assumptions (in minutes)
         # Prep sheet generation saves 3-5 minutes per sheet (4 min average)
@@ -22,25 +33,31 @@ class HealthPrepAnalytics:
             'automated_matching': 2       # vs manual matching
         }
     
+    def _window(self, days):
+        """(cutoff datetime, first day, last day) for the last `days` days"""
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        return cutoff_date, cutoff_date.date(), datetime.utcnow().date()
+    
+    def _scoped(self, model):
+        """model.query limited to this organization (unscoped for all orgs)"""
+        if self.org_id is None:
+            return model.query
+        return model.query.filter(model.org_id == self.org_id)
+    
+    def _daily_totals(self, days, *metrics):
+        _, first_day, last_day = self._window(days)
+        return counters.sum_daily_counters(first_day, last_day, metrics, org_id=self.org_id)
+    
     def calculate_time_savings(self, days=30):
         """Calculate total time saved in the specified period"""
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        cutoff_date = self._window(days)[0]
         
-        # Count automated activities
-        prep_sheets = AdminLog.query.filter(
-            AdminLog.event_type == 'generate_prep_sheet',
-            AdminLog.timestamp >= cutoff_date
-        ).count()
+        # Count automated activities (audit counts read from the daily rollup)
+        prep_sheets = count_events(cutoff_date, event_type='generate_prep_sheet', org_id=self.org_id)
         
-        documents_processed = Document.query.filter(
-            Document.processed_at >= cutoff_date,
-            Document.ocr_text.isnot(None)
-        ).count()
+        documents_processed = self._daily_totals(days, counters.DOCUMENTS_PROCESSED)[counters.DOCUMENTS_PROCESSED]
         
-        screenings_updated = AdminLog.query.filter(
-            AdminLog.event_type == 'refresh_all_screenings',
-            AdminLog.timestamp >= cutoff_date
-        ).count()
+        screenings_updated = count_events(cutoff_date, event_type='refresh_all_screenings', org_id=self.org_id)
         
         # Calculate time saved
         total_minutes_saved = (
@@ -62,38 +79,30 @@ class HealthPrepAnalytics:
     
     def calculate_compliance_gaps_closed(self, days=30):
         """Calculate screening compliance gaps identified and closed"""
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Count screenings moved from 'due' to 'complete'
-        compliance_improvements = AdminLog.query.filter(
-            AdminLog.event_type.like('%screening%'),
-            AdminLog.timestamp >= cutoff_date
-        ).count()
+        gauges = counters.get_gauges(self.org_id)
         
         # Count currently due screenings (gaps still open)
-        open_gaps = Screening.query.filter_by(status='due').count()
+        open_gaps = counters.screening_status_count(gauges, 'due')
         
         # Count screenings due soon (preventive identification)
-        due_soon = Screening.query.filter_by(status='due_soon').count()
+        due_soon = counters.screening_status_count(gauges, 'due_soon')
         
-        # Count completed screenings in period
-        recent_completions = Screening.query.filter(
-            Screening.status == 'complete',
-            Screening.updated_at >= cutoff_date
-        ).count()
+        # Count screenings completed in period
+        recent_completions = self._daily_totals(days, counters.SCREENINGS_COMPLETED)[counters.SCREENINGS_COMPLETED]
         
         return {
             'gaps_identified': open_gaps + due_soon,
             'gaps_closed': recent_completions,
             'preventive_identification': due_soon,
-            'compliance_rate': self._calculate_compliance_rate(),
+            'compliance_rate': self._calculate_compliance_rate(gauges),
             'period_days': days
         }
     
-    def _calculate_compliance_rate(self):
+    def _calculate_compliance_rate(self, gauges=None):
         """Calculate overall screening compliance rate"""
-        total_screenings = Screening.query.count()
-        complete_screenings = Screening.query.filter_by(status='complete').count()
+        gauges = gauges if gauges is not None else counters.get_gauges(self.org_id)
+        total_screenings = gauges.get(counters.SCREENINGS_TOTAL, 0)
+        complete_screenings = counters.screening_status_count(gauges, 'complete')
         
         if total_screenings == 0:
             return 0.0
@@ -114,7 +123,7 @@ class HealthPrepAnalytics:
         compliance_value = compliance_data['gaps_closed'] * 500
         
         # Get total screenings count
-        total_screenings = Screening.query.count()
+        total_screenings = counters.get_gauges(self.org_id).get(counters.SCREENINGS_TOTAL, 0)
         
         return {
             'time_savings': time_saved,
@@ -134,13 +143,12 @@ class HealthPrepAnalytics:
     
     def _calculate_processing_efficiency(self):
         """Calculate document processing efficiency"""
-        # Get processing stats from last 24 hours
-        yesterday = datetime.utcnow() - timedelta(hours=24)
+        # Get processing stats for the last complete day
+        yesterday = datetime.utcnow().date() - timedelta(days=1)
         
-        docs_processed = Document.query.filter(
-            Document.processed_at >= yesterday,
-            Document.ocr_text.isnot(None)
-        ).count()
+        docs_processed = counters.sum_daily_counters(
+            yesterday, yesterday, [counters.DOCUMENTS_PROCESSED], org_id=self.org_id
+        )[counters.DOCUMENTS_PROCESSED]
         
         # Assume 24 hours of potential processing time
         return round(docs_processed / 24, 2) if docs_processed > 0 else 0
@@ -148,45 +156,31 @@ class HealthPrepAnalytics:
     def _calculate_accuracy_rate(self):
         """Calculate system accuracy rate"""
         # Use OCR confidence as a proxy for accuracy
-        avg_confidence = db.session.query(
-            db.func.avg(Document.ocr_confidence)
-        ).scalar()
+        avg_confidence = counters.average_ocr_confidence(counters.get_gauges(self.org_id))
         
         return round(avg_confidence * 100, 1) if avg_confidence else 85.0
     
     def get_usage_statistics(self, days=30):
         """Get system usage statistics"""
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        cutoff_date = self._window(days)[0]
         
         # User activity
-        active_users = db.session.query(
-            db.func.count(db.distinct(AdminLog.user_id))
-        ).filter(AdminLog.timestamp >= cutoff_date).scalar()
-        
-        # Document activity
-        new_documents = Document.query.filter(
-            Document.created_at >= cutoff_date
-        ).count()
+        active_users = count_active_users(cutoff_date, org_id=self.org_id)
         
-        # Patient activity
-        new_patients = Patient.query.filter(
-            Patient.created_at >= cutoff_date
-        ).count()
+        # Document and patient activity
+        created = self._daily_totals(days, counters.DOCUMENTS_CREATED, counters.PATIENTS_CREATED)
+        new_documents = created[counters.DOCUMENTS_CREATED]
+        new_patients = created[counters.PATIENTS_CREATED]
         
         # Screening activity
-        screening_updates = AdminLog.query.filter(
-            AdminLog.event_type.like('%screening%'),
-            AdminLog.timestamp >= cutoff_date
-        ).count()
+        screening_updates = count_events(cutoff_date, event_type_like='%screening%', org_id=self.org_id)
         
         return {
             'active_users': active_users,
             'new_documents': new_documents,
             'new_patients': new_patients,
             'screening_updates': screening_updates,
-            'total_activities': AdminLog.query.filter(
-                AdminLog.timestamp >= cutoff_date
-            ).count(),
+            'total_activities': count_events(cutoff_date, org_id=self.org_id),
             'period_days': days
         }
     
@@ -270,10 +264,10 @@ class HealthPrepAnalytics:
                 'usage_statistics': self.get_usage_statistics(days)
             },
             'system_performance': {
-                'total_patients': Patient.query.count(),
-                'total_documents': Document.query.count(),
-                'total_screenings': Screening.query.count(),
-                'active_screening_types': ScreeningType.query.filter_by(is_active=True).count()
+                'total_patients': self._scoped(Patient).count(),
+                'total_documents': self._scoped(Document).count(),
+                'total_screenings': counters.get_gauges(self.org_id).get(counters.SCREENINGS_TOTAL, 0),
+                'active_screening_types': self._scoped(ScreeningType).filter_by(is_active=True).count()
             }
         }
         
@@ -0,0 +1,426 @@
+"""
+Incremental analytics counters for the ROI dashboard (admin/analytics.py)
+
+The dashboard used to run COUNT(*) over document, patient and screening on
+every page load. These counters are kept up to date as changes are committed,
+so dashboard reads are O(days) per organization:
+
+1. Daily counters (analytics_daily_counters), per org and UTC day
+   documents_created     Document rows, by created_at day
+   documents_processed   Documents with OCR text, by processed_at day
+   patients_created      Patient rows, by created_at day
+   screenings_completed  Screenings moved to 'complete', on the day it happened.
+                         The raw tables don't record that transition, so a
+                         rebuild uses the updated_at day of screenings that are
+                         currently complete (what the dashboard used to count).
+
+2. Gauges (analytics_gauges), per org
+   screenings_total, screenings_status:<status>, ocr_confidence_sum
+   (confidence * CONFIDENCE_SCALE) and ocr_confidence_count.
+
+Audit-derived metrics (prep sheets generated, screening refreshes) already have
+daily rollups - see admin/log_storage.py - and are not duplicated here.
+
+Maintenance: session events in models.py turn ORM inserts / updates / deletes
+into deltas after each flush (queue_counter_delta), and apply_counter_deltas()
+upserts them in before_commit, inside the committing transaction. Bulk
+Query.update()/delete() and Core statements bypass those events; they must
+queue deltas themselves or the organization's counters must be rebuilt.
+
+rebuild_counters() recomputes an organization from the raw tables. It holds an
+exclusive advisory lock for the organization while incremental writers hold a
+shared one, so a rebuild never double counts or loses a concurrent commit.
+Counters for an organization are built lazily on first read
+(ensure_counters_built) and can be rebuilt with scripts/analytics_counters.py.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Date, cast, delete, func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import db
+from models import AnalyticsDailyCounter, AnalyticsGauge, Document, Organization, Patient, Screening
+
+logger = logging.getLogger(__name__)
+
+COUNTER_LOCK_KEY = 815_205  # pg_advisory_xact_lock namespace for per-org counter writes
+COUNTER_DELTAS_KEY = 'analytics_counter_deltas'
+CONFIDENCE_SCALE = 1_000_000
+
+# Daily counters
+DOCUMENTS_CREATED = 'documents_created'
+DOCUMENTS_PROCESSED = 'documents_processed'
+PATIENTS_CREATED = 'patients_created'
+SCREENINGS_COMPLETED = 'screenings_completed'
+
+# Gauges
+SCREENINGS_TOTAL = 'screenings_total'
+SCREENING_STATUS_PREFIX = 'screenings_status:'
+OCR_CONFIDENCE_SUM = 'ocr_confidence_sum'
+OCR_CONFIDENCE_COUNT = 'ocr_confidence_count'
+BUILT_AT = 'counters_built_at'  # Unix time of the last rebuild; absent = never built
+
+
+# =============================================================================
+# Incremental maintenance
+# =============================================================================
+
+def queue_counter_delta(session, org_id: Optional[int], metric: str, delta: int,
+                        day: Optional[date] = None) -> None:
+    """
+    Add delta to a counter when the session's transaction commits.
+
+    day=None addresses a gauge, otherwise the daily counter for that day.
+    """
+    if org_id is None or not delta:
+        return
+    pending = session.info.setdefault(COUNTER_DELTAS_KEY, defaultdict(int))
+    pending[(org_id, day, metric)] += delta
+
+
+def _day_of(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    return value or datetime.utcnow().date()
+
+
+def _old_value(state, attr_name):
+    """Value of an attribute before the flush (None when it was never loaded)"""
+    history = state.attrs[attr_name].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def _has_ocr_text(state) -> bool:
+    """
+    Whether a document has OCR text, without loading the deferred column.
+
+    processed_at is only set by OCR alongside the text, so an unloaded column
+    counts as present.
+    """
+    if '_ocr_text' not in state.dict:
+        return True
+    return state.dict['_ocr_text'] is not None
+
+
+def _queue_confidence(session, org_id, confidence, sign: int) -> None:
+    if confidence is None:
+        return
+    queue_counter_delta(session, org_id, OCR_CONFIDENCE_SUM, sign * round(confidence * CONFIDENCE_SCALE))
+    queue_counter_delta(session, org_id, OCR_CONFIDENCE_COUNT, sign)
+
+
+def _queue_screening_status(session, org_id, status, sign: int) -> None:
+    queue_counter_delta(session, org_id, SCREENINGS_TOTAL, sign)
+    if status:
+        queue_counter_delta(session, org_id, SCREENING_STATUS_PREFIX + status, sign)
+
+
+def collect_flush_deltas(session) -> None:
+    """
+    Turn the flushed Document / Patient / Screening changes into counter deltas.
+
+    Called from an after_flush listener: IDs and defaults are assigned and
+    attribute history still describes the flushed change.
+    """
+    from sqlalchemy import inspect as sa_inspect
+
+    today = datetime.utcnow().date()
+
+    for obj in session.new:
+        if isinstance(obj, Document):
+            queue_counter_delta(session, obj.org_id, DOCUMENTS_CREATED, 1, _day_of(obj.created_at))
+            if obj.processed_at and _has_ocr_text(sa_inspect(obj)):
+                queue_counter_delta(session, obj.org_id, DOCUMENTS_PROCESSED, 1, _day_of(obj.processed_at))
+            _queue_confidence(session, obj.org_id, obj.ocr_confidence, 1)
+        elif isinstance(obj, Patient):
+            queue_counter_delta(session, obj.org_id, PATIENTS_CREATED, 1, _day_of(obj.created_at))
+        elif isinstance(obj, Screening):
+            _queue_screening_status(session, obj.org_id, obj.status, 1)
+            if obj.status == 'complete':
+                queue_counter_delta(session, obj.org_id, SCREENINGS_COMPLETED, 1, today)
+
+    for obj in session.dirty:
+        if not isinstance(obj, (Document, Screening)):
+            continue
+        state = sa_inspect(obj)
+        if isinstance(obj, Document):
+            processed = state.attrs.processed_at.history
+            if processed.has_changes():
+                has_text = _has_ocr_text(state)
+                old = _old_value(state, 'processed_at')
+                if old and has_text:
+                    queue_counter_delta(session, obj.org_id, DOCUMENTS_PROCESSED, -1, _day_of(old))
+                if obj.processed_at and has_text:
+                    queue_counter_delta(session, obj.org_id, DOCUMENTS_PROCESSED, 1, _day_of(obj.processed_at))
+            if state.attrs.ocr_confidence.history.has_changes():
+                _queue_confidence(session, obj.org_id, _old_value(state, 'ocr_confidence'), -1)
+                _queue_confidence(session, obj.org_id, obj.ocr_confidence, 1)
+        else:
+            if state.attrs.status.history.has_changes():
+                old_status = _old_value(state, 'status')
+                if old_status != obj.status:
+                    _queue_screening_status(session, obj.org_id, old_status, -1)
+                    _queue_screening_status(session, obj.org_id, obj.status, 1)
+                    if obj.status == 'complete':
+                        queue_counter_delta(session, obj.org_id, SCREENINGS_COMPLETED, 1, today)
+
+    # Deleted rows are gone - read loaded values only, never trigger a refresh
+    for obj in session.deleted:
+        if not isinstance(obj, (Document, Patient, Screening)):
+            continue
+        state = sa_inspect(obj)
+        org_id = _old_value(state, 'org_id')
+        created_at = _old_value(state, 'created_at')
+        if isinstance(obj, Document):
+            if created_at:
+                queue_counter_delta(session, org_id, DOCUMENTS_CREATED, -1, _day_of(created_at))
+            processed_at = _old_value(state, 'processed_at')
+            if processed_at and _has_ocr_text(state):
+                queue_counter_delta(session, org_id, DOCUMENTS_PROCESSED, -1, _day_of(processed_at))
+            _queue_confidence(session, org_id, _old_value(state, 'ocr_confidence'), -1)
+        elif isinstance(obj, Patient):
+            if created_at:
+                queue_counter_delta(session, org_id, PATIENTS_CREATED, -1, _day_of(created_at))
+        else:
+            old_status = _old_value(state, 'status')
+            _queue_screening_status(session, org_id, old_status, -1)
+            updated_at = _old_value(state, 'updated_at')
+            if old_status == 'complete' and updated_at:
+                # Keep the daily count consistent with what a rebuild would produce
+                queue_counter_delta(session, org_id, SCREENINGS_COMPLETED, -1, _day_of(updated_at))
+
+
+def _lock_orgs(conn, org_ids: Iterable[int], shared: bool) -> None:
+    if conn.dialect.name != 'postgresql':
+        return
+    lock = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    for org_id in sorted(set(org_ids)):
+        conn.execute(text(f"SELECT {lock}(:ns, :org_id)"), {'ns': COUNTER_LOCK_KEY, 'org_id': org_id})
+
+
+def apply_counter_deltas(session, pending: Dict) -> int:
+    """
+    Upsert queued deltas in the session's transaction (no commit).
+
+    Rows are written in a fixed order so concurrent commits touching the same
+    counters cannot deadlock.
+
+    Returns:
+        Number of counter rows written
+    """
+    daily = [(org_id, day, metric, delta) for (org_id, day, metric), delta in pending.items()
+             if day is not None and delta]
+    gauges = [(org_id, metric, delta) for (org_id, day, metric), delta in pending.items()
+              if day is None and delta]
+    if not daily and not gauges:
+        return 0
+
+    conn = session.connection()
+    _lock_orgs(conn, [row[0] for row in daily] + [row[0] for row in gauges], shared=True)
+
+    if daily:
+        stmt = pg_insert(AnalyticsDailyCounter.__table__)
+        conn.execute(
+            stmt.on_conflict_do_update(
+                constraint='uq_analytics_counter_org_day_metric',
+                set_={'value': AnalyticsDailyCounter.__table__.c.value + stmt.excluded.value}
+            ),
+            [{'org_id': org_id, 'day': day, 'metric': metric, 'value': delta}
+             for org_id, day, metric, delta in sorted(daily)]
+        )
+
+    if gauges:
+        now = datetime.utcnow()
+        stmt = pg_insert(AnalyticsGauge.__table__)
+        conn.execute(
+            stmt.on_conflict_do_update(
+                constraint='uq_analytics_gauge_org_metric',
+                set_={'value': AnalyticsGauge.__table__.c.value + stmt.excluded.value,
+                      'updated_at': stmt.excluded.updated_at}
+            ),
+            [{'org_id': org_id, 'metric': metric, 'value': delta, 'updated_at': now}
+             for org_id, metric, delta in sorted(gauges)]
+        )
+
+    return len(daily) + len(gauges)
+
+
+def mark_counters_stale(session, org_ids: Iterable[int]) -> None:
+    """Drop the built marker so these organizations are rebuilt on next read"""
+    org_ids = sorted({oid for oid in org_ids if oid is not None})
+    if org_ids:
+        session.execute(delete(AnalyticsGauge).where(
+            AnalyticsGauge.metric == BUILT_AT, AnalyticsGauge.org_id.in_(org_ids)
+        ))
+
+
+# =============================================================================
+# Rebuild from raw tables
+# =============================================================================
+
+def _daily_source_queries(org_id: int):
+    """(metric, SELECT day, count) pairs that reproduce each daily counter"""
+    document_created_day = cast(Document.created_at, Date)
+    processed_day = cast(Document.processed_at, Date)
+    patient_day = cast(Patient.created_at, Date)
+    completed_day = cast(Screening.updated_at, Date)
+    return [
+        (DOCUMENTS_CREATED, select(document_created_day, func.count(Document.id))
+            .where(Document.org_id == org_id, Document.created_at.isnot(None))
+            .group_by(document_created_day)),
+        (DOCUMENTS_PROCESSED, select(processed_day, func.count(Document.id))
+            .where(Document.org_id == org_id, Document.processed_at.isnot(None),
+                   Document._ocr_text.isnot(None))
+            .group_by(processed_day)),
+        (PATIENTS_CREATED, select(patient_day, func.count(Patient.id))
+            .where(Patient.org_id == org_id, Patient.created_at.isnot(None))
+            .group_by(patient_day)),
+        (SCREENINGS_COMPLETED, select(completed_day, func.count(Screening.id))
+            .where(Screening.org_id == org_id, Screening.status == 'complete',
+                   Screening.updated_at.isnot(None))
+            .group_by(completed_day)),
+    ]
+
+
+def _gauge_values(conn, org_id: int) -> Dict[str, int]:
+    values = {SCREENINGS_TOTAL: 0, OCR_CONFIDENCE_SUM: 0, OCR_CONFIDENCE_COUNT: 0}
+    for status, count in conn.execute(
+        select(Screening.status, func.count(Screening.id))
+        .where(Screening.org_id == org_id).group_by(Screening.status)
+    ):
+        values[SCREENINGS_TOTAL] += count
+        if status:
+            values[SCREENING_STATUS_PREFIX + status] = count
+
+    confidence_sum, confidence_count = conn.execute(
+        select(func.sum(Document.ocr_confidence), func.count(Document.ocr_confidence))
+        .where(Document.org_id == org_id)
+    ).one()
+    values[OCR_CONFIDENCE_SUM] = round((confidence_sum or 0) * CONFIDENCE_SCALE)
+    values[OCR_CONFIDENCE_COUNT] = confidence_count or 0
+    return values
+
+
+def rebuild_counters(org_id: int, conn=None) -> Dict[str, int]:
+    """
+    Recompute one organization's counters and gauges from the raw tables. Idempotent.
+
+    Returns:
+        Number of daily counter rows and gauges written
+    """
+    if conn is None:
+        with db.engine.begin() as own_conn:
+            return rebuild_counters(org_id, own_conn)
+
+    # Wait for in-flight incremental commits and block new ones until done
+    _lock_orgs(conn, [org_id], shared=False)
+
+    counters = AnalyticsDailyCounter.__table__
+    gauges = AnalyticsGauge.__table__
+    conn.execute(delete(counters).where(counters.c.org_id == org_id))
+    conn.execute(delete(gauges).where(gauges.c.org_id == org_id))
+
+    daily_rows = 0
+    for metric, source in _daily_source_queries(org_id):
+        source = source.subquery()
+        result = conn.execute(counters.insert().from_select(
+            ['org_id', 'day', 'metric', 'value'],
+            select(literal(org_id), source.c[0], literal(metric), source.c[1])
+        ))
+        daily_rows += max(result.rowcount or 0, 0)
+
+    now = datetime.utcnow()
+    gauge_values = _gauge_values(conn, org_id)
+    gauge_values[BUILT_AT] = int(now.timestamp())
+    conn.execute(gauges.insert(), [
+        {'org_id': org_id, 'metric': metric, 'value': value, 'updated_at': now}
+        for metric, value in sorted(gauge_values.items())
+    ])
+
+    logger.info(f"Rebuilt analytics counters for org {org_id}: {daily_rows} daily rows, "
+                f"{len(gauge_values)} gauges")
+    return {'daily_rows': daily_rows, 'gauges': len(gauge_values)}
+
+
+def delete_org_counters(org_id: int, session=None) -> None:
+    """Remove an organization's counters (organization deletion; caller commits)"""
+    session = session or db.session
+    session.execute(delete(AnalyticsDailyCounter).where(AnalyticsDailyCounter.org_id == org_id))
+    session.execute(delete(AnalyticsGauge).where(AnalyticsGauge.org_id == org_id))
+
+
+def _all_org_ids() -> List[int]:
+    return [row[0] for row in db.session.query(Organization.id).order_by(Organization.id)]
+
+
+def ensure_counters_built(org_id: Optional[int] = None) -> int:
+    """
+    Build counters for organizations that never had them (all when org_id is None).
+
+    Returns:
+        Number of organizations built
+    """
+    org_ids = [org_id] if org_id is not None else _all_org_ids()
+    built_orgs = {row[0] for row in db.session.query(AnalyticsGauge.org_id).filter(
+        AnalyticsGauge.metric == BUILT_AT,
+        AnalyticsGauge.org_id.in_(org_ids)
+    )}
+    missing = [oid for oid in org_ids if oid not in built_orgs]
+    for oid in missing:
+        rebuild_counters(oid)
+    return len(missing)
+
+
+# =============================================================================
+# Reads
+# =============================================================================
+
+def sum_daily_counters(first_day: date, last_day: date, metrics: Iterable[str],
+                       org_id: Optional[int] = None) -> Dict[str, int]:
+    """Totals of daily counters over [first_day, last_day] (all orgs when org_id is None)"""
+    metrics = list(metrics)
+    ensure_counters_built(org_id)
+    query = db.session.query(
+        AnalyticsDailyCounter.metric, func.sum(AnalyticsDailyCounter.value)
+    ).filter(
+        AnalyticsDailyCounter.metric.in_(metrics),
+        AnalyticsDailyCounter.day >= first_day,
+        AnalyticsDailyCounter.day <= last_day
+    )
+    if org_id is not None:
+        query = query.filter(AnalyticsDailyCounter.org_id == org_id)
+
+    totals = {metric: 0 for metric in metrics}
+    for metric, total in query.group_by(AnalyticsDailyCounter.metric):
+        totals[metric] = int(total or 0)
+    return totals
+
+
+def get_gauges(org_id: Optional[int] = None) -> Dict[str, int]:
+    """Current gauge values (summed across orgs when org_id is None)"""
+    ensure_counters_built(org_id)
+    query = db.session.query(AnalyticsGauge.metric, func.sum(AnalyticsGauge.value)).filter(
+        AnalyticsGauge.metric != BUILT_AT
+    )
+    if org_id is not None:
+        query = query.filter(AnalyticsGauge.org_id == org_id)
+    return {metric: int(total or 0) for metric, total in query.group_by(AnalyticsGauge.metric)}
+
+
+def screening_status_count(gauges: Dict[str, int], status: str) -> int:
+    return gauges.get(SCREENING_STATUS_PREFIX + status, 0)
+
+
+def average_ocr_confidence(gauges: Dict[str, int]) -> Optional[float]:
+    count = gauges.get(OCR_CONFIDENCE_COUNT, 0)
+    if count <= 0:
+        return None
+    return gauges.get(OCR_CONFIDENCE_SUM, 0) / CONFIDENCE_SCALE / count
@@ -0,0 +1,449 @@
+"""
+Audit log storage: daily rollups and optional monthly partitioning
+
+Raw admin_logs rows are kept for compliance, but dashboards should not scan
+them. This module provides:
+
+1. Daily rollups (admin_log_daily_rollup)
+   Counts per (day, org_id, event_type, user_id), built with one
+   INSERT ... SELECT ... GROUP BY per day. A day is "final" once it was rolled
+   up at least ROLLUP_FINAL_AFTER after it ended (late audit rows, e.g. spool
+   replays, land before that); non-final days are rebuilt on the next read.
+   Rollups are built lazily by the read helpers below and by
+   scripts/admin_log_maintenance.py.
+
+2. Rollup-backed counters
+   count_events(), count_events_by_type() and count_active_users() split a time
+   window into whole days (read from the rollup) and partial edge days (read
+   from raw rows through the timestamp indexes). Results are identical to the
+   equivalent query on admin_logs.
+
+3. Monthly range partitioning (PostgreSQL, optional)
+   convert_to_partitioned() rebuilds admin_logs as a table partitioned by
+   RANGE (timestamp) with one partition per month plus a default partition,
+   and ensure_future_partitions() creates upcoming months. Old months can then
+   be detached in O(1) once past every organization's audit retention
+   (detach_expired_partitions) - their counts survive in the rollup.
+
+Rollup writes use their own connection and transaction, so reading a dashboard
+never commits the caller's session.
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Date, and_, delete, func, insert, literal, select, text
+
+from app import db
+from models import AdminLog, AdminLogDailyRollup, AdminLogRollupDay
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FINAL_AFTER = timedelta(hours=1)
+ROLLUP_LOCK_KEY = 815_204  # pg_advisory_xact_lock namespace for rollup builds
+PARTITIONED_TABLE = 'admin_logs'
+
+
+# =============================================================================
+# Daily rollups
+# =============================================================================
+
+def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def rollup_day(day: date, conn=None) -> int:
+    """
+    (Re)build the rollup for one day. Idempotent.
+
+    Returns:
+        Number of raw audit rows aggregated
+    """
+    if conn is None:
+        with db.engine.begin() as own_conn:
+            return rollup_day(day, own_conn)
+
+    if conn.dialect.name == 'postgresql':
+        # Serialize concurrent builds of the same day (delete + insert would double count)
+        conn.execute(text("SELECT pg_advisory_xact_lock(:ns, :day)"),
+                     {'ns': ROLLUP_LOCK_KEY, 'day': day.toordinal()})
+
+    start, end = _day_bounds(day)
+    in_day = and_(AdminLog.timestamp >= start, AdminLog.timestamp < end)
+
+    conn.execute(delete(AdminLogDailyRollup).where(AdminLogDailyRollup.day == day))
+    conn.execute(insert(AdminLogDailyRollup).from_select(
+        ['day', 'org_id', 'event_type', 'user_id', 'event_count'],
+        select(
+            literal(day, type_=Date),
+            AdminLog.org_id,
+            AdminLog.event_type,
+            AdminLog.user_id,
+            func.count(AdminLog.id)
+        ).where(in_day).group_by(AdminLog.org_id, AdminLog.event_type, AdminLog.user_id)
+    ))
+    source_rows = conn.execute(select(func.count(AdminLog.id)).where(in_day)).scalar() or 0
+
+    marker = AdminLogRollupDay.__table__
+    conn.execute(delete(marker).where(marker.c.day == day))
+    conn.execute(insert(marker).values(day=day, rolled_up_at=datetime.utcnow(), source_rows=source_rows))
+    return source_rows
+
+
+def ensure_rolled_up(first_day: date, last_day: date) -> int:
+    """
+    Make sure every completed day in [first_day, last_day] has a final rollup.
+
+    Today and future days are never rolled up (they are read from raw rows).
+
+    Returns:
+        Number of days (re)built
+    """
+    last_day = min(last_day, datetime.utcnow().date() - timedelta(days=1))
+    if first_day > last_day:
+        return 0
+
+    final_days = {
+        day for day, rolled_up_at in db.session.query(
+            AdminLogRollupDay.day, AdminLogRollupDay.rolled_up_at
+        ).filter(AdminLogRollupDay.day >= first_day, AdminLogRollupDay.day <= last_day)
+        if rolled_up_at >= _day_bounds(day)[1] + ROLLUP_FINAL_AFTER
+    }
+
+    built = 0
+    day = first_day
+    while day <= last_day:
+        if day not in final_days:
+            rollup_day(day)
+            built += 1
+        day += timedelta(days=1)
+
+    if built:
+        logger.info(f"Built admin log rollups for {built} days between {first_day} and {last_day}")
+    return built
+
+
+def invalidate_rollups(days: Optional[Iterable[date]] = None) -> None:
+    """
+    Force rollups to be rebuilt on next read (all days when days is None).
+
+    Call after bulk changes to historical audit rows, e.g. reassigning a
+    deleted organization's logs.
+    """
+    marker = AdminLogRollupDay.__table__
+    statement = delete(marker)
+    if days is not None:
+        statement = statement.where(marker.c.day.in_(list(days)))
+    with db.engine.begin() as conn:
+        conn.execute(statement)
+
+
+def _split_window(start: datetime, end: Optional[datetime]):
+    """
+    Split [start, end) into raw edge ranges and a whole-day range.
+
+    Returns:
+        (raw_ranges, first_full_day, last_full_day) - the day range may be empty
+    """
+    end = end or datetime.utcnow()
+    first_full_day = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+    last_full_day = end.date() - timedelta(days=1)
+    # Today (or later) is still being written - read it raw
+    last_full_day = min(last_full_day, datetime.utcnow().date() - timedelta(days=1))
+
+    if first_full_day > last_full_day:
+        return [(start, end)], None, None
+
+    raw_ranges = []
+    full_start, full_end = _day_bounds(first_full_day)[0], _day_bounds(last_full_day)[1]
+    if start < full_start:
+        raw_ranges.append((start, full_start))
+    if full_end < end:
+        raw_ranges.append((full_end, end))
+    return raw_ranges, first_full_day, last_full_day
+
+
+def _raw_filters(event_type=None, event_type_like=None, event_types=None, org_id=None):
+    filters = []
+    if event_type is not None:
+        filters.append(AdminLog.event_type == event_type)
+    if event_type_like is not None:
+        filters.append(AdminLog.event_type.like(event_type_like))
+    if event_types is not None:
+        filters.append(AdminLog.event_type.in_(list(event_types)))
+    if org_id is not None:
+        filters.append(AdminLog.org_id == org_id)
+    return filters
+
+
+def _rollup_filters(event_type=None, event_type_like=None, event_types=None, org_id=None):
+    filters = []
+    if event_type is not None:
+        filters.append(AdminLogDailyRollup.event_type == event_type)
+    if event_type_like is not None:
+        filters.append(AdminLogDailyRollup.event_type.like(event_type_like))
+    if event_types is not None:
+        filters.append(AdminLogDailyRollup.event_type.in_(list(event_types)))
+    if org_id is not None:
+        filters.append(AdminLogDailyRollup.org_id == org_id)
+    return filters
+
+
+def count_events_by_type(start: datetime, end: Optional[datetime] = None, **criteria) -> Dict[Optional[str], int]:
+    """
+    Audit event counts per event_type in [start, end).
+
+    criteria: event_type, event_type_like, event_types, org_id
+    """
+    raw_ranges, first_day, last_day = _split_window(start, end)
+    counts: Dict[Optional[str], int] = {}
+
+    if first_day is not None:
+        ensure_rolled_up(first_day, last_day)
+        for event_type, total in db.session.query(
+            AdminLogDailyRollup.event_type, func.sum(AdminLogDailyRollup.event_count)
+        ).filter(
+            AdminLogDailyRollup.day >= first_day,
+            AdminLogDailyRollup.day <= last_day,
+            *_rollup_filters(**criteria)
+        ).group_by(AdminLogDailyRollup.event_type):
+            counts[event_type] = counts.get(event_type, 0) + int(total or 0)
+
+    for range_start, range_end in raw_ranges:
+        for event_type, total in db.session.query(
+            AdminLog.event_type, func.count(AdminLog.id)
+        ).filter(
+            AdminLog.timestamp >= range_start,
+            AdminLog.timestamp < range_end,
+            *_raw_filters(**criteria)
+        ).group_by(AdminLog.event_type):
+            counts[event_type] = counts.get(event_type, 0) + int(total or 0)
+
+    return counts
+
+
+def count_events(start: datetime, end: Optional[datetime] = None, **criteria) -> int:
+    """Total audit events in [start, end) matching criteria (see count_events_by_type)"""
+    return sum(count_events_by_type(start, end, **criteria).values())
+
+
+def active_user_ids(start: datetime, end: Optional[datetime] = None, **criteria) -> Set[int]:
+    """Distinct user IDs with audit events in [start, end)"""
+    raw_ranges, first_day, last_day = _split_window(start, end)
+    user_ids: Set[int] = set()
+
+    if first_day is not None:
+        ensure_rolled_up(first_day, last_day)
+        user_ids.update(row[0] for row in db.session.query(AdminLogDailyRollup.user_id).filter(
+            AdminLogDailyRollup.day >= first_day,
+            AdminLogDailyRollup.day <= last_day,
+            AdminLogDailyRollup.user_id.isnot(None),
+            *_rollup_filters(**criteria)
+        ).distinct())
+
+    for range_start, range_end in raw_ranges:
+        user_ids.update(row[0] for row in db.session.query(AdminLog.user_id).filter(
+            AdminLog.timestamp >= range_start,
+            AdminLog.timestamp < range_end,
+            AdminLog.user_id.isnot(None),
+            *_raw_filters(**criteria)
+        ).distinct())
+
+    return user_ids
+
+
+def count_active_users(start: datetime, end: Optional[datetime] = None, **criteria) -> int:
+    """Number of distinct users with audit events in [start, end)"""
+    return len(active_user_ids(start, end, **criteria))
+
+
+# =============================================================================
+# Monthly range partitioning (PostgreSQL)
+# =============================================================================
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value: date) -> date:
+    return date(value.year + (value.month == 12), value.month % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f'{PARTITIONED_TABLE}_{month.year:04d}_{month.month:02d}'
+
+
+def is_partitioned(conn) -> bool:
+    """True when admin_logs is a PostgreSQL partitioned table"""
+    if conn.dialect.name != 'postgresql':
+        return False
+    return conn.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = :table
+        )
+    """), {'table': PARTITIONED_TABLE}).scalar()
+
+
+def _create_month_partition(conn, month: date) -> bool:
+    name = _partition_name(month)
+    exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+    if exists:
+        return False
+    conn.execute(text(
+        f"CREATE TABLE {name} PARTITION OF {PARTITIONED_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+    ))
+    return True
+
+
+def ensure_future_partitions(months_ahead: int = 3) -> List[str]:
+    """Create monthly partitions from the current month through months_ahead"""
+    created = []
+    with db.engine.begin() as conn:
+        if not is_partitioned(conn):
+            return created
+        month = _month_start(datetime.utcnow().date())
+        for _ in range(months_ahead + 1):
+            if _create_month_partition(conn, month):
+                created.append(_partition_name(month))
+            month = _next_month(month)
+    if created:
+        logger.info(f"Created admin log partitions: {', '.join(created)}")
+    return created
+
+
+def convert_to_partitioned(months_ahead: int = 3, dry_run: bool = True) -> Dict:
+    """
+    Rebuild admin_logs as a monthly RANGE-partitioned table (PostgreSQL only).
+
+    Runs in one transaction: the new partitioned table is created with the same
+    columns, defaults and indexes, partitions are created for every month that
+    has rows (plus months_ahead and a default partition for NULL/out-of-range
+    timestamps), rows are copied, the id sequence is re-attached, and the
+    tables are swapped. The old table is kept as admin_logs_unpartitioned for
+    verification and must be dropped manually.
+
+    PostgreSQL requires the partition key in every unique constraint, and a
+    (id, timestamp) primary key would make timestamp NOT NULL - legacy rows
+    without a timestamp must stay intact (they land in the default partition).
+    The partitioned table therefore has a plain index on id instead of a
+    primary key; ids remain unique because they come from the same sequence.
+    """
+    with db.engine.begin() as conn:
+        if conn.dialect.name != 'postgresql':
+            return {'success': False, 'error': 'Partitioning requires PostgreSQL'}
+        if is_partitioned(conn):
+            return {'success': True, 'already_partitioned': True}
+
+        months = [row[0] for row in conn.execute(text(
+            f"SELECT DISTINCT date_trunc('month', timestamp)::date FROM {PARTITIONED_TABLE} "
+            "WHERE timestamp IS NOT NULL ORDER BY 1"
+        ))]
+        month = _month_start(datetime.utcnow().date())
+        for _ in range(months_ahead + 1):
+            if month not in months:
+                months.append(month)
+            month = _next_month(month)
+        months.sort()
+        row_count = conn.execute(text(f"SELECT count(*) FROM {PARTITIONED_TABLE}")).scalar()
+
+        plan = {
+            'success': True,
+            'dry_run': dry_run,
+            'rows_to_copy': row_count,
+            'partitions': [_partition_name(m) for m in months] + [f'{PARTITIONED_TABLE}_default'],
+        }
+        if dry_run:
+            return plan
+
+        conn.execute(text("LOCK TABLE admin_logs IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(text(
+            "CREATE TABLE admin_logs_partitioned "
+            "(LIKE admin_logs INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)"
+        ))
+        conn.execute(text("ALTER TABLE admin_logs RENAME TO admin_logs_unpartitioned"))
+        conn.execute(text("ALTER TABLE admin_logs_partitioned RENAME TO admin_logs"))
+
+        for month in months:
+            _create_month_partition(conn, month)
+        conn.execute(text(f"CREATE TABLE {PARTITIONED_TABLE}_default PARTITION OF {PARTITIONED_TABLE} DEFAULT"))
+
+        # Indexes on the parent propagate to every partition
+        conn.execute(text(f"CREATE INDEX idx_admin_logs_id ON {PARTITIONED_TABLE} (id)"))
+        for index in AdminLog.__table__.indexes:
+            columns = ', '.join(column.name for column in index.columns)
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            conn.execute(text(f"CREATE INDEX {index.name} ON {PARTITIONED_TABLE} ({columns})"))
+
+        conn.execute(text("INSERT INTO admin_logs SELECT * FROM admin_logs_unpartitioned"))
+
+        # Keep the id sequence with the live table
+        sequence = conn.execute(text(
+            "SELECT pg_get_serial_sequence('admin_logs_unpartitioned', 'id')"
+        )).scalar()
+        if sequence:
+            conn.execute(text(f"ALTER TABLE admin_logs ALTER COLUMN id SET DEFAULT nextval('{sequence}')"))
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY admin_logs.id"))
+
+        for fk_column, referenced in (('user_id', 'users(id)'), ('org_id', 'organizations(id)'),
+                                      ('patient_id', 'patient(id)')):
+            conn.execute(text(
+                f"ALTER TABLE admin_logs ADD FOREIGN KEY ({fk_column}) REFERENCES {referenced}"
+            ))
+
+    logger.info(f"Converted admin_logs to {len(months)} monthly partitions ({row_count} rows copied)")
+    return plan
+
+
+def detach_expired_partitions(retention_days: Optional[int] = None, dry_run: bool = True) -> List[str]:
+    """
+    Detach monthly partitions that lie entirely before the audit retention cutoff.
+
+    retention_days defaults to the longest Organization.audit_retention_days, so
+    no organization loses audit rows it must still retain. Partitions are only
+    DETACHED (kept as standalone tables for archival); dropping them is a
+    separate, manual decision. Affected days stay counted in the rollup.
+    """
+    from models import Organization
+
+    if retention_days is None:
+        retention_days = db.session.query(func.max(Organization.audit_retention_days)).scalar() or 2555
+    cutoff = _month_start(datetime.utcnow().date() - timedelta(days=retention_days))
+
+    detached = []
+    with db.engine.begin() as conn:
+        if not is_partitioned(conn):
+            return detached
+        names = [row[0] for row in conn.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = :table
+        """), {'table': PARTITIONED_TABLE})]
+
+        for name in sorted(names):
+            suffix = name[len(PARTITIONED_TABLE) + 1:]
+            try:
+                year, month = (int(part) for part in suffix.split('_'))
+            except ValueError:
+                continue  # default partition
+            if _next_month(date(year, month, 1)) > cutoff:
+                continue
+            # Make sure the rollup covers the month before its rows leave the table
+            first_day = date(year, month, 1)
+            last_day = _next_month(first_day) - timedelta(days=1)
+            if not dry_run:
+                day = first_day
+                while day <= last_day:
+                    rollup_day(day, conn)
+                    day += timedelta(days=1)
+                conn.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name}"))
+            detached.append(name)
+
+    if detached and not dry_run:
+        logger.info(f"Detached expired admin log partitions: {', '.join(detached)}")
+    return detached
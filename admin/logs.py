@@ -3,7 +3,6 @@ Admin log management and activity tracking
 """
 from datetime import datetime
 from flask import request
-from app import db
 from models import AdminLog, User
 import json
 import logging
@@ -96,32 +95,21 @@ class AdminLogger:
         """Get activity summary for dashboard"""
         from datetime import timedelta
 
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-
-        # Count activities by type
-        activities = db.session.query(
-            AdminLog.event_type,
-            db.func.count(AdminLog.id).label('count')
-        ).filter(
-            AdminLog.timestamp >= cutoff_date
-        ).group_by(AdminLog.event_type).all()
+        from admin.log_storage import count_events_by_type, count_active_users
 
-        # Get unique users active in period
-        active_users = db.session.query(
-            db.func.count(db.distinct(AdminLog.user_id))
-        ).filter(AdminLog.timestamp >= cutoff_date).scalar()
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
 
-        # Get total activities
-        total_activities = AdminLog.query.filter(
-            AdminLog.timestamp >= cutoff_date
-        ).count()
+        # Whole days come from the daily rollup, the partial edges from raw rows
+        activities_by_type = count_events_by_type(cutoff_date)
+        active_users = count_active_users(cutoff_date)
+        total_activities = sum(activities_by_type.values())
 
         return {
             'period_days': days,
             'total_activities': total_activities,
             'active_users': active_users,
-            'activities_by_type': {activity.event_type: activity.count for activity in activities},
-            'most_common_event': max(activities, key=lambda x: x.count).event_type if activities else None
+            'activities_by_type': activities_by_type,
+            'most_common_event': max(activities_by_type, key=activities_by_type.get) if activities_by_type else None
         }
 
     @staticmethod
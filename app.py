@@ -9,6 +9,7 @@ from flask_cors import CORS
 from datetime import datetime
 import os
 import logging
+import threading
 from flask import Flask, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
@@ -41,29 +42,59 @@ login_manager = LoginManager()
 csrf = CSRFProtect()
 migrate = Migrate()
 
-def create_app():
-    """Create and configure Flask application"""
+APP_PHASES = ('serve', 'worker', 'bootstrap')
+
+_process_app = None
+_process_app_lock = threading.Lock()
+
+
+def auto_bootstrap_enabled() -> bool:
+    """Whether a serve-phase app also runs the bootstrap (AUTO_BOOTSTRAP, default true)"""
+    return os.environ.get('AUTO_BOOTSTRAP', 'true').lower() != 'false'
+
+
+def create_app(phase=None):
+    """Create and configure Flask application
+    
+    PERFORMANCE: Start-up is split into phases so each process only pays for
+    what it uses. phase defaults to the APP_PHASE environment variable:
+    
+        serve      Web process: middleware, login flow and all blueprints. Also
+                   runs the bootstrap unless AUTO_BOOTSTRAP=false - under
+                   gunicorn the master runs it once (gunicorn.conf.py) and the
+                   workers it forks skip it.
+        worker     RQ jobs, OCR threads and scripts: configuration, extensions
+                   and models only. No blueprints, no schema checks.
+        bootstrap  Worker app plus run_bootstrap(): crash temp-file cleanup,
+                   create_all, schema patches, system organization and presets
+                   (scripts/bootstrap_app.py).
+    
+    STARTUP_PROFILE=true logs per-phase timings (utils/startup_profile.py).
+    """
+    from utils.startup_profile import StartupProfile
+    
+    phase = phase or os.environ.get('APP_PHASE', 'serve')
+    if phase not in APP_PHASES:
+        raise ValueError(f"Unknown application phase '{phase}' (expected one of {', '.join(APP_PHASES)})")
+    profile = StartupProfile(phase)
+    
     app = Flask(__name__)
+    app.config['APP_PHASE'] = phase
 
     # Add proxy fix for proper URL generation behind reverse proxy
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
     # Validate all required secrets on startup
-    from utils.secrets_validator import validate_secrets_on_startup, SecretsValidationError
-    
-    try:
-        # Determine environment from FLASK_ENV or default to development
-        environment = os.environ.get('FLASK_ENV', 'development')
-        validate_secrets_on_startup(environment)
-    except SecretsValidationError as e:
-        logger.error(f"Secrets validation failed: {e}")
-        raise
-    
-    # HIPAA: Cleanup any temp files from previous crash
-    from utils.secure_delete import cleanup_registered_temp_files
-    cleaned = cleanup_registered_temp_files()
-    if cleaned > 0:
-        logger.info(f"HIPAA: Cleaned up {cleaned} orphaned temp files from crash recovery")
+    with profile.phase('validate_secrets'):
+        from utils.secrets_validator import validate_secrets_on_startup, SecretsValidationError
+        
+        try:
+            # Determine environment from FLASK_ENV or default to development
+            environment = os.environ.get('FLASK_ENV', 'development')
+            validate_secrets_on_startup(environment)
+        except SecretsValidationError as e:
+            logger.error(f"Secrets validation failed: {e}")
+            raise
     
     # Configuration - SECRET_KEY validated above
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
@@ -78,6 +109,160 @@ def create_app():
     app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour session lifetime
     app.config['SESSION_REFRESH_EACH_REQUEST'] = True  # Refresh session on each request
 
+    with profile.phase('database_config'):
+        _configure_database(app, is_production)
+
+    # Initialize extensions
+    with profile.phase('extensions'):
+        db.init_app(app)
+        login_manager.init_app(app)
+        login_manager.login_view = 'auth.login'  # type: ignore
+        login_manager.login_message = 'Please log in to access this page.'
+        csrf.init_app(app)
+        configure_csrf_exemptions(app)
+        migrate.init_app(app, db)
+        _configure_login()
+        
+        # Per-request / per-job query counts and N+1 detection
+        from utils.query_profiler import init_query_profiler
+        init_query_profiler(app)
+        
+        # Role label for the gauges this process pushes to the fleet metrics store
+        from utils.fleet_metrics import configure_fleet_metrics
+        configure_fleet_metrics(phase)
+
+    if phase == 'serve':
+        with profile.phase('web'):
+            _configure_web(app, is_production)
+        
+        # Register blueprints
+        with profile.phase('blueprints'):
+            register_blueprints(app)
+            
+            # Register error handlers
+            register_error_handlers(app)
+
+    # Template filters and context processors
+    register_template_utilities(app)
+    configure_jinja_filters(app)
+
+    with profile.phase('models'):
+        import models  # noqa: F401 - registers mappers and session listeners
+
+    if phase == 'bootstrap' or (phase == 'serve' and auto_bootstrap_enabled()):
+        run_bootstrap(app, profile)
+    elif phase == 'serve':
+        logger.info("Startup bootstrap skipped (AUTO_BOOTSTRAP=false)")
+
+    app.extensions['startup_profile'] = profile.as_dict()
+    profile.log()
+    return app
+
+
+def get_app():
+    """
+    Application for code running outside a request: RQ jobs, OCR worker threads
+    and scripts. Returns the current app inside an app context, otherwise one
+    worker-phase app per process, created on first use.
+    """
+    global _process_app
+    from flask import current_app, has_app_context
+    
+    if has_app_context():
+        return current_app._get_current_object()
+    if _process_app is None:
+        with _process_app_lock:
+            if _process_app is None:
+                _process_app = create_app(phase='worker')
+    return _process_app
+
+
+def run_bootstrap(app, profile=None):
+    """
+    One-time start-up work against the database and host: crash temp-file
+    cleanup, create_all, schema patches, System Organization / root admin and
+    global presets. Idempotent; safe to run from several processes.
+    """
+    from utils.startup_profile import StartupProfile
+    profile = profile or StartupProfile('bootstrap')
+    
+    # HIPAA: Cleanup any temp files from previous crash. Runs once per start-up
+    # rather than per process - the registry is shared by every process on the
+    # host, so a late-starting worker must not delete files other processes
+    # are still using.
+    with profile.phase('temp_file_cleanup'):
+        from utils.secure_delete import cleanup_registered_temp_files
+        cleaned = cleanup_registered_temp_files()
+        if cleaned > 0:
+            logger.info(f"HIPAA: Cleaned up {cleaned} orphaned temp files from crash recovery")
+
+    # Create tables
+    with app.app_context():
+        import models  # Import after app context
+        with profile.phase('create_all'):
+            db.create_all()
+            logger.info("Database tables created successfully")
+        
+        # Create partial unique indexes for screening table (NULL-safe uniqueness)
+        with profile.phase('screening_indexes'):
+            _create_screening_unique_indexes(db)
+        
+        # Add new columns to existing tables (schema migration for existing databases)
+        with profile.phase('missing_columns'):
+            _add_missing_columns(db)
+        
+        # Ensure System Organization (org_id=0) and root admin configuration
+        # This is required before root admin can log in or perform any actions
+        with profile.phase('system_organization'):
+            _ensure_system_organization(db, models.Organization, models.User)
+        
+        # Ensure global screening presets exist and are owned by system
+        # These presets persist across AWS migrations and user deletions
+        with profile.phase('global_presets'):
+            from utils.seed_global_presets import ensure_global_presets
+            ensure_global_presets(db, models.ScreeningPreset, models.User)
+        
+        # Process any existing unmatched documents on startup (disabled by default for performance)
+        # Enable with environment variable: STARTUP_PROCESS_DOCS=true
+        # Document processing should be triggered by EMR sync or screening list refresh instead
+        if os.environ.get('STARTUP_PROCESS_DOCS', 'false').lower() == 'true':
+            try:
+                from core.engine import ScreeningEngine
+                from models import Document, ScreeningDocumentMatch
+                
+                # Check if there are unmatched documents with OCR text
+                unmatched_docs = db.session.query(Document).filter(
+                    Document.ocr_text.isnot(None),
+                    ~Document.id.in_(db.session.query(ScreeningDocumentMatch.document_id))
+                ).all()
+                
+                if unmatched_docs:
+                    logger.info(f"Processing {len(unmatched_docs)} unmatched documents on startup")
+                    engine = ScreeningEngine()
+                    
+                    processed_count = 0
+                    for doc in unmatched_docs:
+                        try:
+                            engine.process_new_document(doc.id)
+                            processed_count += 1
+                        except Exception as e:
+                            logger.warning(f"Failed to process document {doc.id} on startup: {str(e)}")
+                    
+                    logger.info(f"Startup document processing completed: {processed_count}/{len(unmatched_docs)} documents processed")
+                else:
+                    logger.info("No unmatched documents found on startup")
+            
+            except Exception as e:
+                logger.warning(f"Startup document processing failed: {str(e)}")
+                # Don't fail startup if document processing fails
+        else:
+            logger.info("Startup document processing disabled for faster boot times (set STARTUP_PROCESS_DOCS=true to enable)")
+
+    return profile
+
+
+def _configure_database(app, is_production):
+    """SQLAlchemy URI and engine options (PostgreSQL required in production)"""
     # Database configuration with production enforcement
     database_url = os.environ.get('DATABASE_URL', 'sqlite:///instance/healthprep.db')
 
@@ -121,21 +306,14 @@ def create_app():
         'pool_pre_ping': True,
     }
 
+
+def _configure_web(app, is_production):
+    """Request-facing setup for the serve phase: security headers, CORS, login flow, routes"""
     # Configure security headers and HTTPS enforcement
     from utils.security_headers import configure_security_middleware
     
-    # is_production already defined above for session config
     configure_security_middleware(app, force_https=is_production)
     
-    # Initialize extensions
-    db.init_app(app)
-    login_manager.init_app(app)
-    login_manager.login_view = 'auth.login'  # type: ignore
-    login_manager.login_message = 'Please log in to access this page.'
-    csrf.init_app(app)
-    configure_csrf_exemptions(app)
-    migrate.init_app(app, db)
-    
     # Configure CORS for API endpoints
     # Allow marketing website to call /api/signup endpoint
     # SECURITY: Restrict origins in production - never use "*" in production
@@ -150,27 +328,6 @@ def create_app():
     })
     logger.info(f"CORS configured with origins: {cors_origins}")
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        from models import User
-        try:
-            user = User.query.get(int(user_id))
-            if user and user.is_active_user:
-                # Update last activity
-                user.update_activity()
-                db.session.commit()
-                return user
-            return None
-        except Exception as e:
-            logger.error(f"Error loading user {user_id}: {e}")
-            return None
-
-    @login_manager.unauthorized_handler
-    def unauthorized():
-        from flask import flash, redirect, url_for, request
-        flash('Please log in to access this page.', 'warning')
-        return redirect(url_for('auth.login', next=request.url))
-
     @app.before_request
     def check_user_role_redirect():
         from flask_login import current_user
@@ -216,9 +373,6 @@ def create_app():
                   current_endpoint and (current_endpoint.startswith('admin.') or current_endpoint.startswith('root_admin.'))):
                 return redirect(url_for('ui.dashboard'))
 
-    # Register blueprints
-    register_blueprints(app)
-
     # Add static file serving for JWKS fallbacks
     from flask import send_from_directory
     @app.route('/static/<path:filename>')
@@ -226,70 +380,6 @@ def create_app():
         """Serve static files including JWKS fallbacks"""
         return send_from_directory('static', filename)
 
-    # Register error handlers
-    register_error_handlers(app)
-
-    # Template filters and context processors
-    register_template_utilities(app)
-    configure_jinja_filters(app)
-
-    # Create tables
-    with app.app_context():
-        import models  # Import after app context
-        db.create_all()
-        logger.info("Database tables created successfully")
-        
-        # Create partial unique indexes for screening table (NULL-safe uniqueness)
-        _create_screening_unique_indexes(db)
-        
-        # Add new columns to existing tables (schema migration for existing databases)
-        _add_missing_columns(db)
-        
-        # Ensure System Organization (org_id=0) and root admin configuration
-        # This is required before root admin can log in or perform any actions
-        _ensure_system_organization(db, models.Organization, models.User)
-        
-        # Ensure global screening presets exist and are owned by system
-        # These presets persist across AWS migrations and user deletions
-        from utils.seed_global_presets import ensure_global_presets
-        ensure_global_presets(db, models.ScreeningPreset, models.User)
-        
-        # Process any existing unmatched documents on startup (disabled by default for performance)
-        # Enable with environment variable: STARTUP_PROCESS_DOCS=true
-        # Document processing should be triggered by EMR sync or screening list refresh instead
-        if os.environ.get('STARTUP_PROCESS_DOCS', 'false').lower() == 'true':
-            try:
-                from core.engine import ScreeningEngine
-                from models import Document, ScreeningDocumentMatch
-                
-                # Check if there are unmatched documents with OCR text
-                unmatched_docs = db.session.query(Document).filter(
-                    Document.ocr_text.isnot(None),
-                    ~Document.id.in_(db.session.query(ScreeningDocumentMatch.document_id))
-                ).all()
-                
-                if unmatched_docs:
-                    logger.info(f"Processing {len(unmatched_docs)} unmatched documents on startup")
-                    engine = ScreeningEngine()
-                    
-                    processed_count = 0
-                    for doc in unmatched_docs:
-                        try:
-                            engine.process_new_document(doc.id)
-                            processed_count += 1
-                        except Exception as e:
-                            logger.warning(f"Failed to process document {doc.id} on startup: {str(e)}")
-                    
-                    logger.info(f"Startup document processing completed: {processed_count}/{len(unmatched_docs)} documents processed")
-                else:
-                    logger.info("No unmatched documents found on startup")
-            
-            except Exception as e:
-                logger.warning(f"Startup document processing failed: {str(e)}")
-                # Don't fail startup if document processing fails
-        else:
-            logger.info("Startup document processing disabled for faster boot times (set STARTUP_PROCESS_DOCS=true to enable)")
-
     # Root route
     @app.route('/')
     def index():
@@ -310,7 +400,30 @@ def create_app():
         else:
             return redirect(url_for('auth.login'))
 
-    return app
+
+def _configure_login():
+    """Flask-Login callbacks (every phase - jobs may resolve current_user too)"""
+    @login_manager.user_loader
+    def load_user(user_id):
+        from models import User
+        try:
+            user = User.query.get(int(user_id))
+            if user and user.is_active_user:
+                # Update last activity
+                user.update_activity()
+                db.session.commit()
+                return user
+            return None
+        except Exception as e:
+            logger.error(f"Error loading user {user_id}: {e}")
+            return None
+
+    @login_manager.unauthorized_handler
+    def unauthorized():
+        from flask import flash, redirect, url_for, request
+        flash('Please log in to access this page.', 'warning')
+        return redirect(url_for('auth.login', next=request.url))
+
 
 def register_blueprints(app):
     """Register all blueprints"""
@@ -688,4 +801,88 @@ def _add_missing_columns(db):
     except Exception as e:
         # Non-fatal - might be SQLite or column might already exist
         logger.debug(f"Column migration check skipped (may not be PostgreSQL): {e}")
-        db.session.rollback()
\ No newline at end of file
+        db.session.rollback()
+
+    # Denormalized screening match summary (core/match_summary.py)
+    screening_summary_columns = [
+        ('match_count', 'INTEGER NOT NULL DEFAULT 0'),
+        ('immunization_count', 'INTEGER NOT NULL DEFAULT 0'),
+        ('dismissed_count', 'INTEGER NOT NULL DEFAULT 0'),
+        ('latest_match_date', 'DATE NULL'),
+        ('latest_match_title', 'VARCHAR(255) NULL'),
+        ('latest_match_source', 'VARCHAR(20) NULL'),
+        ('match_summary_updated_at', 'TIMESTAMP NULL'),
+    ]
+    try:
+        result = db.session.execute(text("""
+            SELECT column_name FROM information_schema.columns 
+            WHERE table_name = 'screening'
+        """))
+        existing_columns = {row[0] for row in result}
+        added_columns = []
+        for column_name, column_type in screening_summary_columns:
+            if column_name not in existing_columns:
+                db.session.execute(text(f"ALTER TABLE screening ADD COLUMN {column_name} {column_type}"))
+                added_columns.append(column_name)
+        if added_columns:
+            db.session.commit()
+            logger.info(f"Added match summary columns to screening table: {', '.join(added_columns)}")
+        
+    except Exception as e:
+        logger.debug(f"Screening summary column migration skipped (may not be PostgreSQL): {e}")
+        db.session.rollback()
+
+    # Audit log access-pattern indexes (models.AdminLog.__table_args__). create_all() only
+    # indexes new tables; build them CONCURRENTLY so audit writes are not blocked, with an
+    # advisory lock so only one starting worker does the work.
+    try:
+        if db.engine.dialect.name == 'postgresql':
+            from models import AdminLog
+            with db.engine.connect() as conn:
+                conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+                if conn.execute(text("SELECT pg_try_advisory_lock(815203)")).scalar():
+                    try:
+                        for index in AdminLog.__table__.indexes:
+                            columns = ', '.join(column.name for column in index.columns)
+                            conn.execute(text(
+                                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index.name} ON admin_logs ({columns})"
+                            ))
+                    finally:
+                        conn.execute(text("SELECT pg_advisory_unlock(815203)"))
+        
+    except Exception as e:
+        logger.debug(f"Admin log index check skipped: {e}")
+
+    # Unique (screening_id, document_id) for the bulk re-match upsert (core/bulk_rematch.py).
+    # create_all() does not add constraints to existing tables; collapse duplicate pairs to
+    # their oldest row first, as migration a6b7c8d9e0f1 does.
+    try:
+        from sqlalchemy import inspect as sa_inspect
+        inspector = sa_inspect(db.engine)
+        pair = {'screening_id', 'document_id'}
+        has_unique_pair = any(
+            set(uc['column_names']) == pair
+            for uc in inspector.get_unique_constraints('screening_document_match')
+        ) or any(
+            index['unique'] and set(index['column_names']) == pair
+            for index in inspector.get_indexes('screening_document_match')
+        )
+        if not has_unique_pair:
+            with db.engine.begin() as conn:
+                if db.engine.dialect.name == 'postgresql':
+                    # One starting worker at a time; the lock ends with the transaction
+                    conn.execute(text("SELECT pg_advisory_xact_lock(815204)"))
+                removed = conn.execute(text("""
+                    DELETE FROM screening_document_match
+                    WHERE id NOT IN (
+                        SELECT MIN(id) FROM screening_document_match GROUP BY screening_id, document_id
+                    )
+                """)).rowcount
+                conn.execute(text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS uq_screening_document_match_pair "
+                    "ON screening_document_match (screening_id, document_id)"
+                ))
+            logger.info(f"Added unique screening/document match index ({removed} duplicate rows removed)")
+        
+    except Exception as e:
+        logger.warning(f"Screening match unique index check failed; bulk re-match upserts need it: {e}")
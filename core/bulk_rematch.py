@@ -0,0 +1,292 @@
+"""
+Bulk, resumable re-match of every document against its patient's screenings
+
+PERFORMANCE: DocumentMatcher.update_all_matches deleted every
+screening_document_match row, loaded every document with its text at once,
+and ran find_document_matches one document at a time: a screenings query per
+document, the keyword rules rebuilt for every (document, screening) pair,
+one ORM INSERT per match, and a single commit at the very end.
+
+rebuild_all_matches() walks documents in ID order, REMATCH_CHUNK_SIZE at a
+time:
+
+    load        one SELECT for the chunk's ids, filenames and text, one for
+                its patients' screenings
+    score       CompiledKeywordIndex (core/keyword_index.py), compiled once per
+                run, in-process or across a process pool (workers > 1)
+    upsert      one executemany INSERT ... ON CONFLICT (screening_id,
+                document_id) DO UPDATE for the chunk's matches (other
+                databases: executemany UPDATE of existing pairs + INSERT of
+                new ones); rows that no longer match are deleted, except
+                dismissed / pending-review rows, which keep their audit
+                metadata. At most 500 screenings match one document, as in
+                find_document_matches (ProcessingGuard)
+    checkpoint  the run's last_document_id advances in the same transaction,
+                then the chunk commits
+
+An interrupted run loses at most the chunk in flight: the next call resumes
+the newest incomplete MatchRebuildRun from its checkpoint. Match summaries of
+the screenings whose rows were written or removed are refreshed at each
+commit (core/match_summary.py).
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import bindparam, delete, select, update
+
+from .keyword_index import CompiledKeywordIndex, init_worker_index, match_documents_in_worker
+
+logger = logging.getLogger(__name__)
+
+REMATCH_CHUNK_SIZE = 500
+WORKER_BATCH_SIZE = 50  # documents per process pool task
+
+
+def get_rematch_workers() -> int:
+    """MATCH_REBUILD_WORKERS environment variable, default 1 (score in-process)"""
+    try:
+        return max(1, int(os.environ.get('MATCH_REBUILD_WORKERS', 1)))
+    except ValueError:
+        return 1
+
+
+def _upsert_statement(conn, table):
+    """INSERT ... ON CONFLICT (screening_id, document_id) DO UPDATE for PostgreSQL or SQLite"""
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=['screening_id', 'document_id'],
+        set_={
+            'match_confidence': stmt.excluded.match_confidence,
+            'matched_keywords': stmt.excluded.matched_keywords,
+            'updated_at': stmt.excluded.updated_at,
+        }
+    )
+
+
+def _write_matches(conn, table, new_rows, existing_ids: Dict[tuple, int]):
+    """
+    Upsert the chunk's matches. Dialects without ON CONFLICT get an executemany
+    UPDATE for pairs that already have a row (existing_ids: pair -> row id) and
+    an executemany INSERT for the rest.
+    """
+    if conn.dialect.name in ('postgresql', 'sqlite'):
+        conn.execute(_upsert_statement(conn, table), new_rows)
+        return
+
+    updates = [
+        {'row_id': existing_ids[(r['screening_id'], r['document_id'])], 'new_confidence': r['match_confidence'],
+         'new_keywords': r['matched_keywords'], 'new_updated_at': r['updated_at']}
+        for r in new_rows if (r['screening_id'], r['document_id']) in existing_ids
+    ]
+    inserts = [r for r in new_rows if (r['screening_id'], r['document_id']) not in existing_ids]
+    if updates:
+        conn.execute(
+            update(table).where(table.c.id == bindparam('row_id')).values(
+                match_confidence=bindparam('new_confidence'),
+                matched_keywords=bindparam('new_keywords'),
+                updated_at=bindparam('new_updated_at'),
+            ),
+            updates
+        )
+    if inserts:
+        conn.execute(table.insert(), inserts)
+
+
+def _make_executor(workers: int, type_keywords: Dict):
+    if workers <= 1:
+        return None
+    # spawn: workers only import core.keyword_index, never a copy of this process's
+    # database connections or threads
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker_index,
+        initargs=(type_keywords,)
+    )
+
+
+def rebuild_all_matches(chunk_size: int = REMATCH_CHUNK_SIZE, workers: Optional[int] = None,
+                        max_total_matches: Optional[int] = None, resume: bool = True,
+                        progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Re-match all documents, chunk by chunk, resuming an interrupted run.
+
+    Args:
+        chunk_size: Documents per transaction
+        workers: Scoring processes (default MATCH_REBUILD_WORKERS; 1 scores in-process)
+        max_total_matches: Stop (resumably) once this many matches were written;
+                           checked between chunks
+        resume: Continue the newest incomplete run instead of starting over
+        progress_callback: Called with the run statistics after each chunk
+
+    Returns:
+        {'run_id', 'resumed', 'completed', 'last_document_id', 'documents_processed',
+         'matches_written', 'matches_removed', 'elapsed_seconds'}
+    """
+    from app import db
+    from models import Document, Screening, ScreeningType, ScreeningDocumentMatch, MatchRebuildRun
+    from core.match_summary import queue_match_summary_refresh
+    from utils.keyword_validator import ProcessingGuard
+
+    session = db.session
+    started = time.monotonic()
+    workers = workers or get_rematch_workers()
+
+    run = None
+    if resume:
+        run = MatchRebuildRun.query.filter(
+            MatchRebuildRun.completed_at.is_(None)
+        ).order_by(MatchRebuildRun.id.desc()).first()
+    resumed = run is not None
+    if run is None:
+        run = MatchRebuildRun(last_document_id=0, documents_processed=0, matches_written=0, matches_removed=0)
+        session.add(run)
+        session.commit()
+    else:
+        logger.info(f"Resuming match rebuild run {run.id} after document {run.last_document_id}")
+
+    type_keywords = {st.id: st.keywords_list for st in ScreeningType.query.all()}
+    index = CompiledKeywordIndex(type_keywords)
+    executor = _make_executor(workers, type_keywords)
+    match_table = ScreeningDocumentMatch.__table__
+    checkpoint = run.last_document_id
+    written_this_call = 0
+
+    def stats():
+        return {
+            'run_id': run.id,
+            'resumed': resumed,
+            'completed': run.completed_at is not None,
+            'last_document_id': run.last_document_id,
+            'documents_processed': run.documents_processed,
+            'matches_written': run.matches_written,
+            'matches_removed': run.matches_removed,
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+        }
+
+    try:
+        while True:
+            rows = session.execute(
+                select(Document.id, Document.patient_id, Document.filename, Document._ocr_text.label('ocr_text'))
+                .where(Document.id > run.last_document_id)
+                .order_by(Document.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                run.completed_at = datetime.utcnow()
+                session.commit()
+                break
+
+            # patient_id -> {screening_type_id: [screening_id, ...]}
+            screenings_by_patient: Dict[int, Dict[int, list]] = {}
+            for screening_id, patient_id, type_id in session.execute(
+                select(Screening.id, Screening.patient_id, Screening.screening_type_id)
+                .where(Screening.patient_id.in_(list({row.patient_id for row in rows})))
+            ):
+                screenings_by_patient.setdefault(patient_id, {}).setdefault(type_id, []).append(screening_id)
+
+            # Screening types created since the run started
+            chunk_type_ids = {t for types in screenings_by_patient.values() for t in types}
+            if not chunk_type_ids <= set(type_keywords):
+                type_keywords = {st.id: st.keywords_list for st in ScreeningType.query.all()}
+                index = CompiledKeywordIndex(type_keywords)
+                if executor is not None:
+                    executor.shutdown()
+                    executor = _make_executor(workers, type_keywords)
+
+            work = [
+                (row.id, row.filename, row.ocr_text, list(screenings_by_patient[row.patient_id]))
+                for row in rows if row.ocr_text and row.patient_id in screenings_by_patient
+            ]
+            if executor is not None:
+                batches = [work[i:i + WORKER_BATCH_SIZE] for i in range(0, len(work), WORKER_BATCH_SIZE)]
+                results = [item for batch in executor.map(match_documents_in_worker, batches) for item in batch]
+            else:
+                results = [(document_id, index.match_document(filename, ocr_text, type_ids))
+                           for document_id, filename, ocr_text, type_ids in work]
+
+            now = datetime.utcnow()
+            patient_of = {row.id: row.patient_id for row in rows}
+            new_rows = []
+            for document_id, matches in results:
+                patient_screenings = screenings_by_patient[patient_of[document_id]]
+                # Same per-document limits as DocumentMatcher.find_document_matches
+                guard = ProcessingGuard(warning_threshold=100, hard_limit=500,
+                                        context=f"Document {document_id} matching")
+                for type_id, confidence, matched_keywords in matches:
+                    for screening_id in patient_screenings[type_id]:
+                        if not guard.increment():
+                            break
+                        new_rows.append({
+                            'screening_id': screening_id,
+                            'document_id': document_id,
+                            'match_confidence': confidence,
+                            'matched_keywords': json.dumps(matched_keywords) if matched_keywords else None,
+                            'match_result': 'matched',
+                            'created_at': now,
+                            'updated_at': now,
+                        })
+
+            new_pairs = {(r['screening_id'], r['document_id']) for r in new_rows}
+            existing_ids, stale = {}, []
+            for match_id, screening_id, document_id, match_result in session.execute(
+                select(match_table.c.id, match_table.c.screening_id, match_table.c.document_id,
+                       match_table.c.match_result)
+                .where(match_table.c.document_id.in_(list(patient_of)))
+            ):
+                existing_ids[(screening_id, document_id)] = match_id
+                if (screening_id, document_id) not in new_pairs and (match_result or 'matched') == 'matched':
+                    stale.append((match_id, screening_id))
+
+            conn = session.connection()
+            if stale:
+                conn.execute(delete(match_table).where(match_table.c.id.in_([match_id for match_id, _ in stale])))
+            if new_rows:
+                _write_matches(conn, match_table, new_rows, existing_ids)
+
+            # Core statements bypass the ORM events that keep match summaries current
+            queue_match_summary_refresh(
+                session, {r['screening_id'] for r in new_rows} | {screening_id for _, screening_id in stale}
+            )
+
+            run.last_document_id = rows[-1].id
+            run.documents_processed += len(rows)
+            run.matches_written += len(new_rows)
+            run.matches_removed += len(stale)
+            run.updated_at = now
+            session.commit()
+            checkpoint = rows[-1].id
+            written_this_call += len(new_rows)
+
+            if progress_callback:
+                progress_callback(stats())
+
+            if max_total_matches is not None and written_this_call >= max_total_matches:
+                logger.warning(f"Match rebuild run {run.id} stopped after {written_this_call} matches "
+                               f"(limit {max_total_matches}); resume to continue after document {checkpoint}")
+                break
+    except Exception:
+        session.rollback()
+        logger.exception(f"Match rebuild interrupted; it resumes after document {checkpoint}")
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    result = stats()
+    logger.info(f"Match rebuild run {run.id}: {result['documents_processed']} documents, "
+                f"{result['matches_written']} matches written, {result['matches_removed']} removed, "
+                f"completed={result['completed']}")
+    return result
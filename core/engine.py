@@ -6,8 +6,13 @@ from models import Patient, ScreeningType, Screening, Document, Organization
 from .matcher import DocumentMatcher
 from .criteria import EligibilityCriteria
 from .fuzzy_detection import FuzzyDetectionEngine
+from .keyword_effectiveness import (
+    build_keyword_effectiveness_report, generate_keyword_recommendations,
+    get_cached_keyword_effectiveness_report
+)
 from emr.epic_integration import EpicScreeningIntegration
 from services.appointment_prioritization import AppointmentBasedPrioritization
+from utils.app_cache import set_cached_keyword_report
 from datetime import datetime, date
 import logging
 from flask_login import current_user
@@ -50,12 +55,15 @@ class ScreeningEngine:
                     if priority_patient_ids:
                         self.logger.info(f"Processing {len(priority_patient_ids)} priority patients with upcoming appointments")
                         
-                        # Process priority patients first - mark as NOT dormant
+                        # Patients refreshed in this run - marked active (not dormant) in one
+                        # set-based update by the dormancy planner after processing
+                        processed_patient_ids = set()
+                        
+                        # Process priority patients first
                         for patient_id in priority_patient_ids:
                             try:
                                 updated_count += self.refresh_patient_screenings(patient_id)
-                                # Mark all screenings for this patient as active (not dormant)
-                                self._mark_patient_screenings_dormancy(patient_id, is_dormant=False)
+                                processed_patient_ids.add(patient_id)
                             except Exception as e:
                                 # Log but continue - one patient failure shouldn't stop all others
                                 self.logger.warning(f"Patient {patient_id} refresh failed, continuing with others: {str(e)}")
@@ -96,31 +104,24 @@ class ScreeningEngine:
                             for patient_id in patients_to_process:
                                 try:
                                     updated_count += self.refresh_patient_screenings(patient_id)
-                                    # Mark processed non-scheduled patients as active
-                                    self._mark_patient_screenings_dormancy(patient_id, is_dormant=False)
+                                    processed_patient_ids.add(patient_id)
                                 except Exception as e:
                                     # Log but continue - one patient failure shouldn't stop all others
                                     self.logger.warning(f"Patient {patient_id} refresh failed, continuing with others: {str(e)}")
-                            
-                            # When process_non_scheduled_patients is enabled, keep ALL non-scheduled active
-                            # Do NOT mark any as dormant - they should all remain processable
-                            all_non_scheduled = prioritization_service.get_non_scheduled_patients(
-                                exclude_patient_ids=priority_patient_ids
-                            )
-                            for patient_id in all_non_scheduled:
-                                self._mark_patient_screenings_dormancy(patient_id, is_dormant=False)
-                        else:
-                            # Mark patients without appointments AND not processed today as dormant (stale data)
-                            # Exclude both appointment patients AND same-day non-dormant patients
-                            # This ensures manually reprocessed patients stay active for the same day
-                            # but age out the next day if they don't have an appointment
-                            # priority_patient_ids already includes both: appointments + today's non-dormant
-                            non_scheduled_ids = prioritization_service.get_non_scheduled_patients(
-                                exclude_patient_ids=priority_patient_ids
-                            )
-                            self.logger.info(f"Marking {len(non_scheduled_ids)} patients (no appointments, not processed today) as dormant (process_non_scheduled_patients is disabled)")
-                            for patient_id in non_scheduled_ids:
-                                self._mark_patient_screenings_dormancy(patient_id, is_dormant=True)
+                        
+                        # Apply dormancy for the whole org in a few set-based UPDATEs:
+                        # - processed patients: active, last_processed = now
+                        # - process_non_scheduled_patients enabled: keep ALL non-scheduled active
+                        # - disabled: mark patients without appointments AND not processed today
+                        #   as dormant (stale data). priority_patient_ids already includes both
+                        #   appointments + today's non-dormant, so manually reprocessed patients
+                        #   stay active for the same day but age out the next day
+                        from services.dormancy_planner import DormancyPlanner
+                        dormancy_result = DormancyPlanner(org_id, organization).plan_and_apply(
+                            priority_patient_ids=priority_patient_ids,
+                            processed_patient_ids=processed_patient_ids
+                        )
+                        self.logger.info(f"Dormancy updated: {dormancy_result['rows_changed']} screenings changed")
                     else:
                         self.logger.info("No priority patients found - falling back to standard processing")
                         # Fall back to standard processing
@@ -215,55 +216,6 @@ class ScreeningEngine:
             
         return updated_count
     
-    def _mark_patient_screenings_dormancy(self, patient_id, is_dormant=True):
-        """Mark all screenings for a patient as dormant or active
-        
-        Args:
-            patient_id: Patient ID
-            is_dormant: True to mark as dormant (stale), False to mark as active
-            
-        Note: When marking dormant, respects "active for the day" semantic - 
-        screenings refreshed today will NOT be marked dormant until tomorrow.
-        Also, when marking dormant we don't update last_processed to preserve 
-        the timestamp that enables the "active for the day" check.
-        """
-        from datetime import datetime, timezone
-        now_utc = datetime.now(timezone.utc)
-        screenings = Screening.query.filter_by(patient_id=patient_id).all()
-        
-        marked_count = 0
-        skipped_count = 0
-        
-        for screening in screenings:
-            if is_dormant:
-                # When marking dormant, respect "active for the day" semantic
-                # Don't mark dormant if screening was refreshed today
-                today_start = now_utc.replace(hour=0, minute=0, second=0, microsecond=0)
-                
-                # Handle both naive and aware datetimes from database
-                screening_processed = screening.last_processed
-                if screening_processed:
-                    if screening_processed.tzinfo is None:
-                        # Make naive datetime aware for comparison
-                        screening_processed = screening_processed.replace(tzinfo=timezone.utc)
-                    if screening_processed >= today_start:
-                        skipped_count += 1
-                        continue  # Skip - was refreshed today, stays active
-                
-                # Mark dormant but DON'T update last_processed (preserve the active-for-day timestamp)
-                screening.is_dormant = True
-                marked_count += 1
-            else:
-                # Mark active and update last_processed
-                screening.is_dormant = False
-                screening.last_processed = now_utc.replace(tzinfo=None)  # Store as naive for consistency
-                marked_count += 1
-        
-        if is_dormant and skipped_count > 0:
-            self.logger.debug(f"Marked {marked_count} screenings dormant for patient {patient_id}, skipped {skipped_count} (refreshed today)")
-        else:
-            self.logger.debug(f"Marked {marked_count} screenings for patient {patient_id} as {'dormant' if is_dormant else 'active'}")
-    
     def _should_refresh_screening(self, screening: Screening, screening_type: ScreeningType) -> bool:
         """Determine if a screening needs to be refreshed based on criteria changes
         
@@ -594,92 +546,54 @@ class ScreeningEngine:
         return summary
     
     def analyze_screening_keywords(self, screening_type_id):
-        """Analyze and optimize keywords for a screening type using fuzzy detection"""
+        """
+        Analyze and optimize keywords for a screening type using fuzzy detection
+        
+        Served from the organization's cached keyword effectiveness report when
+        it matches the current keywords; otherwise the type's documents are
+        scanned once (core/keyword_effectiveness.py).
+        """
         screening_type = ScreeningType.query.get(screening_type_id)
         if not screening_type:
             return None
         
-        # Get related documents for analysis
-        related_documents = []
-        screenings = Screening.query.filter_by(screening_type_id=screening_type_id).all()
+        report = get_cached_keyword_effectiveness_report(screening_type.org_id)
+        if report is None or str(screening_type_id) not in report['screening_types']:
+            report = build_keyword_effectiveness_report(screening_type.org_id, [screening_type_id])
         
-        for screening in screenings:
-            matches = self.matcher.find_screening_matches(screening)
-            for match in matches:
-                related_documents.append(match['document'])
-        
-        # Analyze current keywords effectiveness
-        current_keywords = screening_type.keywords_list
-        keyword_analysis = {}
-        
-        for keyword in current_keywords:
-            document_texts = [f"{doc.filename or ''} {doc.ocr_text or ''}" 
-                             for doc in related_documents if doc.filename or doc.ocr_text]
-            
-            relevance = self.fuzzy_engine.validate_keyword_relevance(keyword, document_texts)
-            keyword_analysis[keyword] = {
-                'relevance': relevance,
-                'effective': relevance > 0.5
-            }
-        
-        # Get keyword suggestions
-        suggested_keywords = self.matcher.suggest_keywords_for_screening(
-            screening_type_id, related_documents
-        )
-        
-        return {
-            'screening_type': screening_type.name,
-            'current_keywords': keyword_analysis,
-            'suggested_keywords': suggested_keywords,
-            'total_related_documents': len(related_documents),
-            'recommendations': self._generate_keyword_recommendations(keyword_analysis, suggested_keywords)
-        }
+        return report['screening_types'][str(screening_type_id)]
     
     def _generate_keyword_recommendations(self, keyword_analysis, suggested_keywords):
         """Generate actionable keyword recommendations"""
-        recommendations = []
-        
-        # Identify ineffective keywords
-        ineffective_keywords = [kw for kw, analysis in keyword_analysis.items() 
-                               if not analysis['effective']]
-        
-        if ineffective_keywords:
-            recommendations.append({
-                'type': 'remove',
-                'message': f"Consider removing these ineffective keywords: {', '.join(ineffective_keywords)}",
-                'keywords': ineffective_keywords
-            })
-        
-        # Recommend new keywords
-        if suggested_keywords:
-            recommendations.append({
-                'type': 'add',
-                'message': f"Consider adding these relevant keywords: {', '.join(suggested_keywords[:5])}",
-                'keywords': suggested_keywords[:5]
-            })
-        
-        # Check for keyword gaps
-        high_relevance_keywords = [kw for kw, analysis in keyword_analysis.items() 
-                                  if analysis['relevance'] > 0.8]
+        return generate_keyword_recommendations(keyword_analysis, suggested_keywords)
+    
+    def optimize_all_screening_keywords(self, org_id=None):
+        """
+        Optimize keywords for all active screening types
         
-        if len(high_relevance_keywords) < 3:
-            recommendations.append({
-                'type': 'optimize',
-                'message': "Consider expanding keyword coverage for better document matching",
-                'keywords': []
-            })
+        One document scan per organization builds the analysis of all its
+        types; the report is cached before recommendations are applied.
+        """
+        if org_id is None:
+            org_ids = [row[0] for row in db.session.query(ScreeningType.org_id).filter_by(is_active=True).distinct()]
+        else:
+            org_ids = [org_id]
         
-        return recommendations
-    
-    def optimize_all_screening_keywords(self):
-        """Optimize keywords for all active screening types"""
-        screening_types = ScreeningType.query.filter_by(is_active=True).all()
         optimization_results = []
         
-        for screening_type in screening_types:
-            try:
-                analysis = self.analyze_screening_keywords(screening_type.id)
-                if analysis:
+        for current_org_id in org_ids:
+            report = build_keyword_effectiveness_report(current_org_id)
+            set_cached_keyword_report(current_org_id, report['keyword_set_version'], report)
+            
+            screening_types = {
+                st.id: st for st in ScreeningType.query.filter_by(org_id=current_org_id, is_active=True).all()
+            }
+            
+            for analysis in report['screening_types'].values():
+                screening_type = screening_types.get(analysis['screening_type_id'])
+                if not screening_type:
+                    continue
+                try:
                     optimization_results.append(analysis)
                     
                     # Auto-apply high-confidence recommendations
@@ -690,8 +604,8 @@ class ScreeningEngine:
                     if auto_applied:
                         self.logger.info(f"Auto-applied keyword optimizations for {screening_type.name}")
                         
-            except Exception as e:
-                self.logger.error(f"Error optimizing keywords for {screening_type.name}: {str(e)}")
+                except Exception as e:
+                    self.logger.error(f"Error optimizing keywords for {screening_type.name}: {str(e)}")
         
         if optimization_results:
             db.session.commit()
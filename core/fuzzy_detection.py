@@ -410,8 +410,19 @@ class FuzzyDetectionEngine:
                 match_count += 1
                 total_confidence += matches[0][1]  # First match confidence
         
+        return self.relevance_from_hits(match_count, total_confidence, len(document_texts))
+    
+    @staticmethod
+    def relevance_from_hits(match_count: int, total_confidence: float, document_count: int) -> float:
+        """
+        Relevance score from keyword hit counts (shared with the offline
+        keyword-effectiveness report in core/keyword_effectiveness.py)
+        """
+        if not document_count:
+            return 0.0
+        
         # Calculate relevance based on match frequency and average confidence
-        match_frequency = match_count / len(document_texts)
+        match_frequency = match_count / document_count
         avg_confidence = total_confidence / match_count if match_count > 0 else 0.0
         
         # Weighted combination of frequency and confidence
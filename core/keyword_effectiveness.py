@@ -0,0 +1,345 @@
+"""
+Offline keyword-effectiveness analytics
+
+ScreeningEngine.analyze_screening_keywords used to run find_screening_matches
+for every screening of a type (one document query and keyword match per
+screening), then, for each keyword, rebuild the full list of document texts
+and re-normalize and fuzzy-match every one of them, synchronously in the
+request. optimize_all_screening_keywords repeated that for every type.
+
+build_keyword_effectiveness_report() produces the same per-type analysis for a
+whole organization from a single scan of its documents:
+
+    related documents   a document is related to a type when its patient has a
+                        screening of that type, it passes the type's keyword
+                        match (same rule and 0.75 threshold as
+                        find_screening_matches) and that match is not dismissed
+    hit matrix          each related document is fuzzy-matched once against the
+                        union of its related types' keywords; hits (count and
+                        confidence sum) are added to every keyword x type cell
+                        they belong to
+    suggestions         drawn from each type's first SUGGESTION_SAMPLE_DOCUMENTS
+                        related documents, then scored through the same matrix
+                        for the documents that follow
+
+Relevance, effectiveness and recommendations use the formulas and thresholds
+of FuzzyDetectionEngine.validate_keyword_relevance and the previous engine
+code.
+
+Reports are cached per organization and keyword-set version (a hash of the
+active types' keywords, utils/app_cache.py), so a keyword change makes the
+cached report stale without any explicit invalidation. The report is built by
+an RQ job (services/async_processing.py); the keyword analysis APIs serve the
+cached report and enqueue the job when there is none.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from .fuzzy_detection import FuzzyDetectionEngine
+
+logger = logging.getLogger(__name__)
+
+SCAN_CHUNK_SIZE = 200
+SUGGESTION_SAMPLE_DOCUMENTS = 10  # documents per type that suggestions are drawn from
+MAX_SUGGESTED_KEYWORDS = 10
+MATCH_CONFIDENCE_THRESHOLD = 0.75  # find_screening_matches
+KEYWORD_HIT_THRESHOLD = 0.5  # validate_keyword_relevance
+SUGGESTION_MIN_RELEVANCE = 0.3  # suggest_keywords_for_screening
+EFFECTIVE_RELEVANCE = 0.5
+
+
+def keyword_set_version(types: Iterable[Dict]) -> str:
+    """Hash of the (type id, keywords) pairs, as in get_screening_type_rules()['types']"""
+    payload = sorted([t['id'], list(t['keywords'] or [])] for t in types)
+    return hashlib.sha1(json.dumps(payload).encode('utf-8')).hexdigest()[:16]
+
+
+def current_keyword_set_version(org_id: int) -> str:
+    from utils.app_cache import get_screening_type_rules
+    return keyword_set_version(get_screening_type_rules(org_id)['types'])
+
+
+def generate_keyword_recommendations(keyword_analysis: Dict, suggested_keywords: List[str]) -> List[Dict]:
+    """Generate actionable keyword recommendations"""
+    recommendations = []
+
+    # Identify ineffective keywords
+    ineffective_keywords = [kw for kw, analysis in keyword_analysis.items()
+                            if not analysis['effective']]
+
+    if ineffective_keywords:
+        recommendations.append({
+            'type': 'remove',
+            'message': f"Consider removing these ineffective keywords: {', '.join(ineffective_keywords)}",
+            'keywords': ineffective_keywords
+        })
+
+    # Recommend new keywords
+    if suggested_keywords:
+        recommendations.append({
+            'type': 'add',
+            'message': f"Consider adding these relevant keywords: {', '.join(suggested_keywords[:5])}",
+            'keywords': suggested_keywords[:5]
+        })
+
+    # Check for keyword gaps
+    high_relevance_keywords = [kw for kw, analysis in keyword_analysis.items()
+                               if analysis['relevance'] > 0.8]
+
+    if len(high_relevance_keywords) < 3:
+        recommendations.append({
+            'type': 'optimize',
+            'message': "Consider expanding keyword coverage for better document matching",
+            'keywords': []
+        })
+
+    return recommendations
+
+
+class _TypeState:
+    """Per screening type accumulators for one scan"""
+
+    def __init__(self, screening_type):
+        self.screening_type = screening_type
+        self.keywords = list(screening_type.keywords_list)
+        self.related_documents = 0
+        self.hits: Dict[str, List[float]] = {}  # keyword -> [match count, confidence sum]
+        self.sample_texts: List[str] = []
+        self.suggestions: Optional[List[str]] = None  # set once the sample is complete
+
+    def tracked_keywords(self) -> List[str]:
+        return self.keywords + (self.suggestions or [])
+
+    def add_hits(self, confidences: Dict[str, float], keywords: Iterable[str]) -> None:
+        for keyword in keywords:
+            confidence = confidences.get(keyword)
+            if confidence is not None:
+                cell = self.hits.setdefault(keyword, [0, 0.0])
+                cell[0] += 1
+                cell[1] += confidence
+
+    def relevance(self, keyword: str) -> float:
+        count, confidence_sum = self.hits.get(keyword, (0, 0.0))
+        return FuzzyDetectionEngine.relevance_from_hits(count, confidence_sum, self.related_documents)
+
+
+class KeywordEffectivenessScan:
+    """One pass over an organization's documents, building the keyword x type hit matrix"""
+
+    def __init__(self, screening_types, fuzzy_engine: Optional[FuzzyDetectionEngine] = None, matcher=None):
+        from .matcher import DocumentMatcher
+
+        self.fuzzy_engine = fuzzy_engine or FuzzyDetectionEngine()
+        self.matcher = matcher or DocumentMatcher()
+        self.types = {st.id: _TypeState(st) for st in screening_types}
+        self.documents_scanned = 0
+
+    def _hit_confidences(self, text: str, keywords: List[str]) -> Dict[str, float]:
+        """keyword -> confidence for every keyword hitting the text (one normalization of the text)"""
+        if not keywords:
+            return {}
+        return {
+            keyword: confidence
+            for keyword, confidence, _ in self.fuzzy_engine.fuzzy_match_keywords(
+                text, keywords, threshold=KEYWORD_HIT_THRESHOLD)
+        }
+
+    def _finalize_suggestions(self, state: _TypeState) -> None:
+        """Draw suggestions from the sample and score them over the sampled documents"""
+        suggestions = set()
+        for text in state.sample_texts:
+            suggestions.update(self.fuzzy_engine.suggest_keywords(text, state.keywords))
+        state.suggestions = sorted(suggestions - set(state.keywords))
+        for text in state.sample_texts:
+            state.add_hits(self._hit_confidences(text, state.suggestions), state.suggestions)
+        state.sample_texts = []
+
+    def add_document(self, document, related_type_ids: List[int]) -> None:
+        """Count one document's keyword hits for the types it is related to"""
+        self.documents_scanned += 1
+        if not related_type_ids:
+            return
+        text = f"{document.filename or ''} {document.ocr_text or ''}"
+
+        keywords = []
+        seen = set()
+        for type_id in related_type_ids:
+            for keyword in self.types[type_id].tracked_keywords():
+                if keyword not in seen:
+                    seen.add(keyword)
+                    keywords.append(keyword)
+        confidences = self._hit_confidences(text, keywords)
+
+        for type_id in related_type_ids:
+            state = self.types[type_id]
+            state.related_documents += 1
+            state.add_hits(confidences, state.tracked_keywords())
+            if state.suggestions is None:
+                state.sample_texts.append(text)
+                if len(state.sample_texts) >= SUGGESTION_SAMPLE_DOCUMENTS:
+                    self._finalize_suggestions(state)
+
+    def related_type_ids(self, document, patient_screenings: Dict[int, int], dismissed: set) -> List[int]:
+        """Types whose screening for this patient would match the document (find_screening_matches rule)"""
+        related = []
+        if not document.ocr_text:
+            return related
+        for type_id, screening_id in patient_screenings.items():
+            if (document.id, screening_id) in dismissed:
+                continue
+            confidence, _ = self.matcher._calculate_match_with_keywords(document, self.types[type_id].screening_type)
+            if confidence > MATCH_CONFIDENCE_THRESHOLD:
+                related.append(type_id)
+        return related
+
+    def analysis(self) -> Dict[str, Dict]:
+        """Per-type analysis, keyed by screening type id (as a string, the report is JSON)"""
+        results = {}
+        for type_id, state in self.types.items():
+            if state.suggestions is None:
+                self._finalize_suggestions(state)
+
+            keyword_analysis = {}
+            for keyword in state.keywords:
+                relevance = state.relevance(keyword)
+                count, confidence_sum = state.hits.get(keyword, (0, 0.0))
+                keyword_analysis[keyword] = {
+                    'relevance': relevance,
+                    'effective': relevance > EFFECTIVE_RELEVANCE,
+                    'matched_documents': count,
+                    'average_confidence': confidence_sum / count if count else 0.0,
+                }
+
+            scored = [(s, state.relevance(s)) for s in state.suggestions]
+            scored = [item for item in scored if item[1] > SUGGESTION_MIN_RELEVANCE]
+            scored.sort(key=lambda item: item[1], reverse=True)
+            suggested_keywords = [s for s, _ in scored[:MAX_SUGGESTED_KEYWORDS]]
+
+            results[str(type_id)] = {
+                'screening_type_id': type_id,
+                'screening_type': state.screening_type.name,
+                'current_keywords': keyword_analysis,
+                'suggested_keywords': suggested_keywords,
+                'total_related_documents': state.related_documents,
+                'recommendations': generate_keyword_recommendations(keyword_analysis, suggested_keywords),
+            }
+        return results
+
+
+def _load_screenings(session, type_ids: List[int]) -> Tuple[Dict[int, Dict[int, int]], set]:
+    """patient_id -> {screening_type_id: screening_id}, and active (document_id, screening_id) dismissals"""
+    from models import Screening, DismissedDocumentMatch
+
+    patient_screenings: Dict[int, Dict[int, int]] = {}
+    screening_ids = []
+    for screening_id, patient_id, type_id in session.execute(
+        select(Screening.id, Screening.patient_id, Screening.screening_type_id)
+        .where(Screening.screening_type_id.in_(type_ids))
+    ):
+        patient_screenings.setdefault(patient_id, {})[type_id] = screening_id
+        screening_ids.append(screening_id)
+
+    dismissed = set()
+    for start in range(0, len(screening_ids), SCAN_CHUNK_SIZE * 5):
+        chunk = screening_ids[start:start + SCAN_CHUNK_SIZE * 5]
+        dismissed.update((document_id, screening_id) for document_id, screening_id in session.execute(
+            select(DismissedDocumentMatch.document_id, DismissedDocumentMatch.screening_id)
+            .where(DismissedDocumentMatch.screening_id.in_(chunk),
+                   DismissedDocumentMatch.document_id.isnot(None),
+                   DismissedDocumentMatch.is_active == True)
+        ))
+    return patient_screenings, dismissed
+
+
+def build_keyword_effectiveness_report(org_id: int, screening_type_ids: Optional[List[int]] = None,
+                                       progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """
+    Scan an organization's documents once and analyze its screening type keywords.
+
+    Args:
+        org_id: Organization ID
+        screening_type_ids: Restrict to these types (default: all active types)
+        progress_callback: Called as (documents_scanned, last_document_id) after each chunk
+
+    Returns:
+        {'org_id', 'keyword_set_version', 'generated_at', 'documents_scanned',
+         'elapsed_seconds', 'screening_types': {str(type_id): analysis}}
+    """
+    from models import db, Document, ScreeningType
+
+    started = time.monotonic()
+    query = ScreeningType.query.filter_by(org_id=org_id)
+    if screening_type_ids is not None:
+        query = query.filter(ScreeningType.id.in_(screening_type_ids))
+    else:
+        query = query.filter_by(is_active=True)
+    screening_types = query.all()
+
+    version = keyword_set_version({'id': st.id, 'keywords': st.keywords_list} for st in screening_types)
+    scan = KeywordEffectivenessScan(screening_types)
+
+    patient_screenings, dismissed = {}, set()
+    if screening_types:
+        patient_screenings, dismissed = _load_screenings(db.session, [st.id for st in screening_types])
+    patient_ids = list(patient_screenings)
+
+    # Keyset over the patients' documents, text loaded with the row
+    for start in range(0, len(patient_ids), SCAN_CHUNK_SIZE * 5):
+        patient_chunk = patient_ids[start:start + SCAN_CHUNK_SIZE * 5]
+        last_id = 0
+        while True:
+            documents = Document.query.filter(
+                Document.patient_id.in_(patient_chunk),
+                Document.id > last_id
+            ).options(Document.text_loader_option()).order_by(Document.id).limit(SCAN_CHUNK_SIZE).all()
+            if not documents:
+                break
+            for document in documents:
+                related = scan.related_type_ids(document, patient_screenings[document.patient_id], dismissed)
+                scan.add_document(document, related)
+                db.session.expunge(document)
+            last_id = documents[-1].id
+            if progress_callback:
+                progress_callback(scan.documents_scanned, last_id)
+
+    report = {
+        'org_id': org_id,
+        'keyword_set_version': version,
+        'generated_at': datetime.utcnow().isoformat(),
+        'documents_scanned': scan.documents_scanned,
+        'screening_types': scan.analysis(),
+    }
+    report['elapsed_seconds'] = round(time.monotonic() - started, 3)
+    logger.info(f"Keyword effectiveness report for org {org_id}: {len(screening_types)} types, "
+                f"{scan.documents_scanned} documents in {report['elapsed_seconds']}s")
+    return report
+
+
+def get_cached_keyword_effectiveness_report(org_id: int) -> Optional[Dict]:
+    """The cached report for the organization's current keyword set, or None"""
+    from utils.app_cache import get_cached_keyword_report
+    return get_cached_keyword_report(org_id, current_keyword_set_version(org_id))
+
+
+def get_or_request_keyword_effectiveness_report(org_id: int, user_id: int) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    (report, None) when a current report is cached, otherwise (None, job_id)
+    after enqueueing the report job (job_id is None if the queue is unavailable).
+    """
+    report = get_cached_keyword_effectiveness_report(org_id)
+    if report is not None:
+        return report, None
+    try:
+        from services.async_processing import get_async_processing_service
+        job_id = get_async_processing_service().enqueue_keyword_effectiveness_report(org_id, user_id)
+    except Exception as e:
+        logger.warning(f"Could not enqueue keyword effectiveness report for org {org_id}: {e}")
+        job_id = None
+    return None, job_id
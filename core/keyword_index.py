@@ -0,0 +1,221 @@
+"""
+Compiled screening keyword rules, shared by per-document and bulk matching
+
+DocumentMatcher (core/matcher.py) applies three rules to a document and a
+screening type: a substring pre-filter on the keywords, their stems,
+suffix variants and legacy synonyms; word-boundary regexes for every
+keyword that is not a generic stopword, against the filename and the OCR
+text; and a confidence from what matched, accepted above
+MATCH_CONFIDENCE_THRESHOLD. The rules live here as plain functions.
+
+PERFORMANCE: DocumentMatcher builds the patterns and pre-filter terms again
+for every (document, screening) pair. CompiledKeywordIndex compiles them
+once per screening type and, within a document, evaluates each distinct
+pre-filter term and keyword once no matter how many of the patient's
+screening types share it. Results are those of
+DocumentMatcher._quick_keyword_prefilter + _calculate_match_with_keywords.
+
+This module imports neither the app nor the models, so process pool workers
+(core/bulk_rematch.py) can load it on their own.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MATCH_CONFIDENCE_THRESHOLD = 0.75  # Raised threshold to reduce false positives
+
+# Generic stopwords that cause false positives, never matched as keywords
+MATCH_KEYWORD_STOPWORDS = {'review', 'note', 'report', 'imaging', 'result', 'clinic', 'screening', 'test', 'exam'}
+
+# Legacy term mappings (maintained for backward compatibility)
+LEGACY_TERM_MAPPINGS = {
+    'dxa': ['dexa', 'bone density', 'densitometry'],
+    'mammogram': ['mammography', 'breast imaging'],
+    'colonoscopy': ['colonography', 'colon screening'],
+    'pap': ['pap smear', 'cervical screening', 'cytology'],
+    'a1c': ['hemoglobin a1c', 'hba1c', 'glycohemoglobin'],
+    'lipid': ['cholesterol', 'lipid panel', 'lipids'],
+    'cbc': ['complete blood count', 'blood count'],
+    'echo': ['echocardiogram', 'cardiac echo'],
+    'ekg': ['ecg', 'electrocardiogram'],
+    'stress test': ['cardiac stress', 'exercise test']
+}
+
+# Medical suffix variations to check (handles mammogram/mammography, colonoscopy/colon, etc.)
+_PREFILTER_SUFFIX_STEMS = {
+    'gram': ['graphy', 'graphic', 'grams'],
+    'scopy': ['scope', 'scopic'],
+    'ectomy': ['ectomies'],
+    'oscopy': ['oscope', 'oscopic'],
+}
+_PREFILTER_STRIP_SUFFIXES = ['graphy', 'gram', 'scopy', 'scope', 'ectomy', 'screening', 'test', 'exam']
+
+
+def prefilter_needles(keywords, term_mappings=LEGACY_TERM_MAPPINGS):
+    """
+    Lowercase substrings whose presence lets a screening type through the
+    quick keyword pre-filter: each keyword, its stem (at least 4 chars), its
+    medical suffix variants and its legacy synonyms.
+
+    Returns None when the type has no keywords (it can't be pre-filtered).
+    """
+    if not keywords:
+        return None
+    
+    needles = []
+    for keyword in keywords:
+        keyword_lower = keyword.lower().strip()
+        if not keyword_lower:
+            continue
+        
+        needles.append(keyword_lower)
+        
+        # Extract stem for variant matching (remove common suffixes)
+        stem = keyword_lower
+        for suffix in _PREFILTER_STRIP_SUFFIXES:
+            if keyword_lower.endswith(suffix) and len(keyword_lower) > len(suffix) + 2:
+                stem = keyword_lower[:-len(suffix)]
+                break
+        if len(stem) >= 4:
+            needles.append(stem)
+        
+        for base_suffix, variants in _PREFILTER_SUFFIX_STEMS.items():
+            if keyword_lower.endswith(base_suffix):
+                base = keyword_lower[:-len(base_suffix)]
+                needles.extend(f"{base}{variant}" for variant in variants)
+        
+        for base_term, synonyms in term_mappings.items():
+            if keyword_lower == base_term or keyword_lower in synonyms:
+                needles.append(base_term)
+                needles.extend(synonyms)
+    
+    return list(dict.fromkeys(needles))
+
+
+def keyword_pattern(keyword):
+    """Word-boundary regex for a keyword; multi-word keywords match their words in sequence"""
+    if ' ' in keyword:
+        # Multi-word: escape each word and require sequential matching with whitespace
+        escaped_words = [re.escape(word) for word in keyword.split()]
+        return r'\b' + r'\s+'.join(escaped_words) + r'\b'
+    # Single word: exact word boundary matching
+    return r'\b' + re.escape(keyword) + r'\b'
+
+
+def keyword_match_confidence(filename_matches, ocr_matches):
+    """Confidence from the keywords found in the filename/title and in the OCR text"""
+    # Start with base confidence
+    confidence = 0.0
+    
+    # Filename matches are very reliable (high confidence)
+    if filename_matches:
+        confidence += 0.9  # High confidence for filename matches
+        if len(filename_matches) > 1:
+            confidence += min(0.1, (len(filename_matches) - 1) * 0.02)  # Small bonus for multiple
+    
+    # OCR matches are also reliable but slightly lower than filename
+    if ocr_matches:
+        ocr_confidence = 0.8  # Base confidence for OCR matches
+        if len(ocr_matches) > 1:
+            ocr_confidence += min(0.15, (len(ocr_matches) - 1) * 0.03)  # Bonus for multiple OCR matches
+        
+        # If we already have filename matches, OCR adds additional confidence
+        if filename_matches:
+            confidence += ocr_confidence * 0.3  # 30% additional confidence from OCR when filename already matches
+        else:
+            confidence += ocr_confidence  # Full OCR confidence if no filename match
+    
+    return min(confidence, 1.0)
+
+
+class CompiledKeywordIndex:
+    """Keyword rules of a set of screening types, compiled once"""
+
+    def __init__(self, type_keywords: Dict[int, List[str]]):
+        """
+        Args:
+            type_keywords: screening_type_id -> keywords_list
+        """
+        self.type_keywords = type_keywords
+        self._needles: Dict[int, Optional[List[str]]] = {}
+        self._valid_keywords: Dict[int, List[str]] = {}
+        self._patterns = {}
+
+        for type_id, keywords in type_keywords.items():
+            keywords = keywords or []
+            self._needles[type_id] = prefilter_needles(keywords)
+            # Duplicates are kept: the confidence counts every listed keyword that matched
+            valid_keywords = [k for k in keywords if k.lower() not in MATCH_KEYWORD_STOPWORDS]
+            self._valid_keywords[type_id] = valid_keywords
+            for keyword in valid_keywords:
+                if keyword not in self._patterns:
+                    self._patterns[keyword] = re.compile(keyword_pattern(keyword), re.IGNORECASE)
+
+    def match_document(self, filename: Optional[str], ocr_text: Optional[str],
+                       type_ids: Iterable[int]) -> List[Tuple[int, float, List[str]]]:
+        """
+        Screening types (of the given ones) this document matches.
+
+        Returns:
+            [(screening_type_id, confidence, matched_keywords), ...]
+        """
+        if not ocr_text:
+            return []
+        filename = filename or ''
+        ocr_text_lower = ocr_text.lower()
+        needle_hits = {}
+        keyword_hits = {}
+        matches = []
+
+        for type_id in type_ids:
+            if type_id not in self._needles:
+                continue
+            needles = self._needles[type_id]
+            if needles is not None:
+                passed = False
+                for needle in needles:
+                    hit = needle_hits.get(needle)
+                    if hit is None:
+                        hit = needle_hits[needle] = needle in ocr_text_lower
+                    if hit:
+                        passed = True
+                        break
+                if not passed:
+                    continue
+
+            filename_matches = []
+            ocr_matches = []
+            for keyword in self._valid_keywords[type_id]:
+                hits = keyword_hits.get(keyword)
+                if hits is None:
+                    pattern = self._patterns[keyword]
+                    hits = keyword_hits[keyword] = (
+                        bool(filename) and pattern.search(filename) is not None,
+                        pattern.search(ocr_text) is not None,
+                    )
+                if hits[0]:
+                    filename_matches.append(keyword)
+                if hits[1]:
+                    ocr_matches.append(keyword)
+
+            if filename_matches or ocr_matches:
+                confidence = keyword_match_confidence(filename_matches, ocr_matches)
+                if confidence > MATCH_CONFIDENCE_THRESHOLD:
+                    matches.append((type_id, confidence, list(dict.fromkeys(filename_matches + ocr_matches))))
+
+        return matches
+
+
+# Process pool workers: each builds the index once from the type keywords
+_worker_index: Optional[CompiledKeywordIndex] = None
+
+
+def init_worker_index(type_keywords: Dict[int, List[str]]) -> None:
+    global _worker_index
+    _worker_index = CompiledKeywordIndex(type_keywords)
+
+
+def match_documents_in_worker(documents: List[Tuple[int, str, str, List[int]]]):
+    """[(document_id, filename, ocr_text, type_ids)] -> [(document_id, matches)]"""
+    return [(document_id, _worker_index.match_document(filename, ocr_text, type_ids))
+            for document_id, filename, ocr_text, type_ids in documents]
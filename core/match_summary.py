@@ -0,0 +1,214 @@
+"""
+Denormalized per-screening match summary
+
+The screening list only needs counts and the latest matched document for each
+row. Computing that at render time required eager-loading every document match,
+FHIR document and immunization for the page, plus two DismissedDocumentMatch
+queries and filtering in Python.
+
+Instead, each Screening row carries a small summary:
+    match_count         Active (non-dismissed) document + FHIR document matches
+    immunization_count  Linked immunization records
+    dismissed_count     Active dismissals for the screening
+    latest_match_date   Date of the most recent active match
+    latest_match_title  Filename / title / vaccine name of that match
+    latest_match_source 'document', 'fhir' or 'immunization'
+    match_summary_updated_at  NULL until first computed
+
+Summaries are kept current transactionally: session events in models.py
+collect the screenings touched by ScreeningDocumentMatch, DismissedDocumentMatch
+and FHIR document / immunization association changes during flush, and
+refresh_screening_match_summaries() recomputes them just before commit, in the
+same transaction. Bulk Query.delete()/update() paths bypass those events and
+must call refresh_screening_match_summaries() (or queue_match_summary_refresh())
+themselves.
+
+Recomputation is set-based: four grouped queries per chunk of screenings,
+then one executemany UPDATE.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, select
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CHUNK_SIZE = 500
+MATCH_SUMMARY_PENDING_KEY = 'match_summary_pending'
+
+
+def _empty_summary() -> Dict:
+    return {
+        'match_count': 0,
+        'immunization_count': 0,
+        'dismissed_count': 0,
+        'latest_match_date': None,
+        'latest_match_title': None,
+        'latest_match_source': None,
+    }
+
+
+def _consider_latest(summary: Dict, match_date, title: Optional[str], source: str) -> None:
+    """Keep the most recent match; undated matches only fill an empty slot"""
+    current = summary['latest_match_date']
+    if summary['latest_match_source'] is None or (match_date and (current is None or match_date > current)):
+        summary['latest_match_date'] = match_date
+        summary['latest_match_title'] = (title or '')[:255] or None
+        summary['latest_match_source'] = source
+
+
+def compute_match_summaries(session, screening_ids: List[int]) -> Dict[int, Dict]:
+    """Compute summaries for one chunk of screening IDs (no writes)"""
+    from models import (
+        Document, FHIRDocument, FHIRImmunization, ScreeningDocumentMatch,
+        DismissedDocumentMatch, screening_fhir_documents, screening_immunizations
+    )
+
+    summaries = {sid: _empty_summary() for sid in screening_ids}
+
+    dismissed_docs = set()
+    dismissed_fhir = set()
+    for screening_id, document_id, fhir_document_id in session.execute(
+        select(DismissedDocumentMatch.screening_id, DismissedDocumentMatch.document_id,
+               DismissedDocumentMatch.fhir_document_id)
+        .where(DismissedDocumentMatch.screening_id.in_(screening_ids),
+               DismissedDocumentMatch.is_active == True)
+    ):
+        summaries[screening_id]['dismissed_count'] += 1
+        if document_id is not None:
+            dismissed_docs.add((screening_id, document_id))
+        if fhir_document_id is not None:
+            dismissed_fhir.add((screening_id, fhir_document_id))
+
+    for screening_id, document_id, document_date, created_at, filename in session.execute(
+        select(ScreeningDocumentMatch.screening_id, Document.id, Document.document_date,
+               Document.created_at, Document.filename)
+        .join(Document, Document.id == ScreeningDocumentMatch.document_id)
+        .where(ScreeningDocumentMatch.screening_id.in_(screening_ids))
+    ):
+        if (screening_id, document_id) in dismissed_docs:
+            continue
+        summary = summaries[screening_id]
+        summary['match_count'] += 1
+        match_date = document_date or (created_at.date() if created_at else None)
+        _consider_latest(summary, match_date, filename, 'document')
+
+    fhir_link = screening_fhir_documents.c
+    for screening_id, fhir_id, document_date, title, type_display in session.execute(
+        select(fhir_link.screening_id, FHIRDocument.id, FHIRDocument.document_date,
+               FHIRDocument.title, FHIRDocument.document_type_display)
+        .join(FHIRDocument, FHIRDocument.id == fhir_link.fhir_document_id)
+        .where(fhir_link.screening_id.in_(screening_ids))
+    ):
+        if (screening_id, fhir_id) in dismissed_fhir:
+            continue
+        summary = summaries[screening_id]
+        summary['match_count'] += 1
+        _consider_latest(summary, document_date, title or type_display, 'fhir')
+
+    immunization_link = screening_immunizations.c
+    for screening_id, administration_date, vaccine_name in session.execute(
+        select(immunization_link.screening_id, FHIRImmunization.administration_date,
+               FHIRImmunization.vaccine_name)
+        .join(FHIRImmunization, FHIRImmunization.id == immunization_link.immunization_id)
+        .where(immunization_link.screening_id.in_(screening_ids))
+    ):
+        summary = summaries[screening_id]
+        summary['immunization_count'] += 1
+        _consider_latest(summary, administration_date, vaccine_name, 'immunization')
+
+    return summaries
+
+
+SUMMARY_FIELDS = ('match_count', 'immunization_count', 'dismissed_count',
+                  'latest_match_date', 'latest_match_title', 'latest_match_source')
+
+
+def _summary_update_statement():
+    from models import Screening
+
+    table = Screening.__table__
+    # Bind names must not collide with the SET column names
+    values = {field: bindparam(f'b_{field}') for field in SUMMARY_FIELDS}
+    values['match_summary_updated_at'] = bindparam('b_updated_at')
+    # Summary maintenance is not a screening change - don't fire updated_at's onupdate
+    values['updated_at'] = table.c.updated_at
+    return table.update().where(table.c.id == bindparam('b_id')).values(**values)
+
+
+def _summary_rows(summaries: Dict[int, Dict], now: datetime) -> List[Dict]:
+    rows = []
+    for screening_id, summary in summaries.items():
+        row = {f'b_{field}': summary[field] for field in SUMMARY_FIELDS}
+        row['b_id'] = screening_id
+        row['b_updated_at'] = now
+        rows.append(row)
+    return rows
+
+
+def refresh_screening_match_summaries(screening_ids: Optional[Iterable[int]] = None,
+                                      org_id: Optional[int] = None, session=None) -> int:
+    """
+    Recompute and store match summaries.
+
+    Runs in the caller's transaction (no commit). Pass screening_ids to refresh
+    specific rows, or org_id to refresh a whole organization.
+
+    Returns:
+        Number of screening rows updated
+    """
+    from app import db
+    from models import Screening
+
+    session = session or db.session
+
+    if screening_ids is None:
+        if org_id is None:
+            raise ValueError("refresh_screening_match_summaries requires screening_ids or org_id")
+        screening_ids = [row[0] for row in session.execute(
+            select(Screening.id).where(Screening.org_id == org_id)
+        )]
+    screening_ids = sorted(set(screening_ids))
+    if not screening_ids:
+        return 0
+
+    update_stmt = _summary_update_statement()
+    now = datetime.utcnow()
+    updated = 0
+    for start in range(0, len(screening_ids), SUMMARY_CHUNK_SIZE):
+        chunk = screening_ids[start:start + SUMMARY_CHUNK_SIZE]
+        rows = _summary_rows(compute_match_summaries(session, chunk), now)
+        session.execute(update_stmt, rows)
+        updated += len(rows)
+
+    logger.debug(f"Refreshed match summaries for {updated} screenings")
+    return updated
+
+
+def queue_match_summary_refresh(session, screening_ids: Iterable[int]) -> None:
+    """Refresh these screenings' summaries when the session's transaction commits"""
+    session.info.setdefault(MATCH_SUMMARY_PENDING_KEY, set()).update(
+        sid for sid in screening_ids if sid is not None
+    )
+
+
+def backfill_missing_summaries(screenings) -> int:
+    """
+    Compute summaries for loaded screenings that were never summarized (rows
+    created before the summary columns existed). The caller commits and reloads.
+
+    Returns:
+        Number of screenings backfilled
+    """
+    from app import db
+
+    missing_ids = [s.id for s in screenings if s.match_summary_updated_at is None]
+    if not missing_ids:
+        return 0
+
+    summaries = compute_match_summaries(db.session, missing_ids)
+    db.session.execute(_summary_update_statement(), _summary_rows(summaries, datetime.utcnow()))
+    logger.info(f"Backfilled match summaries for {len(missing_ids)} screenings")
+    return len(missing_ids)
@@ -1,12 +1,14 @@
 """
 Advanced fuzzy keyword matching and document matching functionality with semantic detection
 """
-from app import db
-from models import Document, Screening, ScreeningType, ScreeningDocumentMatch
+from models import Document, Screening, ScreeningType
 from .fuzzy_detection import FuzzyDetectionEngine
 from datetime import date
-import json
 import logging
+from .keyword_index import (
+    LEGACY_TERM_MAPPINGS, MATCH_CONFIDENCE_THRESHOLD, MATCH_KEYWORD_STOPWORDS,
+    keyword_match_confidence, keyword_pattern, prefilter_needles
+)
 
 class DocumentMatcher:
     """Handles document matching against screening criteria using advanced fuzzy matching"""
@@ -16,18 +18,7 @@ class DocumentMatcher:
         self.fuzzy_engine = FuzzyDetectionEngine()
         
         # Legacy term mappings (maintained for backward compatibility)
-        self.term_mappings = {
-            'dxa': ['dexa', 'bone density', 'densitometry'],
-            'mammogram': ['mammography', 'breast imaging'],
-            'colonoscopy': ['colonography', 'colon screening'],
-            'pap': ['pap smear', 'cervical screening', 'cytology'],
-            'a1c': ['hemoglobin a1c', 'hba1c', 'glycohemoglobin'],
-            'lipid': ['cholesterol', 'lipid panel', 'lipids'],
-            'cbc': ['complete blood count', 'blood count'],
-            'echo': ['echocardiogram', 'cardiac echo'],
-            'ekg': ['ecg', 'electrocardiogram'],
-            'stress test': ['cardiac stress', 'exercise test']
-        }
+        self.term_mappings = LEGACY_TERM_MAPPINGS
     
     def find_document_matches(self, document, max_matches=None):
         """
@@ -81,7 +72,7 @@ class DocumentMatcher:
             confidence, matched_keywords = self._calculate_match_with_keywords(document, screening.screening_type)
             
             # AUDIT TRAIL: Log match explanation regardless of outcome
-            if confidence > 0.75:  # Raised threshold to reduce false positives
+            if confidence > MATCH_CONFIDENCE_THRESHOLD:
                 if guard.increment():
                     matches.append((screening.id, confidence, matched_keywords))
                     # Log successful match with full explanation
@@ -123,57 +114,14 @@ class DocumentMatcher:
         
         PERFORMANCE: This check is O(k) where k is keyword count, vs O(n*k) for fuzzy matching.
         """
-        keywords = screening_type.keywords_list
-        if not keywords:
+        needles = prefilter_needles(screening_type.keywords_list, self.term_mappings)
+        if needles is None:
             # No keywords defined - can't pre-filter, must do full matching
             return True
         
-        # Medical suffix variations to check (handles mammogram/mammography, colonoscopy/colon, etc.)
-        suffix_stems = {
-            'gram': ['graphy', 'graphic', 'grams'],
-            'scopy': ['scope', 'scopic'],
-            'ectomy': ['ectomies'],
-            'oscopy': ['oscope', 'oscopic'],
-        }
-        
-        # Check if ANY keyword (or its stem/variant) appears in the document
-        for keyword in keywords:
-            keyword_lower = keyword.lower().strip()
-            if not keyword_lower:
-                continue
-            
-            # Direct substring check (fast)
-            if keyword_lower in ocr_text_lower:
-                return True
-            
-            # Extract stem for variant matching (remove common suffixes)
-            stem = keyword_lower
-            for suffix in ['graphy', 'gram', 'scopy', 'scope', 'ectomy', 'screening', 'test', 'exam']:
-                if keyword_lower.endswith(suffix) and len(keyword_lower) > len(suffix) + 2:
-                    stem = keyword_lower[:-len(suffix)]
-                    break
-            
-            # Check if stem (at least 4 chars) appears in document
-            if len(stem) >= 4 and stem in ocr_text_lower:
-                return True
-            
-            # Check medical suffix variations
-            for base_suffix, variants in suffix_stems.items():
-                if keyword_lower.endswith(base_suffix):
-                    base = keyword_lower[:-len(base_suffix)]
-                    for variant in variants:
-                        if f"{base}{variant}" in ocr_text_lower:
-                            return True
-            
-            # Check term mappings from the class (legacy synonym support)
-            for base_term, synonyms in self.term_mappings.items():
-                if keyword_lower == base_term or keyword_lower in synonyms:
-                    # Check all synonyms in document
-                    if base_term in ocr_text_lower:
-                        return True
-                    for synonym in synonyms:
-                        if synonym in ocr_text_lower:
-                            return True
+        # Check if ANY keyword (or its stem/variant/synonym) appears in the document
+        if any(needle in ocr_text_lower for needle in needles):
+            return True
         
         # No keywords found - skip this screening
         return False
@@ -203,7 +151,9 @@ class DocumentMatcher:
             context=f"Screening {screening.id} ({screening.screening_type.name}) matching"
         )
         
-        documents = Document.query.filter_by(patient_id=screening.patient_id).all()
+        documents = Document.query.filter_by(patient_id=screening.patient_id).options(
+            Document.text_loader_option()
+        ).all()
         
         # First pass: find all potential matches
         for document in documents:
@@ -490,8 +440,7 @@ class DocumentMatcher:
             return 0.0, []
         
         # Remove generic stopwords that cause false positives
-        stopwords = {'review', 'note', 'report', 'imaging', 'result', 'clinic', 'screening', 'test', 'exam'}
-        valid_keywords = [k for k in keywords if k.lower() not in stopwords]
+        valid_keywords = [k for k in keywords if k.lower() not in MATCH_KEYWORD_STOPWORDS]
         
         if not valid_keywords:
             return 0.0, []
@@ -501,14 +450,7 @@ class DocumentMatcher:
         ocr_matches = []
         
         for keyword in valid_keywords:
-            # Handle multi-word keywords: require sequential word matching
-            if ' ' in keyword:
-                # Multi-word: escape each word and require sequential matching with whitespace
-                escaped_words = [re.escape(word) for word in keyword.split()]
-                pattern = r'\b' + r'\s+'.join(escaped_words) + r'\b'
-            else:
-                # Single word: exact word boundary matching
-                pattern = r'\b' + re.escape(keyword) + r'\b'
+            pattern = keyword_pattern(keyword)
             
             # Check filename matches
             if filename and re.search(pattern, filename, re.IGNORECASE):
@@ -520,31 +462,9 @@ class DocumentMatcher:
         
         # Calculate confidence based on matches found
         if filename_matches or ocr_matches:
-            # Start with base confidence
-            confidence = 0.0
-            
-            # Filename matches are very reliable (high confidence)
-            if filename_matches:
-                confidence += 0.9  # High confidence for filename matches
-                if len(filename_matches) > 1:
-                    confidence += min(0.1, (len(filename_matches) - 1) * 0.02)  # Small bonus for multiple
-            
-            # OCR matches are also reliable but slightly lower than filename
-            if ocr_matches:
-                ocr_confidence = 0.8  # Base confidence for OCR matches
-                if len(ocr_matches) > 1:
-                    ocr_confidence += min(0.15, (len(ocr_matches) - 1) * 0.03)  # Bonus for multiple OCR matches
-                
-                # If we already have filename matches, OCR adds additional confidence
-                if filename_matches:
-                    confidence += ocr_confidence * 0.3  # 30% additional confidence from OCR when filename already matches
-                else:
-                    confidence += ocr_confidence  # Full OCR confidence if no filename match
-            
             # Return confidence and all matched keywords (deduplicated)
             all_matched = list(set(filename_matches + ocr_matches))
-            final_confidence = min(confidence, 1.0)
-            return final_confidence, all_matched
+            return keyword_match_confidence(filename_matches, ocr_matches), all_matched
         
         # No exact matches = zero confidence
         return 0.0, []
@@ -603,55 +523,29 @@ class DocumentMatcher:
         # Return confidence based on best match
         return matches[0][1] if matches else 0.0
     
-    def update_all_matches(self, max_total_matches=10000):
+    def update_all_matches(self, max_total_matches=10000, workers=None, resume=True):
         """
         Update all document-screening matches in the database with processing guards.
         
+        Runs the chunked bulk re-match (core/bulk_rematch.py): matches are
+        upserted chunk by chunk with a checkpoint, so an interrupted or
+        limit-stopped run resumes where it left off on the next call.
+        
         Args:
-            max_total_matches: Maximum total matches to process (prevents runaway processing)
+            max_total_matches: Maximum matches to write in this call (prevents runaway
+                               processing); None for no limit
+            workers: Scoring processes (default MATCH_REBUILD_WORKERS)
+            resume: Continue the last incomplete run instead of starting over
+        
+        Returns:
+            Run statistics (see rebuild_all_matches)
         """
-        from utils.keyword_validator import ProcessingGuard
+        from core.bulk_rematch import rebuild_all_matches
         
         self.logger.info("Starting to update all document-screening matches")
-        
-        # Global processing guard for entire batch
-        global_guard = ProcessingGuard(
-            warning_threshold=5000,
-            hard_limit=max_total_matches,
-            context="update_all_matches global"
-        )
-        
-        # Clear existing matches
-        ScreeningDocumentMatch.query.delete()
-        
-        # Process all documents
-        documents = Document.query.filter(Document.ocr_text.isnot(None)).all()
-        total_matches = 0
-        
-        for document in documents:
-            if not global_guard.can_continue():
-                self.logger.warning(f"Global processing guard limit reached after {total_matches} matches")
-                break
-                
-            matches = self.find_document_matches(document)
-            
-            for screening_id, confidence, matched_keywords in matches:
-                if not global_guard.increment():
-                    self.logger.warning(f"Global processing guard hard limit reached at {total_matches} matches")
-                    break
-                    
-                match = ScreeningDocumentMatch()
-                match.screening_id = screening_id
-                match.document_id = document.id
-                match.match_confidence = confidence
-                match.matched_keywords = json.dumps(matched_keywords) if matched_keywords else None
-                db.session.add(match)
-                total_matches += 1
-        
-        db.session.commit()
-        
-        stats = global_guard.get_stats()
-        self.logger.info(f"Completed updating all document-screening matches: {total_matches} total, stats: {stats}")
+        stats = rebuild_all_matches(workers=workers, max_total_matches=max_total_matches, resume=resume)
+        self.logger.info(f"Completed updating all document-screening matches: {stats}")
+        return stats
     
     def suggest_keywords_for_screening(self, screening_type_id, sample_documents=None):
         """Suggest keywords for a screening type based on document analysis"""
@@ -661,7 +555,7 @@ class DocumentMatcher:
         
         # Get sample documents if not provided
         if not sample_documents:
-            sample_documents = Document.query.limit(50).all()
+            sample_documents = Document.query.options(Document.text_loader_option()).limit(50).all()
         
         # Extract text from documents
         from models import FHIRDocument
@@ -7,11 +7,17 @@ import json
 import os
 import secrets
 import base64
+import re
+import time
 from datetime import datetime, timedelta
 from urllib.parse import urlencode, parse_qs, urlparse, quote
 from typing import Dict, Optional, Any
 import logging
 
+from utils.fleet_metrics import record_fhir_request
+
+_RESOURCE_TYPE_RE = re.compile(r'^[A-Z][A-Za-z]+$')
+
 class FHIRClient:
     """Client for connecting to Epic FHIR API following Epic's query patterns"""
     
@@ -140,7 +146,7 @@ class FHIRClient:
             self.logger.info(f"  - grant_type: authorization_code")
             self.logger.info(f"  - code: {'<present>' if authorization_code else 'None'}")
             
-            response = requests.post(self.token_url, data=data)
+            response = self._http_post(self.token_url, data=data)
             
             # Log response details for debugging
             self.logger.info(f"Token exchange response:")
@@ -204,7 +210,7 @@ class FHIRClient:
                 'client_secret': self.client_secret
             }
             
-            response = requests.post(self.token_url, data=data)
+            response = self._http_post(self.token_url, data=data)
             response.raise_for_status()
             
             token_data = response.json()
@@ -308,6 +314,33 @@ class FHIRClient:
         
         self.logger.info("Epic FHIR tokens set successfully")
     
+    def _resource_label(self, url: str) -> str:
+        """Bounded label for latency metrics: FHIR resource type, 'token' or 'other'"""
+        if url == self.token_url:
+            return 'token'
+        if url.startswith(self.base_url):
+            resource = re.split(r'[/?]', url[len(self.base_url):].lstrip('/'), maxsplit=1)[0]
+            if _RESOURCE_TYPE_RE.match(resource):
+                return resource
+        return 'other'
+    
+    def _request(self, method: str, url: str, **kwargs):
+        """requests.request() that records the call's latency in the fleet metrics"""
+        start = time.perf_counter()
+        status_code = None
+        try:
+            response = requests.request(method, url, **kwargs)
+            status_code = response.status_code
+            return response
+        finally:
+            record_fhir_request(self._resource_label(url), time.perf_counter() - start, status_code)
+    
+    def _http_get(self, url: str, **kwargs):
+        return self._request('GET', url, **kwargs)
+    
+    def _http_post(self, url: str, **kwargs):
+        return self._request('POST', url, **kwargs)
+    
     def _get_headers(self):
         """
         Get headers for FHIR API requests with OAuth2 bearer token
@@ -343,7 +376,7 @@ class FHIRClient:
                 headers = self._get_headers()
                 
                 self.logger.debug(f"Making Epic API request to {url} (attempt {attempt + 1})")
-                response = requests.get(url, headers=headers, params=params or {})
+                response = self._http_get(url, headers=headers, params=params or {})
                 
                 # Handle 401 Unauthorized specifically (Epic blueprint pattern)
                 if response.status_code == 401:
@@ -446,7 +479,7 @@ class FHIRClient:
             if identifier:
                 params['identifier'] = identifier
             
-            response = requests.get(url, headers=self._get_headers(), params=params)
+            response = self._http_get(url, headers=self._get_headers(), params=params)
             response.raise_for_status()
             
             return response.json()
@@ -491,7 +524,7 @@ class FHIRClient:
                 else:
                     params['date'] = f"le{date_to.isoformat()}"
             
-            response = requests.get(url, headers=self._get_headers(), params=params)
+            response = self._http_get(url, headers=self._get_headers(), params=params)
             response.raise_for_status()
             
             return response.json()
@@ -600,13 +633,13 @@ class FHIRClient:
             params['_count'] = 100
             
             headers = self._get_headers()
-            response = requests.get(url, headers=headers, params=params)
+            response = self._http_get(url, headers=headers, params=params)
             
             if response.status_code == 401:
                 self.logger.warning("Token expired, attempting refresh...")
                 if self.refresh_access_token():
                     headers = self._get_headers()
-                    response = requests.get(url, headers=headers, params=params)
+                    response = self._http_get(url, headers=headers, params=params)
             
             response.raise_for_status()
             data = response.json()
@@ -676,13 +709,13 @@ class FHIRClient:
                 params['date'] = f'ge{date_from}'
             
             headers = self._get_headers()
-            response = requests.get(url, headers=headers, params=params)
+            response = self._http_get(url, headers=headers, params=params)
             
             if response.status_code == 401:
                 self.logger.warning("Token expired, attempting refresh...")
                 if self.refresh_access_token():
                     headers = self._get_headers()
-                    response = requests.get(url, headers=headers, params=params)
+                    response = self._http_get(url, headers=headers, params=params)
             
             response.raise_for_status()
             data = response.json()
@@ -801,7 +834,7 @@ class FHIRClient:
             headers = self._get_headers()
             headers['Accept'] = 'application/fhir+json'
             
-            response = requests.get(url, headers=headers)
+            response = self._http_get(url, headers=headers)
             
             # Categorize HTTP errors
             if response.status_code in (401, 403):
@@ -902,7 +935,7 @@ class FHIRClient:
             if date_from:
                 params['date'] = f"ge{date_from.isoformat()}"
             
-            response = requests.get(url, headers=self._get_headers(), params=params)
+            response = self._http_get(url, headers=self._get_headers(), params=params)
             response.raise_for_status()
             
             return response.json()
@@ -970,7 +1003,7 @@ class FHIRClient:
     def download_document_content(self, document_url):
         """Download the actual content of a document"""
         try:
-            response = requests.get(document_url, headers=self._get_headers())
+            response = self._http_get(document_url, headers=self._get_headers())
             response.raise_for_status()
             
             return response.content
@@ -1027,7 +1060,7 @@ class FHIRClient:
                 else:
                     params['date'] = f"le{date_to.isoformat()}"
             
-            response = requests.get(url, headers=self._get_headers(), params=params)
+            response = self._http_get(url, headers=self._get_headers(), params=params)
             response.raise_for_status()
             
             return response.json()
@@ -1069,7 +1102,7 @@ class FHIRClient:
                 else:
                     params['date'] = f"le{date_to.isoformat()}"
             
-            response = requests.get(url, headers=self._get_headers(), params=params)
+            response = self._http_get(url, headers=self._get_headers(), params=params)
             response.raise_for_status()
             
             return response.json()
@@ -1144,7 +1177,7 @@ class FHIRClient:
             if not content_url.startswith('http'):
                 content_url = f"{self.base_url.rstrip('/')}/{content_url.lstrip('/')}"
             
-            response = requests.get(content_url, headers=self._get_headers())
+            response = self._http_get(content_url, headers=self._get_headers())
             response.raise_for_status()
             
             self.logger.info(f"Downloaded document content from {content_url}")
@@ -1196,7 +1229,7 @@ class FHIRClient:
             self.logger.info(f"Creating DocumentReference at {url}")
             self.logger.debug(f"DocumentReference payload summary: {debug_summary}")
             
-            response = requests.post(url, headers=headers, json=document_reference_data)
+            response = self._http_post(url, headers=headers, json=document_reference_data)
             
             # Check status manually to ensure we have access to response object
             if response.status_code >= 400:
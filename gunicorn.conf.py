@@ -4,6 +4,9 @@ Handles long-running EMR sync operations
 """
 
 import multiprocessing
+import os
+import subprocess
+import sys
 
 # Server socket
 bind = "0.0.0.0:5000"
@@ -44,3 +47,14 @@ certfile = None
 # Enable reload for development
 reload = True
 reload_extra_files = []
+
+# Startup bootstrap: run the schema / seed phase once here instead of in every
+# worker (and again whenever max_requests recycles one). It runs in a child
+# process so the master never imports application code, which keeps reload
+# working; forked workers inherit AUTO_BOOTSTRAP=false.
+def on_starting(server):
+    if os.environ.get('AUTO_BOOTSTRAP', 'true').lower() == 'false':
+        return
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts', 'bootstrap_app.py')
+    subprocess.run([sys.executable, script], check=True, stdout=subprocess.DEVNULL)
+    os.environ['AUTO_BOOTSTRAP'] = 'false'
@@ -0,0 +1,53 @@
+"""Unique screening/document match pairs and bulk re-match checkpoints
+
+PERFORMANCE: DocumentMatcher.update_all_matches deleted every
+screening_document_match row and re-inserted matches one ORM object at a
+time. The bulk re-match (core/bulk_rematch.py) upserts with
+INSERT ... ON CONFLICT on (screening_id, document_id), which needs a unique
+constraint; duplicate pairs (possible before, all writers checked for an
+existing row first) are collapsed to their oldest row. match_rebuild_runs
+records the last document a run finished so an interrupted run resumes there.
+
+Revision ID: a6b7c8d9e0f1
+Revises: f5a6b7c8d9e0
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6b7c8d9e0f1'
+down_revision = 'f5a6b7c8d9e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        DELETE FROM screening_document_match
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM screening_document_match GROUP BY screening_id, document_id
+        )
+    """)
+    op.create_unique_constraint(
+        'uq_screening_document_match_pair', 'screening_document_match', ['screening_id', 'document_id']
+    )
+
+    op.create_table(
+        'match_rebuild_runs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('last_document_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('documents_processed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('matches_written', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('matches_removed', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade():
+    op.drop_table('match_rebuild_runs')
+    op.drop_constraint('uq_screening_document_match_pair', 'screening_document_match', type_='unique')
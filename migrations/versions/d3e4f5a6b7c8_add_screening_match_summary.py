@@ -0,0 +1,44 @@
+"""Add denormalized match summary columns to screening
+
+PERFORMANCE: The screening list renders match counts and the latest matched
+document from these columns instead of eager-loading every document match,
+FHIR document and immunization per row. Maintained transactionally by
+core/match_summary.py; rows with NULL match_summary_updated_at are computed
+lazily on first render.
+
+Also merges the a1b2c3d4e5f6 / c2d3e4f5g6h7 heads.
+
+Revision ID: d3e4f5a6b7c8
+Revises: a1b2c3d4e5f6, c2d3e4f5g6h7
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3e4f5a6b7c8'
+down_revision = ('a1b2c3d4e5f6', 'c2d3e4f5g6h7')
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('screening', sa.Column('match_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('screening', sa.Column('immunization_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('screening', sa.Column('dismissed_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('screening', sa.Column('latest_match_date', sa.Date(), nullable=True))
+    op.add_column('screening', sa.Column('latest_match_title', sa.String(length=255), nullable=True))
+    op.add_column('screening', sa.Column('latest_match_source', sa.String(length=20), nullable=True))
+    op.add_column('screening', sa.Column('match_summary_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('screening', 'match_summary_updated_at')
+    op.drop_column('screening', 'latest_match_source')
+    op.drop_column('screening', 'latest_match_title')
+    op.drop_column('screening', 'latest_match_date')
+    op.drop_column('screening', 'dismissed_count')
+    op.drop_column('screening', 'immunization_count')
+    op.drop_column('screening', 'match_count')
@@ -0,0 +1,73 @@
+"""Add admin_logs access-pattern indexes and daily rollup tables
+
+PERFORMANCE: admin_logs had no indexes on timestamp, org_id, event_type or
+ip_address, so every activity summary, export, analytics counter and
+brute-force check scanned the whole audit table. Indexes are built
+CONCURRENTLY on PostgreSQL so audit writes are not blocked.
+
+admin_log_daily_rollup / admin_log_rollup_days hold pre-aggregated daily
+counts (see admin/log_storage.py). Monthly partitioning is optional and
+applied separately with scripts/admin_log_maintenance.py partition.
+
+Revision ID: e4f5a6b7c8d9
+Revises: d3e4f5a6b7c8
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f5a6b7c8d9'
+down_revision = 'd3e4f5a6b7c8'
+branch_labels = None
+depends_on = None
+
+
+ADMIN_LOG_INDEXES = [
+    ('idx_admin_logs_timestamp', ['timestamp']),
+    ('idx_admin_logs_org_timestamp', ['org_id', 'timestamp']),
+    ('idx_admin_logs_event_timestamp', ['event_type', 'timestamp']),
+    ('idx_admin_logs_ip_event_timestamp', ['ip_address', 'event_type', 'timestamp']),
+    ('idx_admin_logs_user_timestamp', ['user_id', 'timestamp']),
+    ('idx_admin_logs_patient', ['patient_id']),
+]
+
+
+def upgrade():
+    op.create_table(
+        'admin_log_daily_rollup',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('org_id', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('event_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index('idx_admin_log_rollup_day_org', 'admin_log_daily_rollup', ['day', 'org_id'])
+    op.create_index('idx_admin_log_rollup_day_event', 'admin_log_daily_rollup', ['day', 'event_type'])
+
+    op.create_table(
+        'admin_log_rollup_days',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('rolled_up_at', sa.DateTime(), nullable=False),
+        sa.Column('source_rows', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, columns in ADMIN_LOG_INDEXES:
+                op.create_index(name, 'admin_logs', columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, columns in ADMIN_LOG_INDEXES:
+            op.create_index(name, 'admin_logs', columns)
+
+
+def downgrade():
+    for name, _ in reversed(ADMIN_LOG_INDEXES):
+        op.drop_index(name, table_name='admin_logs')
+    op.drop_table('admin_log_rollup_days')
+    op.drop_index('idx_admin_log_rollup_day_event', table_name='admin_log_daily_rollup')
+    op.drop_index('idx_admin_log_rollup_day_org', table_name='admin_log_daily_rollup')
+    op.drop_table('admin_log_daily_rollup')
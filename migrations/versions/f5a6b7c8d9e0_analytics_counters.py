@@ -0,0 +1,52 @@
+"""Add incremental analytics counter tables
+
+PERFORMANCE: The ROI dashboard ran COUNT(*) queries over document, patient and
+screening on every page load. analytics_daily_counters holds per-org, per-day
+counts and analytics_gauges per-org totals, both maintained incrementally (see
+admin/analytics_counters.py). Tables start empty; counters for an organization
+are built from the raw tables on first read, or up front with
+scripts/analytics_counters.py rebuild.
+
+Revision ID: f5a6b7c8d9e0
+Revises: e4f5a6b7c8d9
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5a6b7c8d9e0'
+down_revision = 'e4f5a6b7c8d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'analytics_daily_counters',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('org_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('metric', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.UniqueConstraint('org_id', 'day', 'metric', name='uq_analytics_counter_org_day_metric'),
+    )
+    op.create_index('idx_analytics_counter_metric_day', 'analytics_daily_counters', ['metric', 'day'])
+
+    op.create_table(
+        'analytics_gauges',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('org_id', sa.Integer(), nullable=False),
+        sa.Column('metric', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('org_id', 'metric', name='uq_analytics_gauge_org_metric'),
+    )
+
+
+def downgrade():
+    op.drop_table('analytics_gauges')
+    op.drop_index('idx_analytics_counter_metric_day', table_name='analytics_daily_counters')
+    op.drop_table('analytics_daily_counters')
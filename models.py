@@ -7,8 +7,9 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 import json
 import logging
-from sqlalchemy import event
+from sqlalchemy import event, inspect as sa_inspect
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred, undefer, load_only
 from typing import Optional
 
 # Import db from app module
@@ -17,8 +18,17 @@ from app import db
 # Import encryption utilities
 from utils.encryption import encrypt_field, decrypt_field, is_encryption_enabled
 
+# Transparent at-rest compression for large text columns (OCR text, FHIR JSON)
+from utils.text_compression import CompressedText
+
 logger = logging.getLogger(__name__)
 
+# Deferred column groups for large Text columns.
+# These are NOT loaded when rows are listed (screening list, refresh, prep sheet
+# categories). Matching/OCR paths opt in with the model's text_loader_option().
+DOCUMENT_TEXT_GROUP = 'document_text'  # PHI-filtered OCR text / content
+FHIR_RESOURCE_GROUP = 'fhir_resource'  # Raw (sanitized) FHIR resource JSON
+
 
 class Organization(db.Model):
     """Organization model for multi-tenancy"""
@@ -1099,7 +1109,7 @@ class Patient(db.Model):
 
     # Epic FHIR integration fields
     epic_patient_id = db.Column(db.String(100))  # Epic Patient.id from FHIR
-    fhir_patient_resource = db.Column(db.Text)  # Full FHIR Patient resource (JSON)
+    fhir_patient_resource = deferred(db.Column(CompressedText), group=FHIR_RESOURCE_GROUP)  # Full FHIR Patient resource (JSON) - deferred, compressed
     last_fhir_sync = db.Column(db.DateTime)  # Last time data was synced from Epic
     fhir_version_id = db.Column(db.String(50))  # FHIR resource version for change detection
     
@@ -1906,6 +1916,17 @@ class Screening(db.Model):
     last_processed = db.Column(db.DateTime)  # Last time screening criteria was evaluated
     is_dormant = db.Column(db.Boolean, default=False, index=True)  # True if outside appointment window
 
+    # PERFORMANCE: Denormalized match summary for the screening list (see core/match_summary.py).
+    # Maintained in the same transaction as ScreeningDocumentMatch / DismissedDocumentMatch /
+    # FHIR document / immunization link changes; NULL match_summary_updated_at = not yet computed.
+    match_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')  # Active document + FHIR matches
+    immunization_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    dismissed_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    latest_match_date = db.Column(db.Date)
+    latest_match_title = db.Column(db.String(255))
+    latest_match_source = db.Column(db.String(20))  # 'document', 'fhir', 'immunization'
+    match_summary_updated_at = db.Column(db.DateTime)
+
     # Relationships
     organization = db.relationship('Organization', backref='screenings')
     provider = db.relationship('Provider', backref=db.backref('screenings', lazy=True))
@@ -1925,10 +1946,10 @@ class Screening(db.Model):
     def get_active_document_matches(self):
         """Get document matches excluding dismissed ones.
         
-        Uses prefetched _dismissed_doc_ids if available (set by screening_routes.py)
-        to avoid N+1 queries when rendering the screening list.
+        Uses prefetched _dismissed_doc_ids if a caller attached them to avoid N+1
+        queries. The screening list renders from the match summary columns instead.
         """
-        # Use prefetched dismissed IDs if available (set by batch query in screening_routes)
+        # Use prefetched dismissed IDs if available
         if hasattr(self, '_dismissed_doc_ids'):
             dismissed_ids = self._dismissed_doc_ids
         else:
@@ -1948,10 +1969,10 @@ class Screening(db.Model):
     def get_active_fhir_documents(self):
         """Get FHIR documents excluding dismissed ones.
         
-        Uses prefetched _dismissed_fhir_ids if available (set by screening_routes.py)
-        to avoid N+1 queries when rendering the screening list.
+        Uses prefetched _dismissed_fhir_ids if a caller attached them to avoid N+1
+        queries. The screening list renders from the match summary columns instead.
         """
-        # Use prefetched dismissed IDs if available (set by batch query in screening_routes)
+        # Use prefetched dismissed IDs if available
         if hasattr(self, '_dismissed_fhir_ids'):
             dismissed_ids = self._dismissed_fhir_ids
         else:
@@ -1986,8 +2007,8 @@ class Document(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(500))
     document_type = db.Column(db.String(50))  # 'lab', 'imaging', 'consult', 'hospital'
-    _content = db.Column('content', db.Text)  # PHI-filtered OCR extracted text (private column)
-    _ocr_text = db.Column('ocr_text', db.Text)  # PHI-filtered OCR extracted text (private column)
+    _content = deferred(db.Column('content', CompressedText), group=DOCUMENT_TEXT_GROUP)  # PHI-filtered OCR extracted text (private column, deferred, compressed)
+    _ocr_text = deferred(db.Column('ocr_text', CompressedText), group=DOCUMENT_TEXT_GROUP)  # PHI-filtered OCR extracted text (private column, deferred, compressed)
     ocr_confidence = db.Column(db.Float)
     phi_filtered = db.Column(db.Boolean, default=False)
     processed_at = db.Column(db.DateTime)
@@ -2110,6 +2131,29 @@ class Document(db.Model):
         """Set OCR text with mandatory PHI filtering - legacy method, uses property setter"""
         self.ocr_text = text
     
+    @classmethod
+    def text_loader_option(cls):
+        """Loader option that eagerly loads the deferred OCR text column.
+        
+        Use on queries that read ocr_text for every row (matching, OCR, keyword
+        filtering) so the text arrives in the same SELECT instead of one lazy
+        load per document.
+        """
+        return undefer(cls._ocr_text)
+    
+    @classmethod
+    def summary_columns(cls):
+        """Columns for the lightweight document summary projection (UI and prep sheet listing)"""
+        return (
+            cls.id, cls.patient_id, cls.org_id, cls.filename, cls.document_type,
+            cls.document_date, cls.ocr_confidence, cls.created_at
+        )
+    
+    @classmethod
+    def summary_loader_option(cls):
+        """Loader option restricting a Document query to summary_columns()"""
+        return load_only(*cls.summary_columns())
+    
     def set_content(self, text):
         """Set content with mandatory PHI filtering - legacy method, uses property setter"""
         self.content = text
@@ -2234,7 +2278,7 @@ class FHIRDocument(db.Model):
     
     # FHIR DocumentReference fields
     epic_document_id = db.Column(db.String(100), nullable=False)  # Epic DocumentReference.id
-    fhir_document_reference = db.Column(db.Text)  # Full FHIR DocumentReference resource (JSON)
+    fhir_document_reference = deferred(db.Column(CompressedText), group=FHIR_RESOURCE_GROUP)  # Full FHIR DocumentReference resource (JSON) - deferred, compressed
     document_type_code = db.Column(db.String(50))  # LOINC code for document type
     document_type_display = db.Column(db.String(200))  # Human readable document type
     
@@ -2256,7 +2300,7 @@ class FHIRDocument(db.Model):
     is_processed = db.Column(db.Boolean, default=False)  # Has been processed by screening engine
     processing_status = db.Column(db.String(50), default='pending')  # pending, processing, completed, failed
     processing_error = db.Column(db.Text)  # Error message if processing failed
-    _ocr_text = db.Column('ocr_text', db.Text)  # PHI-filtered OCR text (private column)
+    _ocr_text = deferred(db.Column('ocr_text', CompressedText), group=DOCUMENT_TEXT_GROUP)  # PHI-filtered OCR text (private column, deferred, compressed)
     relevance_score = db.Column(db.Float)  # Relevance score for screening (0.0-1.0)
     
     # HealthPrep-generated document flag - skip OCR processing for self-generated documents
@@ -2596,6 +2640,25 @@ class FHIRDocument(db.Model):
         """Set OCR text with mandatory PHI filtering - legacy method, uses property setter"""
         self.ocr_text = text
     
+    @classmethod
+    def text_loader_option(cls):
+        """Loader option that eagerly loads the deferred OCR text column (matching/OCR paths)"""
+        return undefer(cls._ocr_text)
+    
+    @classmethod
+    def summary_columns(cls):
+        """Columns for the lightweight document summary projection (UI and prep sheet listing)"""
+        return (
+            cls.id, cls.patient_id, cls.org_id, cls.epic_document_id, cls.title,
+            cls.document_type_code, cls.document_type_display, cls.document_date,
+            cls.creation_date, cls.is_healthprep_generated, cls.is_superseded
+        )
+    
+    @classmethod
+    def summary_loader_option(cls):
+        """Loader option restricting a FHIRDocument query to summary_columns()"""
+        return load_only(*cls.summary_columns())
+    
     def mark_processed(self, status='completed', error=None, ocr_text=None, relevance_score=None):
         """Mark document as processed with results - PHI filtering is always applied via property setter"""
         self.is_processed = True
@@ -2938,11 +3001,17 @@ class FHIRApiCall(db.Model):
         start_time = target_hour.replace(minute=0, second=0, microsecond=0)
         end_time = start_time + timedelta(hours=1)
         
-        return db.session.query(func.count(cls.id)).filter(
+        count = db.session.query(func.count(cls.id)).filter(
             cls.org_id == org_id,
             cls.called_at >= start_time,
             cls.called_at < end_time
         ).scalar() or 0
+        
+        if hour_offset == 0:
+            # Calls recorded in this process but still in the audit sink buffer
+            from utils.audit_sink import get_audit_sink, KIND_FHIR_API_CALL
+            count += get_audit_sink().pending_count(KIND_FHIR_API_CALL, org_id)
+        return count
     
     @classmethod
     def log_api_call(cls, org_id: int, endpoint: str, method: str, 
@@ -2950,8 +3019,14 @@ class FHIRApiCall(db.Model):
                     resource_id: Optional[str] = None, epic_patient_id: Optional[str] = None,
                     response_status: Optional[int] = None, response_time_ms: Optional[int] = None,
                     request_params: Optional[dict] = None):
-        """Log an API call for audit and rate limiting"""
-        api_call = cls(
+        """
+        Log an API call for audit and rate limiting.
+        
+        PERFORMANCE: Written through the buffered audit sink (utils/audit_sink.py) -
+        no commit on the caller's session. Returns the unsaved row (id is None);
+        get_hourly_call_count() includes calls still buffered in this process.
+        """
+        values = dict(
             org_id=org_id,
             user_id=user_id,
             endpoint=endpoint,
@@ -2961,9 +3036,15 @@ class FHIRApiCall(db.Model):
             epic_patient_id=epic_patient_id,
             response_status=response_status,
             response_time_ms=response_time_ms,
-            request_params=request_params
+            request_params=request_params,
+            called_at=datetime.utcnow()
         )
         
+        from utils.audit_sink import record_audit_row, KIND_FHIR_API_CALL
+        if record_audit_row(KIND_FHIR_API_CALL, dict(values)):
+            return cls(**values)
+        
+        api_call = cls(**values)
         db.session.add(api_call)
         db.session.commit()
         return api_call
@@ -3035,6 +3116,17 @@ class Appointment(db.Model):
 class AdminLog(db.Model):
     """Admin action logging with organization scope"""
     __tablename__ = 'admin_logs'
+    # PERFORMANCE: Composite indexes for the audit access patterns - time-window scans
+    # (activity summaries, exports, analytics), per-org and per-event-type windows,
+    # brute-force lookups by IP, per-user activity. See admin/log_storage.py.
+    __table_args__ = (
+        db.Index('idx_admin_logs_timestamp', 'timestamp'),
+        db.Index('idx_admin_logs_org_timestamp', 'org_id', 'timestamp'),
+        db.Index('idx_admin_logs_event_timestamp', 'event_type', 'timestamp'),
+        db.Index('idx_admin_logs_ip_event_timestamp', 'ip_address', 'event_type', 'timestamp'),
+        db.Index('idx_admin_logs_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('idx_admin_logs_patient', 'patient_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
@@ -3063,20 +3155,121 @@ class AdminLog(db.Model):
     def __repr__(self):
         return f'<AdminLog {self.event_type} by {self.user_id}>'
 
-def log_admin_event(event_type, user_id, org_id, ip, data=None, patient_id=None, resource_type=None, resource_id=None, action_details=None, session_id=None, user_agent=None):
-    """Enhanced utility function to log admin events with organization scope"""
-    log = AdminLog()
-    log.event_type = event_type
-    log.user_id = user_id
-    log.org_id = org_id
-    log.patient_id = patient_id
-    log.resource_type = resource_type
-    log.resource_id = resource_id
-    log.action_details = action_details
-    log.session_id = session_id
-    log.user_agent = user_agent
-    log.ip_address = ip
-    log.data = data or {}
+
+class AdminLogDailyRollup(db.Model):
+    """
+    Pre-aggregated AdminLog counts per day, organization, event type and user.
+    
+    Derived data rebuilt from admin_logs by admin/log_storage.py - dashboards read
+    this instead of scanning raw audit rows. Per-user grain keeps distinct active
+    user counts exact across multi-day windows. org_id has no foreign key so
+    rollups can be rebuilt independently of organization lifecycle.
+    """
+    __tablename__ = 'admin_log_daily_rollup'
+    __table_args__ = (
+        db.Index('idx_admin_log_rollup_day_org', 'day', 'org_id'),
+        db.Index('idx_admin_log_rollup_day_event', 'day', 'event_type'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    org_id = db.Column(db.Integer, nullable=False)
+    event_type = db.Column(db.String(50))
+    user_id = db.Column(db.Integer)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<AdminLogDailyRollup {self.day} org={self.org_id} {self.event_type}: {self.event_count}>'
+
+
+class AdminLogRollupDay(db.Model):
+    """Which days admin_log_daily_rollup covers, and whether they are final"""
+    __tablename__ = 'admin_log_rollup_days'
+    
+    day = db.Column(db.Date, primary_key=True)
+    rolled_up_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    source_rows = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<AdminLogRollupDay {self.day} rows={self.source_rows}>'
+
+
+class AnalyticsDailyCounter(db.Model):
+    """
+    Per-organization, per-day analytics counters (documents created / processed,
+    patients created, screenings completed).
+
+    Maintained incrementally from ORM changes and rebuildable from the raw tables
+    by admin/analytics_counters.py. Like the audit rollups, org_id has no foreign
+    key - counters are derived data.
+    """
+    __tablename__ = 'analytics_daily_counters'
+    __table_args__ = (
+        db.UniqueConstraint('org_id', 'day', 'metric', name='uq_analytics_counter_org_day_metric'),
+        db.Index('idx_analytics_counter_metric_day', 'metric', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    org_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    metric = db.Column(db.String(50), nullable=False)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<AnalyticsDailyCounter org={self.org_id} {self.day} {self.metric}: {self.value}>'
+
+
+class AnalyticsGauge(db.Model):
+    """
+    Per-organization point-in-time analytics totals (screenings by status, OCR
+    confidence sum / count). Maintained alongside AnalyticsDailyCounter.
+    """
+    __tablename__ = 'analytics_gauges'
+    __table_args__ = (
+        db.UniqueConstraint('org_id', 'metric', name='uq_analytics_gauge_org_metric'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    org_id = db.Column(db.Integer, nullable=False)
+    metric = db.Column(db.String(50), nullable=False)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AnalyticsGauge org={self.org_id} {self.metric}: {self.value}>'
+
+def log_admin_event(event_type, user_id, org_id, ip, data=None, patient_id=None, resource_type=None, resource_id=None, action_details=None, session_id=None, user_agent=None, sync=False):
+    """
+    Enhanced utility function to log admin events with organization scope.
+    
+    PERFORMANCE: Written through the buffered audit sink (utils/audit_sink.py) -
+    no commit on the caller's session, and the event is durable in the local spool
+    before this returns. The returned AdminLog is unsaved (id is None).
+    
+    Pass sync=True when the caller needs the persisted row ID (e.g. incident
+    tracking); the row is then added and committed immediately as before.
+    """
+    values = dict(
+        event_type=event_type,
+        user_id=user_id,
+        org_id=org_id,
+        patient_id=patient_id,
+        resource_type=resource_type,
+        resource_id=resource_id,
+        action_details=action_details,
+        session_id=session_id,
+        user_agent=user_agent,
+        ip_address=ip,
+        data=data or {},
+        timestamp=datetime.utcnow()
+    )
+    
+    if not sync:
+        from utils.audit_sink import record_audit_row, KIND_ADMIN_LOG
+        if record_audit_row(KIND_ADMIN_LOG, dict(values)):
+            return AdminLog(**values)
+    
+    log = AdminLog(**values)
     db.session.add(log)
     db.session.commit()
     return log
@@ -3219,6 +3412,10 @@ class OCRStats(db.Model):
 class ScreeningDocumentMatch(db.Model):
     """Junction table for screening-document matches with metadata for audit trail"""
     __tablename__ = 'screening_document_match'
+    __table_args__ = (
+        # One row per pair; bulk re-matching upserts on it (core/bulk_rematch.py)
+        db.UniqueConstraint('screening_id', 'document_id', name='uq_screening_document_match_pair'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     screening_id = db.Column(db.Integer, db.ForeignKey('screening.id'), nullable=False)
@@ -3239,6 +3436,19 @@ class ScreeningDocumentMatch(db.Model):
     document = db.relationship('Document', backref='screening_matches')
     dismisser = db.relationship('User', backref='dismissed_document_matches', foreign_keys=[dismissed_by])
 
+class MatchRebuildRun(db.Model):
+    """Checkpoint of a bulk document re-match (core/bulk_rematch.py), advanced with each committed chunk"""
+    __tablename__ = 'match_rebuild_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)  # NULL while the run can be resumed
+    last_document_id = db.Column(db.Integer, default=0, nullable=False)  # documents up to here are done
+    documents_processed = db.Column(db.Integer, default=0, nullable=False)
+    matches_written = db.Column(db.Integer, default=0, nullable=False)
+    matches_removed = db.Column(db.Integer, default=0, nullable=False)
+
 class ScreeningPreset(db.Model):
     """Screening preset templates with multi-tenant support"""
     __tablename__ = 'screening_preset'
@@ -4258,70 +4468,11 @@ class IPBlocklist(db.Model):
     )
     
     @classmethod
-    def record_failed_attempt(cls, ip_address: str, username: str, window_minutes: int = 15) -> 'IPBlocklist':
-        """Record a failed login attempt from an IP. Returns the record."""
-        from app import db
-        
-        # Find or create record for this IP
-        record = cls.query.filter_by(ip_address=ip_address, is_blocked=False).first()
-        
-        # Check if existing record is stale (outside the tracking window)
-        if record:
-            cutoff = datetime.utcnow() - timedelta(minutes=window_minutes)
-            if record.first_attempt_at and record.first_attempt_at < cutoff:
-                # Record is outside the window - reset it for fresh tracking
-                record.failed_usernames = []
-                record.failed_attempt_count = 0
-                record.first_attempt_at = datetime.utcnow()
-        
-        if not record:
-            record = cls(
-                ip_address=ip_address,
-                block_type='password_spray',
-                failed_usernames=[],
-                failed_attempt_count=0,
-                first_attempt_at=datetime.utcnow()
-            )
-            db.session.add(record)
-        
-        # Check if this is a new username (password spray indicator)
-        if username not in (record.failed_usernames or []):
-            usernames = record.failed_usernames or []
-            usernames.append(username)
-            record.failed_usernames = usernames
-        
-        record.failed_attempt_count += 1
-        record.updated_at = datetime.utcnow()
-        
-        return record
-    
-    @classmethod
-    def should_block_ip(cls, ip_address: str, threshold_usernames: int = 3, 
-                       window_minutes: int = 15) -> tuple:
-        """
-        Check if IP should be blocked based on password spray pattern.
-        Returns (should_block, record, distinct_usernames_count)
-        """
-        cutoff = datetime.utcnow() - timedelta(minutes=window_minutes)
-        
-        record = cls.query.filter(
-            cls.ip_address == ip_address,
-            cls.is_blocked == False,
-            cls.first_attempt_at >= cutoff
-        ).first()
-        
-        if not record:
-            return False, None, 0
-        
-        distinct_usernames = len(record.failed_usernames or [])
-        should_block = distinct_usernames >= threshold_usernames
-        
-        return should_block, record, distinct_usernames
-    
-    @classmethod
-    def block_ip(cls, ip_address: str, reason: str, duration_minutes: int = 60) -> 'IPBlocklist':
+    def block_ip(cls, ip_address: str, reason: str, duration_minutes: int = 60,
+                 failed_usernames: list = None) -> 'IPBlocklist':
         """Block an IP address for a specified duration."""
         from app import db
+        from utils.login_failure_detector import get_login_failure_detector
         
         record = cls.query.filter_by(ip_address=ip_address).first()
         if not record:
@@ -4332,13 +4483,41 @@ class IPBlocklist(db.Model):
         record.blocked_at = datetime.utcnow()
         record.expires_at = datetime.utcnow() + timedelta(minutes=duration_minutes)
         record.reason = reason
+        if failed_usernames is not None:
+            record.failed_usernames = list(failed_usernames)
+            record.failed_attempt_count = len(failed_usernames)
         
         db.session.commit()
+        get_login_failure_detector().mark_blocked(ip_address, duration_minutes * 60)
         return record
     
+    @classmethod
+    def unblock_ip(cls, ip_address: str) -> bool:
+        """Lift a block early. Returns False if the IP was not blocked."""
+        from app import db
+        from utils.login_failure_detector import get_login_failure_detector
+        
+        record = cls.query.filter_by(ip_address=ip_address, is_blocked=True).first()
+        if record:
+            record.is_blocked = False
+            record.expires_at = datetime.utcnow()
+            db.session.commit()
+        get_login_failure_detector().clear_blocked(ip_address)
+        return record is not None
+    
     @classmethod
     def is_ip_blocked(cls, ip_address: str) -> bool:
-        """Check if an IP is currently blocked."""
+        """Check if an IP is currently blocked.
+        
+        PERFORMANCE: Blocks made by block_ip are also marked in the login
+        failure detector, so repeated requests from a blocked IP are rejected
+        without a database lookup.
+        """
+        from utils.login_failure_detector import get_login_failure_detector
+        
+        if get_login_failure_detector().is_marked_blocked(ip_address):
+            return True
+        
         record = cls.query.filter_by(ip_address=ip_address, is_blocked=True).first()
         
         if not record:
@@ -4352,6 +4531,7 @@ class IPBlocklist(db.Model):
             record.failed_attempt_count = 0
             record.first_attempt_at = None
             db.session.commit()
+            get_login_failure_detector().clear_blocked(ip_address)
             return False
         
         return True
@@ -4360,6 +4540,7 @@ class IPBlocklist(db.Model):
     def cleanup_expired(cls):
         """Clean up expired IP blocks (run periodically)."""
         from app import db
+        from utils.login_failure_detector import get_login_failure_detector
         
         expired = cls.query.filter(
             cls.is_blocked == True,
@@ -4370,6 +4551,9 @@ class IPBlocklist(db.Model):
             record.is_blocked = False
         
         db.session.commit()
+        detector = get_login_failure_detector()
+        for record in expired:
+            detector.clear_blocked(record.ip_address)
         return len(expired)
     
     def __repr__(self):
@@ -4442,12 +4626,17 @@ class UserSession(db.Model):
         Check if there's a concurrent session from a different IP.
         Returns (has_concurrent, conflicting_session)
         """
-        active_sessions = cls.get_active_sessions(user_id)
+        # One indexed lookup instead of loading every active session
+        session = cls.query.filter(
+            cls.user_id == user_id,
+            cls.is_active == True,
+            (cls.expires_at == None) | (cls.expires_at > datetime.utcnow()),
+            cls.ip_address != current_ip
+        ).first()
         
-        for session in active_sessions:
-            if session.ip_address != current_ip:
-                # Found a session from a different IP
-                return True, session
+        if session:
+            # Found a session from a different IP
+            return True, session
         
         return False, None
     
@@ -4556,4 +4745,201 @@ def prevent_system_org_critical_update(mapper, connection, target):
             if history.has_changes():
                 raise SystemOrganizationProtectionError(
                     f"Cannot modify '{field}' on System Organization (org_id=0). This field is protected."
-                )
\ No newline at end of file
+                )
+
+# =============================================================================
+# Application cache invalidation (utils/app_cache.py)
+# Changes are collected during flush and applied only after the transaction
+# commits, so other workers never re-cache pre-commit data and a rollback
+# leaves the cache untouched.
+# =============================================================================
+
+_APP_CACHE_INVALIDATIONS_KEY = 'app_cache_invalidations'
+
+
+def queue_app_cache_invalidation(session, namespace, org_id):
+    """
+    Invalidate a cached org lookup when the session's transaction commits.
+    
+    Use after bulk Query.update()/delete() calls, which bypass the ORM change
+    tracking that collect_app_cache_invalidations relies on.
+    """
+    session.info.setdefault(_APP_CACHE_INVALIDATIONS_KEY, set()).add((namespace, org_id))
+
+
+@event.listens_for(db.session, 'before_flush')
+def collect_app_cache_invalidations(session, flush_context, instances):
+    """Record which org-scoped cached lookups the pending changes affect"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Appointment):
+            queue_app_cache_invalidation(session, 'priority_patients', obj.org_id)
+        elif isinstance(obj, Organization):
+            queue_app_cache_invalidation(session, 'priority_patients', obj.id)
+        elif isinstance(obj, PrepSheetSettings):
+            queue_app_cache_invalidation(session, 'prep_settings', obj.org_id)
+        elif isinstance(obj, ScreeningType):
+            queue_app_cache_invalidation(session, 'screening_type_rules', obj.org_id)
+        elif isinstance(obj, (UniversalType, UniversalTypeAlias)):
+            queue_app_cache_invalidation(session, 'universal_type_catalog', 'all')
+
+
+@event.listens_for(db.session, 'after_commit')
+def apply_app_cache_invalidations(session):
+    """Invalidate cached lookups for committed changes (all workers via pub/sub)"""
+    pending = session.info.pop(_APP_CACHE_INVALIDATIONS_KEY, None)
+    if not pending:
+        return
+    from utils import app_cache
+    invalidators = {
+        'priority_patients': app_cache.invalidate_priority_patients_cache,
+        'prep_settings': app_cache.invalidate_prep_settings_cache,
+        'screening_type_rules': app_cache.invalidate_screening_type_rules_cache,
+        'universal_type_catalog': app_cache.invalidate_universal_type_catalog_cache,
+    }
+    for namespace, org_id in pending:
+        if org_id is None:
+            continue
+        try:
+            invalidators[namespace](org_id)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate {namespace} cache for org {org_id}: {e}")
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_app_cache_invalidations(session):
+    """Rolled-back changes never reached the database - nothing to invalidate"""
+    session.info.pop(_APP_CACHE_INVALIDATIONS_KEY, None)
+
+
+# =============================================================================
+# Screening match summary maintenance (core/match_summary.py)
+# Screenings touched by match / dismissal / FHIR link changes are collected
+# after each flush (IDs assigned, attribute history still available) and their
+# summaries are recomputed in before_commit, inside the same transaction.
+# =============================================================================
+
+def _collect_linked_screening_ids(obj, attr_name, ids):
+    """Add screening IDs added to or removed from obj.<attr_name>"""
+    history = sa_inspect(obj).attrs[attr_name].history
+    for screening in list(history.added or ()) + list(history.deleted or ()):
+        ids.add(screening.id)
+
+
+@event.listens_for(db.session, 'after_flush')
+def collect_match_summary_changes(session, flush_context):
+    """Record screenings whose match summary the flushed changes affect"""
+    from core.match_summary import queue_match_summary_refresh
+
+    ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (ScreeningDocumentMatch, DismissedDocumentMatch)):
+            ids.add(obj.screening_id)
+            history = sa_inspect(obj).attrs.screening_id.history
+            ids.update(history.deleted or ())
+        elif isinstance(obj, Screening):
+            if obj in session.new:
+                ids.add(obj.id)
+            elif obj not in session.deleted:
+                state = sa_inspect(obj)
+                if (state.attrs.fhir_documents.history.has_changes()
+                        or state.attrs.immunizations.history.has_changes()):
+                    ids.add(obj.id)
+        elif isinstance(obj, FHIRDocument) and obj not in session.new:
+            _collect_linked_screening_ids(obj, 'screenings', ids)
+        elif isinstance(obj, FHIRImmunization) and obj not in session.new:
+            _collect_linked_screening_ids(obj, 'screenings', ids)
+        elif isinstance(obj, Document) and obj in session.dirty:
+            # Filename / date shown as the latest match
+            state = sa_inspect(obj)
+            if state.attrs.filename.history.has_changes() or state.attrs.document_date.history.has_changes():
+                ids.update(m.screening_id for m in obj.screening_matches)
+
+    deleted_screening_ids = {obj.id for obj in session.deleted if isinstance(obj, Screening)}
+    ids -= deleted_screening_ids
+    if ids:
+        queue_match_summary_refresh(session, ids)
+
+
+@event.listens_for(db.session, 'before_commit')
+def apply_match_summary_changes(session):
+    """Recompute queued match summaries as part of the committing transaction"""
+    from core.match_summary import MATCH_SUMMARY_PENDING_KEY, refresh_screening_match_summaries
+
+    if not session.info.get(MATCH_SUMMARY_PENDING_KEY) and not (session.new or session.dirty or session.deleted):
+        return
+    # Flush now so changes still pending at commit are collected too
+    session.flush()
+    pending = session.info.pop(MATCH_SUMMARY_PENDING_KEY, None)
+    if not pending:
+        return
+    try:
+        with session.begin_nested():
+            refresh_screening_match_summaries(pending, session=session)
+    except Exception as e:
+        # Never fail the user's commit over the summary; mark the rows stale so the
+        # list view recomputes them on next render
+        logger.warning(f"Match summary refresh failed for {len(pending)} screenings: {e}")
+        Screening.query.filter(Screening.id.in_(pending)).update(
+            {'match_summary_updated_at': None, 'updated_at': Screening.updated_at},
+            synchronize_session=False
+        )
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_match_summary_changes(session):
+    """Rolled-back changes never reached the database - nothing to summarize"""
+    from core.match_summary import MATCH_SUMMARY_PENDING_KEY
+    session.info.pop(MATCH_SUMMARY_PENDING_KEY, None)
+
+
+# =============================================================================
+# Analytics counter maintenance (admin/analytics_counters.py)
+# Document / Patient / Screening changes become per-org counter deltas after
+# each flush and are upserted in before_commit, inside the same transaction.
+# =============================================================================
+
+def _track_previous_value(target, value, oldvalue, initiator):
+    """No-op; registered with active_history so the pre-change value is loaded"""
+    return value
+
+
+for _tracked_attribute in (Screening.status, Document.processed_at, Document.ocr_confidence):
+    event.listen(_tracked_attribute, 'set', _track_previous_value, retval=True, active_history=True)
+
+
+@event.listens_for(db.session, 'after_flush')
+def collect_analytics_counter_changes(session, flush_context):
+    """Record counter deltas for the flushed changes"""
+    from admin.analytics_counters import collect_flush_deltas
+    try:
+        collect_flush_deltas(session)
+    except Exception as e:
+        # Counters are derived data - never fail the flush; a rebuild corrects them
+        logger.warning(f"Failed to collect analytics counter changes: {e}")
+
+
+@event.listens_for(db.session, 'before_commit')
+def apply_analytics_counter_changes(session):
+    """Upsert queued counter deltas as part of the committing transaction"""
+    from admin.analytics_counters import COUNTER_DELTAS_KEY, apply_counter_deltas, mark_counters_stale
+
+    if session.new or session.dirty or session.deleted:
+        # Flush now so changes still pending at commit are collected too
+        session.flush()
+    pending = session.info.pop(COUNTER_DELTAS_KEY, None)
+    if not pending:
+        return
+    try:
+        with session.begin_nested():
+            apply_counter_deltas(session, pending)
+    except Exception as e:
+        # Never fail the user's commit over derived counters; rebuild them on next read
+        logger.warning(f"Analytics counter update failed ({len(pending)} deltas): {e}")
+        mark_counters_stale(session, {org_id for org_id, _, _ in pending})
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_analytics_counter_changes(session):
+    """Rolled-back changes never reached the database - nothing to count"""
+    from admin.analytics_counters import COUNTER_DELTAS_KEY
+    session.info.pop(COUNTER_DELTAS_KEY, None)
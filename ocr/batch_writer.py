@@ -0,0 +1,118 @@
+"""
+Batched persistence of OCR batch results
+
+PERFORMANCE: the parallel OCR batches (OCRProcessor.process_documents_batch,
+DocumentProcessor.process_fhir_documents_batch) used to build a new
+scoped_session/sessionmaker for every document inside its worker thread,
+load the row, and commit on their own, including status-only changes such
+as an oversized-document skip: a session set-up, a SELECT, an UPDATE and a
+COMMIT per document.
+
+Worker threads now only compute. They return a result to the coordinating
+thread, which queues it here. Every OCR_DB_BATCH_SIZE results, or after
+OCR_DB_FLUSH_SECONDS, the queued results are written in one transaction:
+one SELECT ... WHERE id IN (...) for the whole batch, then the changes are
+applied through the model (so PHI-filtering setters and flush-time hooks
+such as the analytics counters still run), then one flush, where rows with
+the same changed columns go out as a single executemany UPDATE, and one
+COMMIT.
+
+If a batch fails to commit, its documents are retried one by one, so a
+single bad row fails only its own document.
+"""
+
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def get_ocr_db_batch_size() -> int:
+    """OCR_DB_BATCH_SIZE environment variable, default 25 documents per transaction"""
+    try:
+        return max(1, int(os.environ.get('OCR_DB_BATCH_SIZE', 25)))
+    except ValueError:
+        return 25
+
+
+def get_ocr_db_flush_seconds() -> float:
+    """OCR_DB_FLUSH_SECONDS environment variable, default 2 seconds"""
+    try:
+        return max(0.0, float(os.environ.get('OCR_DB_FLUSH_SECONDS', 2.0)))
+    except ValueError:
+        return 2.0
+
+
+class BatchResultWriter:
+    """
+    Coordinator-side writer for per-document results of an OCR batch.
+
+    apply(obj, result) sets the result on the loaded model instance and
+    returns None, or an error message to report the document as failed.
+    Call add() for each result as it arrives and close() at the end; both
+    return the (doc_id, error) outcomes of whatever was written (error is
+    None on success).
+    """
+
+    def __init__(self, session, model, apply: Callable[[Any, Any], Any],
+                 batch_size: int = None, flush_seconds: float = None):
+        self.session = session
+        self.model = model
+        self.apply = apply
+        self.batch_size = batch_size or get_ocr_db_batch_size()
+        self.flush_seconds = get_ocr_db_flush_seconds() if flush_seconds is None else flush_seconds
+        self._pending: Dict[int, Any] = {}
+        self._oldest = None
+        self.stats = {'documents': 0, 'batches': 0, 'fallback_batches': 0}
+
+    def add(self, doc_id: int, result) -> List[Tuple[int, str]]:
+        if not self._pending:
+            self._oldest = time.monotonic()
+        self._pending[doc_id] = result
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._oldest >= self.flush_seconds:
+            return self.flush()
+        return []
+
+    def close(self) -> List[Tuple[int, str]]:
+        return self.flush()
+
+    def flush(self) -> List[Tuple[int, str]]:
+        if not self._pending:
+            return []
+        pending, self._pending = self._pending, {}
+        self.stats['batches'] += 1
+        self.stats['documents'] += len(pending)
+        try:
+            outcomes = self._write(pending)
+            self.session.commit()
+            return outcomes
+        except Exception as e:
+            self.session.rollback()
+            logger.warning(f"Batched OCR write of {len(pending)} documents failed ({e}); retrying one by one")
+            self.stats['fallback_batches'] += 1
+            outcomes = []
+            for doc_id, result in pending.items():
+                try:
+                    outcomes.extend(self._write({doc_id: result}))
+                    self.session.commit()
+                except Exception as row_error:
+                    self.session.rollback()
+                    outcomes.append((doc_id, str(row_error)))
+            return outcomes
+
+    def _write(self, pending: Dict[int, Any]) -> List[Tuple[int, str]]:
+        objects = {
+            obj.id: obj
+            for obj in self.session.query(self.model).filter(self.model.id.in_(list(pending))).all()
+        }
+        outcomes = []
+        for doc_id, result in pending.items():
+            obj = objects.get(doc_id)
+            if obj is None:
+                outcomes.append((doc_id, 'Document not found'))
+                continue
+            outcomes.append((doc_id, self.apply(obj, result)))
+        self.session.flush()
+        return outcomes
@@ -11,16 +11,21 @@ import base64
 import re
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
-from PIL import Image
-import pdf2image
-import pytesseract
 
 from models import db, FHIRDocument
 from ocr.processor import OCRProcessor, get_ocr_timeout_seconds
+from ocr.engine import get_ocr_engine
+from ocr.preprocess import ocr_pdf_page
+from ocr.pdf_probe import PdfProbe, probe_pdf, ROUTE_SKIP
 from ocr.phi_filter import PHIFilter
+from ocr.stream_extract import StreamingExtraction
 from core.fuzzy_detection import FuzzyDetectionEngine
 from utils.document_audit import DocumentAuditLogger
 from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.lazy_import import lazy_module
+
+# PERFORMANCE: imported on first OCR call, not by every importer of this module
+pdf2image = lazy_module('pdf2image')
 
 
 def get_max_document_pages() -> int:
@@ -51,11 +56,13 @@ def get_max_document_pages() -> int:
     
     return 20  # Default: 20 pages (reasonable for most screening docs)
 
-try:
-    from docx import Document as DocxDocument
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
+
+def get_html_boilerplate_max_bytes() -> int:
+    """HTML_BOILERPLATE_MAX_BYTES environment variable, default 2 MB: largest HTML file given to trafilatura"""
+    try:
+        return max(0, int(os.environ.get('HTML_BOILERPLATE_MAX_BYTES', 2 * 1024 * 1024)))
+    except ValueError:
+        return 2 * 1024 * 1024
 
 logger = logging.getLogger(__name__)
 
@@ -196,7 +203,8 @@ class DocumentProcessor:
     
     def process_document(self, document_content: bytes, document_title: str, content_type: Optional[str] = None, 
                          phi_settings_snapshot=None, fhir_doc_id: Optional[int] = None, 
-                         org_id: Optional[int] = None, patient_id: Optional[int] = None) -> Optional[str]:
+                         org_id: Optional[int] = None, patient_id: Optional[int] = None,
+                         pdf_probe: Optional[PdfProbe] = None) -> Optional[str]:
         """
         Process document content and extract text with screening analysis
         
@@ -209,6 +217,12 @@ class DocumentProcessor:
             fhir_doc_id: Optional FHIR document ID for audit logging
             org_id: Optional organization ID for audit logging
             patient_id: Optional patient ID for audit logging
+            pdf_probe: Optional open probe of these PDF bytes (ocr/pdf_probe.py), so a
+                       caller that already probed the document does not reparse it;
+                       the caller keeps ownership and closes it
+            
+        PDFs are probed and extracted straight from memory (no temp file); other
+        types go through a secure temp file.
             
         Returns:
             Extracted and processed text or None if processing failed
@@ -247,88 +261,101 @@ class DocumentProcessor:
             else:
                 file_extension = self._get_file_extension_from_content_type(content_type) or self._get_file_extension(document_title)
             
-            # Use verified secure deletion for PHI temp files (HIPAA compliance)
-            from utils.secure_delete import secure_temp_file, secure_delete_file
+            # SINGLE PARSE: PDFs are opened once, from memory, and the same probe
+            # drives the page limit, routing and extraction (ocr/pdf_probe.py)
+            probe = None
+            if file_extension == '.pdf':
+                probe = pdf_probe or probe_pdf(processed_content, max_pages=get_max_document_pages())
+            
+            try:
+                if probe is not None:
+                    extracted_text, confidence = self._extract_from_pdf(document_title, probe=probe)
+                else:
+                    # Use verified secure deletion for PHI temp files (HIPAA compliance)
+                    from utils.secure_delete import secure_temp_file
+                    
+                    with secure_temp_file(suffix=file_extension) as temp_file_path:
+                        # Write content to secure temp file
+                        with open(temp_file_path, 'wb') as f:
+                            f.write(processed_content)
+                        
+                        # Extract text using OCR
+                        extracted_text, confidence = self._extract_text_from_file(temp_file_path)
+                    # secure_temp_file context manager handles verified secure deletion on exit
+            finally:
+                if probe is not None and probe is not pdf_probe:
+                    probe.close()
+            
+            # COST CONTROL: Check for oversized document sentinel
+            if confidence == -2.0:
+                self.logger.warning(f"COST CONTROL: Document skipped due to page limit: {document_title}")
+                if fhir_doc_id is not None and org_id is not None:
+                    DocumentAuditLogger.log_processing_failed(
+                        document_id=fhir_doc_id,
+                        document_type='fhir_document',
+                        org_id=org_id,
+                        error_message=f'Document exceeds MAX_DOCUMENT_PAGES limit (cost control)',
+                        patient_id=patient_id
+                    )
+                return None
             
-            with secure_temp_file(suffix=file_extension) as temp_file_path:
-                # Write content to secure temp file
-                with open(temp_file_path, 'wb') as f:
-                    f.write(processed_content)
+            if extracted_text:
+                original_length = len(extracted_text)
                 
-                # Extract text using OCR
-                extracted_text, confidence = self._extract_text_from_file(temp_file_path)
+                # Apply PHI filtering with counts for audit trail
+                filtered_text, phi_counts = self.phi_filter.filter_phi_with_counts(extracted_text, preloaded_settings=phi_settings_snapshot)
                 
-                # COST CONTROL: Check for oversized document sentinel
-                if confidence == -2.0:
-                    self.logger.warning(f"COST CONTROL: Document skipped due to page limit: {document_title}")
-                    if fhir_doc_id is not None and org_id is not None:
-                        DocumentAuditLogger.log_processing_failed(
-                            document_id=fhir_doc_id,
-                            document_type='fhir_document',
-                            org_id=org_id,
-                            error_message=f'Document exceeds MAX_DOCUMENT_PAGES limit (cost control)',
-                            patient_id=patient_id
-                        )
-                    return None
+                if phi_counts and fhir_doc_id is not None and org_id is not None:
+                    DocumentAuditLogger.log_phi_redacted(
+                        document_id=fhir_doc_id,
+                        document_type='fhir_document',
+                        org_id=org_id,
+                        phi_types_found=phi_counts,
+                        original_length=original_length,
+                        filtered_length=len(filtered_text),
+                        patient_id=patient_id
+                    )
                 
-                if extracted_text:
-                    original_length = len(extracted_text)
-                    
-                    # Apply PHI filtering with counts for audit trail
-                    filtered_text, phi_counts = self.phi_filter.filter_phi_with_counts(extracted_text, preloaded_settings=phi_settings_snapshot)
-                    
-                    if phi_counts and fhir_doc_id is not None and org_id is not None:
-                        DocumentAuditLogger.log_phi_redacted(
-                            document_id=fhir_doc_id,
-                            document_type='fhir_document',
-                            org_id=org_id,
-                            phi_types_found=phi_counts,
-                            original_length=original_length,
-                            filtered_length=len(filtered_text),
-                            patient_id=patient_id
-                        )
-                    
-                    # Enhance text for screening detection
-                    enhanced_text = self._enhance_text_for_screening(filtered_text, document_title)
-                    
-                    # Binary content guard may reject content
-                    if enhanced_text is None:
-                        self.logger.warning(f"Document rejected by binary content guard: {document_title}")
-                        if fhir_doc_id is not None and org_id is not None:
-                            DocumentAuditLogger.log_processing_failed(
-                                document_id=fhir_doc_id,
-                                document_type='fhir_document',
-                                org_id=org_id,
-                                error_message='Binary content detected in extracted text (PDF/binary not properly processed)',
-                                patient_id=patient_id
-                            )
-                        return None
-                    
-                    if fhir_doc_id is not None and org_id is not None:
-                        DocumentAuditLogger.log_processing_completed(
-                            document_id=fhir_doc_id,
-                            document_type='fhir_document',
-                            org_id=org_id,
-                            confidence=confidence,
-                            text_length=len(enhanced_text),
-                            processing_method='document_processor',
-                            patient_id=patient_id
-                        )
-                    
-                    self.logger.info(f"Successfully processed document with {confidence:.2f} confidence")
-                    return enhanced_text
-                else:
-                    self.logger.warning(f"No text extracted from document: {document_title}")
+                # Enhance text for screening detection
+                enhanced_text = self._enhance_text_for_screening(filtered_text, document_title)
+                
+                # Binary content guard may reject content
+                if enhanced_text is None:
+                    self.logger.warning(f"Document rejected by binary content guard: {document_title}")
                     if fhir_doc_id is not None and org_id is not None:
                         DocumentAuditLogger.log_processing_failed(
                             document_id=fhir_doc_id,
                             document_type='fhir_document',
                             org_id=org_id,
-                            error_message='No text extracted from document',
+                            error_message='Binary content detected in extracted text (PDF/binary not properly processed)',
                             patient_id=patient_id
                         )
                     return None
-            # secure_temp_file context manager handles verified secure deletion on exit
+                
+                if fhir_doc_id is not None and org_id is not None:
+                    DocumentAuditLogger.log_processing_completed(
+                        document_id=fhir_doc_id,
+                        document_type='fhir_document',
+                        org_id=org_id,
+                        confidence=confidence,
+                        text_length=len(enhanced_text),
+                        processing_method='document_processor',
+                        patient_id=patient_id
+                    )
+                
+                self.logger.info(f"Successfully processed document with {confidence:.2f} confidence")
+                return enhanced_text
+            else:
+                self.logger.warning(f"No text extracted from document: {document_title}")
+                if fhir_doc_id is not None and org_id is not None:
+                    DocumentAuditLogger.log_processing_failed(
+                        document_id=fhir_doc_id,
+                        document_type='fhir_document',
+                        org_id=org_id,
+                        error_message='No text extracted from document',
+                        patient_id=patient_id
+                    )
+                return None
                     
         except Exception as e:
             self.logger.error(f"Error processing document {document_title}: {str(e)}")
@@ -642,7 +669,8 @@ class DocumentProcessor:
             self.logger.warning(f"Could not determine page count from PDF bytes: {e}")
             return None
     
-    def _extract_from_pdf(self, pdf_path: str, fhir_doc: Optional[FHIRDocument] = None) -> Tuple[Optional[str], float]:
+    def _extract_from_pdf(self, pdf_path: str, fhir_doc: Optional[FHIRDocument] = None,
+                          probe: Optional[PdfProbe] = None) -> Tuple[Optional[str], float]:
         """Extract text from PDF using hybrid approach with per-page timeout handling
         
         COST OPTIMIZATION (v2): Uses PyMuPDF hybrid extraction:
@@ -652,6 +680,11 @@ class DocumentProcessor:
         
         This reduces compute by 50-80% for documents with embedded text.
         
+        SINGLE PARSE: the document is opened once by probe_pdf (ocr/pdf_probe.py),
+        which supplies the page count, each page's embedded text and the route;
+        pages needing OCR are rendered from the probe's open handle. Callers that
+        already probed the bytes pass the probe in (pdf_path is then only a label).
+        
         If a page times out, continues processing remaining pages instead of
         failing the entire document. This matches the graceful degradation
         behavior expected for healthcare document processing.
@@ -659,20 +692,20 @@ class DocumentProcessor:
         COST CONTROL: Checks MAX_DOCUMENT_PAGES and skips oversized documents
         to prevent runaway compute costs on large medical records.
         """
-        try:
-            import fitz
-            PYMUPDF_AVAILABLE = True
-        except ImportError:
-            PYMUPDF_AVAILABLE = False
+        max_pages = get_max_document_pages()
+        owns_probe = probe is None
+        if probe is None:
+            probe = probe_pdf(pdf_path, max_pages=max_pages)
         
         try:
-            max_pages = get_max_document_pages()
-            
             # Get page count before processing
-            page_count = self._get_pdf_page_count(pdf_path)
+            if probe is not None:
+                page_count = probe.page_count
+            else:
+                page_count = self._get_pdf_page_count(pdf_path)
             
             # Update FHIRDocument with page count if provided
-            if fhir_doc is not None and page_count is not None:
+            if fhir_doc is not None and page_count is not None and not (probe and probe.locked):
                 fhir_doc.page_count = page_count
             
             # COST CONTROL: Skip oversized documents
@@ -687,203 +720,175 @@ class DocumentProcessor:
                 # Return special sentinel: -2.0 indicates skipped due to size
                 return None, -2.0
             
-            with tempfile.TemporaryDirectory() as temp_dir:
-                all_text = []
-                confidences = []
-                timed_out_pages = []
-                pages_extracted = 0
-                pages_ocred = 0
-                
-                if PYMUPDF_AVAILABLE:
-                    # OPTIMIZED PATH: Use PyMuPDF for hybrid extraction
-                    doc = fitz.open(pdf_path)
-                    try:
-                        num_pages = len(doc)
-                        
-                        # Update page count if we didn't get it earlier
-                        if fhir_doc is not None and fhir_doc.page_count is None:
-                            fhir_doc.page_count = num_pages
-                        
-                        for i in range(num_pages):
-                            page = doc[i]
-                            page_text = page.get_text("text").strip()
-                            
-                            # If page has embedded text (>50 chars), use directly (no OCR needed)
-                            if len(page_text) >= 50:
-                                all_text.append(page_text)
-                                confidences.append(1.0)
-                                pages_extracted += 1
-                            else:
-                                # LAZY RENDERING: Only render this page for OCR
-                                # Use get_pixmap() instead of pdf2image (faster, no poppler)
-                                zoom = 150 / 72  # 150 DPI for good OCR quality
-                                matrix = fitz.Matrix(zoom, zoom)
-                                pixmap = page.get_pixmap(matrix=matrix, alpha=False)
-                                
-                                image_path = os.path.join(temp_dir, f"page_{i}.png")
-                                pixmap.save(image_path)
-                                
-                                # Extract text from image (has its own timeout)
-                                text, confidence = self._extract_from_image(image_path)
-                                
-                                if confidence == -1.0:
-                                    # Timeout sentinel - page OCR timed out
-                                    timed_out_pages.append(i + 1)
-                                    self.logger.warning(f"Page {i+1} of {pdf_path} timed out during OCR")
-                                    # FALLBACK: Use short embedded text if OCR timed out
-                                    if page_text:
-                                        all_text.append(page_text)
-                                        confidences.append(0.5)  # Lower confidence for short text
-                                        pages_extracted += 1
-                                elif text:
-                                    all_text.append(text)
-                                    confidences.append(confidence)
-                                    pages_ocred += 1
-                                elif page_text:
-                                    # OCR returned nothing, but we have some embedded text - use it
-                                    all_text.append(page_text)
-                                    confidences.append(0.5)  # Lower confidence for short text
-                                    pages_extracted += 1
-                    finally:
-                        doc.close()
-                    
-                    self.logger.info(
-                        f"PDF hybrid extraction: {pages_extracted} pages embedded text, "
-                        f"{pages_ocred} pages OCR'd ({pdf_path})"
-                    )
-                else:
-                    # FALLBACK: Use pdf2image if PyMuPDF not available
-                    images = pdf2image.convert_from_path(pdf_path)
-                    
-                    # Update page count if we didn't get it earlier
-                    if fhir_doc is not None and fhir_doc.page_count is None:
-                        fhir_doc.page_count = len(images)
+            if probe is not None and probe.route == ROUTE_SKIP:
+                self.logger.warning(f"Skipping PDF {pdf_path}: {probe.skip_reason}")
+                return None, 0.0
+            
+            all_text = []
+            confidences = []
+            timed_out_pages = []
+            pages_extracted = 0
+            pages_ocred = 0
+            
+            if probe is not None:
+                # OPTIMIZED PATH: embedded text comes from the probe, only pages
+                # without a text layer are rendered (none on the text_only route)
+                for page_probe in probe.pages:
+                    i = page_probe.index
+                    page_text = page_probe.text
                     
-                    for i, image in enumerate(images):
-                        image_path = os.path.join(temp_dir, f"page_{i}.png")
-                        image.save(image_path, 'PNG')
-                        
-                        text, confidence = self._extract_from_image(image_path)
+                    # If page has embedded text (>50 chars), use directly (no OCR needed)
+                    if page_probe.has_text_layer:
+                        all_text.append(page_text)
+                        confidences.append(1.0)
+                        pages_extracted += 1
+                    else:
+                        # LAZY RENDERING: Only render this page for OCR
+                        # Use get_pixmap() instead of pdf2image (faster, no poppler);
+                        # the page image stays in memory. DPI is chosen per page,
+                        # blank pages are skipped (ocr/preprocess.py)
+                        # Extract text from image (has its own timeout)
+                        text, confidence, _ = ocr_pdf_page(probe.page(i), self._extract_from_image)
                         
                         if confidence == -1.0:
+                            # Timeout sentinel - page OCR timed out
                             timed_out_pages.append(i + 1)
                             self.logger.warning(f"Page {i+1} of {pdf_path} timed out during OCR")
+                            # FALLBACK: Use short embedded text if OCR timed out
+                            if page_text:
+                                all_text.append(page_text)
+                                confidences.append(0.5)  # Lower confidence for short text
+                                pages_extracted += 1
                         elif text:
                             all_text.append(text)
                             confidences.append(confidence)
+                            pages_ocred += 1
+                        elif page_text:
+                            # OCR returned nothing, but we have some embedded text - use it
+                            all_text.append(page_text)
+                            confidences.append(0.5)  # Lower confidence for short text
+                            pages_extracted += 1
                 
-                if timed_out_pages:
-                    self.logger.warning(f"PDF {pdf_path}: {len(timed_out_pages)} pages had no text: {timed_out_pages}")
-                
-                # Combine all text and calculate average confidence
-                combined_text = '\n'.join(all_text) if all_text else None
-                avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+                self.logger.info(
+                    f"PDF {probe.route} extraction: {pages_extracted} pages embedded text, "
+                    f"{pages_ocred} pages OCR'd ({pdf_path})"
+                )
+            else:
+                # FALLBACK: Use pdf2image if PyMuPDF is not available (or cannot open the file)
+                images = pdf2image.convert_from_path(pdf_path)
                 
-                return combined_text, avg_confidence
+                # Update page count if we didn't get it earlier
+                if fhir_doc is not None and fhir_doc.page_count is None:
+                    fhir_doc.page_count = len(images)
                 
+                for i, image in enumerate(images):
+                    text, confidence = self._extract_from_image(image)
+                    
+                    if confidence == -1.0:
+                        timed_out_pages.append(i + 1)
+                        self.logger.warning(f"Page {i+1} of {pdf_path} timed out during OCR")
+                    elif text:
+                        all_text.append(text)
+                        confidences.append(confidence)
+            
+            if timed_out_pages:
+                self.logger.warning(f"PDF {pdf_path}: {len(timed_out_pages)} pages had no text: {timed_out_pages}")
+            
+            # Combine all text and calculate average confidence
+            combined_text = '\n'.join(all_text) if all_text else None
+            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+            
+            return combined_text, avg_confidence
+            
         except Exception as e:
             self.logger.error(f"Error processing PDF {pdf_path}: {str(e)}")
             return None, 0.0
+        finally:
+            if owns_probe and probe is not None:
+                probe.close()
     
-    def _extract_from_image(self, image_path: str) -> Tuple[Optional[str], float]:
+    def _extract_from_image(self, image) -> Tuple[Optional[str], float]:
         """Extract text from image using Tesseract OCR with timeout protection
         
         Uses the same OCR_TIMEOUT_SECONDS circuit breaker as manual document processing
         to ensure consistent SLA behavior for both Document and FHIRDocument types.
+        
+        Args:
+            image: Image file path, or a PIL image (rendered PDF pages, kept in memory)
         """
         timeout_seconds = get_ocr_timeout_seconds()
         
-        def _run_tesseract(img_path: str) -> Tuple[Optional[str], float]:
+        label = image if isinstance(image, str) else 'rendered page'
+        
+        def _run_tesseract(img) -> Tuple[Optional[str], float]:
             """Inner function for threaded execution with timeout"""
             try:
-                image = Image.open(img_path)
-                
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                
-                config = '--oem 3 --psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,()[]{}:;/\\-+=%$@#!?"\' \n\t'
-                
-                ocr_data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
-                
-                extracted_text = []
-                confidences = []
+                whitelist = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,()[]{}:;/\\-+=%$@#!?"\' \n\t'
                 
-                for i in range(len(ocr_data['text'])):
-                    confidence = int(ocr_data['conf'][i])
-                    text = ocr_data['text'][i].strip()
-                    
-                    if confidence > 30 and text:
-                        extracted_text.append(text)
-                        confidences.append(confidence)
+                # One recognition pass yields words and confidences (ocr/engine.py)
+                result = get_ocr_engine().recognize(img, whitelist=whitelist)
+                words = result.words_above(30)
                 
-                if extracted_text:
-                    combined_text = ' '.join(extracted_text)
-                    avg_confidence = sum(confidences) / len(confidences) / 100.0
+                if words:
+                    combined_text = ' '.join(w.text for w in words)
+                    avg_confidence = sum(w.confidence for w in words) / len(words) / 100.0
                     return combined_text, avg_confidence
                 else:
                     return None, 0.0
                     
             except Exception as e:
-                self.logger.error(f"Tesseract error for {img_path}: {str(e)}")
+                self.logger.error(f"Tesseract error for {label}: {str(e)}")
                 return None, 0.0
         
         try:
             # Use ThreadPoolExecutor with timeout for circuit breaker
             executor = ThreadPoolExecutor(max_workers=1)
             try:
-                future = executor.submit(_run_tesseract, image_path)
+                future = executor.submit(_run_tesseract, image)
                 done, pending = wait([future], timeout=timeout_seconds)
                 
                 if done:
                     return future.result()
                 else:
                     # Return sentinel value (-1.0) to distinguish timeout from low-confidence OCR
-                    self.logger.warning(f"OCR timeout after {timeout_seconds}s for image: {image_path}")
+                    self.logger.warning(f"OCR timeout after {timeout_seconds}s for image: {label}")
                     return None, -1.0  # Timeout sentinel
             finally:
                 executor.shutdown(wait=False, cancel_futures=True)
                 
         except Exception as e:
-            self.logger.error(f"Error processing image {image_path}: {str(e)}")
+            self.logger.error(f"Error processing image {label}: {str(e)}")
             return None, 0.0
     
     def _extract_from_html(self, html_path: str) -> Tuple[Optional[str], float]:
-        """Extract text from HTML document (Epic clinical notes)"""
+        """
+        Extract text from HTML document (Epic clinical notes)
+
+        trafilatura needs the whole page in memory, so it only runs on files
+        up to HTML_BOILERPLATE_MAX_BYTES; larger files, and pages trafilatura
+        finds no main content in, are streamed (ocr/stream_extract.py).
+        """
         try:
-            import trafilatura
-            
-            # Read HTML content
-            with open(html_path, 'r', encoding='utf-8', errors='ignore') as f:
-                html_content = f.read()
-            
-            # Extract clean text using trafilatura
-            extracted_text = trafilatura.extract(html_content, include_tables=True, include_comments=False)
-            
-            if extracted_text:
-                self.logger.info(f"Successfully extracted {len(extracted_text)} characters from HTML")
-                return extracted_text, 1.0  # HTML extraction is deterministic, high confidence
-            else:
-                # Fallback: strip HTML tags manually
-                from html.parser import HTMLParser
-                
-                class HTMLTextExtractor(HTMLParser):
-                    def __init__(self):
-                        super().__init__()
-                        self.text = []
-                    
-                    def handle_data(self, data):
-                        self.text.append(data.strip())
-                
-                parser = HTMLTextExtractor()
-                parser.feed(html_content)
-                fallback_text = ' '.join(parser.text)
-                
-                if fallback_text:
-                    self.logger.info(f"Extracted text using fallback HTML parser")
-                    return fallback_text, 0.9
-                else:
-                    return None, 0.0
-                
+            if os.path.getsize(html_path) <= get_html_boilerplate_max_bytes():
+                import trafilatura
+
+                with open(html_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    html_content = f.read()
+
+                # Extract clean text using trafilatura
+                extracted_text = trafilatura.extract(html_content, include_tables=True, include_comments=False)
+                del html_content
+
+                if extracted_text:
+                    self.logger.info(f"Successfully extracted {len(extracted_text)} characters from HTML")
+                    return extracted_text, 1.0  # HTML extraction is deterministic, high confidence
+
+            streamed_text, _ = StreamingExtraction().extract(html_path, '.html')
+            if streamed_text:
+                self.logger.info("Extracted text using streaming HTML parser")
+                return streamed_text, 0.9
+            return None, 0.0
+
         except Exception as e:
             self.logger.error(f"Error processing HTML {html_path}: {str(e)}")
             return None, 0.0
@@ -892,7 +897,8 @@ class DocumentProcessor:
         """
         Extract text from modern Word documents (.docx)
         
-        Uses python-docx library to extract text from paragraphs and tables.
+        Streams paragraphs and table rows out of word/document.xml, up to
+        STREAM_EXTRACT_MAX_CHARS characters (ocr/stream_extract.py).
         Since text is directly extracted (not OCR'd), confidence is 1.0.
         
         Args:
@@ -901,35 +907,11 @@ class DocumentProcessor:
         Returns:
             Tuple of (extracted_text, confidence_score)
         """
-        if not DOCX_AVAILABLE:
-            self.logger.error("python-docx library not available for .docx processing")
-            return None, 0.0
-        
         try:
-            doc = DocxDocument(docx_path)  # type: ignore
-            text_parts = []
-            
-            # Extract text from paragraphs
-            for paragraph in doc.paragraphs:
-                text = paragraph.text.strip()
-                if text:
-                    text_parts.append(text)
-            
-            # Extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = []
-                    for cell in row.cells:
-                        cell_text = cell.text.strip()
-                        if cell_text:
-                            row_text.append(cell_text)
-                    if row_text:
-                        text_parts.append(' | '.join(row_text))
-            
-            if text_parts:
-                combined_text = '\n'.join(text_parts)
-                self.logger.info(f"Successfully extracted {len(combined_text)} characters from DOCX")
-                return combined_text, 1.0  # Direct text extraction, high confidence
+            text, confidence = StreamingExtraction().extract(docx_path, '.docx')
+            if text:
+                self.logger.info(f"Successfully extracted {len(text)} characters from DOCX")
+                return text, confidence  # Direct text extraction, high confidence
             else:
                 self.logger.warning("No text found in DOCX document")
                 return None, 0.0
@@ -1192,8 +1174,11 @@ class DocumentProcessor:
         MATCHES the batch processing pattern from ocr/processor.py for consistency
         between manual Document and FHIRDocument processing.
         
-        Uses thread-local sessions for safe database access across threads, matching
-        the pattern used in ocr/processor.py.
+        Worker threads read their document through one thread-local session
+        each (a single scoped_session for the batch, reused across documents)
+        and only compute; OCR results and status changes (including oversized
+        skips) are written by this thread in batched transactions
+        (ocr/batch_writer.py).
         
         TIMEOUT HANDLING: Uses the same OCR_TIMEOUT_SECONDS circuit breaker as manual
         document processing to ensure consistent SLA behavior.
@@ -1207,9 +1192,11 @@ class DocumentProcessor:
             Dict with results summary including 'timed_out' list if any documents stalled
         """
         from ocr.processor import get_ocr_max_workers
-        from app import app, db as app_db
+        from ocr.batch_writer import BatchResultWriter
+        from app import get_app, db as app_db
         from sqlalchemy.orm import scoped_session, sessionmaker
         import time
+        app = get_app()  # resolved here: worker threads have no app context
         
         if max_workers is None:
             max_workers = get_ocr_max_workers()
@@ -1232,98 +1219,143 @@ class DocumentProcessor:
         
         # Pre-load PHI filter settings snapshot for thread-safe batch processing
         phi_settings_snapshot = self.phi_filter.get_settings_snapshot()
+        max_pages = get_max_document_pages()
         
-        def process_single_fhir_document_with_session(fhir_doc_id: int) -> Tuple[int, str, Optional[str]]:
+        with app.app_context():
+            # One session factory for the batch; each worker thread gets (and keeps) its own session
+            thread_sessions = scoped_session(sessionmaker(bind=app_db.engine))
+        
+        def process_single_fhir_document(fhir_doc_id: int) -> Tuple[int, str, Optional[str], Optional[dict]]:
             """
-            Process a single FHIR document with thread-local session for safety.
+            Read and process a single FHIR document; no writes.
             
             Returns:
-                Tuple of (doc_id, status, error_message)
-                status is one of: 'success', 'failed', 'skipped_oversized', 'skipped_already_processed'
+                Tuple of (doc_id, status, error_message, update)
+                status is one of: 'success', 'no_text', 'failed', 'skipped_oversized',
+                'skipped_already_processed'; update holds the fields to write, if any
             """
             with app.app_context():
-                thread_session = scoped_session(sessionmaker(bind=app_db.engine))
+                thread_session = thread_sessions()
                 try:
-                    fhir_doc = thread_session.query(FHIRDocument).get(fhir_doc_id)
+                    fhir_doc = thread_session.get(FHIRDocument, fhir_doc_id)
                     if not fhir_doc:
-                        return (fhir_doc_id, 'failed', "Document not found")
+                        return (fhir_doc_id, 'failed', "Document not found", None)
                     
                     # Skip already processed documents
                     if fhir_doc.is_processed:
-                        return (fhir_doc_id, 'skipped_already_processed', None)
+                        return (fhir_doc_id, 'skipped_already_processed', None, None)
                     
                     # Skip already marked as oversized
                     if fhir_doc.skipped_oversized:
-                        return (fhir_doc_id, 'skipped_oversized', f"Previously skipped: {fhir_doc.page_count} pages")
+                        return (fhir_doc_id, 'skipped_oversized', f"Previously skipped: {fhir_doc.page_count} pages", None)
                     
                     # Get document content if available
-                    if fhir_doc.content_data:
-                        content = fhir_doc.content_data
-                        title = fhir_doc.title or f"document_{fhir_doc_id}"
-                        content_type = fhir_doc.content_type
-                        
-                        # COST CONTROL: Check page count for PDFs before OCR processing
-                        max_pages = get_max_document_pages()
-                        if content_type and 'pdf' in content_type.lower():
-                            page_count = self._get_pdf_page_count_from_bytes(content)
-                            if page_count is not None:
-                                fhir_doc.page_count = page_count
-                                if page_count > max_pages:
-                                    fhir_doc.skipped_oversized = True
-                                    fhir_doc.processing_status = 'skipped_oversized'
-                                    fhir_doc.processing_error = f"Document has {page_count} pages, exceeds limit of {max_pages}"
-                                    thread_session.commit()
-                                    self.logger.warning(f"COST CONTROL: Skipping oversized doc {fhir_doc_id} ({page_count} pages > {max_pages} limit)")
-                                    return (fhir_doc_id, 'skipped_oversized', f"{page_count} pages exceeds {max_pages} limit")
-                        
-                        # Process the document (OCR, PHI filtering with pre-loaded settings and audit logging)
-                        extracted_text = self.process_document(
-                            content, title, content_type, 
-                            phi_settings_snapshot=phi_settings_snapshot,
-                            fhir_doc_id=fhir_doc_id,
-                            org_id=fhir_doc.org_id,
-                            patient_id=fhir_doc.patient_id
-                        )
-                        
-                        if extracted_text:
-                            # Use mark_processed() helper to properly set all status/audit fields
-                            fhir_doc.mark_processed(status='completed', ocr_text=extracted_text)
-                            thread_session.commit()
-                            return (fhir_doc_id, 'success', None)
+                    if not fhir_doc.content_data:
+                        return (fhir_doc_id, 'failed', "No content data available", None)
+                    
+                    content = fhir_doc.content_data
+                    title = fhir_doc.title or f"document_{fhir_doc_id}"
+                    content_type = fhir_doc.content_type
+                    org_id, patient_id = fhir_doc.org_id, fhir_doc.patient_id
+                finally:
+                    # Release the connection; the thread's session object is reused for its next document
+                    thread_session.close()
+                
+                probe = None
+                try:
+                    update = {}
+                    
+                    # COST CONTROL: Check page count for PDFs before OCR processing.
+                    # The probe opens the bytes once and is reused for extraction.
+                    if content_type and 'pdf' in content_type.lower():
+                        probe = probe_pdf(content, max_pages=max_pages)
+                        if probe is not None:
+                            page_count = None if probe.locked else probe.page_count
                         else:
-                            fhir_doc.mark_processed(status='failed', error="No text extracted")
-                            thread_session.commit()
-                            return (fhir_doc_id, 'failed', "No text extracted")
-                    else:
-                        return (fhir_doc_id, 'failed', "No content data available")
+                            page_count = self._get_pdf_page_count_from_bytes(content)
+                        if page_count is not None:
+                            update['page_count'] = page_count
+                            if page_count > max_pages:
+                                update['skipped_oversized'] = True
+                                self.logger.warning(f"COST CONTROL: Skipping oversized doc {fhir_doc_id} ({page_count} pages > {max_pages} limit)")
+                                return (fhir_doc_id, 'skipped_oversized', f"{page_count} pages exceeds {max_pages} limit", update)
+                    
+                    # Process the document (OCR, PHI filtering with pre-loaded settings and audit logging)
+                    extracted_text = self.process_document(
+                        content, title, content_type, 
+                        phi_settings_snapshot=phi_settings_snapshot,
+                        fhir_doc_id=fhir_doc_id,
+                        org_id=org_id,
+                        patient_id=patient_id,
+                        pdf_probe=probe
+                    )
+                    
+                    if extracted_text:
+                        update['ocr_text'] = extracted_text
+                        return (fhir_doc_id, 'success', None, update)
+                    return (fhir_doc_id, 'no_text', "No text extracted", update)
                         
                 except Exception as e:
-                    thread_session.rollback()
-                    return (fhir_doc_id, 'failed', str(e))
+                    return (fhir_doc_id, 'failed', str(e), None)
                 finally:
-                    thread_session.remove()
+                    if probe is not None:
+                        probe.close()
+        
+        def apply_update(fhir_doc, update):
+            """Runs on this thread via BatchResultWriter"""
+            if 'page_count' in update:
+                fhir_doc.page_count = update['page_count']
+            if update.get('skipped_oversized'):
+                fhir_doc.skipped_oversized = True
+                fhir_doc.processing_status = 'skipped_oversized'
+                fhir_doc.processing_error = f"Document has {update['page_count']} pages, exceeds limit of {max_pages}"
+            elif update.get('ocr_text'):
+                # Use mark_processed() helper to properly set all status/audit fields
+                fhir_doc.mark_processed(status='completed', ocr_text=update['ocr_text'])
+            else:
+                fhir_doc.mark_processed(status='failed', error="No text extracted")
+            return None
+        
+        statuses = {}
+        
+        def record_outcomes(outcomes):
+            for doc_id, write_error in outcomes:
+                status, message = statuses.pop(doc_id)
+                if write_error is not None:
+                    results['failed'].append({'document_id': doc_id, 'error': write_error})
+                elif status == 'success':
+                    results['successful'].append(doc_id)
+                elif status == 'skipped_oversized':
+                    results['skipped_oversized'].append({'document_id': doc_id, 'reason': message})
+                else:
+                    results['failed'].append({'document_id': doc_id, 'error': message})
         
         processed_count = 0
         timed_out_docs = []
         
-        executor = ThreadPoolExecutor(max_workers=max_workers)
-        try:
-            future_to_doc = {executor.submit(process_single_fhir_document_with_session, doc_id): doc_id 
-                           for doc_id in fhir_document_ids}
-            pending = set(future_to_doc.keys())
-            
-            while pending:
-                done, pending = wait(pending, timeout=timeout_seconds, return_when=FIRST_COMPLETED)
+        with app.app_context():
+            writer = BatchResultWriter(app_db.session, FHIRDocument, apply_update)
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            try:
+                future_to_doc = {executor.submit(process_single_fhir_document, doc_id): doc_id 
+                               for doc_id in fhir_document_ids}
+                pending = set(future_to_doc.keys())
                 
-                for future in done:
-                    doc_id = future_to_doc[future]
-                    processed_count += 1
+                while pending:
+                    done, pending = wait(pending, timeout=timeout_seconds, return_when=FIRST_COMPLETED)
                     
-                    try:
-                        result_doc_id, status, error = future.result()
+                    for future in done:
+                        doc_id = future_to_doc[future]
+                        processed_count += 1
                         
-                        if status == 'success':
-                            results['successful'].append(result_doc_id)
+                        try:
+                            result_doc_id, status, error, update = future.result()
+                        except Exception as e:
+                            result_doc_id, status, error, update = doc_id, 'failed', str(e), None
+                        
+                        if update is not None:
+                            statuses[result_doc_id] = (status, error)
+                            record_outcomes(writer.add(result_doc_id, update))
                         elif status == 'skipped_already_processed':
                             results['successful'].append(result_doc_id)  # Count as successful
                         elif status == 'skipped_oversized':
@@ -1336,32 +1368,27 @@ class DocumentProcessor:
                                 'document_id': result_doc_id,
                                 'error': error or 'Processing failed'
                             })
-                            
-                    except Exception as e:
-                        results['failed'].append({
-                            'document_id': doc_id,
-                            'error': str(e)
-                        })
+                        
+                        if progress_callback:
+                            try:
+                                progress_callback(processed_count, len(fhir_document_ids), doc_id)
+                            except Exception:
+                                pass
                     
-                    if progress_callback:
-                        try:
-                            progress_callback(processed_count, len(fhir_document_ids), doc_id)
-                        except Exception:
-                            pass
-                
-                # Timeout: mark remaining as stalled
-                if not done and pending:
-                    for future in pending:
-                        doc_id = future_to_doc[future]
-                        timed_out_docs.append(doc_id)
-                        results['failed'].append({
-                            'document_id': doc_id,
-                            'error': f'OCR timeout after {timeout_seconds}s (circuit breaker)'
-                        })
-                        self.logger.warning(f"FHIR Document {doc_id} exceeded timeout of {timeout_seconds}s")
-                    break
-        finally:
-            executor.shutdown(wait=False, cancel_futures=True)
+                    # Timeout: mark remaining as stalled
+                    if not done and pending:
+                        for future in pending:
+                            doc_id = future_to_doc[future]
+                            timed_out_docs.append(doc_id)
+                            results['failed'].append({
+                                'document_id': doc_id,
+                                'error': f'OCR timeout after {timeout_seconds}s (circuit breaker)'
+                            })
+                            self.logger.warning(f"FHIR Document {doc_id} exceeded timeout of {timeout_seconds}s")
+                        break
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+                record_outcomes(writer.close())
         
         if timed_out_docs:
             results['timed_out'] = timed_out_docs
@@ -1370,12 +1397,13 @@ class DocumentProcessor:
         results['end_time'] = time.time()
         results['duration_seconds'] = results['end_time'] - results['start_time']
         results['docs_per_second'] = len(fhir_document_ids) / results['duration_seconds'] if results['duration_seconds'] > 0 else 0
+        results['db_batches'] = writer.stats['batches']
         
         skipped_count = len(results['skipped_oversized'])
         log_msg = f"Parallel FHIR OCR complete: {len(results['successful'])}/{len(fhir_document_ids)} successful"
         if skipped_count > 0:
             log_msg += f", {skipped_count} skipped (COST CONTROL: exceeded page limit)"
-        log_msg += f", {results['docs_per_second']:.2f} docs/sec"
+        log_msg += f", {results['docs_per_second']:.2f} docs/sec, {writer.stats['batches']} database batches"
         self.logger.info(log_msg)
         
-        return results
\ No newline at end of file
+        return results
@@ -0,0 +1,315 @@
+"""
+Tesseract OCR engine: text, word boxes and confidences from one recognition pass
+
+PERFORMANCE: OCRProcessor used to run the tesseract CLI twice per page, once
+for plain text and once more with `tsv` output just to average the word
+confidences. Every backend here produces Tesseract's TSV in a single
+recognition and the page text is rebuilt from it, so a page is recognized
+once.
+
+Backends (OCR_ENGINE environment variable):
+
+    auto        tesserocr when installed, otherwise cli (default)
+    cli         `tesseract stdin stdout tsv`, one subprocess per page; in-memory
+                images are piped in as PNM
+    tesserocr   in-process API. PyTessBaseAPI handles are pooled per process:
+                a page borrows an idle handle (or creates one when all are
+                busy) and returns it afterwards, so the language data is
+                loaded once per concurrent OCR thread instead of once per
+                page, including for the short-lived threads that enforce
+                OCR_TIMEOUT_SECONDS. Handles are not carried into forked
+                children.
+    pytesseract pytesseract.image_to_data (still a subprocess per page, and
+                pytesseract writes each image to a temp file)
+
+recognize() takes a file path or a PIL image. Rendered PDF pages stay in
+memory from PyMuPDF to Tesseract (render_page_image), so page images never
+reach disk and need no secure deletion.
+
+Usage:
+    result = get_ocr_engine().recognize(image)
+    result.text, result.mean_confidence(), result.words
+"""
+
+import io
+import logging
+import os
+import shlex
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from utils.lazy_import import lazy_module, module_available
+
+logger = logging.getLogger(__name__)
+
+fitz = lazy_module('fitz')
+tesserocr = lazy_module('tesserocr')
+pytesseract = lazy_module('pytesseract')
+
+OCR_LANGUAGE = 'eng'
+DEFAULT_PSM = 6  # single uniform block of text
+DEFAULT_OEM = 3  # default engine (LSTM when available)
+CLI_TIMEOUT_SECONDS = 60
+
+TSV_WORD_LEVEL = 5
+
+
+class OCREngineError(Exception):
+    """Tesseract failed to recognize an image"""
+    pass
+
+
+@dataclass
+class OCRWord:
+    text: str
+    confidence: float  # 0-100 as reported by Tesseract
+    left: int
+    top: int
+    width: int
+    height: int
+    block: int
+    paragraph: int
+    line: int
+
+
+@dataclass
+class OCRResult:
+    text: str
+    words: List[OCRWord] = field(default_factory=list)
+    backend: str = ''
+
+    def mean_confidence(self, min_confidence: float = 0.0, default: float = 0.5) -> float:
+        """Average confidence (0-1) of words scoring above min_confidence (0-100)"""
+        confidences = [w.confidence for w in self.words if w.confidence > min_confidence]
+        if not confidences:
+            return default
+        return sum(confidences) / len(confidences) / 100.0
+
+    def words_above(self, min_confidence: float) -> List[OCRWord]:
+        return [w for w in self.words if w.confidence > min_confidence and w.text]
+
+
+def parse_tsv(tsv: str, backend: str = '') -> OCRResult:
+    """
+    Build an OCRResult from Tesseract TSV output.
+
+    Text layout follows Tesseract's plain-text renderer: words of a line joined
+    by spaces, lines by newlines, and a blank line between paragraphs.
+    """
+    words = []
+    for row in tsv.splitlines():
+        parts = row.split('\t', 11)
+        if len(parts) < 12 or parts[0] == 'level':
+            continue
+        try:
+            if int(parts[0]) != TSV_WORD_LEVEL:
+                continue
+            text = parts[11].strip()
+            if not text:
+                continue
+            words.append(OCRWord(
+                text=text,
+                confidence=float(parts[10]),
+                left=int(parts[6]),
+                top=int(parts[7]),
+                width=int(parts[8]),
+                height=int(parts[9]),
+                block=int(parts[2]),
+                paragraph=int(parts[3]),
+                line=int(parts[4]),
+            ))
+        except ValueError:
+            continue
+
+    paragraphs = []
+    lines = []
+    current_line = []
+    line_key = paragraph_key = None
+    for word in words:
+        if (word.block, word.paragraph) != paragraph_key:
+            if current_line:
+                lines.append(' '.join(current_line))
+            if lines:
+                paragraphs.append('\n'.join(lines))
+            lines, current_line = [], []
+            paragraph_key = (word.block, word.paragraph)
+            line_key = None
+        if word.line != line_key:
+            if current_line:
+                lines.append(' '.join(current_line))
+            current_line = []
+            line_key = word.line
+        current_line.append(word.text)
+    if current_line:
+        lines.append(' '.join(current_line))
+    if lines:
+        paragraphs.append('\n'.join(lines))
+
+    return OCRResult(text='\n\n'.join(paragraphs), words=words, backend=backend)
+
+
+def image_to_pnm(image) -> bytes:
+    """Encode a PIL image as PGM/PPM: no compression, a header plus the raw samples"""
+    if image.mode not in ('L', 'RGB'):
+        image = image.convert('L' if image.mode in ('1', 'LA', 'I', 'F') else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PPM')
+    return buffer.getvalue()
+
+
+def render_page_image(page, dpi: int = 150):
+    """
+    Render a PyMuPDF page straight into a grayscale PIL image.
+
+    The pixmap's samples are wrapped, not encoded: no PNG, no temp file.
+    """
+    from PIL import Image
+
+    zoom = dpi / 72  # 72 is default PDF DPI
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    mode = {1: 'L', 3: 'RGB'}.get(pixmap.n, 'L')
+    return Image.frombuffer(mode, (pixmap.width, pixmap.height), pixmap.samples,
+                            'raw', mode, pixmap.stride, 1)
+
+
+class CLIEngine:
+    """tesseract executable, TSV on stdout"""
+
+    name = 'cli'
+
+    def recognize(self, image, psm: int = DEFAULT_PSM,
+                  whitelist: Optional[str] = None) -> OCRResult:
+        # In-memory images are piped to tesseract as uncompressed PNM on stdin
+        stdin_bytes = None
+        if isinstance(image, str):
+            source = image
+        else:
+            source = 'stdin'
+            stdin_bytes = image_to_pnm(image)
+
+        cmd = ['tesseract', source, 'stdout', '-l', OCR_LANGUAGE,
+               '--oem', str(DEFAULT_OEM), '--psm', str(psm)]
+        if whitelist:
+            cmd += ['-c', f'tessedit_char_whitelist={whitelist}']
+        cmd.append('tsv')
+
+        result = subprocess.run(cmd, input=stdin_bytes, capture_output=True, timeout=CLI_TIMEOUT_SECONDS)
+        if result.returncode != 0:
+            stderr = result.stderr.decode('utf-8', errors='replace')
+            raise OCREngineError(f"Tesseract failed with return code {result.returncode}: {stderr}")
+        return parse_tsv(result.stdout.decode('utf-8', errors='replace'), self.name)
+
+    def warm(self) -> None:
+        subprocess.run(['tesseract', '--version'], capture_output=True, timeout=CLI_TIMEOUT_SECONDS)
+
+
+class PytesseractEngine:
+    """pytesseract.image_to_data in TSV form"""
+
+    name = 'pytesseract'
+
+    def recognize(self, image, psm: int = DEFAULT_PSM,
+                  whitelist: Optional[str] = None) -> OCRResult:
+        config = f'--oem {DEFAULT_OEM} --psm {psm}'
+        if whitelist:
+            config += ' -c ' + shlex.quote(f'tessedit_char_whitelist={whitelist}')
+        try:
+            tsv = pytesseract.image_to_data(image, lang=OCR_LANGUAGE, config=config,
+                                            timeout=CLI_TIMEOUT_SECONDS)
+        except pytesseract.TesseractError as e:
+            raise OCREngineError(str(e)) from e
+        return parse_tsv(tsv, self.name)
+
+    def warm(self) -> None:
+        pytesseract.get_tesseract_version()
+
+
+class TesserocrEngine:
+    """In-process Tesseract API with a pool of persistent handles"""
+
+    name = 'tesserocr'
+
+    def __init__(self):
+        self._idle = []
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        # The parent's handles (and any OpenMP state behind them) stay with the parent
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return tesserocr.PyTessBaseAPI(lang=OCR_LANGUAGE, oem=tesserocr.OEM.DEFAULT)
+
+    def _release(self, api) -> None:
+        with self._lock:
+            self._idle.append(api)
+
+    def recognize(self, image, psm: int = DEFAULT_PSM,
+                  whitelist: Optional[str] = None) -> OCRResult:
+        api = self._acquire()
+        try:
+            api.SetPageSegMode(psm)
+            api.SetVariable('tessedit_char_whitelist', whitelist or '')
+            if isinstance(image, str):
+                api.SetImageFile(image)
+            else:
+                api.SetImage(image)
+            tsv = api.GetTSVText(0)
+        except RuntimeError as e:
+            raise OCREngineError(str(e)) from e
+        finally:
+            api.Clear()
+            self._release(api)
+        return parse_tsv(tsv or '', self.name)
+
+    def warm(self) -> None:
+        self._release(self._acquire())
+
+
+_BACKENDS = {
+    'cli': CLIEngine,
+    'tesserocr': TesserocrEngine,
+    'pytesseract': PytesseractEngine,
+}
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def _select_backend() -> str:
+    requested = os.environ.get('OCR_ENGINE', 'auto').strip().lower()
+    if requested == 'auto':
+        return 'tesserocr' if module_available('tesserocr') else 'cli'
+    if requested not in _BACKENDS:
+        logger.warning(f"Unknown OCR_ENGINE '{requested}', using the tesseract CLI")
+        return 'cli'
+    if requested != 'cli' and not module_available(requested):
+        logger.warning(f"OCR_ENGINE={requested} but {requested} is not installed, using the tesseract CLI")
+        return 'cli'
+    return requested
+
+
+def get_ocr_engine():
+    """The process-wide OCR engine (backend chosen from OCR_ENGINE on first use)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                backend = _select_backend()
+                _engine = _BACKENDS[backend]()
+                logger.info(f"OCR engine: {backend}")
+    return _engine
+
+
+def warm_ocr_engine() -> str:
+    """Load the OCR engine (bindings, language data) ahead of the first page; returns the backend name"""
+    engine = get_ocr_engine()
+    engine.warm()
+    return engine.name
@@ -212,7 +212,9 @@ class OCRMonitor:
                 })
         
         # Documents with high error density
-        all_docs = Document.query.filter(Document.ocr_text.isnot(None)).all()
+        all_docs = Document.query.filter(Document.ocr_text.isnot(None)).options(
+            Document.text_loader_option()
+        ).all()
         
         for doc in all_docs:
             analysis = self.analyze_document_quality(doc.id)
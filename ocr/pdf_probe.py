@@ -0,0 +1,209 @@
+"""
+Single-pass PDF probe: page count, text layer, image coverage and encryption
+
+PERFORMANCE: a FHIR PDF used to be parsed up to three times before any OCR
+ran: once from bytes for the MAX_DOCUMENT_PAGES check, again from the temp
+file for the page count, and again for extraction. OCRProcessor opened each
+PDF once to try the embedded text and again for per-page hybrid processing.
+
+probe_pdf() opens the document once, from a path or straight from memory,
+and reads what the routing decision needs:
+
+    page_count       checked against MAX_DOCUMENT_PAGES before any page is read
+                     (0 for a locked document)
+    per-page text    the embedded text layer (kept, so extraction reuses it)
+    image coverage   share of each page covered by placed images
+    encryption       encrypted / locked (password required) documents
+
+The probe keeps the document open; extraction renders the pages that need
+OCR from the same handle (probe.page(i)), so each PDF is parsed exactly
+once. Close it with close() or use it as a context manager.
+
+A page needs OCR when its text layer is under MIN_PAGE_TEXT_CHARS, or when
+it looks scanned: placed images cover at least SCANNED_PAGE_IMAGE_COVERAGE of
+it and its text layer is thin (under SCANNED_PAGE_MIN_TEXT_CHARS), e.g. a fax
+header or a scanner's partial OCR over a full-page image.
+
+Routes:
+
+    skip        no pages, locked, or over the page limit
+    text_only   every page has a text layer, nothing is rendered
+    hybrid      text layer where present, OCR for the remaining pages
+    full_ocr    no page has a text layer (scans)
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+from utils.lazy_import import lazy_module, module_available
+
+logger = logging.getLogger(__name__)
+
+fitz = lazy_module('fitz')
+PYMUPDF_AVAILABLE = module_available('fitz')
+
+MIN_PAGE_TEXT_CHARS = 50  # embedded text needed to use a page without OCR
+SCANNED_PAGE_IMAGE_COVERAGE = 0.85  # image share of a page that makes it a scan
+SCANNED_PAGE_MIN_TEXT_CHARS = 300  # text layer that a scanned page is trusted with
+
+ROUTE_SKIP = 'skip'
+ROUTE_TEXT_ONLY = 'text_only'
+ROUTE_HYBRID = 'hybrid'
+ROUTE_FULL_OCR = 'full_ocr'
+
+
+@dataclass
+class PdfPageProbe:
+    index: int
+    text: str
+    image_coverage: float  # 0-1, share of the page area under placed images
+
+    @property
+    def text_length(self) -> int:
+        return len(self.text)
+
+    @property
+    def looks_scanned(self) -> bool:
+        """Mostly image with a thin text layer: the text is not the page content"""
+        return self.image_coverage >= SCANNED_PAGE_IMAGE_COVERAGE and self.text_length < SCANNED_PAGE_MIN_TEXT_CHARS
+
+    @property
+    def has_text_layer(self) -> bool:
+        return self.text_length >= MIN_PAGE_TEXT_CHARS and not self.looks_scanned
+
+
+@dataclass
+class PdfProbe:
+    page_count: int
+    encrypted: bool = False
+    locked: bool = False
+    oversized: bool = False
+    pages: List[PdfPageProbe] = field(default_factory=list)
+    doc: Any = field(default=None, repr=False)
+
+    @property
+    def route(self) -> str:
+        if self.skip_reason:
+            return ROUTE_SKIP
+        with_text = sum(1 for p in self.pages if p.has_text_layer)
+        if with_text == len(self.pages):
+            return ROUTE_TEXT_ONLY
+        if with_text == 0:
+            return ROUTE_FULL_OCR
+        return ROUTE_HYBRID
+
+    @property
+    def skip_reason(self) -> Optional[str]:
+        if self.locked:
+            return 'encrypted (password required)'
+        if self.oversized:
+            return f'{self.page_count} pages exceeds page limit'
+        if self.page_count == 0:
+            return 'no pages'
+        return None
+
+    @property
+    def pages_needing_ocr(self) -> List[int]:
+        return [p.index for p in self.pages if not p.has_text_layer]
+
+    @property
+    def scanned_pages(self) -> List[int]:
+        return [p.index for p in self.pages if p.looks_scanned]
+
+    def embedded_text(self) -> str:
+        return '\n'.join(p.text for p in self.pages if p.text)
+
+    def page(self, index: int):
+        """The open fitz page, for rendering"""
+        return self.doc[index]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'route': self.route,
+            'page_count': self.page_count,
+            'pages_with_text': sum(1 for p in self.pages if p.has_text_layer),
+            'scanned_pages': len(self.scanned_pages),
+            'mean_image_coverage': round(
+                sum(p.image_coverage for p in self.pages) / len(self.pages), 3) if self.pages else 0.0,
+            'encrypted': self.encrypted,
+        }
+
+    def close(self) -> None:
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _image_coverage(page) -> float:
+    """Sum of placed image areas clipped to the page, capped at 1 (overlaps are not merged)"""
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height
+    if page_area <= 0:
+        return 0.0
+    covered = 0.0
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info.get('bbox', (0, 0, 0, 0))
+        width = min(x1, page_rect.x1) - max(x0, page_rect.x0)
+        height = min(y1, page_rect.y1) - max(y0, page_rect.y0)
+        if width > 0 and height > 0:
+            covered += width * height
+    return min(1.0, covered / page_area)
+
+
+def probe_pdf(source: Union[str, bytes], max_pages: Optional[int] = None) -> Optional[PdfProbe]:
+    """
+    Open a PDF once and probe it.
+
+    Args:
+        source: File path, or the PDF bytes (opened in memory, no temp file)
+        max_pages: If given, a longer document is marked oversized and its
+                   pages are not read
+
+    Returns:
+        An open PdfProbe (caller closes it), or None if PyMuPDF is not
+        installed or the document cannot be opened
+    """
+    if not PYMUPDF_AVAILABLE:
+        return None
+
+    try:
+        if isinstance(source, (bytes, bytearray)):
+            doc = fitz.open(stream=source, filetype='pdf')
+        else:
+            doc = fitz.open(source)
+    except Exception as e:
+        logger.warning(f"Could not open PDF for probing: {e}")
+        return None
+
+    try:
+        encrypted = bool(doc.is_encrypted)
+
+        # Encrypted with an empty user password (permissions only) still opens
+        if doc.needs_pass and not doc.authenticate(''):
+            return PdfProbe(page_count=0, encrypted=True, locked=True, doc=doc)
+
+        probe = PdfProbe(page_count=len(doc), encrypted=encrypted, doc=doc)
+
+        if max_pages is not None and probe.page_count > max_pages:
+            probe.oversized = True
+            return probe
+
+        for index in range(probe.page_count):
+            page = doc[index]
+            probe.pages.append(PdfPageProbe(
+                index=index,
+                text=page.get_text('text').strip(),
+                image_coverage=_image_coverage(page),
+            ))
+        return probe
+    except Exception as e:
+        logger.warning(f"Error probing PDF: {e}")
+        doc.close()
+        return None
@@ -8,6 +8,8 @@ Performance optimizations:
 - Per-page hybrid processing: Only OCR pages that lack embedded text
 - Configurable parallel workers via OCR_MAX_WORKERS environment variable
 - Batch processing with isolated database sessions for thread safety
+- DOCX, RTF, HTML, EML and text files are streamed with a per-document character
+  cap (STREAM_EXTRACT_MAX_CHARS); EML attachments go through the same dispatcher
 
 Audit logging:
 - All document processing events are logged to AdminLog via DocumentAuditLogger
@@ -18,40 +20,25 @@ import subprocess
 import tempfile
 import hashlib
 from PIL import Image
-import pdf2image
 from app import db
 from models import Document
 from .phi_filter import PHIFilter
+from .engine import get_ocr_engine, OCREngineError
+from .preprocess import ocr_pdf_page, preprocess_for_ocr, NUMPY_AVAILABLE
+from .pdf_probe import probe_pdf, ROUTE_SKIP, ROUTE_TEXT_ONLY
 from utils.document_audit import DocumentAuditLogger
+from .stream_extract import StreamingExtraction, STREAM_EXTENSIONS
 import logging
 from datetime import datetime
-import email
-from email import policy
 
-try:
-    import fitz  # PyMuPDF for embedded text extraction
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    PYMUPDF_AVAILABLE = False
+from utils.lazy_import import lazy_module, module_available
 
+# PERFORMANCE: PyMuPDF and pdf2image are imported on first use; availability is
+# checked without importing
+fitz = lazy_module('fitz')  # PyMuPDF for embedded text extraction
+PYMUPDF_AVAILABLE = module_available('fitz')
+pdf2image = lazy_module('pdf2image')
 
-try:
-    from docx import Document as DocxDocument
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-
-try:
-    from striprtf.striprtf import rtf_to_text
-    STRIPRTF_AVAILABLE = True
-except ImportError:
-    STRIPRTF_AVAILABLE = False
-
-try:
-    from bs4 import BeautifulSoup
-    BS4_AVAILABLE = True
-except ImportError:
-    BS4_AVAILABLE = False
 
 # Configurable worker count - defaults to 4, can be overridden via environment
 MIN_TEXT_LENGTH_FOR_SKIP_OCR = 100  # Minimum chars to consider PDF machine-readable
@@ -290,19 +277,10 @@ class OCRProcessor:
                 return self._process_pdf(file_path)
             elif file_ext in ['.png', '.jpg', '.jpeg', '.tiff', '.bmp']:
                 return self._process_image(file_path)
-            elif file_ext == '.docx':
-                return self._process_docx(file_path)
             elif file_ext == '.doc':
                 return self._process_doc(file_path)
-            elif file_ext == '.rtf':
-                return self._process_rtf(file_path)
-            elif file_ext in ['.html', '.htm']:
-                return self._process_html(file_path)
-            elif file_ext == '.eml':
-                return self._process_eml(file_path)
-            elif file_ext == '.txt':
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    return f.read(), 1.0
+            elif file_ext in STREAM_EXTENSIONS:
+                return self._process_streamed(file_path, file_ext)
             else:
                 raise ValueError(f"Unsupported file type: {file_ext}")
 
@@ -310,46 +288,6 @@ class OCRProcessor:
             self.logger.error(f"Error extracting text from {file_path}: {str(e)}")
             return None, 0.0
 
-    def _extract_embedded_pdf_text(self, pdf_path):
-        """
-        Extract embedded text from PDF using PyMuPDF.
-        Returns (text, is_machine_readable) tuple.
-        
-        Machine-readable PDFs have embedded text layers (not scanned images).
-        This is ~100x faster than OCR and should be attempted first.
-        """
-        if not PYMUPDF_AVAILABLE:
-            return None, False
-        
-        try:
-            doc = fitz.open(pdf_path)
-            all_text = []
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text("text")
-                if text and text.strip():
-                    all_text.append(text.strip())
-            
-            doc.close()
-            
-            combined_text = '\n'.join(all_text)
-            
-            # Check if we have substantial text (not just headers/footers)
-            is_machine_readable = len(combined_text) >= MIN_TEXT_LENGTH_FOR_SKIP_OCR
-            
-            if is_machine_readable:
-                self.logger.info(
-                    f"PDF is machine-readable: {len(combined_text)} chars extracted, skipping OCR"
-                )
-            
-            return combined_text if is_machine_readable else None, is_machine_readable
-            
-        except Exception as e:
-            self.logger.warning(f"Error extracting embedded PDF text: {str(e)}")
-            return None, False
-
-
     def _process_pdf(self, pdf_path):
         """
         Process PDF document and extract text.
@@ -359,21 +297,40 @@ class OCRProcessor:
         2. OCR via Tesseract (slowest, for scanned documents)
         
         This reduces processing time by 20-30% for typical document sets.
-        """
-        # First, try to extract embedded text with PyMuPDF (fastest)
-        embedded_text, is_machine_readable = self._extract_embedded_pdf_text(pdf_path)
         
-        if is_machine_readable and embedded_text:
-            # Machine-readable PDF - no OCR needed, confidence is 1.0
-            return embedded_text, 1.0
-        
-        # Fall back to hybrid per-page processing
-        # For each page: use embedded text if available, otherwise OCR
-        self.logger.info(f"PDF requires hybrid per-page processing: {pdf_path}")
+        SINGLE PARSE: the PDF is opened once by probe_pdf (ocr/pdf_probe.py); its
+        embedded text decides the route and the hybrid pass renders the pages
+        that need OCR from the same handle.
+        """
+        probe = probe_pdf(pdf_path) if PYMUPDF_AVAILABLE else None
+        if probe is None:
+            return self._process_pdf_hybrid(pdf_path)
         
-        return self._process_pdf_hybrid(pdf_path)
+        with probe:
+            if probe.route == ROUTE_SKIP:
+                self.logger.warning(f"Skipping PDF {pdf_path}: {probe.skip_reason}")
+                return None, 0.0
+            
+            # Machine-readable PDFs have embedded text layers (not scanned images):
+            # ~100x faster than OCR. Enough text overall (not just headers/footers)
+            # skips OCR for the whole document, unless some page is a scan whose
+            # thin text layer does not carry its content.
+            embedded_text = probe.embedded_text()
+            if probe.route == ROUTE_TEXT_ONLY or (
+                len(embedded_text) >= MIN_TEXT_LENGTH_FOR_SKIP_OCR and not probe.scanned_pages
+            ):
+                self.logger.info(
+                    f"PDF is machine-readable: {len(embedded_text)} chars extracted, skipping OCR"
+                )
+                return embedded_text, 1.0
+            
+            # Fall back to hybrid per-page processing
+            # For each page: use embedded text if available, otherwise OCR
+            self.logger.info(f"PDF requires {probe.route} per-page processing: {pdf_path} ({probe.summary()})")
+            
+            return self._process_pdf_hybrid(pdf_path, probe)
 
-    def _process_pdf_hybrid(self, pdf_path):
+    def _process_pdf_hybrid(self, pdf_path, probe=None):
         """
         Hybrid per-page PDF processing with lazy rendering.
         
@@ -388,77 +345,77 @@ class OCRProcessor:
         This optimization can reduce compute by 50-80% for documents with mixed
         scanned/digital pages, and eliminates unnecessary page rendering entirely
         for fully digital PDFs.
+        
+        Args:
+            pdf_path: Path to PDF file
+            probe: Open PdfProbe of the file (page text and pages to render); without
+                   one (PyMuPDF unavailable or unable to open it) all pages go
+                   through pdf2image
         """
         all_text = []
         confidences = []
         pages_extracted = 0
         pages_ocred = 0
         pages_skipped_text = 0  # Pages with enough embedded text
+        pages_blank = 0  # Scanned pages with nothing printed (OCR skipped)
+        pages_retried = 0  # Low-confidence pages re-rendered at a higher DPI
         
-        # Use secure temp directory for HIPAA-compliant cleanup of PDF page images
-        from utils.secure_delete import secure_temp_directory
-        
-        with secure_temp_directory(prefix='healthprep_pdf_') as temp_dir:
-            try:
-                if PYMUPDF_AVAILABLE:
-                    # Single document open - process all pages through one handle
-                    doc = fitz.open(pdf_path)
-                    try:
-                        num_pages = len(doc)
-                        
-                        for i in range(num_pages):
-                            page = doc[i]
-                            page_text = page.get_text("text").strip()
-                            
-                            if len(page_text) >= 50:
-                                # Page has embedded text - use directly (no rendering needed)
-                                all_text.append(page_text)
-                                confidences.append(1.0)
-                                pages_extracted += 1
-                                pages_skipped_text += 1
-                            else:
-                                # LAZY RENDERING: Only render pages that need OCR
-                                # Use PyMuPDF get_pixmap() instead of pdf2image (faster, no poppler)
-                                text, confidence = self._ocr_page_with_pixmap(page, temp_dir, i)
-                                if text:
-                                    all_text.append(text)
-                                    confidences.append(confidence)
-                                    pages_ocred += 1
-                                elif page_text:
-                                    # OCR returned nothing, but we have some embedded text - use it
-                                    all_text.append(page_text)
-                                    confidences.append(0.5)  # Lower confidence for short text
-                                    pages_extracted += 1
-                    finally:
-                        doc.close()
-                else:
-                    # Fallback: pdf2image for all pages (slower, requires poppler)
-                    images = pdf2image.convert_from_path(pdf_path)
-                    for i, image in enumerate(images):
-                        image_path = os.path.join(temp_dir, f"page_{i}.png")
-                        image.save(image_path, 'PNG')
-                        text, confidence = self._process_image(image_path)
+        # Page images are rendered and OCR'd in memory: nothing to write or securely delete
+        try:
+            if probe is not None:
+                # Single document open - embedded text comes from the probe and
+                # pages are rendered from its handle
+                for page_probe in probe.pages:
+                    i = page_probe.index
+                    page_text = page_probe.text
+                    
+                    if page_probe.has_text_layer:
+                        # Page has embedded text - use directly (no rendering needed)
+                        all_text.append(page_text)
+                        confidences.append(1.0)
+                        pages_extracted += 1
+                        pages_skipped_text += 1
+                    else:
+                        # LAZY RENDERING: Only render pages that need OCR
+                        # Use PyMuPDF get_pixmap() instead of pdf2image (faster, no poppler)
+                        text, confidence, info = self._ocr_page_with_pixmap(probe.page(i), i)
+                        pages_blank += info.get('blank', False)
+                        pages_retried += info.get('retried', False)
                         if text:
                             all_text.append(text)
                             confidences.append(confidence)
                             pages_ocred += 1
-                
-                self.logger.info(
-                    f"Hybrid PDF processing: {pages_extracted} pages extracted "
-                    f"({pages_skipped_text} skipped rendering), {pages_ocred} pages OCR'd"
-                )
-                
-                combined_text = '\n'.join(all_text)
-                avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
-                
-                return combined_text, avg_confidence
-                # secure_temp_directory handles verified secure deletion on exit
-                
-            except Exception as e:
-                self.logger.error(f"Error in hybrid PDF processing {pdf_path}: {str(e)}")
-                return None, 0.0
+                        elif page_text:
+                            # OCR returned nothing, but we have some embedded text - use it
+                            all_text.append(page_text)
+                            confidences.append(0.5)  # Lower confidence for short text
+                            pages_extracted += 1
+            else:
+                # Fallback: pdf2image for all pages (slower, requires poppler)
+                images = pdf2image.convert_from_path(pdf_path)
+                for i, image in enumerate(images):
+                    text, confidence = self._ocr_image(image, f"page {i}")
+                    if text:
+                        all_text.append(text)
+                        confidences.append(confidence)
+                        pages_ocred += 1
+            
+            self.logger.info(
+                f"Hybrid PDF processing: {pages_extracted} pages extracted "
+                f"({pages_skipped_text} skipped rendering), {pages_ocred} pages OCR'd, "
+                f"{pages_blank} blank pages skipped, {pages_retried} pages re-rendered"
+            )
+            
+            combined_text = '\n'.join(all_text)
+            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+            
+            return combined_text, avg_confidence
+            
+        except Exception as e:
+            self.logger.error(f"Error in hybrid PDF processing {pdf_path}: {str(e)}")
+            return None, 0.0
     
-    def _ocr_page_with_pixmap(self, page, temp_dir, page_index):
+    def _ocr_page_with_pixmap(self, page, page_index):
         """
         Render a single PDF page using PyMuPDF's get_pixmap() and OCR it.
         
@@ -469,237 +426,133 @@ class OCRProcessor:
         - pdf2image: Spawns poppler subprocess, renders all pages to memory
         - get_pixmap: In-process, renders single page on demand
         
+        The pixmap is rendered in grayscale and wrapped as a PIL image without
+        encoding; preprocessing and OCR run on that buffer, so the page image
+        (PHI) never reaches disk.
+        
+        ADAPTIVE DPI: a 72 DPI thumbnail decides the render resolution from the
+        text line height, blank pages skip OCR, and only low-confidence pages
+        are rendered again at a higher DPI (ocr/preprocess.py).
+        
         Args:
             page: fitz.Page object
-            temp_dir: Secure temp directory for image files
-            page_index: Page number for logging/temp filename
+            page_index: Page number for logging
             
         Returns:
-            (text, confidence) tuple
+            (text, confidence, info) tuple; info holds the DPI and blank/retry flags
         """
+        label = f"page {page_index}"
         try:
-            # Render page to pixmap at 150 DPI (good balance of quality vs speed)
-            # Higher DPI = better OCR accuracy but more CPU/RAM
-            zoom = 150 / 72  # 72 is default PDF DPI
-            matrix = fitz.Matrix(zoom, zoom)
-            pixmap = page.get_pixmap(matrix=matrix, alpha=False)
-            
-            # Save to temp file for Tesseract
-            image_path = os.path.join(temp_dir, f"page_{page_index}.png")
-            pixmap.save(image_path)
-            
-            # OCR the rendered page
-            text, confidence = self._process_image(image_path)
-            
-            return text, confidence
-            
+            return ocr_pdf_page(page, lambda image: self._ocr_image(image, label, preprocess=False))
         except Exception as e:
             self.logger.warning(f"Error rendering page {page_index} with pixmap: {e}")
-            return None, 0.0
+            return None, 0.0, {}
 
     def _process_image(self, image_path):
-        """Process image and extract text using Tesseract"""
+        """Process image file and extract text using Tesseract"""
         try:
-            # Preprocess image for better OCR results
-            processed_image_path = self._preprocess_image(image_path)
-
-            # Run Tesseract OCR
-            cmd = [
-                'tesseract',
-                processed_image_path,
-                'stdout',
-                '--oem', '3',
-                '--psm', '6'
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-
-            if result.returncode == 0:
-                text = result.stdout.strip()
-
-                # Get confidence score
-                confidence = self._calculate_confidence(processed_image_path)
-                
-                # Secure cleanup of preprocessed image (HIPAA compliance)
-                self.cleanup_temp_files()
-
-                return text, confidence
-            else:
-                self.logger.error(f"Tesseract failed with return code {result.returncode}: {result.stderr}")
-                self.cleanup_temp_files()  # Cleanup on error path too
-                return None, 0.0
-
-        except subprocess.TimeoutExpired:
-            self.logger.error(f"Tesseract timeout processing {image_path}")
-            self.cleanup_temp_files()
-            return None, 0.0
+            with Image.open(image_path) as image:
+                image.load()
+                return self._ocr_image(image, image_path)
         except Exception as e:
             self.logger.error(f"Error processing image {image_path}: {str(e)}")
-            self.cleanup_temp_files()
             return None, 0.0
 
-    def _preprocess_image(self, image_path):
-        """Preprocess image to improve OCR accuracy
+    def _ocr_image(self, image, label, preprocess=True):
+        """OCR an in-memory PIL image
         
-        Uses HIPAA-compliant temp file handling with crash recovery registry.
-        Returns a temp file path - cleanup happens via cleanup_temp_files().
-        """
-        from utils.secure_delete import secure_delete_file, register_temp_path, unregister_temp_path
-        import tempfile as tf
+        PERFORMANCE: one recognition pass returns both the text and the word
+        confidences (ocr/engine.py), and the image goes to Tesseract from
+        memory (stdin or the in-process API) rather than through temp files.
         
-        temp_path = None
+        preprocess=False when the caller already preprocessed the image.
+        """
         try:
-            # Create temp file for preprocessing
-            fd, temp_path = tf.mkstemp(suffix='.png', prefix='healthprep_ocr_')
-            os.close(fd)
-            
-            # Register for crash recovery (HIPAA compliance)
-            register_temp_path(temp_path)
-            
-            # Track for secure cleanup
-            if not hasattr(self, '_temp_files_to_cleanup'):
-                self._temp_files_to_cleanup = []
-            self._temp_files_to_cleanup.append(temp_path)
-
-            # Open and preprocess image
-            with Image.open(image_path) as image:
-                # Convert to grayscale
-                if image.mode != 'L':
-                    image = image.convert('L')
-
-                # Enhance contrast and resize if needed
-                from PIL import ImageEnhance
-
-                # Enhance contrast
-                enhancer = ImageEnhance.Contrast(image)
-                image = enhancer.enhance(1.5)
-
-                # Resize if image is too small
-                width, height = image.size
-                if width < 800 or height < 600:
-                    scale_factor = max(800 / width, 600 / height)
-                    new_width = int(width * scale_factor)
-                    new_height = int(height * scale_factor)
-                    image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                # Save preprocessed image
-                image.save(temp_path, 'PNG')
-
-            return temp_path
-
+            if preprocess:
+                # Preprocess image for better OCR results
+                image, analysis = self._preprocess_image(image)
+                if analysis is not None and analysis.blank:
+                    self.logger.info(f"Skipping OCR for blank {label}")
+                    return '', 0.0
+
+            result = get_ocr_engine().recognize(image)
+            return result.text.strip(), result.mean_confidence()
+
+        except OCREngineError as e:
+            self.logger.error(str(e))
+            return None, 0.0
+        except subprocess.TimeoutExpired:
+            self.logger.error(f"Tesseract timeout processing {label}")
+            return None, 0.0
         except Exception as e:
-            self.logger.error(f"Error preprocessing image {image_path}: {str(e)}")
-            # Immediately secure delete any temp file created on exception
-            if temp_path and os.path.exists(temp_path):
-                secure_delete_file(temp_path)
-                # Unregister from crash recovery and remove from tracking list
-                unregister_temp_path(temp_path)
-                if hasattr(self, '_temp_files_to_cleanup') and temp_path in self._temp_files_to_cleanup:
-                    self._temp_files_to_cleanup.remove(temp_path)
-            return image_path  # Return original if preprocessing fails
-    
-    def cleanup_temp_files(self):
-        """Securely delete any temporary files created during processing (HIPAA compliance)"""
-        from utils.secure_delete import secure_delete_file, unregister_temp_path
+            self.logger.error(f"Error processing image {label}: {str(e)}")
+            return None, 0.0
+
+    def _preprocess_image(self, image):
+        """Preprocess a PIL image in memory to improve OCR accuracy
         
-        remaining = []
-        if hasattr(self, '_temp_files_to_cleanup'):
-            for temp_path in self._temp_files_to_cleanup:
-                if os.path.exists(temp_path):
-                    success = secure_delete_file(temp_path)
-                    if success:
-                        # Only unregister on successful deletion
-                        unregister_temp_path(temp_path)
-                    else:
-                        self.logger.warning(f"Failed to securely delete temp file (HIPAA risk) - keeping in registry")
-                        remaining.append(temp_path)
-                else:
-                    # File already gone, can unregister
-                    unregister_temp_path(temp_path)
-            self._temp_files_to_cleanup = remaining
+        With NumPy: blank detection, deskew and binarization (ocr/preprocess.py).
+        Without it: grayscale, contrast boost and upscaling of small images.
+        
+        Returns (image, analysis); analysis is None without NumPy. The original
+        image is returned if preprocessing fails.
+        """
+        if NUMPY_AVAILABLE:
+            try:
+                return preprocess_for_ocr(image)
+            except Exception as e:
+                self.logger.error(f"Error preprocessing image: {str(e)}")
+                return image, None
 
-    def _calculate_confidence(self, image_path):
-        """Calculate OCR confidence score"""
         try:
-            cmd = [
-                'tesseract',
-                image_path,
-                'stdout',
-                '--oem', '3',
-                '--psm', '6',
-                'tsv'
-            ]
+            # Convert to grayscale
+            if image.mode != 'L':
+                image = image.convert('L')
 
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            # Enhance contrast and resize if needed
+            from PIL import ImageEnhance
 
-            if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')
-                confidences = []
+            # Enhance contrast
+            enhancer = ImageEnhance.Contrast(image)
+            image = enhancer.enhance(1.5)
 
-                for line in lines[1:]:  # Skip header
-                    parts = line.split('\t')
-                    if len(parts) >= 11 and parts[10].strip():  # Confidence is in column 10
-                        try:
-                            conf = float(parts[10])
-                            if conf > 0:  # Only include positive confidences
-                                confidences.append(conf)
-                        except ValueError:
-                            continue
+            # Resize if image is too small
+            width, height = image.size
+            if width < 800 or height < 600:
+                scale_factor = max(800 / width, 600 / height)
+                new_width = int(width * scale_factor)
+                new_height = int(height * scale_factor)
+                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
-                if confidences:
-                    return sum(confidences) / len(confidences) / 100.0  # Convert to 0-1 scale
-                else:
-                    return 0.5  # Default confidence if no data
-            else:
-                return 0.5  # Default confidence on error
+            return image, None
 
         except Exception as e:
-            self.logger.error(f"Error calculating confidence for {image_path}: {str(e)}")
-            return 0.5  # Default confidence on error
+            self.logger.error(f"Error preprocessing image: {str(e)}")
+            return image, None  # Return original if preprocessing fails
 
-    def _process_docx(self, docx_path):
+    def _process_streamed(self, file_path, file_ext):
         """
-        Extract text from modern Word documents (.docx)
-        
-        Uses python-docx library for direct text extraction.
+        Extract text from DOCX, RTF, HTML, EML and plain text files.
+
+        The file is read incrementally and at most STREAM_EXTRACT_MAX_CHARS
+        characters are kept (ocr/stream_extract.py). EML attachments come back
+        through _extract_text, so a PDF or scan attached to a referral is
+        extracted like an uploaded one.
         """
-        if not DOCX_AVAILABLE:
-            self.logger.error("python-docx library not available for .docx processing")
-            return None, 0.0
-        
+        extraction = StreamingExtraction(extract_file=self._extract_text)
         try:
-            doc = DocxDocument(docx_path)  # type: ignore
-            text_parts = []
-            
-            # Extract text from paragraphs
-            for paragraph in doc.paragraphs:
-                text = paragraph.text.strip()
-                if text:
-                    text_parts.append(text)
-            
-            # Extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = []
-                    for cell in row.cells:
-                        cell_text = cell.text.strip()
-                        if cell_text:
-                            row_text.append(cell_text)
-                    if row_text:
-                        text_parts.append(' | '.join(row_text))
-            
-            if text_parts:
-                combined_text = '\n'.join(text_parts)
-                self.logger.info(f"Successfully extracted {len(combined_text)} characters from DOCX")
-                return combined_text, 1.0
-            else:
-                self.logger.warning("No text found in DOCX document")
-                return None, 0.0
-                
+            text, confidence = extraction.extract(file_path, file_ext)
         except Exception as e:
-            self.logger.error(f"Error processing DOCX {docx_path}: {str(e)}")
+            self.logger.error(f"Error processing {file_ext} {file_path}: {str(e)}")
             return None, 0.0
 
+        if text:
+            self.logger.info(f"Successfully extracted {len(text)} characters from {file_ext.lstrip('.').upper()}"
+                             + (f" ({extraction.attachments} attachments)" if extraction.attachments else ""))
+        else:
+            self.logger.warning(f"No text found in {file_ext.lstrip('.').upper()} document")
+        return text, confidence
+
     def _process_doc(self, doc_path):
         """
         Extract text from legacy Word documents (.doc)
@@ -768,120 +621,6 @@ class OCRProcessor:
         self.logger.error(f"Unable to extract text from DOC file: {doc_path}")
         return None, 0.0
 
-    def _process_rtf(self, rtf_path):
-        """
-        Extract text from RTF (Rich Text Format) files.
-        Common format for medical referrals and legacy documents.
-        """
-        if not STRIPRTF_AVAILABLE:
-            self.logger.error("striprtf library not available for RTF processing")
-            return None, 0.0
-        
-        try:
-            with open(rtf_path, 'r', encoding='utf-8', errors='ignore') as f:
-                rtf_content = f.read()
-            
-            text = rtf_to_text(rtf_content)
-            
-            if text and text.strip():
-                cleaned_text = text.strip()
-                self.logger.info(f"Successfully extracted {len(cleaned_text)} characters from RTF")
-                return cleaned_text, 1.0
-            else:
-                self.logger.warning("No text found in RTF document")
-                return None, 0.0
-                
-        except Exception as e:
-            self.logger.error(f"Error processing RTF {rtf_path}: {str(e)}")
-            return None, 0.0
-
-    def _process_html(self, html_path):
-        """
-        Extract text from HTML files.
-        Common format for patient portal exports and email attachments.
-        """
-        if not BS4_AVAILABLE:
-            self.logger.error("BeautifulSoup library not available for HTML processing")
-            return None, 0.0
-        
-        try:
-            with open(html_path, 'r', encoding='utf-8', errors='ignore') as f:
-                html_content = f.read()
-            
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            for script in soup(["script", "style", "meta", "link", "noscript"]):
-                script.decompose()
-            
-            text = soup.get_text(separator='\n', strip=True)
-            
-            if text:
-                self.logger.info(f"Successfully extracted {len(text)} characters from HTML")
-                return text, 1.0
-            else:
-                self.logger.warning("No text found in HTML document")
-                return None, 0.0
-                
-        except Exception as e:
-            self.logger.error(f"Error processing HTML {html_path}: {str(e)}")
-            return None, 0.0
-
-    def _process_eml(self, eml_path):
-        """
-        Extract text from EML (email) files.
-        Common format for forwarded medical records and referrals.
-        """
-        try:
-            with open(eml_path, 'rb') as f:
-                msg = email.message_from_binary_file(f, policy=policy.default)
-            
-            text_parts = []
-            
-            if msg['subject']:
-                text_parts.append(f"Subject: {msg['subject']}")
-            if msg['from']:
-                text_parts.append(f"From: {msg['from']}")
-            if msg['date']:
-                text_parts.append(f"Date: {msg['date']}")
-            
-            text_parts.append("")
-            
-            if msg.is_multipart():
-                for part in msg.walk():
-                    content_type = part.get_content_type()
-                    if content_type == 'text/plain':
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            charset = part.get_content_charset() or 'utf-8'
-                            text_parts.append(payload.decode(charset, errors='ignore'))
-                    elif content_type == 'text/html' and BS4_AVAILABLE:
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            charset = part.get_content_charset() or 'utf-8'
-                            html_content = payload.decode(charset, errors='ignore')
-                            soup = BeautifulSoup(html_content, 'html.parser')
-                            for script in soup(["script", "style"]):
-                                script.decompose()
-                            text_parts.append(soup.get_text(separator='\n', strip=True))
-            else:
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    charset = msg.get_content_charset() or 'utf-8'
-                    text_parts.append(payload.decode(charset, errors='ignore'))
-            
-            combined_text = '\n'.join(text_parts).strip()
-            
-            if combined_text:
-                self.logger.info(f"Successfully extracted {len(combined_text)} characters from EML")
-                return combined_text, 1.0
-            else:
-                self.logger.warning("No text found in EML document")
-                return None, 0.0
-                
-        except Exception as e:
-            self.logger.error(f"Error processing EML {eml_path}: {str(e)}")
-            return None, 0.0
-
     def reprocess_document(self, document_id):
         """Reprocess an existing document"""
         return self.process_document(document_id)
@@ -932,17 +671,19 @@ class OCRProcessor:
     def process_documents_batch(self, document_ids, max_workers=None, progress_callback=None):
         """
         Process multiple documents in parallel using ThreadPoolExecutor.
-        Each thread gets its own Flask app context and session for safe database access.
+        Worker threads only extract and PHI-filter text; results stream back to
+        this (coordinating) thread, which writes them in batched transactions
+        (ocr/batch_writer.py: OCR_DB_BATCH_SIZE documents or OCR_DB_FLUSH_SECONDS).
         
         TIMEOUT HANDLING: Uses a response-time circuit breaker that ensures this function
         returns within OCR_TIMEOUT_SECONDS (default 10s) even if some documents stall.
+        Results of stalled documents that finish after the batch returned are not saved.
         
         NOTE: For production PHI workloads requiring true task cancellation, use RQ
         async processing (services/async_processing.py) which has proper job_timeout
         that can terminate hung workers. This synchronous batch method is suitable for:
         - Development/testing scenarios
         - Small batches where response time is acceptable
-        - Cases where background completion of stalled tasks is acceptable
         
         Args:
             document_ids: List of document IDs to process
@@ -956,10 +697,11 @@ class OCRProcessor:
         # Use configurable worker count
         if max_workers is None:
             max_workers = get_ocr_max_workers()
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        from app import app, db
-        from sqlalchemy.orm import scoped_session, sessionmaker
+        from concurrent.futures import ThreadPoolExecutor
+        from app import get_app, db
+        from ocr.batch_writer import BatchResultWriter
         import time
+        app = get_app()  # resolved here: worker threads have no app context
         
         results = {
             'total': len(document_ids),
@@ -973,78 +715,87 @@ class OCRProcessor:
         
         self.logger.info(f"Starting parallel OCR processing of {len(document_ids)} documents with {max_workers} workers")
         
-        def process_single_with_isolated_session(doc_id):
-            """Worker function with isolated session for thread-safe database access"""
-            with app.app_context():
-                try:
-                    thread_session = scoped_session(sessionmaker(bind=db.engine))
-                    try:
-                        success = self._process_document_with_session(doc_id, thread_session)
-                        return (doc_id, success, None)
-                    finally:
-                        thread_session.remove()
-                except Exception as e:
-                    return (doc_id, False, str(e))
-        
-        processed_count = 0
-        timeout_seconds = get_ocr_timeout_seconds()
-        timed_out_docs = []
-        
-        from concurrent.futures import wait, FIRST_COMPLETED
+        def record_outcomes(outcomes):
+            for doc_id, error in outcomes:
+                if error is None:
+                    results['successful'].append(doc_id)
+                else:
+                    results['failed'].append({'document_id': doc_id, 'error': error})
         
-        # Use executor without context manager to allow non-blocking shutdown on timeout
-        executor = ThreadPoolExecutor(max_workers=max_workers)
-        try:
-            future_to_doc = {executor.submit(process_single_with_isolated_session, doc_id): doc_id for doc_id in document_ids}
-            pending = set(future_to_doc.keys())
+        with app.app_context():
+            # One query for every worker's input; workers never touch the database
+            file_paths = dict(
+                db.session.query(Document.id, Document.file_path).filter(Document.id.in_(document_ids)).all()
+            )
+            db.session.rollback()  # release the connection while OCR runs
             
-            while pending:
-                # Wait for at least one future to complete OR timeout
-                done, pending = wait(pending, timeout=timeout_seconds, return_when=FIRST_COMPLETED)
+            def extract_single(doc_id):
+                """Worker function: extraction and PHI filtering only"""
+                if doc_id not in file_paths:
+                    return (doc_id, None, 'Document not found')
+                with app.app_context():
+                    try:
+                        return (doc_id, self._extract_document_result(doc_id, file_paths[doc_id]), None)
+                    except Exception as e:
+                        return (doc_id, None, str(e))
+            
+            writer = BatchResultWriter(db.session, Document, self._apply_document_result)
+            processed_count = 0
+            timeout_seconds = get_ocr_timeout_seconds()
+            timed_out_docs = []
+            
+            from concurrent.futures import wait, FIRST_COMPLETED
+            
+            # Use executor without context manager to allow non-blocking shutdown on timeout
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            try:
+                future_to_doc = {executor.submit(extract_single, doc_id): doc_id for doc_id in document_ids}
+                pending = set(future_to_doc.keys())
                 
-                # Handle completed futures
-                for future in done:
-                    doc_id = future_to_doc[future]
-                    processed_count += 1
+                while pending:
+                    # Wait for at least one future to complete OR timeout
+                    done, pending = wait(pending, timeout=timeout_seconds, return_when=FIRST_COMPLETED)
                     
-                    try:
-                        result_doc_id, success, error = future.result()
+                    # Handle completed futures
+                    for future in done:
+                        doc_id = future_to_doc[future]
+                        processed_count += 1
                         
-                        if success:
-                            results['successful'].append(result_doc_id)
+                        try:
+                            result_doc_id, result, error = future.result()
+                        except Exception as e:
+                            result_doc_id, result, error = doc_id, None, str(e)
+                        
+                        if result is not None:
+                            record_outcomes(writer.add(result_doc_id, result))
                         else:
                             results['failed'].append({
                                 'document_id': result_doc_id,
                                 'error': error or 'Processing failed'
                             })
-                            
-                    except Exception as e:
-                        results['failed'].append({
-                            'document_id': doc_id,
-                            'error': str(e)
-                        })
+                        
+                        if progress_callback:
+                            try:
+                                progress_callback(processed_count, len(document_ids), doc_id)
+                            except Exception:
+                                pass
                     
-                    if progress_callback:
-                        try:
-                            progress_callback(processed_count, len(document_ids), doc_id)
-                        except Exception:
-                            pass
-                
-                # If nothing completed and we still have pending, batch timeout was hit
-                if not done and pending:
-                    for future in pending:
-                        doc_id = future_to_doc[future]
-                        timed_out_docs.append(doc_id)
-                        results['failed'].append({
-                            'document_id': doc_id,
-                            'error': f'OCR timeout after {timeout_seconds}s (circuit breaker)'
-                        })
-                        self.logger.warning(f"Document {doc_id} exceeded timeout of {timeout_seconds}s")
-                    break
-        finally:
-            # Non-blocking shutdown: don't wait for stalled workers, let them complete in background
-            # This ensures the batch returns promptly even if some OCR tasks are hung
-            executor.shutdown(wait=False, cancel_futures=True)
+                    # If nothing completed and we still have pending, batch timeout was hit
+                    if not done and pending:
+                        for future in pending:
+                            doc_id = future_to_doc[future]
+                            timed_out_docs.append(doc_id)
+                            results['failed'].append({
+                                'document_id': doc_id,
+                                'error': f'OCR timeout after {timeout_seconds}s (circuit breaker)'
+                            })
+                            self.logger.warning(f"Document {doc_id} exceeded timeout of {timeout_seconds}s")
+                        break
+            finally:
+                # Non-blocking shutdown: don't wait for stalled workers, let them complete in background
+                # This ensures the batch returns promptly even if some OCR tasks are hung
+                executor.shutdown(wait=False, cancel_futures=True)
+                record_outcomes(writer.close())
         
         if timed_out_docs:
             results['timed_out'] = timed_out_docs
@@ -1053,45 +804,35 @@ class OCRProcessor:
         results['end_time'] = time.time()
         results['duration_seconds'] = results['end_time'] - results['start_time']
         results['docs_per_second'] = len(document_ids) / results['duration_seconds'] if results['duration_seconds'] > 0 else 0
+        results['db_batches'] = writer.stats['batches']
         
         self.logger.info(
             f"Parallel OCR complete: {len(results['successful'])}/{len(document_ids)} successful, "
-            f"{results['docs_per_second']:.2f} docs/sec"
+            f"{results['docs_per_second']:.2f} docs/sec, {writer.stats['batches']} database batches"
         )
         
         return results
     
-    def _process_document_with_session(self, document_id, session):
+    def _extract_document_result(self, document_id, file_path):
         """
-        Internal document processing with explicit session for thread safety.
-        Used by parallel batch processing.
+        Extraction half of batch processing, run in a worker thread (no database access).
+        Returns {'text', 'confidence'}, or None when no text was extracted.
         """
-        document = session.query(Document).get(document_id)
-        if not document:
-            self.logger.error(f"Document {document_id} not found")
-            return False
-
-        try:
-            ocr_text, confidence = self._extract_text(document.file_path)
-
-            if ocr_text:
-                filtered_text = self.phi_filter.filter_phi(ocr_text)
-                document.ocr_text = filtered_text
-                document.content = filtered_text
-                document.ocr_confidence = confidence
-                document.phi_filtered = True
-                document.processed_at = datetime.utcnow()
-                session.commit()
-                self.logger.info(f"Successfully processed document {document_id} with confidence {confidence:.2f}")
-                return True
-            else:
-                self.logger.warning(f"No text extracted from document {document_id}")
-                return False
-
-        except Exception as e:
-            self.logger.error(f"Error processing document {document_id}: {str(e)}")
-            session.rollback()
-            return False
+        ocr_text, confidence = self._extract_text(file_path)
+        if not ocr_text:
+            self.logger.warning(f"No text extracted from document {document_id}")
+            return None
+        return {'text': self.phi_filter.filter_phi(ocr_text), 'confidence': confidence}
+    
+    def _apply_document_result(self, document, result):
+        """Write half of batch processing, run by BatchResultWriter on the coordinating thread"""
+        document.ocr_text = result['text']
+        document.content = result['text']
+        document.ocr_confidence = result['confidence']
+        document.phi_filtered = True
+        document.processed_at = datetime.utcnow()
+        self.logger.info(f"Successfully processed document {document.id} with confidence {result['confidence']:.2f}")
+        return None
     
     def process_documents_batch_with_screening_update(self, document_ids, max_workers=None, progress_callback=None):
         """
@@ -1103,7 +844,8 @@ class OCRProcessor:
         Args:
             max_workers: None = auto-detect from OCR_MAX_WORKERS env var or CPU cores
         """
-        from app import app
+        from app import get_app
+        app = get_app()
         
         # max_workers=None will trigger auto-detection in process_documents_batch
         results = self.process_documents_batch(document_ids, max_workers, progress_callback)
@@ -1166,57 +908,47 @@ class OCRProcessor:
         if max_workers is None:
             max_workers = get_ocr_max_workers()
         
-        # Use secure temp directory for HIPAA-compliant cleanup
-        from utils.secure_delete import secure_temp_directory
-        
-        with secure_temp_directory(prefix='healthprep_pdf_parallel_') as temp_dir:
-            try:
-                images = pdf2image.convert_from_path(pdf_path)
-                
-                if len(images) <= 2:
-                    return self._process_pdf(pdf_path)
-                
-                self.logger.info(f"Processing {len(images)} PDF pages in parallel")
-                
-                image_paths = []
-                for i, image in enumerate(images):
-                    image_path = os.path.join(temp_dir, f"page_{i}.png")
-                    image.save(image_path, 'PNG')
-                    image_paths.append((i, image_path))
-                
-                page_results = {}
-                
-                def process_page(args):
-                    page_num, image_path = args
-                    text, confidence = self._process_image(image_path)
-                    return (page_num, text, confidence)
-                
-                with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    futures = {executor.submit(process_page, args): args[0] for args in image_paths}
-                    
-                    for future in as_completed(futures):
-                        try:
-                            page_num, text, confidence = future.result()
-                            page_results[page_num] = (text, confidence)
-                        except Exception as e:
-                            page_num = futures[future]
-                            self.logger.error(f"Error processing page {page_num}: {str(e)}")
-                            page_results[page_num] = ('', 0.0)
-                
-                all_text = []
-                confidences = []
-                for i in range(len(images)):
-                    text, confidence = page_results.get(i, ('', 0.0))
-                    if text:
-                        all_text.append(text)
-                        confidences.append(confidence)
-                
-                combined_text = '\n'.join(all_text)
-                avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
-                
-                return combined_text, avg_confidence
-                # secure_temp_directory handles verified secure deletion on exit
+        # Page images stay in memory (pdf2image parses pdftoppm output from its pipe)
+        try:
+            images = pdf2image.convert_from_path(pdf_path)
+            
+            if len(images) <= 2:
+                return self._process_pdf(pdf_path)
+            
+            self.logger.info(f"Processing {len(images)} PDF pages in parallel")
+            
+            page_results = {}
+            
+            def process_page(args):
+                page_num, image = args
+                text, confidence = self._ocr_image(image, f"page {page_num}")
+                return (page_num, text, confidence)
+            
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(process_page, args): args[0] for args in enumerate(images)}
                 
-            except Exception as e:
-                self.logger.error(f"Error in parallel PDF processing: {str(e)}")
-                return self._process_pdf(pdf_path)
\ No newline at end of file
+                for future in as_completed(futures):
+                    try:
+                        page_num, text, confidence = future.result()
+                        page_results[page_num] = (text, confidence)
+                    except Exception as e:
+                        page_num = futures[future]
+                        self.logger.error(f"Error processing page {page_num}: {str(e)}")
+                        page_results[page_num] = ('', 0.0)
+            
+            all_text = []
+            confidences = []
+            for i in range(len(images)):
+                text, confidence = page_results.get(i, ('', 0.0))
+                if text:
+                    all_text.append(text)
+                    confidences.append(confidence)
+            
+            combined_text = '\n'.join(all_text)
+            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+            
+            return combined_text, avg_confidence
+            
+        except Exception as e:
+            self.logger.error(f"Error in parallel PDF processing: {str(e)}")
+            return self._process_pdf(pdf_path)
\ No newline at end of file
@@ -0,0 +1,556 @@
+"""
+Streaming text extraction for DOCX, HTML, RTF, EML and plain text documents
+
+PERFORMANCE: OCRProcessor._process_docx/_process_html/_process_eml/_process_rtf
+and DocumentProcessor._extract_from_docx/_extract_from_html read each file
+into one string, built a complete parse tree (python-docx, BeautifulSoup,
+striprtf) and then a list of every text fragment before joining it. A large
+email export was held as raw bytes, as a parsed message, as decoded parts and
+as the joined result at the same time, and its attachments were dropped.
+
+Each format here is a generator that reads its input in
+STREAM_EXTRACT_CHUNK_BYTES pieces and yields text fragments as soon as they
+are complete:
+
+    docx    word/document.xml streamed out of the zip with iterparse;
+            paragraphs in document order, table rows as 'cell | cell'
+    html    html.parser fed chunk by chunk; script/style/noscript skipped
+    rtf     control-word tokenizer over the chunks (group stack, ignorable
+            destinations, \\'hh and \\uN escapes)
+    eml     at most EML_MAX_BYTES of the message are parsed; the email
+            package holds the MIME tree of what is read, about three times
+            its raw size at peak. Headers, then the body parts one
+            at a time, each released once extracted. Attachments go back
+            through the same dispatcher, EML_ATTACHMENT_MAX_DEPTH levels deep
+            (forwarded messages count as a level); their encoded size is
+            checked against EML_ATTACHMENT_MAX_BYTES before decoding. Other
+            types such as PDF and images are written to a secure temp file
+            for the caller's extractor
+    txt     incremental UTF-8 decode
+
+StreamingExtraction.extract() stops reading once STREAM_EXTRACT_MAX_CHARS
+characters have been collected, so the PHI filter and the keyword matcher
+receive at most that much text per document whatever the size of the file.
+The PHI filter still runs over the collected text as a whole: its patterns
+may span line breaks, so filtering fragment by fragment could miss a match.
+"""
+
+import codecs
+import io
+import logging
+import mimetypes
+import os
+import re
+import zipfile
+from email import policy
+from email.parser import BytesFeedParser
+from html.parser import HTMLParser
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple, Union
+from xml.etree import ElementTree
+
+logger = logging.getLogger(__name__)
+
+STREAM_EXTENSIONS = frozenset({'.docx', '.html', '.htm', '.rtf', '.eml', '.txt'})
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+def get_stream_max_chars() -> int:
+    """STREAM_EXTRACT_MAX_CHARS environment variable, default 2,000,000 characters per document"""
+    return _env_int('STREAM_EXTRACT_MAX_CHARS', 2_000_000)
+
+
+def get_stream_chunk_bytes() -> int:
+    """STREAM_EXTRACT_CHUNK_BYTES environment variable, default 64 KiB per read"""
+    return _env_int('STREAM_EXTRACT_CHUNK_BYTES', 64 * 1024)
+
+
+def get_eml_attachment_max_depth() -> int:
+    """EML_ATTACHMENT_MAX_DEPTH environment variable, default 2 levels of nested attachments"""
+    try:
+        return max(0, int(os.environ.get('EML_ATTACHMENT_MAX_DEPTH', 2)))
+    except ValueError:
+        return 2
+
+
+def get_eml_max_bytes() -> int:
+    """EML_MAX_BYTES environment variable, default 25 MB of raw message parsed per email"""
+    return _env_int('EML_MAX_BYTES', 25 * 1024 * 1024)
+
+
+def get_eml_attachment_max_bytes() -> int:
+    """EML_ATTACHMENT_MAX_BYTES environment variable, default 25 MB per decoded attachment"""
+    return _env_int('EML_ATTACHMENT_MAX_BYTES', 25 * 1024 * 1024)
+
+
+def _read_chunks(fileobj: BinaryIO, chunk_bytes: int) -> Iterator[bytes]:
+    while True:
+        chunk = fileobj.read(chunk_bytes)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _decode_chunks(fileobj: BinaryIO, chunk_bytes: int, encoding: str = 'utf-8') -> Iterator[str]:
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='ignore')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    for chunk in _read_chunks(fileobj, chunk_bytes):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+# --- DOCX -------------------------------------------------------------------
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_P, _W_R, _W_T, _W_TAB, _W_BR, _W_CR = (_W + t for t in ('p', 'r', 't', 'tab', 'br', 'cr'))
+_W_TR, _W_TC, _W_TBL = _W + 'tr', _W + 'tc', _W + 'tbl'
+
+
+def iter_docx_text(fileobj: BinaryIO) -> Iterator[str]:
+    """Paragraphs and table rows of a .docx, one line each, in document order"""
+    paragraphs = []  # open w:p elements (text boxes nest them)
+    cells = []       # open w:tc elements -> their paragraph texts
+    rows = []        # open w:tr elements -> their cell texts
+    in_run = 0
+
+    with zipfile.ZipFile(fileobj) as archive, archive.open('word/document.xml') as xml:
+        for event, elem in ElementTree.iterparse(xml, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == _W_P:
+                    paragraphs.append([])
+                elif tag == _W_R:
+                    in_run += 1
+                elif tag == _W_TC:
+                    cells.append([])
+                elif tag == _W_TR:
+                    rows.append([])
+                continue
+
+            if tag == _W_T:
+                if paragraphs and elem.text:
+                    paragraphs[-1].append(elem.text)
+            elif tag == _W_R:
+                in_run -= 1
+            elif in_run and tag == _W_TAB:  # w:tab outside a run is a tab stop definition
+                if paragraphs:
+                    paragraphs[-1].append('\t')
+            elif in_run and tag in (_W_BR, _W_CR):
+                if paragraphs:
+                    paragraphs[-1].append('\n')
+            elif tag == _W_P:
+                text = ''.join(paragraphs.pop()).strip()
+                elem.clear()
+                if not text:
+                    continue
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    yield text + '\n'
+            elif tag == _W_TC:
+                text = '\n'.join(cells.pop()).strip()
+                if text and rows:
+                    rows[-1].append(text)
+            elif tag == _W_TR:
+                row = rows.pop()
+                elem.clear()
+                if not row:
+                    continue
+                line = ' | '.join(row)
+                if cells:  # nested table
+                    cells[-1].append(line)
+                else:
+                    yield line + '\n'
+            elif tag == _W_TBL:
+                elem.clear()
+
+
+# --- HTML -------------------------------------------------------------------
+
+class _HTMLTextStream(HTMLParser):
+    """Collects stripped text nodes outside script/style/noscript until drained"""
+
+    SKIP_TAGS = frozenset({'script', 'style', 'noscript', 'template'})
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pending = []
+        self._node = []  # a text node may arrive in several handle_data calls
+        self._skip_depth = 0
+
+    def _end_node(self):
+        if self._node:
+            text = ''.join(self._node).strip()
+            self._node = []
+            if text and not self._skip_depth:
+                self.pending.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._end_node()
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._end_node()
+
+    def handle_endtag(self, tag):
+        self._end_node()
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_comment(self, data):
+        self._end_node()
+
+    def handle_data(self, data):
+        self._node.append(data)
+
+    def close(self):
+        super().close()
+        self._end_node()
+
+    def drain(self) -> Optional[str]:
+        if not self.pending:
+            return None
+        text = '\n'.join(self.pending) + '\n'
+        self.pending = []
+        return text
+
+
+def iter_html_text(fileobj: BinaryIO, chunk_bytes: int = None, encoding: str = 'utf-8') -> Iterator[str]:
+    """Text nodes of an HTML document, one per line"""
+    parser = _HTMLTextStream()
+    for text in _decode_chunks(fileobj, chunk_bytes or get_stream_chunk_bytes(), encoding):
+        parser.feed(text)
+        drained = parser.drain()
+        if drained:
+            yield drained
+    parser.close()
+    drained = parser.drain()
+    if drained:
+        yield drained
+
+
+# --- RTF --------------------------------------------------------------------
+
+_RTF_TOKEN = re.compile(
+    r"\\([a-zA-Z]+)(-?\d+)? ?"      # control word
+    r"|\\'([0-9a-fA-F]{2})"          # hex escape
+    r"|\\(.)"                        # control symbol
+    r"|([{}])"                       # group
+    r"|[\r\n]+"                      # raw line breaks carry no text
+    r"|([^\\{}\r\n]+)",              # text
+    re.S
+)
+_RTF_TOKEN_LOOKAHEAD = 64  # longest control word kept back for the next chunk
+
+_RTF_DESTINATIONS = frozenset({
+    'aftncn', 'aftnsep', 'aftnsepc', 'annotation', 'atnauthor', 'atndate', 'atnicn', 'atnid',
+    'atnparent', 'atnref', 'atntime', 'atrfend', 'atrfstart', 'author', 'background', 'bkmkend',
+    'bkmkstart', 'buptim', 'category', 'colorschememapping', 'colortbl', 'comment', 'company',
+    'creatim', 'datastore', 'doccomm', 'docvar', 'fldinst', 'fonttbl', 'footer', 'footerf',
+    'footerl', 'footerr', 'footnote', 'ftncn', 'ftnsep', 'ftnsepc', 'generator', 'header',
+    'headerf', 'headerl', 'headerr', 'info', 'keywords', 'latentstyles', 'listoverridetable',
+    'listtable', 'nonshppict', 'objdata', 'object', 'operator', 'pgdsctbl', 'pict', 'printim',
+    'private', 'revtbl', 'revtim', 'rsidtbl', 'rxe', 'shppict', 'stylesheet', 'subject',
+    'themedata', 'title', 'txe', 'userprops', 'xe', 'xmlnstbl',
+})
+_RTF_SPECIAL = {
+    'par': '\n', 'line': '\n', 'sect': '\n', 'page': '\n', 'row': '\n', 'cell': '\t', 'tab': '\t',
+    'emdash': '\u2014', 'endash': '\u2013', 'emspace': ' ', 'enspace': ' ', 'qmspace': ' ',
+    'bullet': '\u2022', 'lquote': '\u2018', 'rquote': '\u2019', 'ldblquote': '\u201c',
+    'rdblquote': '\u201d',
+}
+_RTF_SYMBOLS = {'\\': '\\', '{': '{', '}': '}', '~': '\u00a0', '_': '-', '\r': '\n', '\n': '\n'}
+
+
+def iter_rtf_text(fileobj: BinaryIO, chunk_bytes: int = None) -> Iterator[str]:
+    """Plain text of an RTF document (the striprtf rules, applied chunk by chunk)"""
+    stack = []            # (ignorable, uc) of the enclosing groups
+    ignorable = False
+    uc = 1                # characters to skip after a \uN escape
+    skip = 0
+    buffer = ''
+
+    for text, final in _with_final(_decode_chunks(fileobj, chunk_bytes or get_stream_chunk_bytes())):
+        buffer += text
+        out = []
+        pos, end = 0, len(buffer)
+        while pos < end:
+            if not final and end - pos < _RTF_TOKEN_LOOKAHEAD:
+                break
+            match = _RTF_TOKEN.match(buffer, pos)
+            if match is None:
+                pos += 1
+                continue
+            pos = match.end()
+            word, arg, hex_code, symbol, brace, plain = match.groups()
+
+            if brace == '{':
+                skip = 0
+                stack.append((ignorable, uc))
+            elif brace == '}':
+                skip = 0
+                if stack:
+                    ignorable, uc = stack.pop()
+            elif word is not None:
+                skip = 0
+                if word in _RTF_DESTINATIONS:
+                    ignorable = True
+                elif ignorable:
+                    pass
+                elif word == 'uc':
+                    uc = int(arg) if arg else 1
+                elif word == 'u' and arg:
+                    code = int(arg)
+                    out.append(chr(code + 0x10000 if code < 0 else code))
+                    skip = uc
+                elif word in _RTF_SPECIAL:
+                    out.append(_RTF_SPECIAL[word])
+            elif hex_code is not None:
+                if skip:
+                    skip -= 1
+                elif not ignorable:
+                    out.append(bytes.fromhex(hex_code).decode('cp1252', errors='ignore'))
+            elif symbol is not None:
+                skip = 0
+                if symbol == '*':
+                    ignorable = True
+                elif not ignorable and symbol in _RTF_SYMBOLS:
+                    out.append(_RTF_SYMBOLS[symbol])
+            elif plain is not None:
+                if skip:
+                    dropped = min(skip, len(plain))
+                    plain = plain[dropped:]
+                    skip -= dropped
+                if plain and not ignorable:
+                    out.append(plain)
+        buffer = buffer[pos:]
+        if out:
+            yield ''.join(out)
+
+
+def _with_final(iterable):
+    """(item, is_last) pairs; a trailing ('', True) marks the end of an empty or exhausted input"""
+    iterator = iter(iterable)
+    previous = next(iterator, None)
+    while previous is not None:
+        current = next(iterator, None)
+        yield previous, current is None
+        previous = current
+    yield '', True
+
+
+# --- Dispatcher and EML -----------------------------------------------------
+
+Source = Union[str, bytes, BinaryIO]
+FileExtractor = Callable[[str], Tuple[Optional[str], float]]
+
+
+class StreamingExtraction:
+    """
+    One document's extraction: the dispatcher, the character cap and the
+    attachment depth limit.
+
+    extract_file(path) -> (text, confidence) handles attachment types this
+    module cannot stream (PDF, images, .doc); pass the processor's own
+    extractor. The result's confidence is the lowest confidence of any
+    attachment that contributed text, otherwise 1.0.
+    """
+
+    def __init__(self, extract_file: Optional[FileExtractor] = None, max_chars: int = None,
+                 max_depth: int = None, max_attachment_bytes: int = None, chunk_bytes: int = None,
+                 max_eml_bytes: int = None):
+        self.extract_file = extract_file
+        self.max_chars = max_chars or get_stream_max_chars()
+        self.max_depth = get_eml_attachment_max_depth() if max_depth is None else max_depth
+        self.max_attachment_bytes = max_attachment_bytes or get_eml_attachment_max_bytes()
+        self.max_eml_bytes = max_eml_bytes or get_eml_max_bytes()
+        self.chunk_bytes = chunk_bytes or get_stream_chunk_bytes()
+        self.confidence = 1.0
+        self.truncated = False
+        self.attachments = 0
+
+    def extract(self, source: Source, ext: str) -> Tuple[Optional[str], float]:
+        """Collect up to max_chars of the document's text; (None, 0.0) if it has none"""
+        parts, total = [], 0
+        chunks = self.iter_text(source, ext.lower())
+        try:
+            for chunk in chunks:
+                if total + len(chunk) > self.max_chars:
+                    parts.append(chunk[:self.max_chars - total])
+                    self.truncated = True
+                    break
+                parts.append(chunk)
+                total += len(chunk)
+        finally:
+            chunks.close()  # closes the file of a truncated document
+
+        if self.truncated:
+            logger.warning(f"{ext} text truncated at {self.max_chars} characters (STREAM_EXTRACT_MAX_CHARS)")
+        text = ''.join(parts).strip()
+        if not text:
+            return None, 0.0
+        return text, self.confidence
+
+    def iter_text(self, source: Source, ext: str, depth: int = 0) -> Iterator[str]:
+        """Text fragments of a document; extensions outside STREAM_EXTENSIONS go to extract_file"""
+        if ext not in STREAM_EXTENSIONS:
+            yield from self._extract_other(source, ext)
+            return
+
+        if isinstance(source, str):
+            with open(source, 'rb') as fileobj:
+                yield from self._iter_stream(fileobj, ext, depth)
+        elif isinstance(source, (bytes, bytearray)):
+            yield from self._iter_stream(io.BytesIO(source), ext, depth)
+        else:
+            yield from self._iter_stream(source, ext, depth)
+
+    def _iter_stream(self, fileobj: BinaryIO, ext: str, depth: int) -> Iterator[str]:
+        if ext == '.docx':
+            yield from iter_docx_text(fileobj)
+        elif ext in ('.html', '.htm'):
+            yield from iter_html_text(fileobj, self.chunk_bytes)
+        elif ext == '.rtf':
+            yield from iter_rtf_text(fileobj, self.chunk_bytes)
+        elif ext == '.eml':
+            yield from self._iter_eml(fileobj, depth)
+        else:
+            yield from _decode_chunks(fileobj, self.chunk_bytes)
+
+    def _extract_other(self, source: Source, ext: str) -> Iterator[str]:
+        if self.extract_file is None:
+            logger.info(f"No extractor for {ext or 'untyped'} attachment, skipped")
+            return
+        if isinstance(source, str):
+            text, confidence = self.extract_file(source)
+        else:
+            from utils.secure_delete import secure_temp_directory
+            with secure_temp_directory(prefix='healthprep_attach_') as temp_dir:
+                # Generic name: the attachment's own filename may carry PHI
+                path = os.path.join(temp_dir, f'attachment{ext}')
+                with open(path, 'wb') as f:
+                    if isinstance(source, (bytes, bytearray)):
+                        f.write(source)
+                    else:
+                        for chunk in _read_chunks(source, self.chunk_bytes):
+                            f.write(chunk)
+                if not isinstance(source, (bytes, bytearray)):
+                    source.close()  # frees an in-memory attachment; it lives in the temp file now
+                text, confidence = self.extract_file(path)
+        if text:
+            self.confidence = min(self.confidence, confidence)
+            yield text + '\n'
+
+    def _iter_eml(self, fileobj: BinaryIO, depth: int) -> Iterator[str]:
+        parser = BytesFeedParser(policy=policy.default)
+        read = 0
+        for chunk in _read_chunks(fileobj, self.chunk_bytes):
+            if read + len(chunk) > self.max_eml_bytes:
+                # Parse what fits: headers and body come first, trailing attachments are cut
+                parser.feed(chunk[:self.max_eml_bytes - read])
+                self.truncated = True
+                logger.warning(f"EML parsed up to {self.max_eml_bytes} bytes (EML_MAX_BYTES); the rest is skipped")
+                break
+            parser.feed(chunk)
+            read += len(chunk)
+        msg = parser.close()
+        del parser
+        yield from self._iter_message(msg, depth)
+
+    def _iter_message(self, msg, depth: int) -> Iterator[str]:
+        headers = [f"{name}: {msg[name]}" for name in ('Subject', 'From', 'Date') if msg[name]]
+        if headers:
+            yield '\n'.join(headers) + '\n\n'
+        yield from self._iter_part(msg, depth)
+
+    def _iter_part(self, part, depth: int) -> Iterator[str]:
+        content_type = part.get_content_type()
+
+        if content_type == 'message/rfc822':
+            if depth >= self.max_depth:
+                logger.info(f"Forwarded message skipped at attachment depth {depth} (EML_ATTACHMENT_MAX_DEPTH)")
+                return
+            for inner in part.get_payload():
+                yield from self._iter_message(inner, depth + 1)
+            return
+
+        if part.is_multipart():
+            subparts = list(part.iter_parts())
+            if content_type == 'multipart/alternative':
+                # Same body in several formats: keep the plain text one if there is one
+                plain = [p for p in subparts if p.get_content_type() == 'text/plain']
+                subparts = plain[:1] or subparts[:1]
+            for subpart in subparts:
+                yield from self._iter_part(subpart, depth)
+            return
+
+        if part.is_attachment():
+            yield from self._iter_attachment(part, depth)
+            return
+
+        if content_type not in ('text/plain', 'text/html'):
+            part.set_payload('')  # inline images and other decorations
+            return
+        stream = self._take_payload(part)
+        if stream is None:
+            return
+        charset = part.get_content_charset() or 'utf-8'
+        if content_type == 'text/html':
+            yield from iter_html_text(stream, self.chunk_bytes, charset)
+        else:
+            yield from _decode_chunks(stream, self.chunk_bytes, charset)
+        yield '\n'
+
+    def _take_payload(self, part) -> Optional[BinaryIO]:
+        """
+        The decoded payload as a stream, or None if it is empty or over
+        EML_ATTACHMENT_MAX_BYTES. The encoded copy in the message tree is
+        released, and the size is checked before anything is decoded.
+        """
+        encoded = part.get_payload()
+        if not isinstance(encoded, str) or not encoded:
+            return None
+        estimated = len(encoded)
+        if str(part.get('Content-Transfer-Encoding', '')).strip().lower() == 'base64':
+            estimated = estimated * 3 // 4
+        del encoded
+        if estimated > self.max_attachment_bytes:
+            part.set_payload('')
+            logger.warning(f"{part.get_content_type()} part of about {estimated} bytes skipped "
+                           f"(EML_ATTACHMENT_MAX_BYTES {self.max_attachment_bytes})")
+            return None
+        payload = part.get_payload(decode=True)
+        part.set_payload('')
+        return io.BytesIO(payload) if payload else None
+
+    def _iter_attachment(self, part, depth: int) -> Iterator[str]:
+        if depth >= self.max_depth:
+            part.set_payload('')
+            logger.info(f"Attachment skipped at depth {depth} (EML_ATTACHMENT_MAX_DEPTH)")
+            return
+        filename = part.get_filename() or ''
+        ext = os.path.splitext(filename)[1].lower() or mimetypes.guess_extension(part.get_content_type()) or ''
+        stream = self._take_payload(part)
+        if stream is None:
+            return
+
+        self.attachments += 1
+        try:
+            yield from self.iter_text(stream, ext, depth + 1)
+        except Exception as e:
+            # One unreadable attachment does not fail the message
+            logger.warning(f"Could not extract {ext or 'untyped'} attachment: {e}")
+        # Keep the next part's text from running into this one (keyword \b matching)
+        yield '\n'
@@ -64,34 +64,46 @@ class PrepSheetFilters:
         
         return filtered_data
     
-    def _get_documents_for_category(self, patient_id, category, cutoff_date, keywords=None):
+    def _get_documents_for_category(self, patient_id, category, cutoff_date, keywords=None, include_text=False):
         """
         Get documents (both Document and FHIRDocument) for a category with date filtering.
         
+        OCR text is deferred on both models, so listing a category only loads the
+        document summary columns. Text is loaded in the same query when keyword
+        filtering needs it or the caller asks for it (include_text=True).
+        
         Args:
             patient_id: Patient ID
             category: Document category (lab, imaging, consult, hospital)
             cutoff_date: Only include documents on or after this date
             keywords: Optional list of keywords to filter by
+            include_text: Load OCR text with the rows (e.g. for lab value extraction)
             
         Returns:
             List of document-like objects (unified interface for templates)
         """
         all_docs = []
+        load_text = include_text or bool(keywords)
         
-        manual_docs = Document.query.filter_by(
+        manual_query = Document.query.filter_by(
             patient_id=patient_id,
             document_type=category
         ).filter(
             Document.document_date.isnot(None),
             Document.document_date >= cutoff_date
-        ).order_by(Document.document_date.desc()).all()
+        )
+        if load_text:
+            manual_query = manual_query.options(Document.text_loader_option())
+        manual_docs = manual_query.order_by(Document.document_date.desc()).all()
         all_docs.extend(manual_docs)
         
-        fhir_docs_query = FHIRDocument.query.filter_by(patient_id=patient_id).filter(
+        fhir_query = FHIRDocument.query.filter_by(patient_id=patient_id).filter(
             FHIRDocument.document_date.isnot(None),
             FHIRDocument.document_date >= cutoff_date
-        ).order_by(FHIRDocument.document_date.desc()).all()
+        )
+        if load_text:
+            fhir_query = fhir_query.options(FHIRDocument.text_loader_option())
+        fhir_docs_query = fhir_query.order_by(FHIRDocument.document_date.desc()).all()
         
         for fhir_doc in fhir_docs_query:
             doc_category = get_prep_sheet_category(
@@ -177,14 +189,17 @@ class PrepSheetFilters:
         """
         all_docs = []
         
-        manual_docs = Document.query.filter_by(patient_id=patient_id).all()
+        # Callers filter these by keyword, so load OCR text in the same query
+        manual_docs = Document.query.filter_by(patient_id=patient_id).options(
+            Document.text_loader_option()
+        ).all()
         all_docs.extend(manual_docs)
         
         fhir_docs = FHIRDocument.query.filter_by(
             patient_id=patient_id,
             is_healthprep_generated=False,
             is_superseded=False
-        ).all()
+        ).options(FHIRDocument.text_loader_option()).all()
         all_docs.extend(fhir_docs)
         
         return all_docs
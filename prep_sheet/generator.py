@@ -389,7 +389,7 @@ class PrepSheetGenerator:
         
         return enhanced_data
     
-    def _get_documents_by_type(self, patient_id, doc_type, cutoff_date, keywords=None):
+    def _get_documents_by_type(self, patient_id, doc_type, cutoff_date, keywords=None, include_text=False):
         """
         Get documents of specific type after cutoff date.
         
@@ -401,6 +401,7 @@ class PrepSheetGenerator:
             doc_type: Document type (lab, imaging, consult, hospital)
             cutoff_date: Date cutoff for document filtering
             keywords: Optional list of keywords to filter documents by content/title
+            include_text: Load deferred OCR text with the rows
             
         Returns:
             List of document objects (Document or FHIRDocument) matching criteria
@@ -409,7 +410,8 @@ class PrepSheetGenerator:
             patient_id, 
             doc_type, 
             cutoff_date, 
-            keywords
+            keywords,
+            include_text=include_text
         )
         
         self.logger.debug(f"Retrieved {len(documents)} documents for {doc_type} category (cutoff: {cutoff_date})")
@@ -420,7 +422,7 @@ class PrepSheetGenerator:
         """Get structured lab data (would integrate with FHIR observations)"""
         # This would pull from FHIR Observation resources in a real implementation
         # For now, return filtered document-based lab results
-        lab_docs = self._get_documents_by_type(patient_id, 'lab', cutoff_date)
+        lab_docs = self._get_documents_by_type(patient_id, 'lab', cutoff_date, include_text=True)
         
         structured_labs = []
         for doc in lab_docs:
@@ -593,8 +595,22 @@ class PrepSheetGenerator:
         return (cutoff, is_fallback) if return_fallback_info else cutoff
     
     def _get_prep_settings(self, org_id=None):
-        """Get prep sheet settings for organization"""
+        """Get prep sheet settings for organization
+        
+        PERFORMANCE: Org settings are read from the shared application cache and
+        returned as a detached, read-only PrepSheetSettings instance. Do not add
+        the returned object to the session - edit settings through admin routes.
+        """
         if org_id:
+            from utils.app_cache import get_prep_settings_values
+            try:
+                cached_values = get_prep_settings_values(org_id)
+            except Exception as e:
+                self.logger.warning(f"Prep settings cache unavailable for org_id={org_id}: {e}")
+                cached_values = None
+            if cached_values is not None:
+                return PrepSheetSettings(**cached_values)
+            
             settings = PrepSheetSettings.query.filter_by(org_id=org_id).first()
             if not settings:
                 # Create default settings for this organization
@@ -627,7 +627,7 @@ def billing_portal():
 
 def get_dashboard_data():
     """Helper function to get common dashboard data"""
-    analytics = HealthPrepAnalytics()
+    analytics = HealthPrepAnalytics(org_id=current_user.org_id)
     
     # Get dashboard statistics
     dashboard_stats = analytics.get_roi_metrics()
@@ -1299,6 +1299,7 @@ def performance_metrics_api():
                 '5min': monitor.get_throughput_metrics(300)
             },
             'scaling': monitor.get_scaling_recommendations(),
+            'fleet': monitor.get_fleet_resources(),
             'worker_recommendations': get_ocr_max_workers_recommendation(),
             'cost_control': {
                 'max_document_pages': get_max_document_pages(),
@@ -1352,6 +1353,29 @@ def performance_report_api():
         return jsonify({'error': str(e)}), 500
 
 
+@admin_bp.route('/api/query-profile')
+@login_required
+@admin_required
+def query_profile_api():
+    """
+    JSON API for the SQL query profiler (utils/query_profiler.py).
+    
+    Returns, for this worker process, the endpoints and jobs with the most
+    database time, repeated-statement fingerprints flagged as possible N+1
+    access (with the code location that issued them) and recent threshold
+    warnings. Fingerprints have literals removed and contain no PHI.
+    """
+    try:
+        from utils.query_profiler import get_query_profiler_report
+        
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        return jsonify(get_query_profiler_report(limit=limit))
+        
+    except Exception as e:
+        logger.error(f"Error in query profile API: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 # PHI settings route removed - consolidated into dashboard
 
 @admin_bp.route('/phi-test', methods=['POST'])
@@ -1855,7 +1879,7 @@ def settings():
 def analytics():
     """Advanced analytics dashboard"""
     try:
-        analytics = HealthPrepAnalytics()
+        analytics = HealthPrepAnalytics(org_id=current_user.org_id)
 
         # Get comprehensive analytics
         analytics_data = {
@@ -1879,7 +1903,7 @@ def analytics():
 def system_health():
     """System health monitoring"""
     try:
-        analytics = HealthPrepAnalytics()
+        analytics = HealthPrepAnalytics(org_id=current_user.org_id)
 
         health_data = analytics.get_roi_metrics()
 
@@ -2561,14 +2585,16 @@ def admin_documents():
         
         for patient in patients:
             # Get manual documents
-            manual_documents = Document.query.filter_by(patient_id=patient.id).all()
+            manual_documents = Document.query.filter_by(patient_id=patient.id).options(
+                Document.text_loader_option()
+            ).all()
             
             # Get FHIR documents (exclude HealthPrep-generated and superseded prep sheets)
             fhir_documents = FHIRDocument.query.filter_by(
                 patient_id=patient.id,
                 is_healthprep_generated=False,
                 is_superseded=False
-            ).all()
+            ).options(FHIRDocument.text_loader_option()).all()
             
             # Get immunizations
             immunizations = FHIRImmunization.query.filter_by(patient_id=patient.id).order_by(FHIRImmunization.administration_date.desc()).all()
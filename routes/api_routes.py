@@ -43,6 +43,41 @@ def api_health():
     })
 
 
+@api_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Prometheus exposition of fleet-wide job metrics (utils/fleet_metrics.py)
+    plus RQ queue depth. Disabled (404) unless METRICS_TOKEN is set; scrapers
+    authenticate with "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    import os
+    from flask import Response, abort
+    from utils.security import constant_time_compare
+    
+    token = os.environ.get('METRICS_TOKEN')
+    if not token:
+        abort(404)
+    
+    supplied = request.headers.get('Authorization', '')
+    if not supplied.startswith('Bearer ') or not constant_time_compare(supplied[len('Bearer '):], token):
+        return Response('Unauthorized\n', status=401, mimetype='text/plain',
+                        headers={'WWW-Authenticate': 'Bearer'})
+    
+    from utils.fleet_metrics import render_prometheus, series_key
+    from utils.performance import PerformanceMonitor
+    
+    queue = PerformanceMonitor().get_queue_metrics()
+    extra_gauges = {}
+    if 'queues' in queue:
+        extra_gauges['healthprep_rq_queue_jobs'] = ('RQ jobs by queue and state', {
+            series_key('healthprep_rq_queue_jobs', {'queue': name, 'state': state}): count
+            for name, counts in queue['queues'].items()
+            for state, count in counts.items()
+        })
+    
+    return Response(render_prometheus(extra_gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def _process_signup_request():
     """Shared signup processing logic for both /signup and /register endpoints"""
     try:
@@ -714,7 +749,7 @@ def search_api():
     try:
         query = request.args.get('q', '').strip()
         search_type = request.args.get('type', 'all')
-        limit = request.args.get('limit', 10, type=int)
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
 
         if not query:
             return jsonify({
@@ -727,6 +762,7 @@ def search_api():
             })
 
         results = {'patients': [], 'documents': [], 'screenings': []}
+        results_incomplete = False
 
         # Search patients
         if search_type in ['all', 'patients']:
@@ -749,12 +785,27 @@ def search_api():
 
         # Search documents
         if search_type in ['all', 'documents']:
-            documents = Document.query.filter(
+            # SECURITY: Filter by org_id - this also bounds the compressed text scan
+            org_documents = Document.query.filter_by(org_id=current_user.org_id)
+            documents = org_documents.filter(
                 db.or_(
                     Document.filename.contains(query),
                     Document.content.contains(query)
                 )
             ).limit(limit).all()
+            # Long content is stored compressed and is invisible to SQL LIKE
+            if len(documents) < limit:
+                from sqlalchemy.orm import undefer
+                from utils.text_compression import get_search_max_scan, scan_compressed_matches
+                compressed_matches, complete = scan_compressed_matches(
+                    org_documents.options(undefer(Document._content)),
+                    Document._content, query, limit - len(documents),
+                    text_getter=lambda d: d.content,
+                    exclude_ids=[d.id for d in documents],
+                    max_scan=get_search_max_scan()
+                )
+                documents += compressed_matches
+                results_incomplete = not complete
 
             results['documents'] = [
                 {
@@ -788,7 +839,8 @@ def search_api():
         return jsonify({
             'success': True,
             'query': query,
-            'results': results
+            'results': results,
+            'results_incomplete': results_incomplete
         })
 
     except Exception as e:
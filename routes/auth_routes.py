@@ -299,7 +299,7 @@ def login():
                     )
                     logger.warning(f"Account lockout alert sent for user {user.username}")
             
-            # SECURITY: Log failed login attempt for brute force tracking (even for nonexistent users)
+            # SECURITY: Audit failed login attempt (even for nonexistent users; written asynchronously)
             target_org_id = user.org_id if user else 0
             log_admin_event(
                 event_type='login_failed',
@@ -312,50 +312,16 @@ def login():
                 }
             )
             
-            # SECURITY: Check for brute force pattern from this IP (runs for ALL failed attempts)
-            # This catches credential stuffing with random usernames
-            SecurityAlertService.check_and_alert_brute_force(
+            # SECURITY: Brute force and password spray detection (UNIVERSAL - all environments)
+            # Runs for ALL failed attempts, so credential stuffing with random usernames
+            # is caught too. Sliding-window counters - no audit log scan per attempt;
+            # 3+ distinct usernames from one IP in 15 min blocks the IP.
+            SecurityAlertService.record_failed_login(
                 ip_address=client_ip,
+                username=form.username.data,
                 org_id=target_org_id
             )
             
-            # SECURITY: Password spray detection (UNIVERSAL - all environments)
-            # Track failed attempts by IP across different usernames
-            IPBlocklist.record_failed_attempt(client_ip, form.username.data)
-            db.session.commit()
-            
-            # Check if IP should be blocked (3+ distinct usernames failed in 15 min)
-            should_block, block_record, distinct_count = IPBlocklist.should_block_ip(client_ip)
-            if should_block:
-                # Block the IP
-                IPBlocklist.block_ip(
-                    client_ip, 
-                    f"Password spray detected: {distinct_count} distinct usernames attempted",
-                    duration_minutes=60
-                )
-                
-                # Send alert
-                SecurityAlertService.send_password_spray_alert(
-                    ip_address=client_ip,
-                    usernames_targeted=block_record.failed_usernames if block_record else [],
-                    org_id=target_org_id
-                )
-                
-                # Log the event
-                log_admin_event(
-                    event_type='password_spray_blocked',
-                    user_id=None,
-                    org_id=target_org_id,
-                    ip=client_ip,
-                    data={
-                        'usernames_targeted': block_record.failed_usernames[:10] if block_record else [],
-                        'distinct_count': distinct_count,
-                        'description': f'Password spray attack blocked: {client_ip}'
-                    }
-                )
-                
-                logger.critical(f"Password spray detected and blocked for IP: {client_ip}")
-            
             # SECURITY: Record failed attempt for IP-based rate limiting
             RateLimiter.record_attempt('login', success=False)
             flash('Invalid username or password.', 'error')
@@ -8,7 +8,9 @@ from flask_login import login_required, current_user
 from core.fuzzy_detection import FuzzyDetectionEngine
 from core.matcher import DocumentMatcher
 from core.engine import ScreeningEngine
-from models import ScreeningType, Document, db
+from core.keyword_effectiveness import get_or_request_keyword_effectiveness_report
+from services.async_processing import get_async_processing_service
+from models import ScreeningType, Document
 
 # Create blueprint
 fuzzy_bp = Blueprint('fuzzy', __name__, url_prefix='/fuzzy')
@@ -177,15 +179,29 @@ def api_optimize_keywords(screening_type_id):
         if not current_user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
         
-        # Analyze keywords using the screening engine
-        analysis = screening_engine.analyze_screening_keywords(screening_type_id)
-        
-        if not analysis:
+        screening_type = ScreeningType.query.get(screening_type_id)
+        if not screening_type:
             return jsonify({'error': 'Screening type not found'}), 404
         
+        if not screening_type.is_active:
+            # Not part of the organization report: scan this type's documents only
+            analysis = screening_engine.analyze_screening_keywords(screening_type_id)
+            return jsonify({'success': True, 'analysis': analysis})
+        
+        # Served from the offline keyword effectiveness report
+        report, job_id = get_or_request_keyword_effectiveness_report(screening_type.org_id, current_user.id)
+        if report is None:
+            return jsonify({
+                'success': True,
+                'status': 'pending',
+                'job_id': job_id,
+                'message': 'Keyword analysis is being generated; retry shortly'
+            }), 202
+        
         return jsonify({
             'success': True,
-            'analysis': analysis
+            'analysis': report['screening_types'].get(str(screening_type_id)),
+            'generated_at': report['generated_at']
         })
         
     except Exception as e:
@@ -297,15 +313,18 @@ def api_batch_optimize():
         if not current_user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
         
-        # Run optimization for all screening types
-        optimization_results = screening_engine.optimize_all_screening_keywords()
+        # Analysis and auto-applied recommendations run in the background job
+        async_service = get_async_processing_service()
+        job_id = async_service.enqueue_keyword_effectiveness_report(
+            current_user.org_id, current_user.id, apply_recommendations=True
+        )
         
         return jsonify({
             'success': True,
-            'optimization_results': optimization_results,
-            'total_screening_types': len(optimization_results),
-            'timestamp': str(db.func.current_timestamp())
-        })
+            'status': 'queued',
+            'job_id': job_id,
+            'message': 'Keyword optimization started for all active screening types'
+        }), 202
         
     except Exception as e:
         logger.error(f"Error in batch optimization: {str(e)}")
@@ -441,6 +441,7 @@ def search():
                                  query='', results={})
 
         results = {}
+        results_incomplete = False
 
         # Search patients
         if search_type in ['all', 'patients']:
@@ -452,10 +453,25 @@ def search():
 
         # Search documents
         if search_type in ['all', 'documents']:
-            results['documents'] = Document.query.filter(
+            # SECURITY: Filter by org_id - this also bounds the compressed text scan
+            org_documents = Document.query.filter_by(org_id=current_user.org_id)
+            documents = org_documents.filter(
                 Document.filename.contains(query) |
                 Document.ocr_text.contains(query)
             ).limit(10).all()
+            # Long OCR text is stored compressed and is invisible to SQL LIKE
+            if len(documents) < 10:
+                from utils.text_compression import get_search_max_scan, scan_compressed_matches
+                compressed_matches, complete = scan_compressed_matches(
+                    org_documents.options(Document.text_loader_option()),
+                    Document._ocr_text, query, 10 - len(documents),
+                    text_getter=lambda d: d.ocr_text,
+                    exclude_ids=[d.id for d in documents],
+                    max_scan=get_search_max_scan()
+                )
+                documents += compressed_matches
+                results_incomplete = not complete
+            results['documents'] = documents
 
         # Search screening types
         if search_type in ['all', 'screenings']:
@@ -466,7 +482,8 @@ def search():
 
         return render_template('search_results.html',
                              query=query, results=results,
-                             search_type=search_type)
+                             search_type=search_type,
+                             results_incomplete=results_incomplete)
 
     except Exception as e:
         logger.error(f"Error in search route: {str(e)}")
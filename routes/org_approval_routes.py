@@ -180,7 +180,7 @@ def reject_organization(org_id):
                 
                 # Archive the customer (mark as deleted in metadata, don't actually delete for audit trail)
                 logger.info(f"Archiving Stripe customer {org.stripe_customer_id} for rejected org {org_id}")
-                import stripe
+                from services.stripe_service import stripe
                 stripe.Customer.modify(
                     org.stripe_customer_id,
                     metadata={
@@ -194,6 +194,10 @@ def reject_organization(org_id):
                 logger.error(f"Error cleaning up Stripe resources for org {org_id}: {str(stripe_error)}")
         
         # CRITICAL: Reassign admin_logs to System Organization (org_id=0) for audit trail preservation
+        # Write this process's buffered audit rows first so they keep the org name; rows
+        # still buffered elsewhere are moved to org_id=0 by the audit sink on write.
+        from utils.audit_sink import flush_audit_sink
+        flush_audit_sink(timeout=10.0)
         admin_logs = AdminLog.query.filter_by(org_id=org_id).all()
         for log in admin_logs:
             log.org_id = 0  # Reassign to System Organization context
@@ -228,6 +232,10 @@ def reject_organization(org_id):
         # Delete providers before users (may have FK relationships)
         Provider.query.filter_by(org_id=org_id).delete()
         
+        # Derived analytics counters (bulk deletes above bypass their maintenance)
+        from admin.analytics_counters import delete_org_counters
+        delete_org_counters(org_id)
+        
         # Delete all users in this organization
         for user in org_users:
             db.session.delete(user)
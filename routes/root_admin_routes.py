@@ -824,12 +824,17 @@ def delete_organization(org_id):
         user_count = len(org_users)
         
         # CRITICAL: Reassign admin_logs to System Organization (org_id=0) for audit trail preservation
-        # This prevents NOT NULL constraint violation and maintains HIPAA compliance
+        # This prevents NOT NULL constraint violation and maintains HIPAA compliance.
+        # Write this process's buffered audit rows first so they keep the org name; rows
+        # still buffered elsewhere are moved to org_id=0 by the audit sink on write.
+        from utils.audit_sink import flush_audit_sink
+        flush_audit_sink(timeout=10.0)
         admin_logs = AdminLog.query.filter_by(org_id=org_id).all()
         for log in admin_logs:
             log.org_id = 0  # Reassign to System Organization context
             log.action_details = f"[ORG DELETED: {org_name}] " + (log.action_details or "")
         
+        reassigned_log_days = {log.timestamp.date() for log in admin_logs if log.timestamp}
         logger.info(f"Reassigned {len(admin_logs)} audit log entries from org {org_id} to System Organization context")
         
         # CRITICAL: Clear patient_id references in admin_logs before deleting patients
@@ -845,6 +850,11 @@ def delete_organization(org_id):
         # This ensures FK constraints are cleared before patient deletion
         db.session.commit()
         
+        # Reassigned logs moved to org 0 - rebuild the affected daily rollups on next read
+        if reassigned_log_days:
+            from admin.log_storage import invalidate_rollups
+            invalidate_rollups(reassigned_log_days)
+        
         # Delete organization-scoped data (order matters for foreign key constraints)
         # 1. User-Provider assignments (before users and providers)
         UserProviderAssignment.query.filter_by(org_id=org_id).delete()
@@ -928,6 +938,10 @@ def delete_organization(org_id):
         # 18. Epic credentials
         EpicCredentials.query.filter_by(org_id=org_id).delete()
         
+        # Derived analytics counters (bulk deletes above bypass their maintenance)
+        from admin.analytics_counters import delete_org_counters
+        delete_org_counters(org_id)
+        
         # 19. Delete all users in this organization
         for user in org_users:
             db.session.delete(user)
@@ -1540,6 +1554,44 @@ def unlock_user(user_id):
         return jsonify({'success': False, 'error': 'Error unlocking user account'}), 500
 
 
+@root_admin_bp.route('/security/ip-blocks/<path:ip_address>/unblock', methods=['POST'])
+@login_required
+@root_admin_required
+def unblock_ip(ip_address):
+    """Lift an IP block before it expires (root admin only)"""
+    try:
+        from models import IPBlocklist
+        
+        if not IPBlocklist.unblock_ip(ip_address):
+            return jsonify({
+                'success': False,
+                'error': 'This IP address is not blocked'
+            }), 400
+        
+        log_admin_event(
+            event_type='security_ip_unblock',
+            user_id=current_user.id,
+            org_id=0,  # System Organization - all root admin actions
+            ip=flask_request.remote_addr,
+            data={
+                'target_ip': ip_address,
+                'description': f'Unblocked IP address: {ip_address}'
+            }
+        )
+        
+        logger.info(f"Root admin {current_user.username} unblocked IP {ip_address}")
+        
+        return jsonify({
+            'success': True,
+            'message': f'IP address {ip_address} unblocked.'
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error unblocking IP {ip_address}: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error unblocking IP address'}), 500
+
+
 @root_admin_bp.route('/users/<int:user_id>/lockout-details', methods=['GET'])
 @login_required
 @root_admin_required
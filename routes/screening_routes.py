@@ -12,6 +12,7 @@ import os
 
 from models import ScreeningType, Screening, Patient
 from core.engine import ScreeningEngine
+from core.keyword_effectiveness import get_or_request_keyword_effectiveness_report
 from models import log_admin_event
 from forms import ScreeningTypeForm
 from app import db
@@ -102,7 +103,7 @@ def screening_list():
     """Main screening list view - provider scoped with optimized SQL queries"""
     try:
         from sqlalchemy import case, func, literal
-        from sqlalchemy.orm import joinedload, selectinload
+        from sqlalchemy.orm import joinedload
         from datetime import datetime, timedelta
         
         patient_filter = request.args.get('patient', '', type=str)
@@ -124,24 +125,15 @@ def screening_list():
             appointment_prioritization_enabled = True
             
             # Use application-level cache for priority patients (1 hour TTL)
-            # This ensures consistency across all sessions/devices for the same org
-            from utils.app_cache import get_cached_priority_patients, set_cached_priority_patients
+            # Shared across workers and invalidated on appointment changes,
+            # so all sessions/devices for the same org see the same set
+            from utils.app_cache import get_priority_patient_ids
             
-            cached_result = get_cached_priority_patients(current_user.org_id)
-            if cached_result is not None:
-                priority_patient_ids = cached_result
-                logger.debug(f"Using cached priority patients: {len(priority_patient_ids)} patients")
-            else:
-                # Refresh cache
-                try:
-                    from services.appointment_prioritization import AppointmentBasedPrioritization
-                    prioritization_service = AppointmentBasedPrioritization(current_user.org_id)
-                    priority_patient_ids = set(prioritization_service.get_priority_patients())
-                    set_cached_priority_patients(current_user.org_id, priority_patient_ids)
-                    logger.info(f"Refreshed priority patients cache: {len(priority_patient_ids)} patients")
-                except Exception as e:
-                    logger.error(f"Error getting priority patients: {str(e)}")
-                    priority_patient_ids = set()
+            try:
+                priority_patient_ids = get_priority_patient_ids(current_user.org_id)
+            except Exception as e:
+                logger.error(f"Error getting priority patients: {str(e)}")
+                priority_patient_ids = set()
         
         # Calculate dormancy cutoff based on organization's timezone
         # When non-priority processing is disabled, use local midnight for cleaner day-boundary rollover
@@ -185,16 +177,13 @@ def screening_list():
 
         # Build optimized query with eager loading to prevent N+1 queries
         # - patient, screening_type: needed for display
-        # - document_matches: for get_active_document_matches() 
-        # - fhir_documents: for get_active_fhir_documents()
-        # - immunizations: for immunization-based screenings
+        # Matched documents are rendered from the denormalized match summary on each
+        # screening row (core/match_summary.py), so no document / FHIR / immunization
+        # collections or dismissal lookups are loaded for the list
         query = get_provider_screenings(current_user, all_providers=False)
         query = query.options(
             joinedload(Screening.patient),
-            joinedload(Screening.screening_type),
-            selectinload(Screening.document_matches),
-            selectinload(Screening.fhir_documents),
-            selectinload(Screening.immunizations)
+            joinedload(Screening.screening_type)
         ).join(Patient).join(ScreeningType).filter(
             ScreeningType.is_active == True
         )
@@ -272,49 +261,18 @@ def screening_list():
         # Get paginated results using SQL LIMIT/OFFSET
         screenings = query.offset(start_idx).limit(per_page).all()
         
-        # Batch-prefetch dismissed document IDs to avoid N+1 queries in template
-        # This eliminates per-screening queries in get_active_document_matches() and get_active_fhir_documents()
+        # Rows created before the summary columns existed are summarized on first render.
+        # Commit/rollback expires the loaded rows, so reload the page afterwards (one-time cost).
         if screenings:
-            from models import DismissedDocumentMatch
-            screening_ids = [s.id for s in screenings]
-            
-            # Get all dismissed document IDs for these screenings in one query
-            dismissed_doc_query = db.session.query(
-                DismissedDocumentMatch.screening_id,
-                DismissedDocumentMatch.document_id
-            ).filter(
-                DismissedDocumentMatch.screening_id.in_(screening_ids),
-                DismissedDocumentMatch.is_active == True,
-                DismissedDocumentMatch.document_id.isnot(None)
-            ).all()
-            
-            # Get all dismissed FHIR document IDs
-            dismissed_fhir_query = db.session.query(
-                DismissedDocumentMatch.screening_id,
-                DismissedDocumentMatch.fhir_document_id
-            ).filter(
-                DismissedDocumentMatch.screening_id.in_(screening_ids),
-                DismissedDocumentMatch.is_active == True,
-                DismissedDocumentMatch.fhir_document_id.isnot(None)
-            ).all()
-            
-            # Build lookup dicts
-            dismissed_docs_by_screening = {}
-            for screening_id, doc_id in dismissed_doc_query:
-                if screening_id not in dismissed_docs_by_screening:
-                    dismissed_docs_by_screening[screening_id] = set()
-                dismissed_docs_by_screening[screening_id].add(doc_id)
-            
-            dismissed_fhir_by_screening = {}
-            for screening_id, fhir_id in dismissed_fhir_query:
-                if screening_id not in dismissed_fhir_by_screening:
-                    dismissed_fhir_by_screening[screening_id] = set()
-                dismissed_fhir_by_screening[screening_id].add(fhir_id)
-            
-            # Attach prefetched dismissed IDs to each screening for use in template
-            for s in screenings:
-                s._dismissed_doc_ids = dismissed_docs_by_screening.get(s.id, set())
-                s._dismissed_fhir_ids = dismissed_fhir_by_screening.get(s.id, set())
+            from core.match_summary import backfill_missing_summaries
+            try:
+                if backfill_missing_summaries(screenings):
+                    db.session.commit()
+                    screenings = query.offset(start_idx).limit(per_page).all()
+            except Exception as e:
+                logger.warning(f"Could not backfill screening match summaries: {e}")
+                db.session.rollback()
+                screenings = query.offset(start_idx).limit(per_page).all()
         
         # Add effective_dormant attribute for template use
         for s in screenings:
@@ -947,6 +905,18 @@ def analyze_keyword_distribution():
         # Sort screening details by keyword count (descending)
         analysis['screening_details'].sort(key=lambda x: x['keyword_count'], reverse=True)
         
+        # Keyword effectiveness comes from the offline report (never computed in the request)
+        report, job_id = get_or_request_keyword_effectiveness_report(current_user.org_id, current_user.id)
+        if report is not None:
+            analysis['keyword_effectiveness'] = {
+                'status': 'ready',
+                'generated_at': report['generated_at'],
+                'documents_scanned': report['documents_scanned'],
+                'screening_types': report['screening_types']
+            }
+        else:
+            analysis['keyword_effectiveness'] = {'status': 'pending', 'job_id': job_id}
+        
         return jsonify({
             'success': True,
             'analysis': analysis
@@ -6,9 +6,8 @@ Handles incoming webhooks from external services (Stripe, etc.)
 from flask import Blueprint, request, jsonify
 import logging
 import os
-import stripe
 
-from services.stripe_service import StripeService
+from services.stripe_service import StripeService, stripe
 from services.email_service import EmailService
 from models import Organization
 
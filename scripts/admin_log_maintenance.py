@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Audit log storage maintenance (admin/log_storage.py)
+
+Commands:
+    rollup       Build daily rollups for completed days (default: last 30 days).
+                 Dashboards also build missing days lazily; run this nightly to
+                 keep reads fast.
+    partition    Convert admin_logs to monthly RANGE partitions (PostgreSQL).
+                 Dry run unless --execute; takes an exclusive lock while rows are
+                 copied, so run it in a maintenance window.
+    partitions   Create upcoming monthly partitions (run monthly, e.g. from cron).
+    detach       Detach monthly partitions older than the audit retention period
+                 (dry run unless --execute). Detached tables are kept, not dropped.
+
+Usage:
+    python scripts/admin_log_maintenance.py rollup --days 90
+    python scripts/admin_log_maintenance.py partition             # Show plan
+    python scripts/admin_log_maintenance.py partition --execute
+    python scripts/admin_log_maintenance.py partitions --months-ahead 3
+    python scripts/admin_log_maintenance.py detach --retention-days 2555 --execute
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audit log rollup and partition maintenance')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rollup = subparsers.add_parser('rollup', help='Build daily rollups')
+    rollup.add_argument('--days', type=int, default=30, help='Completed days to cover (default: 30)')
+    rollup.add_argument('--rebuild', action='store_true', help='Rebuild days that are already final')
+
+    partition = subparsers.add_parser('partition', help='Convert admin_logs to monthly partitions')
+    partition.add_argument('--execute', action='store_true', help='Perform the conversion')
+    partition.add_argument('--months-ahead', type=int, default=3)
+
+    partitions = subparsers.add_parser('partitions', help='Create upcoming monthly partitions')
+    partitions.add_argument('--months-ahead', type=int, default=3)
+
+    detach = subparsers.add_parser('detach', help='Detach partitions past audit retention')
+    detach.add_argument('--retention-days', type=int, default=None,
+                        help='Default: longest Organization.audit_retention_days')
+    detach.add_argument('--execute', action='store_true', help='Detach (default: dry run)')
+
+    args = parser.parse_args()
+
+    from app import create_app
+    from admin import log_storage
+
+    app = create_app()
+    with app.app_context():
+        if args.command == 'rollup':
+            yesterday = datetime.utcnow().date() - timedelta(days=1)
+            first_day = yesterday - timedelta(days=args.days - 1)
+            if args.rebuild:
+                log_storage.invalidate_rollups()
+            built = log_storage.ensure_rolled_up(first_day, yesterday)
+            result = {'first_day': first_day.isoformat(), 'last_day': yesterday.isoformat(), 'days_built': built}
+        elif args.command == 'partition':
+            result = log_storage.convert_to_partitioned(months_ahead=args.months_ahead,
+                                                        dry_run=not args.execute)
+        elif args.command == 'partitions':
+            result = {'created': log_storage.ensure_future_partitions(args.months_ahead)}
+        else:
+            detached = log_storage.detach_expired_partitions(args.retention_days, dry_run=not args.execute)
+            result = {'dry_run': not args.execute, 'partitions': detached}
+
+        print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Analytics counter maintenance (admin/analytics_counters.py)
+
+Counters are maintained incrementally and built lazily on first dashboard read.
+Rebuild them from the raw tables after bulk imports or data fixes that bypass
+the ORM, or up front after deploying the counter tables.
+
+Usage:
+    python scripts/analytics_counters.py rebuild              # All organizations
+    python scripts/analytics_counters.py rebuild --org-id 12
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analytics counter maintenance')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rebuild = subparsers.add_parser('rebuild', help='Rebuild counters from raw tables')
+    rebuild.add_argument('--org-id', type=int, default=None, help='Default: every organization')
+
+    args = parser.parse_args()
+
+    from app import create_app, db
+    from models import Organization
+    from admin.analytics_counters import rebuild_counters
+
+    app = create_app()
+    with app.app_context():
+        if args.org_id is not None:
+            org_ids = [args.org_id]
+        else:
+            org_ids = [row[0] for row in db.session.query(Organization.id).order_by(Organization.id)]
+
+        results = {}
+        for org_id in org_ids:
+            start = time.perf_counter()
+            result = rebuild_counters(org_id)
+            result['seconds'] = round(time.perf_counter() - start, 3)
+            results[org_id] = result
+
+        print(json.dumps({'organizations': results}, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
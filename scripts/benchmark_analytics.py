@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Benchmark: incremental analytics counters vs. the previous dashboard queries
+
+Seeds a synthetic organization (patients, screenings, documents spread over a
+year) with bulk inserts, builds its counters with rebuild_counters(), then
+times the COUNT(*) queries the ROI dashboard used to run on every page load
+against the counter reads in admin/analytics_counters.py, and checks both
+return the same numbers. A second check changes rows through the ORM and
+verifies the incrementally maintained counters still match.
+
+The seeded organization is deleted afterwards unless --keep is given.
+
+Usage:
+    python scripts/benchmark_analytics.py
+    python scripts/benchmark_analytics.py --patients 20000 --documents 200000 --screenings 100000
+    python scripts/benchmark_analytics.py --repeat 50 --keep
+
+Output is a JSON document on stdout.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import logging
+import statistics
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STATUSES = ['due', 'due_soon', 'complete', 'complete', 'overdue']
+INSERT_CHUNK = 5000
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timing_summary(samples_ms):
+    return {
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'mean_ms': round(statistics.mean(samples_ms), 3) if samples_ms else 0.0,
+    }
+
+
+def _insert_chunked(conn, table, rows):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        conn.execute(table.insert(), rows[start:start + INSERT_CHUNK])
+
+
+def seed_organization(args, rng):
+    """Create the benchmark organization and bulk insert its rows (bypasses counter events)"""
+    from app import db
+    from models import Organization, Patient, ScreeningType, Screening, Document
+
+    org = Organization(name=f"Analytics Benchmark {datetime.utcnow():%Y%m%d%H%M%S}")
+    db.session.add(org)
+    db.session.commit()
+    org_id = org.id
+
+    now = datetime.utcnow()
+
+    def recent(days=args.history_days):
+        return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+    start = time.perf_counter()
+    with db.engine.begin() as conn:
+        screening_type_id = conn.execute(ScreeningType.__table__.insert().values(
+            name='Benchmark Screening', org_id=org_id, frequency_value=1, created_at=now, updated_at=now
+        ).returning(ScreeningType.__table__.c.id)).scalar()
+
+        _insert_chunked(conn, Patient.__table__, [
+            {'name': f'Benchmark Patient {i}', 'date_of_birth': date(1950, 1, 1) + timedelta(days=rng.randint(0, 20000)),
+             'gender': rng.choice(['M', 'F']), 'org_id': org_id, 'created_at': recent(), 'updated_at': now}
+            for i in range(args.patients)
+        ])
+        patient_ids = [row[0] for row in conn.execute(
+            db.select(Patient.id).where(Patient.org_id == org_id)
+        )]
+
+        screening_rows = []
+        for _ in range(args.screenings):
+            updated_at = recent()
+            screening_rows.append({
+                'patient_id': rng.choice(patient_ids), 'screening_type_id': screening_type_id,
+                'org_id': org_id, 'status': rng.choice(STATUSES),
+                'created_at': updated_at, 'updated_at': updated_at,
+            })
+        _insert_chunked(conn, Screening.__table__, screening_rows)
+
+        document_rows = []
+        for i in range(args.documents):
+            created_at = recent()
+            processed = rng.random() < 0.85
+            document_rows.append({
+                'patient_id': rng.choice(patient_ids), 'org_id': org_id, 'filename': f'benchmark_{i}.pdf',
+                'created_at': created_at, 'updated_at': created_at,
+                'processed_at': created_at + timedelta(minutes=rng.randint(1, 120)) if processed else None,
+                'ocr_text': 'Benchmark OCR text' if processed else None,
+                'ocr_confidence': round(rng.uniform(0.6, 0.99), 4) if processed else None,
+            })
+        _insert_chunked(conn, Document.__table__, document_rows)
+
+    return org_id, time.perf_counter() - start
+
+
+def legacy_counts(org_id, cutoff):
+    """The COUNT(*) queries the dashboard ran per page load (org-scoped)"""
+    from app import db
+    from models import Document, Patient, Screening
+
+    def screening_count(**filters):
+        return Screening.query.filter_by(org_id=org_id, **filters).count()
+
+    return {
+        'documents_processed': Document.query.filter(
+            Document.org_id == org_id, Document.processed_at >= cutoff, Document.ocr_text.isnot(None)
+        ).count(),
+        'new_documents': Document.query.filter(Document.org_id == org_id, Document.created_at >= cutoff).count(),
+        'new_patients': Patient.query.filter(Patient.org_id == org_id, Patient.created_at >= cutoff).count(),
+        'gaps_closed': Screening.query.filter(
+            Screening.org_id == org_id, Screening.status == 'complete', Screening.updated_at >= cutoff
+        ).count(),
+        'open_gaps': screening_count(status='due'),
+        'due_soon': screening_count(status='due_soon'),
+        'complete': screening_count(status='complete'),
+        'total_screenings': screening_count(),
+        'avg_confidence': round(db.session.query(db.func.avg(Document.ocr_confidence))
+                                .filter(Document.org_id == org_id).scalar() or 0, 4),
+    }
+
+
+def counter_counts(org_id, first_day):
+    """The same figures read from the incremental counters"""
+    from admin import analytics_counters as counters
+
+    daily = counters.sum_daily_counters(first_day, datetime.utcnow().date(), [
+        counters.DOCUMENTS_PROCESSED, counters.DOCUMENTS_CREATED,
+        counters.PATIENTS_CREATED, counters.SCREENINGS_COMPLETED
+    ], org_id=org_id)
+    gauges = counters.get_gauges(org_id)
+    return {
+        'documents_processed': daily[counters.DOCUMENTS_PROCESSED],
+        'new_documents': daily[counters.DOCUMENTS_CREATED],
+        'new_patients': daily[counters.PATIENTS_CREATED],
+        'gaps_closed': daily[counters.SCREENINGS_COMPLETED],
+        'open_gaps': counters.screening_status_count(gauges, 'due'),
+        'due_soon': counters.screening_status_count(gauges, 'due_soon'),
+        'complete': counters.screening_status_count(gauges, 'complete'),
+        'total_screenings': gauges.get(counters.SCREENINGS_TOTAL, 0),
+        'avg_confidence': round(counters.average_ocr_confidence(gauges) or 0, 4),
+    }
+
+
+def time_calls(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, samples
+
+
+def mismatches(expected, actual):
+    return {key: {'legacy': expected[key], 'counters': actual.get(key)}
+            for key in expected if expected[key] != actual.get(key)}
+
+
+def apply_orm_changes(org_id, rng, count):
+    """Change rows through the ORM so the incremental path is exercised"""
+    from app import db
+    from models import Document, Patient, Screening
+
+    patient_ids = [row[0] for row in db.session.query(Patient.id).filter(Patient.org_id == org_id).limit(100)]
+    now = datetime.utcnow()
+    for i in range(count):
+        document = Document(patient_id=rng.choice(patient_ids), org_id=org_id,
+                            filename=f'benchmark_incremental_{i}.pdf')
+        document.ocr_text = 'Benchmark OCR text'
+        document.ocr_confidence = 0.9
+        document.processed_at = now
+        db.session.add(document)
+
+    for screening in Screening.query.filter(Screening.org_id == org_id, Screening.status == 'due').limit(count):
+        screening.status = 'complete'
+
+    for document in Document.query.filter(Document.org_id == org_id,
+                                          Document.processed_at.isnot(None)).limit(count // 2):
+        db.session.delete(document)
+
+    db.session.commit()
+
+
+def delete_organization(org_id):
+    from app import db
+    from models import Organization, Patient, ScreeningType, Screening, Document
+    from admin.analytics_counters import delete_org_counters
+
+    with db.engine.begin() as conn:
+        for model in (Screening, Document, Patient, ScreeningType):
+            conn.execute(model.__table__.delete().where(model.__table__.c.org_id == org_id))
+        conn.execute(Organization.__table__.delete().where(Organization.__table__.c.id == org_id))
+    delete_org_counters(org_id)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark incremental analytics counters')
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--documents', type=int, default=50000)
+    parser.add_argument('--screenings', type=int, default=25000)
+    parser.add_argument('--history-days', type=int, default=365, help='Spread of seeded timestamps')
+    parser.add_argument('--days', type=int, default=30, help='Dashboard window (default: 30)')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed iterations per method')
+    parser.add_argument('--keep', action='store_true', help='Keep the seeded organization')
+    args = parser.parse_args()
+
+    from app import create_app
+    from admin import analytics_counters as counters
+
+    rng = random.Random(42)
+    app = create_app()
+    with app.app_context():
+        org_id, seed_seconds = seed_organization(args, rng)
+        logger.info(f"Seeded organization {org_id} in {seed_seconds:.1f}s")
+
+        try:
+            start = time.perf_counter()
+            rebuilt = counters.rebuild_counters(org_id)
+            rebuild_seconds = time.perf_counter() - start
+
+            # Counters have day granularity - compare with a midnight-aligned cutoff
+            first_day = datetime.utcnow().date() - timedelta(days=args.days)
+            cutoff = datetime.combine(first_day, datetime.min.time())
+
+            legacy, legacy_ms = time_calls(lambda: legacy_counts(org_id, cutoff), args.repeat)
+            counted, counter_ms = time_calls(lambda: counter_counts(org_id, first_day), args.repeat)
+
+            apply_orm_changes(org_id, rng, count=200)
+            incremental_diff = mismatches(legacy_counts(org_id, cutoff), counter_counts(org_id, first_day))
+
+            legacy_p50 = percentile(legacy_ms, 50)
+            counter_p50 = percentile(counter_ms, 50)
+            report = {
+                'org_id': org_id,
+                'seeded': {'patients': args.patients, 'documents': args.documents,
+                           'screenings': args.screenings, 'history_days': args.history_days},
+                'seed_seconds': round(seed_seconds, 2),
+                'rebuild_seconds': round(rebuild_seconds, 3),
+                'rebuild': rebuilt,
+                'window_days': args.days,
+                'legacy_queries': timing_summary(legacy_ms),
+                'counters': timing_summary(counter_ms),
+                'speedup_p50': round(legacy_p50 / counter_p50, 1) if counter_p50 else None,
+                'results': counted,
+                'rebuild_mismatches': mismatches(legacy, counted),
+                'incremental_mismatches': incremental_diff,
+            }
+        finally:
+            if not args.keep:
+                delete_organization(org_id)
+
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
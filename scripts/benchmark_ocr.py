@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmark: OCR page pipeline, fixed 150 DPI vs. adaptive DPI (ocr/preprocess.py)
+
+Runs every page of a corpus of sample scans through each configuration and
+reports pages/sec, per-page latency, blank pages skipped, low-confidence
+re-renders, mean Tesseract confidence and, where ground truth exists,
+accuracy.
+
+    fixed               previous pipeline: PDF pages rendered at 150 DPI,
+                        PIL grayscale + contrast 1.5 + upscale of small images
+    adaptive:<method>   thumbnail analysis, per-page DPI, blank skip, deskew,
+                        binarization <method> (adaptive, otsu or none), retry
+                        at a higher DPI below OCR_RETRY_CONFIDENCE
+
+Corpus layout: PDFs and images (.png .jpg .jpeg .tif .tiff .bmp) in one
+directory. Ground truth for <name>.pdf / <name>.png is <name>.txt next to
+it; for multi-page PDFs, pages are separated by form feeds (\\f). Every page
+is OCR'd, embedded text layers are ignored. Accuracy is reported as
+character similarity (difflib ratio) and word error rate, both on
+whitespace-normalized text.
+
+Usage:
+    python scripts/benchmark_ocr.py samples/scans
+    python scripts/benchmark_ocr.py samples/scans --configs fixed,adaptive:adaptive,adaptive:otsu --per-file
+
+Output is a JSON document on stdout. Uses the OCR backend selected by OCR_ENGINE.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import difflib
+import logging
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+FIXED_DPI = 150
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def normalize(text):
+    return ' '.join((text or '').split())
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = reference.split(), hypothesis.split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def char_similarity(reference, hypothesis):
+    return difflib.SequenceMatcher(None, reference, hypothesis, autojunk=False).ratio()
+
+
+def load_corpus(corpus_dir):
+    """[(name, kind, path, [ground truth per page] or None)]"""
+    documents = []
+    for filename in sorted(os.listdir(corpus_dir)):
+        stem, ext = os.path.splitext(filename)
+        ext = ext.lower()
+        if ext != '.pdf' and ext not in IMAGE_EXTENSIONS:
+            continue
+        truth = None
+        truth_path = os.path.join(corpus_dir, stem + '.txt')
+        if os.path.exists(truth_path):
+            with open(truth_path, 'r', encoding='utf-8', errors='ignore') as f:
+                truth = f.read().split('\f')
+        documents.append((filename, 'pdf' if ext == '.pdf' else 'image', os.path.join(corpus_dir, filename), truth))
+    return documents
+
+
+def legacy_preprocess(image):
+    """The pre-adaptive OCRProcessor._preprocess_image steps"""
+    from PIL import Image, ImageEnhance
+
+    if image.mode != 'L':
+        image = image.convert('L')
+    image = ImageEnhance.Contrast(image).enhance(1.5)
+    width, height = image.size
+    if width < 800 or height < 600:
+        scale_factor = max(800 / width, 600 / height)
+        image = image.resize((int(width * scale_factor), int(height * scale_factor)), Image.Resampling.LANCZOS)
+    return image
+
+
+def make_recognizer(engine):
+    def recognize(image):
+        result = engine.recognize(image)
+        return result.text.strip(), result.mean_confidence()
+    return recognize
+
+
+def ocr_page(config, recognize, page=None, image=None):
+    """(text, confidence, info) for one PDF page or raster image"""
+    from ocr.engine import render_page_image
+    from ocr.preprocess import ocr_pdf_page, preprocess_for_ocr
+
+    if config == 'fixed':
+        if page is not None:
+            image = render_page_image(page, dpi=FIXED_DPI)
+        text, confidence = recognize(legacy_preprocess(image))
+        return text, confidence, {'dpi': FIXED_DPI if page is not None else None}
+
+    method = config.split(':', 1)[1] if ':' in config else None
+    if page is not None:
+        return ocr_pdf_page(page, recognize, method=method)
+    processed, analysis = preprocess_for_ocr(image, method=method)
+    if analysis.blank:
+        return None, 0.0, {'blank': True}
+    text, confidence = recognize(processed)
+    return text, confidence, {'blank': False}
+
+
+def run_config(config, documents, recognize, per_file):
+    import fitz
+    from PIL import Image
+
+    page_ms = []
+    confidences = []
+    similarities = []
+    error_rates = []
+    dpis = []
+    blank = retried = 0
+    files = []
+    started = time.perf_counter()
+
+    for name, kind, path, truth in documents:
+        file_pages = []
+        if kind == 'pdf':
+            doc = fitz.open(path)
+            try:
+                for index in range(len(doc)):
+                    start = time.perf_counter()
+                    text, confidence, info = ocr_page(config, recognize, page=doc[index])
+                    file_pages.append((index, text, confidence, info, (time.perf_counter() - start) * 1000))
+            finally:
+                doc.close()
+        else:
+            with Image.open(path) as image:
+                image.load()
+                start = time.perf_counter()
+                text, confidence, info = ocr_page(config, recognize, image=image)
+                file_pages.append((0, text, confidence, info, (time.perf_counter() - start) * 1000))
+
+        file_similarities = []
+        for index, text, confidence, info, elapsed_ms in file_pages:
+            page_ms.append(elapsed_ms)
+            blank += bool(info.get('blank'))
+            retried += bool(info.get('retried'))
+            if info.get('dpi'):
+                dpis.append(info['dpi'])
+            if not info.get('blank'):
+                confidences.append(confidence)
+            if truth is not None and index < len(truth):
+                reference, hypothesis = normalize(truth[index]), normalize(text)
+                similarity = char_similarity(reference, hypothesis)
+                similarities.append(similarity)
+                file_similarities.append(similarity)
+                error_rates.append(word_error_rate(reference, hypothesis))
+
+        if per_file:
+            files.append({
+                'file': name,
+                'pages': len(file_pages),
+                'seconds': round(sum(p[4] for p in file_pages) / 1000, 3),
+                'char_similarity': round(statistics.mean(file_similarities), 4) if file_similarities else None,
+            })
+
+    elapsed = time.perf_counter() - started
+    pages = len(page_ms)
+    report = {
+        'pages': pages,
+        'seconds': round(elapsed, 3),
+        'pages_per_second': round(pages / elapsed, 3) if elapsed > 0 else 0.0,
+        'page_p50_ms': round(percentile(page_ms, 50), 1),
+        'page_p95_ms': round(percentile(page_ms, 95), 1),
+        'blank_pages_skipped': blank,
+        'pages_re_rendered': retried,
+        'mean_dpi': round(statistics.mean(dpis), 1) if dpis else None,
+        'mean_confidence': round(statistics.mean(confidences), 4) if confidences else None,
+        'accuracy': {
+            'pages_with_ground_truth': len(similarities),
+            'char_similarity': round(statistics.mean(similarities), 4) if similarities else None,
+            'word_error_rate': round(statistics.mean(error_rates), 4) if error_rates else None,
+        },
+    }
+    if per_file:
+        report['files'] = files
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the OCR page pipeline on a corpus of sample scans')
+    parser.add_argument('corpus', help='Directory of PDFs/images with optional <name>.txt ground truth')
+    parser.add_argument('--configs', default='fixed,adaptive',
+                        help='Comma-separated: fixed, adaptive, adaptive:<adaptive|otsu|none>')
+    parser.add_argument('--per-file', action='store_true', help='Include per-file timings and accuracy')
+    args = parser.parse_args()
+
+    from ocr.engine import warm_ocr_engine, get_ocr_engine
+    from ocr import preprocess
+
+    documents = load_corpus(args.corpus)
+    if not documents:
+        parser.error(f"No PDFs or images found in {args.corpus}")
+
+    backend = warm_ocr_engine()
+    recognize = make_recognizer(get_ocr_engine())
+    configs = [c.strip() for c in args.configs.split(',') if c.strip()]
+
+    results = {config: run_config(config, documents, recognize, args.per_file) for config in configs}
+
+    report = {
+        'corpus': os.path.abspath(args.corpus),
+        'documents': len(documents),
+        'ocr_engine': backend,
+        'settings': {
+            'min_dpi': preprocess.OCR_MIN_DPI,
+            'base_dpi': preprocess.OCR_BASE_DPI,
+            'max_dpi': preprocess.OCR_MAX_DPI,
+            'retry_confidence': preprocess.OCR_RETRY_CONFIDENCE,
+            'default_binarization': preprocess.OCR_BINARIZATION,
+        },
+        'results': results,
+    }
+    if 'fixed' in results:
+        baseline = results['fixed']['pages_per_second']
+        report['speedup_vs_fixed'] = {
+            config: round(result['pages_per_second'] / baseline, 2) if baseline else None
+            for config, result in results.items() if config != 'fixed'
+        }
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Benchmark: screening pipeline throughput and latency, comparable across commits
+
+Seeds a synthetic organization - provider, staff user, patients with trigger
+conditions, documents with realistic OCR text and the screening types from
+presets/examples - then times the hot paths of the pipeline:
+
+    refresh_screenings   ScreeningRefreshService.refresh_screenings (full forced refresh)
+    document_matching    DocumentMatcher.find_document_matches, per document
+    phi_filter           PHIFilter.filter_phi, per raw OCR text (with synthetic PHI)
+    prep_sheet           PrepSheetGenerator.generate_prep_sheet, per patient
+    screening_list       the /screening/list view (login and view decorators included,
+                         app-wide before_request middleware excluded), per page
+
+Each target reports latency percentiles, throughput and SQL statements per call
+(utils/query_profiler.py). The report carries the git revision and the seed
+parameters; pass a previous report with --baseline to get p50 ratios and the
+targets that regressed past --regression-threshold.
+
+By default the organization is seeded into a throw-away SQLite database that is
+deleted afterwards. With --database-url (e.g. a local PostgreSQL) the seeded
+organization is deleted afterwards unless --keep is given. Seeding uses a fixed
+random seed, so runs with the same arguments compare like for like.
+
+Usage:
+    python scripts/benchmark_pipeline.py
+    python scripts/benchmark_pipeline.py --patients 1000 --documents-per-patient 10 --output bench.json
+    python scripts/benchmark_pipeline.py --database-url postgresql://localhost/healthprep_bench
+    python scripts/benchmark_pipeline.py --baseline bench.json --fail-on-regression
+
+Output is a JSON document on stdout (and in --output when given).
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import random
+import shutil
+import argparse
+import logging
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PRESETS_DIR = os.path.join(REPO_ROOT, 'presets', 'examples')
+INSERT_CHUNK = 5000
+TARGETS = ('refresh_screenings', 'document_matching', 'phi_filter', 'prep_sheet', 'screening_list')
+
+FILLER_SECTIONS = [
+    "HISTORY OF PRESENT ILLNESS: Patient reports {sym} for the past {n} weeks. "
+    "Denies fever, chills, chest pain or shortness of breath.",
+    "LABORATORY RESULTS: Hemoglobin A1c {a1c}%. LDL cholesterol {ldl} mg/dL. "
+    "Creatinine {cr} mg/dL. TSH {tsh} mIU/L.",
+    "ASSESSMENT AND PLAN: {cond}, stable. Continue current medications. Follow up in {n} months.",
+    "MEDICATIONS: metformin 500 mg BID, lisinopril 10 mg daily, atorvastatin 20 mg nightly.",
+    "REVIEW OF SYSTEMS: Negative except as noted in HPI. Vitals reviewed, BMI {bmi}.",
+]
+KEYWORD_SECTIONS = [
+    "PROCEDURE: {keyword} completed on {when}. Findings within normal limits.",
+    "RESULTS: {keyword} reviewed with patient. No further action required until next interval.",
+    "IMPRESSION: {keyword} - unremarkable. Recommend routine follow-up per guidelines.",
+]
+PHI_HEADER = (
+    "Patient: {name}   DOB: {dob:%m/%d/%Y}   MRN: {mrn}\n"
+    "Phone: ({area}) {prefix}-{line}   SSN: {ssn_a}-{ssn_b}-{ssn_c}\n"
+    "Address: {street} Main Street, Springfield, IL 62701   Email: patient{mrn}@example.com\n"
+)
+DOCUMENT_TYPES = ['lab', 'imaging', 'consult', 'hospital']
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timing_summary(samples_ms):
+    return {
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'mean_ms': round(statistics.mean(samples_ms), 3) if samples_ms else 0.0,
+        'max_ms': round(max(samples_ms), 3) if samples_ms else 0.0,
+        'samples': len(samples_ms),
+    }
+
+
+def git_revision():
+    def git(*args):
+        result = subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    try:
+        return {'commit': git('rev-parse', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+    except (OSError, subprocess.SubprocessError):
+        return {'commit': None, 'dirty': None}
+
+
+def load_preset_screening_types(names):
+    """Screening type definitions from presets/examples, first definition of each name wins"""
+    paths = sorted(glob.glob(os.path.join(PRESETS_DIR, '*.json')))
+    if names:
+        wanted = {name if name.endswith('.json') else f'{name}.json' for name in names}
+        paths = [path for path in paths if os.path.basename(path) in wanted]
+        missing = wanted - {os.path.basename(path) for path in paths}
+        if missing:
+            raise SystemExit(f"Unknown preset(s): {', '.join(sorted(missing))}")
+
+    screening_types = {}
+    for path in paths:
+        with open(path, 'r') as f:
+            for st_data in json.load(f).get('screening_types', []):
+                screening_types.setdefault(st_data['name'], st_data)
+    return list(screening_types.values())
+
+
+def normalize_gender(value):
+    value = str(value or 'both').strip().upper()
+    if value in ('F', 'FEMALE'):
+        return 'F'
+    if value in ('M', 'MALE'):
+        return 'M'
+    return 'both'
+
+
+def document_text(rng, keywords, when):
+    parts = [rng.choice(KEYWORD_SECTIONS).format(keyword=keyword, when=f'{when:%m/%d/%Y}') for keyword in keywords]
+    for _ in range(rng.randint(3, 12)):
+        parts.append(rng.choice(FILLER_SECTIONS).format(
+            cond=rng.choice(['type 2 diabetes', 'hypertension', 'hyperlipidemia', 'hypothyroidism']),
+            sym=rng.choice(['fatigue', 'mild headache', 'joint pain', 'no new symptoms']),
+            n=rng.randint(1, 12), a1c=round(rng.uniform(5.0, 9.5), 1), ldl=rng.randint(60, 190),
+            cr=round(rng.uniform(0.6, 1.6), 2), tsh=round(rng.uniform(0.4, 6.0), 2),
+            bmi=round(rng.uniform(19, 38), 1)
+        ))
+    rng.shuffle(parts)
+    return '\n'.join(parts)
+
+
+def phi_text(rng, text, patient_index, dob):
+    """The raw OCR text as it arrives before filtering: the clinical text behind a PHI header"""
+    return PHI_HEADER.format(
+        name=f'Benchmark Patient {patient_index}', dob=dob, mrn=f'{patient_index:08d}',
+        area=rng.randint(200, 989), prefix=rng.randint(200, 999), line=rng.randint(1000, 9999),
+        ssn_a=rng.randint(100, 899), ssn_b=rng.randint(10, 99), ssn_c=rng.randint(1000, 9999),
+        street=rng.randint(10, 9999)
+    ) + text
+
+
+def _insert_chunked(conn, table, rows):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        conn.execute(table.insert(), rows[start:start + INSERT_CHUNK])
+
+
+def seed_organization(args, rng, preset_types):
+    """
+    Create the benchmark organization. Screening types go through the ORM (few
+    rows, model events apply); patients, conditions and documents are bulk inserted.
+    Returns (org_id, user_id, raw PHI texts for the filter benchmark).
+    """
+    from app import db
+    from models import (Organization, Provider, User, ScreeningType, Patient,
+                        PatientCondition, Document)
+
+    now = datetime.utcnow()
+    org = Organization(name=f"Pipeline Benchmark {now:%Y%m%d%H%M%S}", onboarding_status='active')
+    db.session.add(org)
+    db.session.flush()
+
+    provider = Provider(name='Dr. Benchmark', specialty='Primary Care', org_id=org.id)
+    db.session.add(provider)
+    db.session.flush()
+
+    user = User(username=f'benchmark_{org.id}', email=f'benchmark_{org.id}@example.com', role='nurse',
+                org_id=org.id, provider_id=provider.id)
+    user.set_password(os.urandom(16).hex())
+    db.session.add(user)
+
+    keyword_pool = []
+    trigger_pool = set()
+    for st_data in preset_types:
+        screening_type = ScreeningType(
+            name=st_data['name'], org_id=org.id, keywords=json.dumps(st_data.get('keywords', [])),
+            eligible_genders=normalize_gender(st_data.get('eligible_genders')),
+            min_age=st_data.get('min_age'), max_age=st_data.get('max_age'),
+            frequency_value=float(st_data.get('frequency_years') or 1.0), frequency_unit='years',
+            is_active=st_data.get('is_active', True), created_by=None
+        )
+        screening_type.set_trigger_conditions(st_data.get('trigger_conditions', []))
+        db.session.add(screening_type)
+        keyword_pool.extend(st_data.get('keywords', []))
+        trigger_pool.update(st_data.get('trigger_conditions', []))
+    db.session.commit()
+    org_id, user_id, provider_id = org.id, user.id, provider.id
+
+    keyword_pool = sorted(set(keyword_pool)) or ['annual physical']
+    trigger_pool = sorted(trigger_pool)
+    today = now.date()
+
+    with db.engine.begin() as conn:
+        births = [today - timedelta(days=rng.randint(18 * 365, 85 * 365)) for _ in range(args.patients)]
+        _insert_chunked(conn, Patient.__table__, [
+            {'name': f'Benchmark Patient {i}', 'mrn': f'BENCH{i:08d}', 'date_of_birth': births[i],
+             'gender': rng.choice(['M', 'F']), 'org_id': org_id, 'provider_id': provider_id,
+             'created_at': now, 'updated_at': now}
+            for i in range(args.patients)
+        ])
+        patient_ids = [row[0] for row in conn.execute(
+            db.select(Patient.id).where(Patient.org_id == org_id).order_by(Patient.id)
+        )]
+
+        if trigger_pool:
+            _insert_chunked(conn, PatientCondition.__table__, [
+                {'patient_id': patient_id, 'condition_name': condition, 'is_active': True,
+                 'diagnosis_date': today - timedelta(days=rng.randint(30, 3650)), 'created_at': now}
+                for patient_id in patient_ids
+                for condition in rng.sample(trigger_pool, min(len(trigger_pool), rng.choice([0, 0, 1, 1, 2, 3])))
+            ])
+
+        document_rows = []
+        phi_corpus = []
+        for index, patient_id in enumerate(patient_ids):
+            for n in range(args.documents_per_patient):
+                document_date = today - timedelta(days=rng.randint(0, args.history_days))
+                text = document_text(rng, rng.sample(keyword_pool, min(len(keyword_pool), rng.randint(1, 3))),
+                                     document_date)
+                document_rows.append({
+                    'patient_id': patient_id, 'org_id': org_id, 'filename': f'benchmark_{patient_id}_{n}.pdf',
+                    'document_type': rng.choice(DOCUMENT_TYPES), 'document_date': document_date,
+                    'ocr_text': text, 'content': text, 'phi_filtered': True,
+                    'ocr_confidence': round(rng.uniform(0.7, 0.99), 4),
+                    'processed_at': now, 'created_at': now, 'updated_at': now,
+                })
+                if len(phi_corpus) < args.sample:
+                    phi_corpus.append(phi_text(rng, text, index, births[index]))
+        _insert_chunked(conn, Document.__table__, document_rows)
+
+    return org_id, user_id, phi_corpus
+
+
+def measure(calls, units_per_call=1, query_kind='job', name='benchmark'):
+    """Time each call; SQL statements per call come from the query profiler"""
+    from utils.query_profiler import profile_queries
+
+    samples = []
+    queries = []
+    for call in calls:
+        with profile_queries(name, kind=query_kind) as profile:
+            start = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - start) * 1000)
+        if profile is not None:
+            queries.append(profile.queries)
+
+    summary = timing_summary(samples)
+    total_seconds = sum(samples) / 1000
+    summary['throughput_per_s'] = round(len(samples) * units_per_call / total_seconds, 2) if total_seconds else None
+    summary['queries_per_call'] = round(statistics.mean(queries), 1) if queries else None
+    return summary
+
+
+def benchmark_refresh(args, org_id):
+    from services.screening_refresh_service import ScreeningRefreshService
+
+    options = {'force_refresh': True, 'max_patients': args.patients,
+               'check_eligibility': True, 'update_statuses': True}
+    results = []
+
+    def refresh():
+        results.append(ScreeningRefreshService(org_id).refresh_screenings(dict(options)))
+
+    # The first refresh creates the screenings; later ones re-evaluate them
+    start = time.perf_counter()
+    refresh()
+    first_ms = (time.perf_counter() - start) * 1000
+
+    summary = measure([refresh] * args.refresh_repeat, units_per_call=args.patients,
+                      name='benchmark.refresh_screenings')
+    summary['throughput_unit'] = 'patients'
+    summary['first_run_ms'] = round(first_ms, 3)
+    summary['errors'] = sum(len(result.get('stats', {}).get('errors', [])) + (0 if result.get('success') else 1)
+                            for result in results)
+    return summary
+
+
+def benchmark_matching(args, org_id):
+    from sqlalchemy.orm import undefer_group
+    from core.matcher import DocumentMatcher
+    from models import Document, DOCUMENT_TEXT_GROUP
+
+    documents = Document.query.options(undefer_group(DOCUMENT_TEXT_GROUP)).filter(
+        Document.org_id == org_id
+    ).order_by(Document.id).limit(args.sample).all()
+    for document in documents:
+        document.ocr_text  # decompress outside the timed region
+
+    matcher = DocumentMatcher()
+    matched = []
+
+    def make_call(document):
+        return lambda: matched.append(len(matcher.find_document_matches(document)))
+
+    summary = measure([make_call(document) for document in documents], name='benchmark.document_matching')
+    summary['throughput_unit'] = 'documents'
+    summary['mean_matches'] = round(statistics.mean(matched), 2) if matched else 0.0
+    return summary
+
+
+def benchmark_phi(phi_corpus):
+    from ocr.phi_filter import PHIFilter
+
+    phi_filter = PHIFilter()
+    phi_filter.filter_phi(phi_corpus[0])  # settings lookup and pattern compilation
+
+    summary = measure([lambda text=text: phi_filter.filter_phi(text) for text in phi_corpus],
+                      name='benchmark.phi_filter')
+    summary['throughput_unit'] = 'documents'
+    corpus_mb = sum(len(text.encode('utf-8')) for text in phi_corpus) / (1024 * 1024)
+    if summary['throughput_per_s']:
+        summary['mb_per_s'] = round(corpus_mb * summary['throughput_per_s'] / len(phi_corpus), 2)
+    return summary
+
+
+def benchmark_prep_sheets(args, org_id):
+    from prep_sheet.generator import PrepSheetGenerator
+    from models import Patient
+
+    patient_ids = [row[0] for row in Patient.query.with_entities(Patient.id).filter(
+        Patient.org_id == org_id
+    ).order_by(Patient.id).limit(args.prep_sample)]
+    generator = PrepSheetGenerator()
+    failures = []
+
+    def make_call(patient_id):
+        def call():
+            result = generator.generate_prep_sheet(patient_id, verbose_console=False)
+            if not result.get('success'):
+                failures.append(patient_id)
+        return call
+
+    summary = measure([make_call(patient_id) for patient_id in patient_ids], name='benchmark.prep_sheet')
+    summary['throughput_unit'] = 'prep sheets'
+    summary['failures'] = len(failures)
+    return summary
+
+
+def benchmark_screening_list(args, app, user_id):
+    from flask_login import login_user
+    from app import db
+    from models import User, Screening
+
+    view = app.view_functions['screening.screening_list']
+    user = db.session.get(User, user_id)
+    screenings = Screening.query.filter(Screening.org_id == user.org_id,
+                                        Screening.status != 'superseded').count()
+    pages = max(1, min(args.list_pages, (screenings + 49) // 50))
+    status_codes = {}
+
+    def make_call(page):
+        def call():
+            with app.test_request_context(f'/screening/list?page={page}'):
+                login_user(user)
+                status = app.make_response(view()).status_code
+                status_codes[status] = status_codes.get(status, 0) + 1
+        return call
+
+    make_call(1)()  # template compilation and caches
+    status_codes.clear()
+    calls = [make_call(page) for _ in range(args.list_repeat) for page in range(1, pages + 1)]
+    summary = measure(calls, query_kind='request', name='benchmark.screening_list')
+    summary['throughput_unit'] = 'pages'
+    summary['screenings'] = screenings
+    summary['status_codes'] = {str(code): count for code, count in sorted(status_codes.items())}
+    return summary
+
+
+def compare_with_baseline(report, baseline_path, threshold):
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+
+    comparison = {'baseline_commit': baseline.get('git', {}).get('commit'), 'targets': {}, 'regressions': []}
+    for target in TARGETS:
+        current = report['targets'].get(target)
+        previous = baseline.get('targets', {}).get(target)
+        if not current or not previous or not previous.get('p50_ms'):
+            continue
+        ratio = current['p50_ms'] / previous['p50_ms']
+        comparison['targets'][target] = {
+            'baseline_p50_ms': previous['p50_ms'], 'p50_ms': current['p50_ms'], 'p50_ratio': round(ratio, 3),
+            'baseline_queries_per_call': previous.get('queries_per_call'),
+            'queries_per_call': current.get('queries_per_call'),
+        }
+        if ratio > 1 + threshold:
+            comparison['regressions'].append(target)
+    if baseline.get('config') != report['config']:
+        comparison['warning'] = 'Baseline was seeded with different parameters'
+    return comparison
+
+
+def delete_organization(org_id):
+    """Remove every row the benchmark created or the pipeline wrote for the organization"""
+    from app import db
+    from models import Organization, Patient, Screening, Document
+
+    owned = {
+        'patient_id': db.select(Patient.id).where(Patient.org_id == org_id),
+        'screening_id': db.select(Screening.id).where(Screening.org_id == org_id),
+        'document_id': db.select(Document.id).where(Document.org_id == org_id),
+    }
+    db.session.remove()
+    with db.engine.begin() as conn:
+        for table in reversed(db.metadata.sorted_tables):
+            if table.name == Organization.__tablename__:
+                continue
+            if 'org_id' in table.c:
+                conn.execute(table.delete().where(table.c.org_id == org_id))
+                continue
+            for column, ids in owned.items():
+                if column in table.c:
+                    conn.execute(table.delete().where(table.c[column].in_(ids)))
+        conn.execute(Organization.__table__.delete().where(Organization.__table__.c.id == org_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the screening pipeline')
+    parser.add_argument('--patients', type=int, default=200)
+    parser.add_argument('--documents-per-patient', type=int, default=8)
+    parser.add_argument('--history-days', type=int, default=1095, help='Spread of seeded document dates')
+    parser.add_argument('--presets', default='', help='Comma-separated preset files from presets/examples (default: all)')
+    parser.add_argument('--sample', type=int, default=200, help='Documents timed for matching and PHI filtering')
+    parser.add_argument('--prep-sample', type=int, default=25, help='Patients timed for prep sheet generation')
+    parser.add_argument('--refresh-repeat', type=int, default=3, help='Timed full refreshes after the first')
+    parser.add_argument('--list-pages', type=int, default=5, help='Screening list pages timed')
+    parser.add_argument('--list-repeat', type=int, default=5, help='Passes over the screening list pages')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', default=None,
+                        help='Benchmark against this database (default: a temporary SQLite file)')
+    parser.add_argument('--output', default=None, help='Also write the report to this file')
+    parser.add_argument('--baseline', default=None, help='Previous report to compare against')
+    parser.add_argument('--regression-threshold', type=float, default=0.10,
+                        help='p50 slowdown vs. the baseline reported as a regression (default: 0.10)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on a regression')
+    parser.add_argument('--keep', action='store_true', help='Keep the seeded organization / SQLite file')
+    args = parser.parse_args()
+
+    temp_dir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        temp_dir = tempfile.mkdtemp(prefix='healthprep_bench_')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(temp_dir, 'benchmark.db')}"
+        os.environ['AUTO_BOOTSTRAP'] = 'true'  # empty database - create the schema
+
+    from app import create_app, db
+
+    rng = random.Random(args.seed)
+    preset_types = load_preset_screening_types([name.strip() for name in args.presets.split(',') if name.strip()])
+    app = create_app(phase='serve')
+
+    report = None
+    try:
+        with app.app_context():
+            start = time.perf_counter()
+            org_id, user_id, phi_corpus = seed_organization(args, rng, preset_types)
+            seed_seconds = time.perf_counter() - start
+            logger.warning(f"Seeded organization {org_id} in {seed_seconds:.1f}s")
+
+            try:
+                targets = {}
+                targets['refresh_screenings'] = benchmark_refresh(args, org_id)
+                targets['document_matching'] = benchmark_matching(args, org_id)
+                targets['phi_filter'] = benchmark_phi(phi_corpus)
+                targets['prep_sheet'] = benchmark_prep_sheets(args, org_id)
+                targets['screening_list'] = benchmark_screening_list(args, app, user_id)
+
+                report = {
+                    'benchmark': 'screening_pipeline',
+                    'generated_at': datetime.utcnow().isoformat() + 'Z',
+                    'git': git_revision(),
+                    'environment': {
+                        'python': platform.python_version(),
+                        'platform': platform.platform(),
+                        'database': db.engine.dialect.name,
+                    },
+                    'config': {
+                        'patients': args.patients, 'documents_per_patient': args.documents_per_patient,
+                        'screening_types': len(preset_types), 'presets': args.presets or 'all',
+                        'history_days': args.history_days, 'sample': args.sample,
+                        'prep_sample': args.prep_sample, 'refresh_repeat': args.refresh_repeat,
+                        'list_pages': args.list_pages, 'list_repeat': args.list_repeat, 'seed': args.seed,
+                    },
+                    'org_id': org_id,
+                    'seed_seconds': round(seed_seconds, 2),
+                    'targets': targets,
+                }
+            finally:
+                if not args.keep and temp_dir is None:
+                    delete_organization(org_id)
+    finally:
+        if temp_dir is not None and not args.keep:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        elif temp_dir is not None:
+            logger.warning(f"Kept benchmark database in {temp_dir}")
+
+    if args.baseline:
+        report['comparison'] = compare_with_baseline(report, args.baseline, args.regression_threshold)
+
+    output = json.dumps(report, indent=2, default=str)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+    if args.fail_on_regression and report.get('comparison', {}).get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark: decompression cost vs. I/O saved for compressed text columns
+
+Measures, per codec, the compression ratio and per-document compress /
+decompress latency on a document corpus, and compares the CPU spent
+decompressing with the time saved reading fewer bytes.
+
+Corpus sources:
+    --source db         Sample Document/FHIRDocument OCR text from the configured
+                        database (already PHI-filtered). Also times the actual
+                        column fetch of the sampled rows.
+    --source dir PATH   Every *.txt / *.json file under PATH
+    --source synthetic  Generated clinical-style notes (default, no DB needed)
+
+Usage:
+    python scripts/benchmark_text_compression.py
+    python scripts/benchmark_text_compression.py --source db --sample 2000
+    python scripts/benchmark_text_compression.py --source dir ./corpus --read-mbps 200
+
+Output is a JSON document on stdout.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.text_compression import (  # noqa: E402
+    compress_text, decompress_text, CODEC_ZLIB, CODEC_ZSTD, _zstd
+)
+
+SYNTHETIC_SECTIONS = [
+    "CHIEF COMPLAINT: Routine follow-up for {cond}.",
+    "HISTORY OF PRESENT ILLNESS: Patient reports {sym} for the past {n} weeks. "
+    "Denies fever, chills, chest pain or shortness of breath.",
+    "LABORATORY RESULTS: Hemoglobin A1c {a1c}%. LDL cholesterol {ldl} mg/dL. "
+    "Creatinine {cr} mg/dL. TSH {tsh} mIU/L.",
+    "IMAGING: {img} performed. Impression: no acute abnormality. BI-RADS {birads}.",
+    "ASSESSMENT AND PLAN: {cond}, stable. Continue current medications. "
+    "Repeat {test} in {n} months. Colonoscopy screening discussed.",
+    "MEDICATIONS: metformin 500 mg BID, lisinopril 10 mg daily, atorvastatin 20 mg nightly.",
+]
+
+
+def synthetic_corpus(count, seed=42):
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(4, 40)):
+            template = rng.choice(SYNTHETIC_SECTIONS)
+            parts.append(template.format(
+                cond=rng.choice(['type 2 diabetes', 'hypertension', 'hyperlipidemia', 'hypothyroidism']),
+                sym=rng.choice(['fatigue', 'mild headache', 'joint pain', 'no new symptoms']),
+                n=rng.randint(1, 12), a1c=round(rng.uniform(5.0, 9.5), 1),
+                ldl=rng.randint(60, 190), cr=round(rng.uniform(0.6, 1.6), 2),
+                tsh=round(rng.uniform(0.4, 6.0), 2),
+                img=rng.choice(['Mammogram', 'Chest X-ray', 'DEXA scan', 'CT abdomen']),
+                birads=rng.randint(1, 3), test=rng.choice(['A1c', 'lipid panel', 'TSH'])
+            ))
+        docs.append('\n'.join(parts))
+    return docs
+
+
+def directory_corpus(path, count):
+    docs = []
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if name.endswith(('.txt', '.json')):
+                with open(os.path.join(root, name), encoding='utf-8', errors='replace') as f:
+                    docs.append(f.read())
+                if len(docs) >= count:
+                    return docs
+    return docs
+
+
+def database_corpus(count):
+    """Sample stored text and time the column fetch (includes decompression)"""
+    from app import create_app, db
+    from models import Document, FHIRDocument
+
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        docs = [t for (t,) in db.session.query(Document.ocr_text)
+                .filter(Document.ocr_text.isnot(None)).limit(count).all()]
+        docs += [t for (t,) in db.session.query(FHIRDocument.ocr_text)
+                 .filter(FHIRDocument.ocr_text.isnot(None)).limit(max(count - len(docs), 0)).all()]
+        fetch_seconds = time.perf_counter() - start
+    return docs, fetch_seconds
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def benchmark_codec(docs, codec, read_mbps):
+    compress_us, decompress_us = [], []
+    raw_bytes = stored_bytes = 0
+
+    for text in docs:
+        start = time.perf_counter()
+        encoded = compress_text(text, codec=codec)
+        compress_us.append((time.perf_counter() - start) * 1e6)
+
+        start = time.perf_counter()
+        decoded = decompress_text(encoded)
+        decompress_us.append((time.perf_counter() - start) * 1e6)
+
+        if decoded != text:
+            raise AssertionError(f"Round-trip mismatch for codec {codec}")
+        raw_bytes += len(text.encode('utf-8'))
+        stored_bytes += len(encoded.encode('utf-8'))
+
+    bytes_saved = raw_bytes - stored_bytes
+    io_seconds_saved = bytes_saved / (read_mbps * 1024 * 1024)
+    decompress_seconds = sum(decompress_us) / 1e6
+
+    return {
+        'codec': 'zstd' if codec == CODEC_ZSTD else 'zlib',
+        'documents': len(docs),
+        'raw_bytes': raw_bytes,
+        'stored_bytes': stored_bytes,
+        'ratio': round(raw_bytes / stored_bytes, 2) if stored_bytes else None,
+        'compress_us': {'p50': round(percentile(compress_us, 50), 1),
+                        'p95': round(percentile(compress_us, 95), 1),
+                        'mean': round(statistics.mean(compress_us), 1) if compress_us else 0.0},
+        'decompress_us': {'p50': round(percentile(decompress_us, 50), 1),
+                          'p95': round(percentile(decompress_us, 95), 1),
+                          'mean': round(statistics.mean(decompress_us), 1) if decompress_us else 0.0},
+        'decompress_seconds_total': round(decompress_seconds, 4),
+        'io_seconds_saved_at_read_mbps': round(io_seconds_saved, 4),
+        'net_read_seconds_saved': round(io_seconds_saved - decompress_seconds, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark compressed text storage')
+    parser.add_argument('--source', choices=['synthetic', 'dir', 'db'], default='synthetic')
+    parser.add_argument('path', nargs='?', help='Corpus directory for --source dir')
+    parser.add_argument('--sample', type=int, default=1000, help='Number of documents (default: 1000)')
+    parser.add_argument('--read-mbps', type=float, default=100.0,
+                        help='Assumed uncached read throughput in MB/s (default: 100)')
+    args = parser.parse_args()
+
+    report = {'source': args.source, 'read_mbps': args.read_mbps}
+
+    if args.source == 'db':
+        docs, fetch_seconds = database_corpus(args.sample)
+        report['db_fetch_seconds'] = round(fetch_seconds, 4)
+    elif args.source == 'dir':
+        if not args.path:
+            parser.error('--source dir requires a corpus directory')
+        docs = directory_corpus(args.path, args.sample)
+    else:
+        docs = synthetic_corpus(args.sample)
+
+    codecs = [CODEC_ZLIB] + ([CODEC_ZSTD] if _zstd is not None else [])
+    report['results'] = [benchmark_codec(docs, codec, args.read_mbps) for codec in codecs]
+    if _zstd is None:
+        report['note'] = "zstandard not installed - zstd codec skipped"
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
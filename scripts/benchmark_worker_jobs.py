@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark: RQ job set-up cost, cold vs. warmed worker (services/worker_context.py)
+
+Times the work a batch job does before its first patient/document: app
+context, job modules, PHI pattern compilation, OCR bindings, a database round
+trip and (with --org-id) an authenticated Epic FHIR client. Three
+configurations:
+
+    cold_fork    work-horse forked from a worker that was not warmed (previous behaviour)
+    warm_fork    work-horse forked after warm_worker() (worker.py --mode fork)
+    warm_simple  repeated in-process in a warmed worker (worker.py --mode simple)
+
+Usage:
+    python scripts/benchmark_worker_jobs.py
+    python scripts/benchmark_worker_jobs.py --repeat 20 --org-id 3
+
+Output is a JSON document on stdout. Linux/macOS only (uses os.fork).
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timing_summary(samples_ms):
+    return {
+        'p50_ms': round(percentile(samples_ms, 50), 2),
+        'p95_ms': round(percentile(samples_ms, 95), 2),
+        'mean_ms': round(statistics.mean(samples_ms), 2) if samples_ms else 0.0,
+        'samples': len(samples_ms),
+    }
+
+
+def job_setup(org_id):
+    """What batch_generate_prep_sheets / batch_process_fhir_documents do before their loop"""
+    from sqlalchemy import text
+    from app import get_app, db
+    from services.worker_context import get_fhir_service, prepare_job_process
+    from prep_sheet.generator import PrepSheetGenerator
+    from ocr import document_processor
+    from ocr.engine import warm_ocr_engine
+
+    prepare_job_process()
+    app = get_app()
+    with app.app_context():
+        PrepSheetGenerator()
+        document_processor.DocumentProcessor()
+        warm_ocr_engine()  # first OCR call pays the binding import / language data load
+        db.session.execute(text("SELECT 1"))
+        if org_id is not None:
+            get_fhir_service(org_id).ensure_authenticated()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def run_forked(fn):
+    """Run fn in a forked child and return its duration in ms"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            payload = {'ms': timed(fn)}
+        except Exception as e:
+            payload = {'error': str(e)}
+        os.write(write_fd, json.dumps(payload).encode())
+        os._exit(0)
+
+    os.close(write_fd)
+    chunks = []
+    while True:
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    result = json.loads(b''.join(chunks) or b'{"error": "child exited without a result"}')
+    if 'error' in result:
+        raise RuntimeError(f"Forked job set-up failed: {result['error']}")
+    return result['ms']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RQ job set-up, cold vs. warmed worker')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed iterations per configuration')
+    parser.add_argument('--org-id', type=int, default=None,
+                        help='Also build an authenticated FHIR client for this organization')
+    args = parser.parse_args()
+
+    from app import get_app
+    from services.worker_context import warm_worker
+
+    # Cold: what a work-horse paid when the worker process had only the app
+    get_app()
+
+    def setup():
+        job_setup(args.org_id)
+
+    cold_ms = [run_forked(setup) for _ in range(args.repeat)]
+
+    warmup = warm_worker()
+    warm_fork_ms = [run_forked(setup) for _ in range(args.repeat)]
+
+    setup()  # first in-process job builds the pool / FHIR client cache
+    warm_simple_ms = [timed(setup) for _ in range(args.repeat)]
+
+    cold_p50 = percentile(cold_ms, 50)
+    report = {
+        'org_id': args.org_id,
+        'warmup': warmup,
+        'cold_fork': timing_summary(cold_ms),
+        'warm_fork': timing_summary(warm_fork_ms),
+        'warm_simple': timing_summary(warm_simple_ms),
+        'speedup_p50': {
+            'warm_fork': round(cold_p50 / percentile(warm_fork_ms, 50), 1) if percentile(warm_fork_ms, 50) else None,
+            'warm_simple': round(cold_p50 / percentile(warm_simple_ms, 50), 1) if percentile(warm_simple_ms, 50) else None,
+        },
+    }
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
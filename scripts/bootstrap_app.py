@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Application bootstrap (the "bootstrap" phase of app.create_app)
+
+Runs the one-time start-up work - crash temp-file cleanup, create_all, schema
+patches, System Organization / root admin and global presets - so web and
+worker processes can start with AUTO_BOOTSTRAP=false. Under gunicorn this is
+run once by the master (gunicorn.conf.py); run it yourself before starting
+workers in other deployments.
+
+Usage:
+    python scripts/bootstrap_app.py
+    python scripts/bootstrap_app.py --profile     # Log per-phase timings
+
+Output is a JSON document with the phase timings on stdout.
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the application bootstrap phase')
+    parser.add_argument('--profile', action='store_true', help='Log per-phase timings')
+    args = parser.parse_args()
+
+    if args.profile:
+        os.environ['STARTUP_PROFILE'] = 'true'
+
+    from app import create_app
+
+    app = create_app(phase='bootstrap')
+    print(json.dumps(app.extensions['startup_profile'], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Compress existing OCR text and raw FHIR JSON rows in place
+
+New writes are compressed automatically by the CompressedText column type
+(utils/text_compression.py). This script rewrites rows stored before
+compression was enabled. It is resumable: compressed rows are skipped, and
+each batch is committed separately, so it can be interrupted at any point.
+
+The same backfill can be queued on the RQ worker with
+AsyncProcessingService.enqueue_text_compression_backfill().
+
+Usage:
+    python scripts/compress_text_columns.py --dry-run          # Report savings only
+    python scripts/compress_text_columns.py --execute          # Compress rows
+    python scripts/compress_text_columns.py --execute --batch-size 200 --max-batches 50
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compress stored OCR text and FHIR JSON columns')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--dry-run', action='store_true', help='Report what would be compressed')
+    mode.add_argument('--execute', action='store_true', help='Compress rows in place')
+    parser.add_argument('--batch-size', type=int, default=500, help='Rows per batch (default: 500)')
+    parser.add_argument('--max-batches', type=int, default=None,
+                        help='Stop after this many batches per column (default: no limit)')
+    args = parser.parse_args()
+
+    from app import create_app
+    from utils.text_compression import backfill_compressed_columns, COMPRESSION_CODEC
+
+    app = create_app()
+    with app.app_context():
+        logger.info("=" * 60)
+        logger.info(f"Text compression backfill (codec: {COMPRESSION_CODEC}, "
+                    f"mode: {'DRY RUN' if args.dry_run else 'EXECUTE'})")
+        logger.info("=" * 60)
+
+        results = backfill_compressed_columns(
+            batch_size=args.batch_size,
+            dry_run=args.dry_run,
+            max_batches=args.max_batches
+        )
+
+        total_before = sum(r['bytes_before'] for r in results.values())
+        total_after = sum(r['bytes_after'] for r in results.values())
+
+        logger.info("=" * 60)
+        logger.info("Summary:")
+        for column, stats in results.items():
+            logger.info(f"  {column}: {stats['rows_compressed']}/{stats['rows_scanned']} rows, "
+                        f"{stats['bytes_before']:,} -> {stats['bytes_after']:,} bytes"
+                        f"{'  ERROR: ' + stats['error'] if 'error' in stats else ''}")
+        saved = total_before - total_after
+        logger.info(f"  Total bytes {'would be ' if args.dry_run else ''}saved: {saved:,}")
+        logger.info("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Re-match every document against its patient's screenings
+
+Runs the bulk re-match (core/bulk_rematch.py): documents are scored in
+ID-ordered chunks and matches are upserted with a checkpoint per chunk. It
+is resumable: if interrupted (or stopped by --max-matches), running it again
+continues the last incomplete run; --restart starts over from the first
+document.
+
+Usage:
+    python scripts/rematch_documents.py
+    python scripts/rematch_documents.py --workers 4 --chunk-size 1000
+    python scripts/rematch_documents.py --restart
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild all screening document matches')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Scoring processes (default: MATCH_REBUILD_WORKERS or 1)')
+    parser.add_argument('--chunk-size', type=int, default=500, help='Documents per transaction (default: 500)')
+    parser.add_argument('--max-matches', type=int, default=None,
+                        help='Stop after writing this many matches (resume later)')
+    parser.add_argument('--restart', action='store_true', help='Ignore an incomplete run and start over')
+    args = parser.parse_args()
+
+    from app import create_app
+    from core.bulk_rematch import rebuild_all_matches
+
+    app = create_app()
+    with app.app_context():
+        def report(stats):
+            logger.info(f"Run {stats['run_id']}: document {stats['last_document_id']}, "
+                        f"{stats['documents_processed']} documents, {stats['matches_written']} matches")
+
+        stats = rebuild_all_matches(
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            max_total_matches=args.max_matches,
+            resume=not args.restart,
+            progress_callback=report
+        )
+
+        logger.info("=" * 60)
+        logger.info(f"Run {stats['run_id']} {'completed' if stats['completed'] else 'stopped (resumable)'}"
+                    f"{' (resumed)' if stats['resumed'] else ''}")
+        logger.info(f"  Documents: {stats['documents_processed']}")
+        logger.info(f"  Matches written: {stats['matches_written']}, removed: {stats['matches_removed']}")
+        logger.info(f"  Elapsed: {stats['elapsed_seconds']}s")
+        logger.info("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
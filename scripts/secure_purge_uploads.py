@@ -24,7 +24,7 @@ from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app, db
+from app import create_app, db
 from models import Document, FHIRDocument, AdminLog
 from utils.secure_delete import secure_delete_file, audit_log_deletion, hash_path_for_log
 
@@ -182,6 +182,7 @@ def main():
     
     dry_run = args.dry_run
     
+    app = create_app(phase='worker')
     with app.app_context():
         logger.info("=" * 60)
         logger.info("HIPAA Compliance: Secure Upload File Purge")
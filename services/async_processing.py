@@ -116,6 +116,95 @@ class AsyncProcessingService:
         
         return job.id
     
+    def enqueue_text_compression_backfill(self, organization_id: int, user_id: int,
+                                          batch_size: int = 500, dry_run: bool = False) -> str:
+        """
+        Enqueue background compression of existing OCR text / FHIR JSON rows.
+        
+        System-wide maintenance job; organization_id is the initiating admin's
+        organization (for the audit log only). Safe to re-run: rows that are
+        already compressed are skipped, and each batch commits separately.
+        """
+        job_data = {
+            'organization_id': organization_id,
+            'user_id': user_id,
+            'batch_size': batch_size,
+            'dry_run': dry_run,
+            'initiated_at': datetime.utcnow().isoformat(),
+            'task_type': 'text_compression_backfill'
+        }
+        
+        job = self.queue.enqueue(
+            'services.async_processing.backfill_text_compression',
+            job_data,
+            job_timeout='2h',
+            job_id=f"text_compression_{datetime.utcnow().timestamp()}"
+        )
+        
+        from models import log_admin_event
+        log_admin_event(
+            event_type='text_compression_backfill_initiated',
+            user_id=user_id,
+            org_id=organization_id,
+            ip=None,
+            data={'job_id': job.id, 'batch_size': batch_size, 'dry_run': dry_run},
+            action_details="Initiated background compression of stored document text"
+        )
+        
+        return job.id
+    
+    def enqueue_keyword_effectiveness_report(self, organization_id: int, user_id: int,
+                                             apply_recommendations: bool = False) -> str:
+        """
+        Enqueue the offline keyword effectiveness report (core/keyword_effectiveness.py).
+        
+        One job per organization and keyword-set version: while a report job
+        for the current keywords is queued or running, its ID is returned
+        instead of enqueueing another. apply_recommendations runs
+        ScreeningEngine.optimize_all_screening_keywords for the organization.
+        """
+        from core.keyword_effectiveness import current_keyword_set_version
+        
+        version = current_keyword_set_version(organization_id)
+        job_id = f"keyword_report_{organization_id}_{version}"
+        if apply_recommendations:
+            job_id += '_optimize'
+        
+        try:
+            existing = Job.fetch(job_id, connection=self.redis_conn)
+            if existing.get_status() in (JobStatus.QUEUED, JobStatus.STARTED, JobStatus.DEFERRED):
+                return existing.id
+        except Exception:
+            pass  # no such job (or it expired)
+        
+        job_data = {
+            'organization_id': organization_id,
+            'user_id': user_id,
+            'keyword_set_version': version,
+            'apply_recommendations': apply_recommendations,
+            'initiated_at': datetime.utcnow().isoformat(),
+            'task_type': 'keyword_effectiveness_report'
+        }
+        
+        job = self.queue.enqueue(
+            'services.async_processing.generate_keyword_effectiveness_report',
+            job_data,
+            job_timeout='1h',
+            job_id=job_id
+        )
+        
+        from models import log_admin_event
+        log_admin_event(
+            event_type='keyword_effectiveness_report_initiated',
+            user_id=user_id,
+            org_id=organization_id,
+            ip=None,
+            data={'job_id': job.id, 'apply_recommendations': apply_recommendations},
+            action_details="Initiated keyword effectiveness analysis"
+        )
+        
+        return job.id
+    
     def get_job_status(self, job_id: str) -> Dict[str, Any]:
         """Get detailed status of an async job"""
         try:
@@ -186,8 +275,12 @@ def batch_generate_prep_sheets(job_data: Dict[str, Any]):
     """
     Background job: Generate preparation sheets for multiple patients
     """
-    from app import app
+    from app import get_app
+    from rq import get_current_job
+    from models import Patient, log_admin_event
     from prep_sheet.generator import PrepSheetGenerator
+    from services.worker_context import get_fhir_service
+    app = get_app()
     
     with app.app_context():
         organization_id = job_data['organization_id']
@@ -197,8 +290,8 @@ def batch_generate_prep_sheets(job_data: Dict[str, Any]):
         
         logger.info(f"Starting batch prep sheet generation for {len(patient_ids)} patients")
         
-        # Initialize services
-        epic_service = EpicFHIRService(organization_id)
+        # Initialize services (FHIR client reused across jobs by warm workers)
+        epic_service = get_fhir_service(organization_id)
         prep_generator = PrepSheetGenerator()
         
         results = {
@@ -209,7 +302,7 @@ def batch_generate_prep_sheets(job_data: Dict[str, Any]):
         }
         
         # Update job progress
-        job = Job.fetch(job_data.get('job_id', ''), connection=Redis.from_url('redis://localhost:6379/0'))
+        job = get_current_job()
         
         for i, patient_id in enumerate(patient_ids):
             try:
@@ -220,8 +313,9 @@ def batch_generate_prep_sheets(job_data: Dict[str, Any]):
                     'percentage': round((i + 1) / len(patient_ids) * 100, 1),
                     'current_patient_id': patient_id
                 }
-                job.meta['progress'] = progress
-                job.save_meta()
+                if job is not None:
+                    job.meta['progress'] = progress
+                    job.save_meta()
                 
                 patient = Patient.query.get(patient_id)
                 if not patient:
@@ -299,7 +393,11 @@ def batch_process_fhir_documents(job_data: Dict[str, Any]):
     """
     Background job: Process FHIR documents (OCR, relevance scoring)
     """
-    from app import app
+    from app import get_app
+    from rq import get_current_job
+    from models import FHIRDocument
+    from services.worker_context import get_fhir_service
+    app = get_app()
     
     with app.app_context():
         organization_id = job_data['organization_id']
@@ -308,7 +406,7 @@ def batch_process_fhir_documents(job_data: Dict[str, Any]):
         
         logger.info(f"Starting batch document processing for {len(fhir_document_ids)} documents")
         
-        epic_service = EpicFHIRService(organization_id)
+        epic_service = get_fhir_service(organization_id)
         
         results = {
             'successful_processing': [],
@@ -318,7 +416,7 @@ def batch_process_fhir_documents(job_data: Dict[str, Any]):
         }
         
         # Update job progress
-        job = Job.fetch(job_data.get('job_id', ''), connection=Redis.from_url('redis://localhost:6379/0'))
+        job = get_current_job()
         
         for i, doc_id in enumerate(fhir_document_ids):
             try:
@@ -329,8 +427,9 @@ def batch_process_fhir_documents(job_data: Dict[str, Any]):
                     'percentage': round((i + 1) / len(fhir_document_ids) * 100, 1),
                     'current_document_id': doc_id
                 }
-                job.meta['progress'] = progress
-                job.save_meta()
+                if job is not None:
+                    job.meta['progress'] = progress
+                    job.save_meta()
                 
                 fhir_doc = FHIRDocument.query.get(doc_id)
                 if not fhir_doc:
@@ -366,6 +465,91 @@ def batch_process_fhir_documents(job_data: Dict[str, Any]):
         return results
 
 
+def backfill_text_compression(job_data: Dict[str, Any]):
+    """
+    Background job: Compress existing plaintext OCR text / FHIR JSON rows
+    """
+    from app import get_app
+    from rq import get_current_job
+    from utils.text_compression import backfill_compressed_columns
+    app = get_app()
+    
+    with app.app_context():
+        job = get_current_job()
+        
+        def report_progress(table_name, column_name, last_id, stats):
+            if job is not None:
+                job.meta['progress'] = {
+                    'column': f"{table_name}.{column_name}",
+                    'last_id': last_id,
+                    'rows_compressed': stats['rows_compressed']
+                }
+                job.save_meta()
+        
+        results = backfill_compressed_columns(
+            batch_size=job_data.get('batch_size', 500),
+            dry_run=job_data.get('dry_run', False),
+            progress_callback=report_progress
+        )
+        
+        bytes_before = sum(r['bytes_before'] for r in results.values())
+        bytes_after = sum(r['bytes_after'] for r in results.values())
+        logger.info(f"Text compression backfill completed: {bytes_before:,} -> {bytes_after:,} bytes")
+        
+        return {
+            'columns': results,
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'completed_at': datetime.utcnow().isoformat()
+        }
+
+
+def generate_keyword_effectiveness_report(job_data: Dict[str, Any]):
+    """
+    Background job: Scan an organization's documents once and cache its keyword effectiveness report
+    """
+    from app import get_app
+    from rq import get_current_job
+    from core import keyword_effectiveness
+    from utils.app_cache import set_cached_keyword_report
+    app = get_app()
+    
+    with app.app_context():
+        organization_id = job_data['organization_id']
+        job = get_current_job()
+        
+        if job_data.get('apply_recommendations'):
+            from core.engine import ScreeningEngine
+            results = ScreeningEngine().optimize_all_screening_keywords(org_id=organization_id)
+            return {
+                'organization_id': organization_id,
+                'screening_types': len(results),
+                'completed_at': datetime.utcnow().isoformat()
+            }
+        
+        def report_progress(documents_scanned, last_document_id):
+            if job is not None:
+                job.meta['progress'] = {
+                    'documents_scanned': documents_scanned,
+                    'last_document_id': last_document_id
+                }
+                job.save_meta()
+        
+        report = keyword_effectiveness.build_keyword_effectiveness_report(
+            organization_id, progress_callback=report_progress
+        )
+        set_cached_keyword_report(organization_id, report['keyword_set_version'], report)
+        
+        return {
+            'organization_id': organization_id,
+            'keyword_set_version': report['keyword_set_version'],
+            'documents_scanned': report['documents_scanned'],
+            'screening_types': len(report['screening_types']),
+            'elapsed_seconds': report['elapsed_seconds'],
+            'completed_at': datetime.utcnow().isoformat()
+        }
+
+
 # Factory function for easy service access
 def get_async_processing_service() -> AsyncProcessingService:
     """Get async processing service instance"""
@@ -125,20 +125,13 @@ class ComprehensiveEMRSync:
             return False
         
         try:
-            # Get all active screening types for this organization
-            active_screening_types = ScreeningType.query.filter_by(
-                org_id=patient.org_id,
-                is_active=True
-            ).all()
-            
-            # Find the most recent criteria change across all screening types
+            # Find the most recent criteria change across all active screening types
             # This uses the deterministic criteria_last_changed_at field that's updated
             # only when criteria_signature (SHA-256 of keywords/eligibility/frequency) changes
-            latest_criteria_change = None
-            for st in active_screening_types:
-                if st.criteria_last_changed_at:
-                    if latest_criteria_change is None or st.criteria_last_changed_at > latest_criteria_change:
-                        latest_criteria_change = st.criteria_last_changed_at
+            # PERFORMANCE: Read from the cached org rule set instead of loading every
+            # ScreeningType row for each patient in the sync
+            from utils.app_cache import get_latest_criteria_change
+            latest_criteria_change = get_latest_criteria_change(patient.org_id)
             
             # Check if patient needs re-evaluation based on criteria changes
             # This uses the deterministic method on Patient model
@@ -1667,7 +1660,7 @@ class ComprehensiveEMRSync:
                 patient_id=patient.id
             ).filter(
                 Document.created_at >= cutoff_date
-            ).all()
+            ).options(Document.text_loader_option()).all()
             
             for doc in manual_documents:
                 if self._document_contains_screening_evidence_generic(doc.ocr_text, keywords):
@@ -1693,7 +1686,7 @@ class ComprehensiveEMRSync:
                 patient_id=patient.id
             ).filter(
                 FHIRDocument.document_date >= cutoff_date
-            ).all()
+            ).options(FHIRDocument.text_loader_option()).all()
             
             for doc in fhir_documents:
                 if self._document_contains_screening_evidence_generic(doc.ocr_text, keywords):
@@ -0,0 +1,196 @@
+"""
+Dormancy Planner - set-based screening dormancy updates
+
+Appointment-based prioritization keeps screenings of patients with upcoming
+appointments active and marks the rest of the organization dormant (stale).
+Previously this was applied one patient at a time: one SELECT plus one UPDATE
+per scheduled, non-scheduled and stale patient, i.e. thousands of statements
+per refresh for a large organization.
+
+The planner computes the desired sets once and applies them with a handful of
+set-based statements:
+
+    UPDATE screening SET is_dormant = ...
+     WHERE org_id = :org
+       AND patient_id [NOT] IN (:priority_ids | SELECT id FROM patient WHERE ...)
+
+Only the priority set (patients with appointments in the window, plus patients
+processed today) is materialized in Python - it is bounded by the appointment
+window. The non-scheduled set, which is most of the organization, stays in SQL
+as a subquery. Each statement only touches rows whose state actually changes,
+and the row counts are returned so callers can report them.
+
+Semantics match the previous per-patient logic:
+- Patients refreshed in this run are stamped active (last_processed = now)
+- Priority patients' dormant screenings are reactivated
+- process_non_scheduled_patients enabled: dormant non-scheduled screenings are
+  reactivated, none are marked dormant
+- process_non_scheduled_patients disabled: non-scheduled screenings are marked
+  dormant unless processed since the organization's local midnight
+  ("active for the day") or exempted (manually refreshed this cycle)
+
+The caller owns the transaction and commits.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set
+
+from sqlalchemy import or_, select
+
+from models import db, Organization, Patient, Screening, queue_app_cache_invalidation
+
+logger = logging.getLogger(__name__)
+
+
+class DormancyPlanner:
+    """Compute dormancy patient sets once and apply them with set-based UPDATEs"""
+
+    def __init__(self, organization_id: int, organization: Optional[Organization] = None):
+        self.organization_id = organization_id
+        self.organization = organization or Organization.query.get(organization_id)
+
+    def plan(self, priority_patient_ids: Optional[Iterable[int]] = None,
+             processed_patient_ids: Optional[Iterable[int]] = None,
+             exempt_patient_ids: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+        """
+        Compute the dormancy plan for the organization.
+
+        Args:
+            priority_patient_ids: Priority patients, if the caller already computed
+                them (otherwise loaded from AppointmentBasedPrioritization)
+            processed_patient_ids: Patients refreshed in this run - all of their
+                screenings are marked active and stamped as processed now
+            exempt_patient_ids: Patients that must not be marked dormant this cycle
+                (e.g. manually refreshed patients)
+
+        Returns:
+            Plan dict consumed by apply(); 'enabled' is False when appointment
+            prioritization is off (nothing to apply)
+        """
+        organization = self.organization
+        plan = {
+            'enabled': bool(organization and organization.appointment_based_prioritization),
+            'process_non_scheduled': bool(organization and organization.process_non_scheduled_patients),
+            'priority_patient_ids': set(),
+            'processed_patient_ids': set(processed_patient_ids or ()),
+            'exempt_patient_ids': set(exempt_patient_ids or ()),
+            'today_start': None,
+            'now': datetime.utcnow(),
+        }
+        if not plan['enabled']:
+            return plan
+
+        if priority_patient_ids is None:
+            from services.appointment_prioritization import AppointmentBasedPrioritization
+            priority_patient_ids = AppointmentBasedPrioritization(self.organization_id).get_priority_patients()
+        plan['priority_patient_ids'] = set(priority_patient_ids)
+
+        # "Active for the day" boundary uses the organization's local midnight
+        from utils.date_helpers import get_local_midnight_utc
+        plan['today_start'] = get_local_midnight_utc(organization.timezone or 'UTC')
+
+        return plan
+
+    def _non_scheduled_patients(self, excluded_ids: Set[int]):
+        """Subquery of the organization's patients outside excluded_ids"""
+        query = select(Patient.id).where(Patient.org_id == self.organization_id)
+        if excluded_ids:
+            query = query.where(~Patient.id.in_(excluded_ids))
+        return query
+
+    def _update(self, criteria, values: Dict[str, Any]) -> int:
+        return Screening.query.filter(
+            Screening.org_id == self.organization_id, *criteria
+        ).update(values, synchronize_session=False)
+
+    def apply(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Apply a plan with set-based UPDATE statements.
+
+        Returns:
+            Dict with per-statement row counts and 'rows_changed' total
+        """
+        result = {
+            'applied': False,
+            'processed_marked_active': 0,
+            'priority_patients_activated': 0,
+            'non_scheduled_reactivated': 0,
+            'non_scheduled_marked_dormant': 0,
+            'manually_refreshed_exempted': 0,
+            'rows_changed': 0,
+            'statements': 0,
+        }
+        if not plan['enabled']:
+            return result
+
+        now = plan['now']
+        priority_ids = plan['priority_patient_ids']
+        processed_ids = plan['processed_patient_ids']
+        exempt_ids = plan['exempt_patient_ids']
+        active_values = {'is_dormant': False, 'last_processed': now}
+
+        # 1. Patients refreshed in this run: active and processed now
+        if processed_ids:
+            result['processed_marked_active'] = self._update(
+                [Screening.patient_id.in_(processed_ids)], active_values
+            )
+            result['statements'] += 1
+
+        # 2. Priority patients not refreshed in this run: reactivate dormant screenings
+        remaining_priority = priority_ids - processed_ids
+        if remaining_priority:
+            result['priority_patients_activated'] = self._update(
+                [Screening.patient_id.in_(remaining_priority), Screening.is_dormant == True],
+                active_values
+            )
+            result['statements'] += 1
+
+        # Everyone outside the priority set (and this run's processed patients)
+        non_scheduled = self._non_scheduled_patients(priority_ids | processed_ids)
+
+        if plan['process_non_scheduled']:
+            # 3a. Keep all non-scheduled patients processable - reactivate, never mark dormant
+            result['non_scheduled_reactivated'] = self._update(
+                [Screening.patient_id.in_(non_scheduled), Screening.is_dormant == True],
+                active_values
+            )
+            result['statements'] += 1
+        else:
+            # 3b. Mark non-scheduled dormant, except exempted patients and
+            # screenings already processed today (active for the day)
+            if exempt_ids:
+                result['manually_refreshed_exempted'] = len(exempt_ids - priority_ids - processed_ids)
+                non_scheduled = non_scheduled.where(~Patient.id.in_(exempt_ids))
+            result['non_scheduled_marked_dormant'] = self._update(
+                [
+                    Screening.patient_id.in_(non_scheduled),
+                    Screening.is_dormant == False,
+                    or_(
+                        Screening.last_processed.is_(None),
+                        Screening.last_processed < plan['today_start']
+                    )
+                ],
+                {'is_dormant': True}
+            )
+            result['statements'] += 1
+
+        result['rows_changed'] = (
+            result['processed_marked_active'] + result['priority_patients_activated']
+            + result['non_scheduled_reactivated'] + result['non_scheduled_marked_dormant']
+        )
+        result['applied'] = True
+
+        # Priority set includes today's non-dormant patients - refresh it after commit
+        queue_app_cache_invalidation(db.session, 'priority_patients', self.organization_id)
+
+        logger.info(
+            f"Dormancy plan applied for org {self.organization_id}: {result['rows_changed']} rows changed "
+            f"in {result['statements']} statements (priority={len(priority_ids)}, "
+            f"processed={len(processed_ids)}, exempt={len(exempt_ids)})"
+        )
+        return result
+
+    def plan_and_apply(self, **plan_options) -> Dict[str, Any]:
+        """Convenience wrapper: compute the plan and apply it"""
+        return self.apply(self.plan(**plan_options))
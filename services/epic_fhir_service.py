@@ -32,7 +32,8 @@ class EpicFHIRService:
     - Provider-scoped patient rosters
     """
     
-    def __init__(self, organization_id: int = None, provider_id: int = None, background_context: bool = False):
+    def __init__(self, organization_id: int = None, provider_id: int = None, background_context: bool = False,
+                 fhir_client: Optional[FHIRClient] = None):
         """
         Initialize Epic FHIR service.
         
@@ -40,6 +41,8 @@ class EpicFHIRService:
             organization_id: Organization ID (required for org-level or if provider not specified)
             provider_id: Provider ID for provider-specific access (preferred for v2.1)
             background_context: True for background jobs (uses database tokens)
+            fhir_client: Already-authenticated organization client to reuse (background
+                         context only; see services/worker_context.py)
         """
         self.provider_id = provider_id
         self.provider = None
@@ -90,6 +93,10 @@ class EpicFHIRService:
                     # This prevents PHI exposure across provider boundaries
                     logger.warning(f"Provider {self.provider_id} not Epic-connected, no FHIR client available")
                     self.fhir_client = None
+            elif self.is_background and fhir_client is not None:
+                # Background context with a client reused from an earlier job
+                fhir_client.organization = self.organization
+                self.fhir_client = fhir_client
             elif self.is_background:
                 # Background context: use stored credentials from database
                 logger.info(f"Creating background Epic FHIR client for organization {self.organization_id}")
@@ -10,7 +10,6 @@ import json
 import copy
 from datetime import datetime
 from io import BytesIO
-from weasyprint import HTML, CSS
 from flask import render_template_string
 from emr.fhir_client import FHIRClient
 from models import Patient, Organization, Screening, EpicCredentials, FHIRDocument, log_admin_event
@@ -718,7 +717,7 @@ class EpicWriteBackService:
             # which blocks because the server is waiting for this response to complete.
             # The custom fetcher intercepts /static/... URLs and reads files directly from disk.
             from flask import current_app, has_app_context
-            from weasyprint import default_url_fetcher
+            from weasyprint import HTML, default_url_fetcher  # deferred: heavy import (Pango/cairo)
             import os
             from urllib.parse import urlparse
             from pathlib import Path
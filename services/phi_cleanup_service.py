@@ -5,22 +5,44 @@ Responsible for:
 2. Maintaining system efficiency by removing irrelevant PHI data
 3. Enhancing security by limiting PHI retention
 4. Configurable cleanup policies per screening type
+
+PERFORMANCE: eligibility is decided in SQL. Each active screening type
+contributes one set of conditions (its cutoff date, the patient having that
+screening, no later completion that the document could be evidence for), and
+matching document IDs are walked in id order in chunks of `batch_size`. Each
+chunk is cleared with one UPDATE and committed on its own, so a multi-year
+organization never holds one huge transaction or loads OCR text into memory.
+Progress is logged and passed to an optional callback after every chunk.
+
+Orphaned documents (no active screening type relevant) are pre-filtered in
+SQL: a stored match to an active screening type already proves relevance.
+Only the remaining candidates are loaded, one chunk at a time, for the
+keyword relevance check.
+
+The bulk UPDATE bypasses ORM events, so the documents_processed analytics
+counters (admin/analytics_counters.py) are adjusted explicitly per chunk.
+
+estimate_cleanup() (and cleanup_options['dry_run']) reports what would be
+cleaned with aggregate queries only: document counts and the stored size of
+the OCR text (SQL length(), so the text is never read or decompressed).
 """
 
 import json
 import logging
 from datetime import datetime, timedelta, date
-from typing import Dict, List, Optional, Set, Any
+from typing import Callable, Dict, List, Optional, Set, Any
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import or_, and_
+from sqlalchemy import Date, and_, exists, func, or_, select
 
 from models import (
     db, Patient, Screening, ScreeningType, Document, AdminLog,
-    PrepSheetSettings
+    PrepSheetSettings, ScreeningDocumentMatch
 )
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CLEANUP_BATCH_SIZE = 500
+
 
 class PHICleanupService:
     """
@@ -37,6 +59,7 @@ class PHICleanupService:
             'phi_data_cleared': 0,
             'bytes_freed': 0,
             'screening_types_processed': 0,
+            'batches': 0,
             'errors': [],
             'start_time': None,
             'end_time': None
@@ -44,13 +67,17 @@ class PHICleanupService:
         
         logger.info(f"PHICleanupService initialized for organization {organization_id}")
     
-    def cleanup_old_phi_data(self, cleanup_options: Optional[Dict] = None) -> Dict[str, Any]:
+    def cleanup_old_phi_data(self, cleanup_options: Optional[Dict] = None,
+                             progress_callback: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Any]:
         """
         Main entry point for PHI cleanup
         Removes OCR text from documents beyond relevant frequency periods
         
         Args:
             cleanup_options: Configuration options for cleanup behavior
+            progress_callback: Called as progress_callback(phase, stats) after each
+                               committed chunk; phase is the screening type name or
+                               'orphaned'
             
         Returns:
             Dict with cleanup results and statistics
@@ -58,6 +85,17 @@ class PHICleanupService:
         if cleanup_options is None:
             cleanup_options = self._get_default_cleanup_options()
         
+        if cleanup_options.get('dry_run'):
+            estimate = self.estimate_cleanup(cleanup_options)
+            return {
+                'success': 'error' not in estimate,
+                'dry_run': True,
+                'message': f"Dry run: {estimate.get('total_cleanable_documents', 0)} documents, "
+                           f"~{estimate.get('estimated_bytes_to_clean', 0)} bytes would be freed",
+                'estimate': estimate,
+                'stats': self.cleanup_stats
+            }
+        
         self.cleanup_stats['start_time'] = datetime.utcnow()
         
         try:
@@ -70,10 +108,7 @@ class PHICleanupService:
             })
             
             # Get all screening types to determine frequency periods
-            screening_types = ScreeningType.query.filter_by(
-                org_id=self.organization_id,
-                is_active=True
-            ).all()
+            screening_types = self._get_active_screening_types()
             
             if not screening_types:
                 logger.info("No active screening types found - early termination")
@@ -87,18 +122,23 @@ class PHICleanupService:
             total_cleaned = 0
             for screening_type in screening_types:
                 try:
-                    cleaned_count = self._cleanup_phi_for_screening_type(screening_type, cleanup_options)
+                    cleaned_count = self._cleanup_phi_for_screening_type(
+                        screening_type, cleanup_options, progress_callback
+                    )
                     total_cleaned += cleaned_count
                     self.cleanup_stats['screening_types_processed'] += 1
                     
                 except Exception as e:
+                    db.session.rollback()
                     error_msg = f"Error cleaning PHI for screening type {screening_type.id}: {str(e)}"
                     logger.error(error_msg)
                     self.cleanup_stats['errors'].append(error_msg)
             
             # Clean up documents with no associated screenings (orphaned)
             if cleanup_options.get('cleanup_orphaned', True):
-                orphaned_cleaned = self._cleanup_orphaned_documents(cleanup_options)
+                orphaned_cleaned = self._cleanup_orphaned_documents(
+                    screening_types, cleanup_options, progress_callback
+                )
                 total_cleaned += orphaned_cleaned
             
             # Early termination if no cleanup was needed
@@ -114,7 +154,6 @@ class PHICleanupService:
                     'stats': self.cleanup_stats
                 }
             
-            db.session.commit()
             self.cleanup_stats['end_time'] = datetime.utcnow()
             
             # Log successful completion
@@ -133,6 +172,7 @@ class PHICleanupService:
             }
             
         except Exception as e:
+            # Chunks committed before the failure stay cleaned
             db.session.rollback()
             error_msg = f"PHI cleanup failed: {str(e)}"
             logger.error(error_msg)
@@ -153,40 +193,28 @@ class PHICleanupService:
                 'stats': self.cleanup_stats
             }
     
-    def _cleanup_phi_for_screening_type(self, screening_type: ScreeningType, 
-                                       cleanup_options: Dict) -> int:
+    def _get_active_screening_types(self) -> List[ScreeningType]:
+        return ScreeningType.query.filter_by(
+            org_id=self.organization_id,
+            is_active=True
+        ).all()
+    
+    def _cleanup_phi_for_screening_type(self, screening_type: ScreeningType, cleanup_options: Dict,
+                                        progress_callback: Optional[Callable] = None) -> int:
         """Clean PHI data for documents beyond a screening type's frequency period"""
-        cleaned_count = 0
+        # Calculate cutoff date based on screening frequency
+        cutoff_date = self._calculate_cutoff_date(screening_type, cleanup_options)
         
-        try:
-            # Calculate cutoff date based on screening frequency
-            cutoff_date = self._calculate_cutoff_date(screening_type, cleanup_options)
-            
-            logger.debug(f"Cleaning PHI for {screening_type.name} with cutoff date: {cutoff_date}")
-            
-            # Find documents older than the cutoff that have OCR text
-            # Only clean documents that match this screening type's keywords
-            old_documents = self._find_old_documents_for_screening(screening_type, cutoff_date)
-            
-            for document in old_documents:
-                try:
-                    if self._should_clean_document(document, screening_type, cutoff_date):
-                        bytes_freed = self._clean_document_phi(document)
-                        if bytes_freed > 0:
-                            cleaned_count += 1
-                            self.cleanup_stats['phi_data_cleared'] += 1
-                            self.cleanup_stats['bytes_freed'] += bytes_freed
-                            
-                except Exception as e:
-                    logger.error(f"Error cleaning document {document.id}: {str(e)}")
-                    self.cleanup_stats['errors'].append(f"Document {document.id}: {str(e)}")
-            
-            logger.info(f"Cleaned {cleaned_count} documents for screening type {screening_type.name}")
-            
-        except Exception as e:
-            logger.error(f"Error processing screening type {screening_type.id}: {str(e)}")
-            raise
+        logger.debug(f"Cleaning PHI for {screening_type.name} with cutoff date: {cutoff_date}")
+        
+        cleaned_count = self._clear_in_chunks(
+            self._screening_type_conditions(screening_type, cutoff_date),
+            screening_type.name,
+            cleanup_options.get('batch_size', DEFAULT_CLEANUP_BATCH_SIZE),
+            progress_callback
+        )
         
+        logger.info(f"Cleaned {cleaned_count} documents for screening type {screening_type.name}")
         return cleaned_count
     
     def _calculate_cutoff_date(self, screening_type: ScreeningType, cleanup_options: Dict) -> date:
@@ -227,166 +255,185 @@ class PHICleanupService:
             # Default to 1 year ago for safety
             return date.today() - relativedelta(years=1)
     
-    def _find_old_documents_for_screening(self, screening_type: ScreeningType, 
-                                         cutoff_date: date) -> List[Document]:
-        """Find documents older than cutoff that are relevant to this screening type"""
-        try:
-            # Get documents that:
-            # 1. Are older than the cutoff date
-            # 2. Have OCR text (PHI to clean)
-            # 3. Belong to patients with this screening type
-            
-            # Get patient IDs that have this screening type
-            patient_ids_with_screening = db.session.query(Screening.patient_id).filter(
-                Screening.screening_type_id == screening_type.id,
-                Screening.org_id == self.organization_id
-            ).distinct().subquery()
-            
-            old_documents = Document.query.filter(
-                Document.org_id == self.organization_id,
-                Document.patient_id.in_(patient_ids_with_screening),
-                Document.ocr_text.isnot(None),
-                Document.ocr_text != '',
-                or_(
-                    Document.document_date < cutoff_date,
-                    and_(
-                        Document.document_date.is_(None),
-                        Document.created_at < cutoff_date
-                    )
+    def _document_date(self):
+        """SQL date a document is judged by: EMR document date, else its creation day"""
+        return func.coalesce(Document.document_date, func.date(Document.created_at, type_=Date))
+    
+    def _phi_conditions(self, cutoff_date: date) -> List:
+        """Documents of this organization with OCR text, dated before cutoff_date"""
+        return [
+            Document.org_id == self.organization_id,
+            Document.ocr_text.isnot(None),
+            Document.ocr_text != '',
+            or_(
+                Document.document_date < cutoff_date,
+                and_(
+                    Document.document_date.is_(None),
+                    Document.created_at < cutoff_date
                 )
-            ).all()
-            
-            return old_documents
-            
-        except Exception as e:
-            logger.error(f"Error finding old documents for screening type {screening_type.id}: {str(e)}")
-            return []
+            )
+        ]
     
-    def _should_clean_document(self, document: Document, screening_type: ScreeningType, 
-                              cutoff_date: date) -> bool:
-        """Determine if a document should have its PHI cleaned"""
-        try:
-            # Don't clean if document is still within the relevance period
-            doc_date = document.document_date or document.created_at.date()
-            if doc_date >= cutoff_date:
-                return False
-            
-            # Don't clean if document has no OCR text
-            if not document.ocr_text or document.ocr_text.strip() == '':
-                return False
-            
-            # Check if this document is still relevant to any active screenings
-            # If the patient has a recent screening completion for this type, keep the OCR
-            recent_screening = Screening.query.filter(
-                Screening.patient_id == document.patient_id,
-                Screening.screening_type_id == screening_type.id,
-                Screening.last_completed.isnot(None)
-            ).order_by(Screening.last_completed.desc()).first()
-            
-            if recent_screening and recent_screening.last_completed:
-                # If the document is the most recent completion, keep it
-                if doc_date >= recent_screening.last_completed:
-                    logger.debug(f"Preserving document {document.id} - most recent completion for screening")
-                    return False
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error evaluating document {document.id} for cleanup: {str(e)}")
-            return False
+    def _has_screening_of_type(self, screening_type: ScreeningType):
+        """The document's patient has a screening of this type"""
+        return exists().where(
+            Screening.patient_id == Document.patient_id,
+            Screening.screening_type_id == screening_type.id,
+            Screening.org_id == self.organization_id
+        )
     
-    def _clean_document_phi(self, document: Document) -> int:
-        """Clean PHI data from a document and return bytes freed"""
-        try:
-            bytes_freed = 0
-            
-            # Calculate bytes freed
-            if document.ocr_text:
-                bytes_freed = len(document.ocr_text.encode('utf-8'))
-            
-            # Clear OCR text but preserve metadata
-            document.ocr_text = None
-            document.processed_at = None  # Mark as needing reprocessing if accessed again
-            document.updated_at = datetime.utcnow()
-            
-            # Add cleanup marker to track what was cleaned
-            if not hasattr(document, 'phi_cleaned_at'):
-                # Add field if doesn't exist - this would need a migration in a real system
-                pass
-            
-            logger.debug(f"Cleaned {bytes_freed} bytes of PHI from document {document.id}")
-            
-            return bytes_freed
-            
-        except Exception as e:
-            logger.error(f"Error cleaning PHI from document {document.id}: {str(e)}")
-            return 0
+    def _screening_type_conditions(self, screening_type: ScreeningType, cutoff_date: date) -> List:
+        """
+        Documents whose PHI is past a screening type's relevance period.
+        
+        The patient has a screening of this type, the document predates the
+        cutoff, and it is not evidence for the latest completion: either the
+        screening was never completed, or it was completed after the document.
+        """
+        completed = and_(
+            Screening.patient_id == Document.patient_id,
+            Screening.screening_type_id == screening_type.id,
+            Screening.last_completed.isnot(None)
+        )
+        return self._phi_conditions(cutoff_date) + [
+            self._has_screening_of_type(screening_type),
+            or_(
+                ~exists().where(completed),
+                exists().where(completed, Screening.last_completed > self._document_date())
+            )
+        ]
+    
+    def _orphan_conditions(self, screening_types: List[ScreeningType], cleanup_options: Dict) -> List:
+        """Orphan candidates: old documents with no stored match to an active screening type"""
+        retention_days = cleanup_options.get('orphan_retention_days', 90)
+        cutoff_date = date.today() - timedelta(days=retention_days)
+        
+        conditions = self._phi_conditions(cutoff_date)
+        type_ids = [st.id for st in screening_types]
+        if type_ids:
+            conditions.append(~exists().where(
+                ScreeningDocumentMatch.document_id == Document.id,
+                ScreeningDocumentMatch.screening_id == Screening.id,
+                Screening.screening_type_id.in_(type_ids)
+            ))
+        return conditions
+    
+    def _clear_in_chunks(self, conditions: List, phase: str, batch_size: int,
+                         progress_callback: Optional[Callable] = None,
+                         keep_ids: Optional[Callable[[List[int]], Set[int]]] = None) -> int:
+        """
+        Clear OCR text from every document matching conditions, one committed chunk at a time.
+        
+        Walks document IDs in order (keyset pagination). keep_ids, if given,
+        receives each chunk's IDs and returns those to preserve.
+        
+        Returns:
+            Number of documents cleaned
+        """
+        from admin.analytics_counters import queue_counter_delta, DOCUMENTS_PROCESSED
+        
+        cleaned_count = 0
+        last_id = 0
+        
+        while True:
+            rows = db.session.execute(
+                select(Document.id, Document.processed_at, func.length(Document.ocr_text).label('stored_length'))
+                .where(*conditions)
+                .where(Document.id > last_id)
+                .order_by(Document.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            
+            last_id = rows[-1].id
+            self.cleanup_stats['documents_processed'] += len(rows)
+            
+            keep = keep_ids([row.id for row in rows]) if keep_ids else set()
+            rows = [row for row in rows if row.id not in keep]
+            if not rows:
+                continue
+            
+            try:
+                # Clear OCR text but preserve metadata; processed_at = None marks the
+                # document as needing reprocessing if accessed again
+                cleared = Document.query.filter(
+                    Document.id.in_([row.id for row in rows]),
+                    Document.ocr_text.isnot(None)
+                ).update({
+                    Document._ocr_text: None,
+                    Document.processed_at: None,
+                    Document.updated_at: datetime.utcnow()
+                }, synchronize_session=False)
+                
+                # Query.update() bypasses the flush-time counter hooks
+                for row in rows:
+                    if row.processed_at:
+                        queue_counter_delta(db.session, self.organization_id, DOCUMENTS_PROCESSED, -1,
+                                            row.processed_at.date())
+                
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                error_msg = f"Error cleaning {phase} documents near id {last_id}: {str(e)}"
+                logger.error(error_msg)
+                self.cleanup_stats['errors'].append(error_msg)
+                break
+            
+            cleaned_count += cleared
+            self.cleanup_stats['batches'] += 1
+            self.cleanup_stats['phi_data_cleared'] += cleared
+            self.cleanup_stats['bytes_freed'] += sum(row.stored_length or 0 for row in rows)
+            
+            logger.info(f"PHI cleanup ({phase}): cleared {cleared} documents through id {last_id}, "
+                        f"{self.cleanup_stats['phi_data_cleared']} total")
+            if progress_callback:
+                progress_callback(phase, self.cleanup_stats)
+        
+        return cleaned_count
     
-    def _cleanup_orphaned_documents(self, cleanup_options: Dict) -> int:
+    def _cleanup_orphaned_documents(self, screening_types: List[ScreeningType], cleanup_options: Dict,
+                                    progress_callback: Optional[Callable] = None) -> int:
         """Clean up documents that are not associated with any active screenings"""
         cleaned_count = 0
         
         try:
             logger.info("Cleaning up orphaned documents")
             
-            # Find documents with no associated screenings (older than retention period)
-            retention_days = cleanup_options.get('orphan_retention_days', 90)
-            cutoff_date = date.today() - timedelta(days=retention_days)
-            
-            # Get documents that:
-            # 1. Are older than retention period
-            # 2. Have OCR text
-            # 3. Patient has no active screenings, or document doesn't match any screening keywords
-            
-            orphaned_documents = Document.query.filter(
-                Document.org_id == self.organization_id,
-                Document.ocr_text.isnot(None),
-                Document.ocr_text != '',
-                or_(
-                    Document.document_date < cutoff_date,
-                    and_(
-                        Document.document_date.is_(None),
-                        Document.created_at < cutoff_date
-                    )
-                )
-            ).all()
+            from core.matcher import DocumentMatcher
+            matcher = DocumentMatcher()
             
-            for document in orphaned_documents:
-                try:
-                    # Check if document matches any screening keywords
-                    has_screening_relevance = self._document_has_screening_relevance(document)
-                    
-                    if not has_screening_relevance:
-                        bytes_freed = self._clean_document_phi(document)
-                        if bytes_freed > 0:
-                            cleaned_count += 1
-                            self.cleanup_stats['phi_data_cleared'] += 1
-                            self.cleanup_stats['bytes_freed'] += bytes_freed
-                            logger.debug(f"Cleaned orphaned document {document.id}")
-                    
-                except Exception as e:
-                    logger.error(f"Error cleaning orphaned document {document.id}: {str(e)}")
-                    self.cleanup_stats['errors'].append(f"Orphaned document {document.id}: {str(e)}")
+            def relevant_ids(document_ids: List[int]) -> Set[int]:
+                # Only candidates without a stored match are loaded, one chunk at a time
+                documents = Document.query.filter(Document.id.in_(document_ids)).options(
+                    Document.text_loader_option()
+                ).all()
+                return {
+                    document.id for document in documents
+                    if self._document_has_screening_relevance(document, screening_types, matcher)
+                }
+            
+            cleaned_count = self._clear_in_chunks(
+                self._orphan_conditions(screening_types, cleanup_options),
+                'orphaned',
+                cleanup_options.get('batch_size', DEFAULT_CLEANUP_BATCH_SIZE),
+                progress_callback,
+                keep_ids=relevant_ids
+            )
             
             logger.info(f"Cleaned {cleaned_count} orphaned documents")
             
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error cleaning orphaned documents: {str(e)}")
+            self.cleanup_stats['errors'].append(f"Orphaned documents: {str(e)}")
         
         return cleaned_count
     
-    def _document_has_screening_relevance(self, document: Document) -> bool:
+    def _document_has_screening_relevance(self, document: Document, screening_types: List[ScreeningType],
+                                          matcher) -> bool:
         """Check if a document is relevant to any active screening types"""
         try:
-            # Get all active screening types for this organization
-            screening_types = ScreeningType.query.filter_by(
-                org_id=self.organization_id,
-                is_active=True
-            ).all()
-            
-            from core.matcher import DocumentMatcher
-            matcher = DocumentMatcher()
-            
             # Check if document matches any screening type keywords
             for screening_type in screening_types:
                 # Use the internal method to calculate match confidence
@@ -400,8 +447,25 @@ class PHICleanupService:
             logger.error(f"Error checking document relevance for {document.id}: {str(e)}")
             return True  # Conservative - assume relevant if we can't check
     
-    def get_phi_cleanup_report(self) -> Dict[str, Any]:
-        """Generate a report of PHI data that could be cleaned"""
+    def _aggregate(self, conditions: List) -> Dict[str, int]:
+        """Document count and stored OCR text size, computed in SQL"""
+        count, stored = db.session.execute(
+            select(func.count(Document.id), func.coalesce(func.sum(func.length(Document.ocr_text)), 0))
+            .where(*conditions)
+        ).one()
+        return {'documents': count, 'bytes': int(stored)}
+    
+    def estimate_cleanup(self, cleanup_options: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Dry run: what a cleanup would clear, without loading any OCR text.
+        
+        Per screening type and in total (a document eligible under several
+        types is counted once). Orphan figures are an upper bound: the keyword
+        relevance check needs the text, so it only runs during a real cleanup.
+        """
+        if cleanup_options is None:
+            cleanup_options = self._get_default_cleanup_options()
+        
         try:
             report = {
                 'organization_id': self.organization_id,
@@ -409,43 +473,57 @@ class PHICleanupService:
                 'total_documents_with_phi': 0,
                 'total_cleanable_documents': 0,
                 'estimated_bytes_to_clean': 0,
+                'orphan_candidates': 0,
+                'orphan_candidate_bytes': 0,
                 'generated_at': datetime.utcnow()
             }
             
-            # Analyze each screening type
-            screening_types = ScreeningType.query.filter_by(
-                org_id=self.organization_id,
-                is_active=True
-            ).all()
+            screening_types = self._get_active_screening_types()
+            type_clauses = []
             
             for screening_type in screening_types:
-                cutoff_date = self._calculate_cutoff_date(screening_type, self._get_default_cleanup_options())
-                old_documents = self._find_old_documents_for_screening(screening_type, cutoff_date)
-                
-                cleanable_docs = [doc for doc in old_documents if self._should_clean_document(doc, screening_type, cutoff_date)]
+                cutoff_date = self._calculate_cutoff_date(screening_type, cleanup_options)
+                conditions = self._screening_type_conditions(screening_type, cutoff_date)
+                type_clauses.append(and_(*conditions))
                 
-                estimated_bytes = sum(len(doc.ocr_text.encode('utf-8')) for doc in cleanable_docs if doc.ocr_text)
+                with_phi = self._aggregate(
+                    self._phi_conditions(cutoff_date) + [self._has_screening_of_type(screening_type)]
+                )
+                cleanable = self._aggregate(conditions)
                 
-                screening_report = {
+                report['screening_types'].append({
                     'screening_type_id': screening_type.id,
                     'screening_type_name': screening_type.name,
                     'cutoff_date': cutoff_date.isoformat(),
-                    'documents_with_phi': len(old_documents),
-                    'cleanable_documents': len(cleanable_docs),
-                    'estimated_bytes_to_clean': estimated_bytes
-                }
-                
-                report['screening_types'].append(screening_report)
-                report['total_documents_with_phi'] += len(old_documents)
-                report['total_cleanable_documents'] += len(cleanable_docs)
-                report['estimated_bytes_to_clean'] += estimated_bytes
+                    'documents_with_phi': with_phi['documents'],
+                    'cleanable_documents': cleanable['documents'],
+                    'estimated_bytes_to_clean': cleanable['bytes']
+                })
+                report['total_documents_with_phi'] += with_phi['documents']
+            
+            if type_clauses:
+                total = self._aggregate([or_(*type_clauses)])
+                report['total_cleanable_documents'] = total['documents']
+                report['estimated_bytes_to_clean'] = total['bytes']
+            
+            if cleanup_options.get('cleanup_orphaned', True):
+                orphan_conditions = self._orphan_conditions(screening_types, cleanup_options)
+                if type_clauses:
+                    orphan_conditions.append(~or_(*type_clauses))
+                orphans = self._aggregate(orphan_conditions)
+                report['orphan_candidates'] = orphans['documents']
+                report['orphan_candidate_bytes'] = orphans['bytes']
             
             return report
             
         except Exception as e:
-            logger.error(f"Error generating PHI cleanup report: {str(e)}")
+            logger.error(f"Error estimating PHI cleanup: {str(e)}")
             return {'error': str(e)}
     
+    def get_phi_cleanup_report(self) -> Dict[str, Any]:
+        """Generate a report of PHI data that could be cleaned"""
+        return self.estimate_cleanup(self._get_default_cleanup_options())
+    
     def _log_cleanup_event(self, event_type: str, details: Dict):
         """Log cleanup events to admin audit log"""
         try:
@@ -481,5 +559,6 @@ class PHICleanupService:
             'min_retention_months': 6,  # Never clean documents less than 6 months old
             'cleanup_orphaned': True,
             'orphan_retention_days': 90,
+            'batch_size': DEFAULT_CLEANUP_BATCH_SIZE,  # Documents cleared (and committed) per UPDATE
             'dry_run': False  # Set to True to see what would be cleaned without actually doing it
         }
\ No newline at end of file
@@ -1,10 +1,22 @@
 """
 Screening Catalog Service Layer
 Universal screening type management with fuzzy detection and variant system
+
+PERFORMANCE: fuzzy resolution used to load every active UniversalType, lazily
+load each one's aliases (N+1), and normalize and score every canonical name
+and alias on each call. CatalogSearchIndex keeps the normalized catalog in
+memory (token inverted index plus per-entry character counts) and only scores
+the entries whose upper bound can still reach the top results, with the same
+ratios and thresholds as before. The index is rebuilt when the cached catalog
+snapshot (utils/app_cache.py) changes, i.e. after any committed UniversalType /
+UniversalTypeAlias change.
 """
 import re
 import json
 import difflib
+import heapq
+import threading
+from collections import defaultdict
 from typing import Dict, List, Optional, Tuple
 from sqlalchemy import or_, and_, func
 from models import (
@@ -12,6 +24,10 @@ from models import (
     ScreeningVariant, TypeLabelAssociation, ScreeningType,
     User, Organization
 )
+from utils.lazy_import import lazy_module, module_available
+
+np = lazy_module('numpy')
+NUMPY_AVAILABLE = module_available('numpy')
 
 
 class LabelNormalizer:
@@ -116,6 +132,172 @@ class LabelNormalizer:
         return intersection / union
 
 
+FUZZY_MIN_CONFIDENCE = 0.5  # Minimum threshold for consideration
+
+
+class CatalogSearchIndex:
+    """
+    In-memory search index over active canonical names and aliases.
+
+    Entries are normalized once, at build time, and indexed two ways:
+
+    - a token inverted index: the word-set ratio (LabelNormalizer.token_set_ratio)
+      of every entry sharing a word with the label, without touching the rest
+    - a character-count matrix (NumPy): SequenceMatcher can only match characters
+      both strings contain, so 2 * sum(min(label count, entry count)) / (total
+      length) bounds an entry's sequence ratio (difflib's quick_ratio),
+      computed for the whole catalog in one vectorized pass
+
+    search() scores entries with the full ratios in order of that upper
+    bound and stops once no remaining entry can reach the current top
+    `limit` types. Scores, the 0.5 floor and the tie order (catalog order)
+    are exactly those of scoring every entry; only the entries that can
+    still make the result are scored.
+    """
+
+    def __init__(self, entries: List, version: Optional[str] = None):
+        """
+        Args:
+            entries: [universal_type_id, text, alias_confidence] rows in catalog
+                     order; alias_confidence is None for canonical names
+            version: Catalog snapshot the index was built from
+        """
+        self.version = version
+        self.entries = []  # (universal_type_id, text, normalized, tokens, alias_confidence)
+        self.token_postings = defaultdict(list)
+
+        for ut_id, text, alias_confidence in entries:
+            normalized = LabelNormalizer.normalize_label(text)
+            if not normalized:
+                continue  # scores 0 against every label
+            ordinal = len(self.entries)
+            tokens = set(normalized.split())
+            self.entries.append((ut_id, text, normalized, tokens, alias_confidence))
+            for token in tokens:
+                self.token_postings[token].append(ordinal)
+
+        self.char_columns = {}
+        self.char_counts = self.lengths = self.weights = None
+        if NUMPY_AVAILABLE and self.entries:
+            for entry in self.entries:
+                for char in entry[2]:
+                    self.char_columns.setdefault(char, len(self.char_columns))
+            self.char_counts = np.zeros((len(self.entries), len(self.char_columns)), dtype=np.uint16)
+            for ordinal, entry in enumerate(self.entries):
+                for char in entry[2]:
+                    self.char_counts[ordinal, self.char_columns[char]] += 1
+            self.lengths = np.array([len(entry[2]) for entry in self.entries], dtype=np.float64)
+            self.weights = np.array([1.0 if entry[4] is None else entry[4] for entry in self.entries])
+
+    def _score(self, ordinal: int, query: str, query_tokens: set) -> float:
+        """LabelNormalizer.fuzzy_match_ratio / token_set_ratio on pre-normalized text"""
+        _, _, normalized, tokens, alias_confidence = self.entries[ordinal]
+        sequence_ratio = difflib.SequenceMatcher(None, query, normalized).ratio()
+        token_ratio = len(query_tokens & tokens) / len(query_tokens | tokens)
+        confidence = max(sequence_ratio, token_ratio)
+        if alias_confidence is not None:
+            confidence *= alias_confidence  # Factor in alias confidence
+        return confidence
+
+    def _ordered_by_bound(self, query: str, query_tokens: set):
+        """(ordinal, upper bound) for entries that may score above the floor, best bound first"""
+        query_counts = np.zeros(len(self.char_columns), dtype=np.uint16)
+        for char in query:
+            column = self.char_columns.get(char)
+            if column is not None:
+                query_counts[column] += 1
+        common = np.minimum(self.char_counts, query_counts).sum(axis=1)
+        bounds = 2.0 * common / (len(query) + self.lengths)
+
+        shared_tokens = defaultdict(int)
+        for token in query_tokens:
+            for ordinal in self.token_postings.get(token, ()):
+                shared_tokens[ordinal] += 1
+        for ordinal, shared in shared_tokens.items():
+            token_ratio = shared / (len(query_tokens) + len(self.entries[ordinal][3]) - shared)
+            if token_ratio > bounds[ordinal]:
+                bounds[ordinal] = token_ratio
+
+        bounds *= self.weights
+        ordinals = np.flatnonzero(bounds > FUZZY_MIN_CONFIDENCE)
+        ordinals = ordinals[np.lexsort((ordinals, -bounds[ordinals]))]
+        return zip(ordinals.tolist(), bounds[ordinals].tolist())
+
+    def search(self, normalized_label: str, limit: int = 5) -> List[Dict]:
+        """
+        Best-scoring entry per universal type, at most limit types.
+
+        Returns:
+            [{'universal_type_id', 'confidence', 'match_text', 'match_type'}, ...]
+            sorted by confidence
+        """
+        # Same normalization the ratios have always applied to the label
+        query = LabelNormalizer.normalize_label(normalized_label)
+        if not query or not self.entries:
+            return []
+        query_tokens = set(query.split())
+
+        if self.char_counts is not None:
+            ordered = self._ordered_by_bound(query, query_tokens)
+        else:
+            ordered = ((ordinal, None) for ordinal in range(len(self.entries)))
+
+        candidates = []
+        best_by_type = {}
+        kth_best = None  # score of the limit-th best type so far
+        for ordinal, bound in ordered:
+            # Nothing left can reach the top `limit` types (ties still get scored)
+            if kth_best is not None and bound is not None and bound < kth_best:
+                break
+            confidence = self._score(ordinal, query, query_tokens)
+            if confidence <= FUZZY_MIN_CONFIDENCE:
+                continue
+            candidates.append((confidence, ordinal))
+            ut_id = self.entries[ordinal][0]
+            if confidence > best_by_type.get(ut_id, 0.0):
+                best_by_type[ut_id] = confidence
+                if len(best_by_type) >= limit:
+                    kth_best = heapq.nlargest(limit, best_by_type.values())[-1]
+
+        # Sort by confidence (catalog order breaks ties) and deduplicate by type
+        candidates.sort(key=lambda item: (-item[0], item[1]))
+        seen_uts = set()
+        results = []
+        for confidence, ordinal in candidates:
+            ut_id, text, _, _, alias_confidence = self.entries[ordinal]
+            if ut_id in seen_uts:
+                continue
+            seen_uts.add(ut_id)
+            results.append({
+                'universal_type_id': ut_id,
+                'confidence': confidence,
+                'match_text': text,
+                'match_type': 'canonical' if alias_confidence is None else 'alias'
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+
+_catalog_index: Optional[CatalogSearchIndex] = None
+_catalog_index_lock = threading.Lock()
+
+
+def get_catalog_index() -> CatalogSearchIndex:
+    """The process's search index, rebuilt when the cached catalog snapshot changes"""
+    global _catalog_index
+    from utils.app_cache import get_universal_type_catalog
+
+    catalog = get_universal_type_catalog()
+    index = _catalog_index
+    if index is None or index.version != catalog['version']:
+        with _catalog_index_lock:
+            if _catalog_index is None or _catalog_index.version != catalog['version']:
+                _catalog_index = CatalogSearchIndex(catalog['entries'], version=catalog['version'])
+            index = _catalog_index
+    return index
+
+
 class ScreeningCatalogService:
     """Main service for universal screening type management"""
     
@@ -170,53 +352,30 @@ class ScreeningCatalogService:
         return {"match": "unresolved", "normalized_label": normalized}
     
     def _find_fuzzy_candidates(self, normalized_label: str, limit: int = 5) -> List[Dict]:
-        """Find fuzzy match candidates for a normalized label"""
-        candidates = []
-        
-        # Get all active universal types with their aliases
-        universal_types = UniversalType.query.filter_by(status='active').all()
-        
-        for ut in universal_types:
-            # Check against canonical name
-            canonical_ratio = self.normalizer.fuzzy_match_ratio(normalized_label, ut.canonical_name)
-            token_ratio = self.normalizer.token_set_ratio(normalized_label, ut.canonical_name)
-            confidence = max(canonical_ratio, token_ratio)
-            
-            if confidence > 0.5:  # Minimum threshold for consideration
-                candidates.append({
-                    'universal_type': ut,
-                    'confidence': confidence,
-                    'match_text': ut.canonical_name,
-                    'match_type': 'canonical'
-                })
-            
-            # Check against aliases
-            for alias in ut.aliases:
-                alias_ratio = self.normalizer.fuzzy_match_ratio(normalized_label, alias.alias)
-                token_ratio = self.normalizer.token_set_ratio(normalized_label, alias.alias)
-                confidence = max(alias_ratio, token_ratio) * alias.confidence  # Factor in alias confidence
-                
-                if confidence > 0.5:
-                    candidates.append({
-                        'universal_type': ut,
-                        'confidence': confidence,
-                        'match_text': alias.alias,
-                        'match_type': 'alias'
-                    })
-        
-        # Sort by confidence and deduplicate
-        candidates.sort(key=lambda x: x['confidence'], reverse=True)
-        seen_uts = set()
-        unique_candidates = []
-        
-        for candidate in candidates:
-            if candidate['universal_type'].id not in seen_uts:
-                unique_candidates.append(candidate)
-                seen_uts.add(candidate['universal_type'].id)
-                if len(unique_candidates) >= limit:
-                    break
+        """Find fuzzy match candidates for a normalized label (CatalogSearchIndex)"""
+        matches = get_catalog_index().search(normalized_label, limit=limit)
+        if not matches:
+            return []
+        
+        universal_types = {
+            ut.id: ut for ut in UniversalType.query.filter(
+                UniversalType.id.in_([m['universal_type_id'] for m in matches])
+            ).all()
+        }
         
-        return unique_candidates
+        candidates = []
+        for match in matches:
+            ut = universal_types.get(match['universal_type_id'])
+            if ut is None:
+                continue  # removed since the index was built
+            candidates.append({
+                'universal_type': ut,
+                'confidence': match['confidence'],
+                'match_text': match['match_text'],
+                'match_type': match['match_type']
+            })
+        
+        return candidates
     
     def ensure_protocol(self, universal_type_id: str, org_id: int = None, 
                        scope: str = 'system', name: str = None) -> ScreeningProtocol:
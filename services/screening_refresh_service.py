@@ -10,9 +10,10 @@ Responsible ONLY for:
 
 import json
 import logging
+import time
 from datetime import datetime, timedelta, date
 from typing import Dict, List, Optional, Set, Any
-from sqlalchemy import and_, or_
+from sqlalchemy import and_
 
 from flask import has_request_context
 from flask_login import current_user
@@ -45,6 +46,7 @@ class ScreeningRefreshService:
         # Track refresh progress
         self.refresh_stats = {
             'patients_processed': 0,
+            'patients_evaluated': 0,
             'screenings_updated': 0,
             'documents_reprocessed': 0,
             'criteria_changes_detected': 0,
@@ -65,6 +67,17 @@ class ScreeningRefreshService:
         Returns:
             Dict with refresh results and statistics
         """
+        from utils.fleet_metrics import record_screening_refresh
+        
+        start = time.perf_counter()
+        result = self._run_refresh(refresh_options)
+        # Fleet-wide refresh throughput (patients/sec) for capacity planning
+        record_screening_refresh(self.refresh_stats['patients_evaluated'], time.perf_counter() - start,
+                                 success=result.get('success', False))
+        return result
+    
+    def _run_refresh(self, refresh_options: Optional[Dict]) -> Dict[str, Any]:
+        """Body of refresh_screenings()"""
         if refresh_options is None:
             refresh_options = self._get_default_refresh_options()
         
@@ -119,6 +132,7 @@ class ScreeningRefreshService:
             
             # Process affected screenings
             affected_patients = self._get_affected_patients(changes_detected, refresh_options)
+            self.refresh_stats['patients_evaluated'] = len(affected_patients)
             
             if not affected_patients:
                 logger.info("No affected patients found - applying dormancy check only")
@@ -449,12 +463,14 @@ class ScreeningRefreshService:
         
         from sqlalchemy.orm import selectinload
         
+        # Only document IDs are needed here (change detection); text is loaded
+        # by the matcher's own queries, so restrict documents to their keys
         patients = Patient.query.filter(
             Patient.id.in_(affected_patient_ids),
             Patient.org_id == self.organization_id
         ).options(
-            selectinload(Patient.documents),
-            selectinload(Patient.fhir_documents),
+            selectinload(Patient.documents).load_only(Document.id, Document.patient_id),
+            selectinload(Patient.fhir_documents).load_only(FHIRDocument.id, FHIRDocument.patient_id),
             selectinload(Patient.conditions)
         ).limit(refresh_options.get('max_patients', 1000)).all()
         
@@ -698,7 +714,7 @@ class ScreeningRefreshService:
             # Get patient's FHIR documents
             fhir_documents = FHIRDocument.query.filter_by(
                 patient_id=screening.patient_id
-            ).all()
+            ).options(FHIRDocument.text_loader_option()).all()
             
             for doc in fhir_documents:
                 if not doc.ocr_text:
@@ -1183,13 +1199,17 @@ class ScreeningRefreshService:
         and marks screenings as dormant/active based on whether patients have
         upcoming appointments.
         
+        PERFORMANCE: Delegates to DormancyPlanner, which computes the priority set
+        once and applies set-based UPDATEs (non-scheduled patients stay in a SQL
+        subquery instead of being loaded and updated per patient).
+        
         Args:
             manually_refreshed_patient_ids: Optional set of patient IDs that were manually
                 refreshed in this cycle. These patients will be exempted from dormancy
                 marking so they remain active for the rest of the day.
         
         Returns:
-            Dict with dormancy application results
+            Dict with dormancy application results, including rows_changed
         """
         result = {
             'applied': False,
@@ -1198,12 +1218,10 @@ class ScreeningRefreshService:
             'stale_patients_reactivated': 0,
             'setting_enabled': False,
             'process_non_scheduled': False,
-            'manually_refreshed_exempted': 0
+            'manually_refreshed_exempted': 0,
+            'rows_changed': 0
         }
         
-        if manually_refreshed_patient_ids is None:
-            manually_refreshed_patient_ids = set()
-        
         try:
             # Get organization settings
             organization = Organization.query.get(self.organization_id)
@@ -1219,89 +1237,23 @@ class ScreeningRefreshService:
             result['setting_enabled'] = True
             result['process_non_scheduled'] = organization.process_non_scheduled_patients
             
-            # Get priority patients (those with upcoming appointments)
-            from services.appointment_prioritization import AppointmentBasedPrioritization
-            prioritization_service = AppointmentBasedPrioritization(self.organization_id)
-            priority_patient_ids = set(prioritization_service.get_priority_patients())
-            
-            logger.info(f"Found {len(priority_patient_ids)} priority patients with upcoming appointments")
+            from services.dormancy_planner import DormancyPlanner
+            planner = DormancyPlanner(self.organization_id, organization)
+            plan = planner.plan(exempt_patient_ids=manually_refreshed_patient_ids)
             
-            # Mark priority patients as NOT dormant (active)
-            if priority_patient_ids:
-                active_count = Screening.query.filter(
-                    Screening.org_id == self.organization_id,
-                    Screening.patient_id.in_(priority_patient_ids),
-                    Screening.is_dormant == True
-                ).update({'is_dormant': False, 'last_processed': datetime.utcnow()}, synchronize_session=False)
-                
-                result['priority_patients_activated'] = active_count
-                if active_count > 0:
-                    logger.info(f"Reactivated {active_count} screenings for priority patients")
+            logger.info(f"Found {len(plan['priority_patient_ids'])} priority patients with upcoming appointments")
             
-            # Get non-scheduled patients
-            non_scheduled_ids = prioritization_service.get_non_scheduled_patients(
-                exclude_patient_ids=list(priority_patient_ids)
-            )
-            
-            if organization.process_non_scheduled_patients:
-                # When enabled, keep ALL non-scheduled patients active (not dormant)
-                # This ensures their screenings continue to be processed
-                logger.info("Processing non-scheduled patients (process_non_scheduled_patients is enabled)")
-                
-                if non_scheduled_ids:
-                    # Reactivate any dormant non-scheduled patients
-                    reactivate_count = Screening.query.filter(
-                        Screening.org_id == self.organization_id,
-                        Screening.patient_id.in_(non_scheduled_ids),
-                        Screening.is_dormant == True
-                    ).update({'is_dormant': False, 'last_processed': datetime.utcnow()}, synchronize_session=False)
-                    
-                    if reactivate_count > 0:
-                        result['non_scheduled_reactivated'] = reactivate_count
-                        logger.info(f"Reactivated {reactivate_count} screenings for non-scheduled patients (setting enabled)")
-                    else:
-                        logger.info(f"All {len(non_scheduled_ids)} non-scheduled patients already active")
-                
-                # Do NOT mark any non-scheduled patients as dormant when setting is enabled
-                result['non_scheduled_marked_dormant'] = 0
-            else:
-                # Mark non-scheduled patients as dormant when disabled,
-                # EXCEPT for:
-                # 1. Manually refreshed patients in this cycle (via manually_refreshed_patient_ids)
-                # 2. Patients whose screenings were refreshed today (via last_processed check)
-                patients_to_mark_dormant = set(non_scheduled_ids) - manually_refreshed_patient_ids
-                
-                if manually_refreshed_patient_ids:
-                    exempted_count = len(set(non_scheduled_ids) & manually_refreshed_patient_ids)
-                    result['manually_refreshed_exempted'] = exempted_count
-                    if exempted_count > 0:
-                        logger.info(f"Exempting {exempted_count} manually refreshed patients from dormancy marking")
-                
-                logger.info(f"Marking {len(patients_to_mark_dormant)} non-scheduled patients as dormant (process_non_scheduled_patients is disabled)")
-                
-                if patients_to_mark_dormant:
-                    # Only mark as dormant if last_processed is older than today (local midnight)
-                    # This respects the "active for the day" semantic after manual refresh
-                    # Uses organization's timezone for proper day-boundary rollover
-                    from utils.date_helpers import get_local_midnight_utc
-                    org_timezone = organization.timezone if organization else 'UTC'
-                    today_start = get_local_midnight_utc(org_timezone)
-                    
-                    dormant_count = Screening.query.filter(
-                        Screening.org_id == self.organization_id,
-                        Screening.patient_id.in_(patients_to_mark_dormant),
-                        Screening.is_dormant == False,
-                        or_(
-                            Screening.last_processed.is_(None),
-                            Screening.last_processed < today_start
-                        )
-                    ).update({'is_dormant': True}, synchronize_session=False)
-                    
-                    result['non_scheduled_marked_dormant'] = dormant_count
-                    if dormant_count > 0:
-                        logger.info(f"Marked {dormant_count} screenings as dormant for non-scheduled patients (excluding today's refreshes)")
+            applied = planner.apply(plan)
+            result.update({
+                'applied': applied['applied'],
+                'priority_patients_activated': applied['priority_patients_activated'],
+                'non_scheduled_marked_dormant': applied['non_scheduled_marked_dormant'],
+                'manually_refreshed_exempted': applied['manually_refreshed_exempted'],
+                'rows_changed': applied['rows_changed']
+            })
+            if applied['non_scheduled_reactivated']:
+                result['non_scheduled_reactivated'] = applied['non_scheduled_reactivated']
             
-            result['applied'] = True
             logger.info(f"Appointment prioritization dormancy applied: {result}")
             
             return result
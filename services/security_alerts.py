@@ -19,6 +19,8 @@ class SecurityAlertService:
     ALERT_THRESHOLDS = {
         'failed_logins_per_ip': 10,
         'failed_logins_window_minutes': 5,
+        'password_spray_distinct_usernames': 3,
+        'password_spray_block_minutes': 60,
         'phi_filter_failure_threshold': 1,
     }
     
@@ -393,45 +395,124 @@ class SecurityAlertService:
         return success
     
     @staticmethod
-    def check_and_alert_brute_force(ip_address: str, org_id: int) -> bool:
+    def record_failed_login(ip_address: str, username: Optional[str], org_id: int) -> Dict:
+        """
+        Count a failed login and run the brute force / password spray checks.
+        
+        PERFORMANCE: Counts come from the sliding-window detector
+        (utils/login_failure_detector.py - Redis sorted sets or process memory),
+        so a credential stuffing attack costs O(log n) per attempt instead of an
+        audit log scan. The login_failed AdminLog row is written separately,
+        asynchronously, through the audit sink.
+        
+        Args:
+            ip_address: Source IP of the attempt
+            username: Username that was attempted
+            org_id: Organization of the targeted user (0 if unknown)
+            
+        Returns:
+            Dict with the window snapshot and which checks fired
+        """
+        from utils.login_failure_detector import get_login_failure_detector
+        
+        snapshot = get_login_failure_detector().record_failure(ip_address, username, org_id)
+        return {
+            'snapshot': snapshot,
+            'brute_force': SecurityAlertService.check_and_alert_brute_force(ip_address, org_id, snapshot),
+            'password_spray': SecurityAlertService.check_and_block_password_spray(ip_address, org_id, snapshot),
+        }
+    
+    @staticmethod
+    def check_and_alert_brute_force(ip_address: str, org_id: int, snapshot=None) -> bool:
         """
         Check for brute force patterns and send alert if threshold exceeded
         
+        Alerts are sent once per IP per window, not on every further attempt.
+        
         Args:
             ip_address: IP address to check
             org_id: Organization ID
+            snapshot: FailureSnapshot from record_failed_login (read from the
+                      detector when omitted)
             
         Returns:
             True if brute force detected and alert sent
         """
-        from sqlalchemy import func
+        from utils.login_failure_detector import get_login_failure_detector
         
-        window_start = datetime.utcnow() - timedelta(
-            minutes=SecurityAlertService.ALERT_THRESHOLDS['failed_logins_window_minutes']
-        )
+        detector = get_login_failure_detector()
+        if snapshot is not None:
+            attempt_count = snapshot.ip_attempts
+            usernames = list(snapshot.ip_usernames)
+        else:
+            attempt_count = detector.ip_attempts(ip_address)
+            usernames = []
         
-        recent_failures = db.session.query(AdminLog).filter(
-            AdminLog.event_type == 'login_failed',
-            AdminLog.ip_address == ip_address,
-            AdminLog.timestamp >= window_start
-        ).all()
+        if attempt_count < SecurityAlertService.ALERT_THRESHOLDS['failed_logins_per_ip']:
+            return False
+        
+        cooldown = SecurityAlertService.ALERT_THRESHOLDS['failed_logins_window_minutes'] * 60
+        if not detector.claim_alert('brute_force', ip_address, cooldown):
+            return False
+        
+        SecurityAlertService.send_brute_force_alert(
+            ip_address=ip_address,
+            org_id=org_id,
+            attempt_count=attempt_count,
+            usernames_targeted=usernames
+        )
+        return True
+    
+    @staticmethod
+    def check_and_block_password_spray(ip_address: str, org_id: int, snapshot) -> bool:
+        """
+        Block the IP and alert when it tried too many distinct usernames.
         
-        if len(recent_failures) >= SecurityAlertService.ALERT_THRESHOLDS['failed_logins_per_ip']:
-            usernames = list(set([
-                log.data.get('username', 'unknown') 
-                for log in recent_failures 
-                if log.data
-            ]))
+        Args:
+            ip_address: IP address to check
+            org_id: Organization ID of the latest target
+            snapshot: FailureSnapshot from record_failed_login
             
-            SecurityAlertService.send_brute_force_alert(
-                ip_address=ip_address,
-                org_id=org_id,
-                attempt_count=len(recent_failures),
-                usernames_targeted=usernames
-            )
-            return True
+        Returns:
+            True if the IP was blocked by this call
+        """
+        from models import IPBlocklist, log_admin_event
+        from utils.login_failure_detector import get_login_failure_detector
+        
+        distinct_count = snapshot.ip_distinct_usernames
+        if distinct_count < SecurityAlertService.ALERT_THRESHOLDS['password_spray_distinct_usernames']:
+            return False
+        
+        block_minutes = SecurityAlertService.ALERT_THRESHOLDS['password_spray_block_minutes']
+        if not get_login_failure_detector().claim_alert('password_spray', ip_address, block_minutes * 60):
+            return False  # Another request already blocked this IP
+        
+        usernames = list(snapshot.ip_usernames)
+        IPBlocklist.block_ip(
+            ip_address,
+            f"Password spray detected: {distinct_count} distinct usernames attempted",
+            duration_minutes=block_minutes,
+            failed_usernames=usernames
+        )
         
-        return False
+        SecurityAlertService.send_password_spray_alert(
+            ip_address=ip_address,
+            usernames_targeted=usernames,
+            org_id=org_id
+        )
+        
+        log_admin_event(
+            event_type='password_spray_blocked',
+            user_id=None,
+            org_id=org_id,
+            ip=ip_address,
+            data={
+                'usernames_targeted': usernames[:10],
+                'distinct_count': distinct_count,
+                'description': f'Password spray attack blocked: {ip_address}'
+            }
+        )
+        return True
     
     @staticmethod
     def get_unacknowledged_alerts(org_id: int, limit: int = 10) -> List[Dict]:
@@ -842,7 +923,8 @@ class IncidentLogger:
             ip=ip_address,
             data=incident_data,
             resource_type='security_incident',
-            action_details=f"[{severity}] {category}: {description}"
+            action_details=f"[{severity}] {category}: {description}",
+            sync=True  # Incident ID is returned for tracking
         )
         
         logger.warning(f"INCIDENT DETECTED: [{severity}] {category} in org {org_id}: {description}")
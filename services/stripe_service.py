@@ -6,14 +6,21 @@ import os
 import logging
 from datetime import datetime, timedelta
 from typing import Optional, Dict
-import stripe
 
 from models import Organization, Provider, db
+from utils.lazy_import import lazy_module
 
 logger = logging.getLogger(__name__)
 
-# Initialize Stripe with API key
-stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
+
+def _configure_stripe(module):
+    # Initialize Stripe with API key
+    module.api_key = os.environ.get('STRIPE_SECRET_KEY')
+
+
+# PERFORMANCE: the Stripe SDK is imported on first use rather than by every
+# process that imports this module (web workers, RQ workers, scripts)
+stripe = lazy_module('stripe', on_import=_configure_stripe)
 
 
 class StripeService:
@@ -0,0 +1,144 @@
+"""
+Warm per-process state for RQ workers
+
+Each background job used to start cold: it resolved the application, and in a
+freshly forked work-horse it also re-imported the service modules, recompiled
+the PHI patterns and opened a new database connection. Each job then
+re-authenticated an Epic FHIR client from EpicCredentials. worker.py calls
+warm_worker() once, before it takes any jobs, and jobs get their FHIR service
+from get_fhir_service().
+
+Worker modes (worker.py --mode, RQ_WORKER_MODE):
+
+    fork    RQ default: one forked work-horse per job. The horse starts from
+            the warmed parent (app, models, services, PHI patterns and OCR
+            bindings already loaded, shared copy-on-write) and replaces the
+            inherited connection pool with its own (prepare_job_process).
+    simple  Jobs run in the worker process itself (rq.SimpleWorker), so the
+            connection pool and per-org FHIR clients also survive between
+            jobs. The worker exits after --max-jobs jobs to bound memory
+            growth; the supervisor restarts it.
+
+scripts/benchmark_worker_jobs.py measures job set-up cost cold, forked from
+a warm parent, and in a warm simple worker.
+"""
+
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# organization_id -> (authenticated FHIRClient, EpicCredentials version it was built from)
+_fhir_clients: Dict[int, Tuple[object, object]] = {}
+_warmed_pid: Optional[int] = None
+
+
+def warm_worker(app=None) -> dict:
+    """
+    Load everything jobs need before the first job is taken.
+
+    Returns the phase timings (utils/startup_profile.py format).
+    """
+    global _warmed_pid
+    from utils.startup_profile import StartupProfile
+
+    profile = StartupProfile('worker_warmup')
+
+    with profile.phase('app'):
+        if app is None:
+            from app import get_app
+            app = get_app()
+
+    with profile.phase('job_modules'):
+        import services.async_processing  # noqa: F401
+        import services.epic_fhir_service  # noqa: F401
+        import prep_sheet.generator  # noqa: F401
+        import ocr.document_processor  # noqa: F401
+
+    with profile.phase('phi_patterns'):
+        from ocr.phi_filter import PHIFilter
+        PHIFilter()  # compiles the class-level pattern cache
+
+    with profile.phase('ocr_engine'):
+        from utils.lazy_import import load_module
+        from ocr import document_processor, processor
+        from ocr.engine import warm_ocr_engine
+        for module in (document_processor.pdf2image, processor.fitz):
+            try:
+                load_module(module)
+            except ImportError as e:
+                logger.warning(f"OCR binding unavailable during worker warm-up: {e}")
+        try:
+            warm_ocr_engine()
+        except Exception as e:
+            logger.warning(f"OCR engine unavailable during worker warm-up: {e}")
+
+    with profile.phase('database'):
+        from sqlalchemy import text
+        from app import db
+        with app.app_context():
+            with db.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+
+    _warmed_pid = os.getpid()
+    profile.log()
+    logger.info(f"Worker warm-up completed in {profile.total_seconds * 1000:.0f} ms")
+    return profile.as_dict()
+
+
+def prepare_job_process() -> None:
+    """
+    Call at the start of every job. In a work-horse forked from the warmed
+    worker, drop the inherited connection pool (its sockets belong to the
+    parent) and the parent's FHIR clients.
+    """
+    global _warmed_pid
+    if _warmed_pid is None or _warmed_pid == os.getpid():
+        return
+    from app import get_app, db
+    with get_app().app_context():
+        db.engine.dispose(close=False)
+    _fhir_clients.clear()
+    _warmed_pid = os.getpid()
+
+
+def _credentials_version(organization_id: int):
+    from app import db
+    from models import EpicCredentials
+    return db.session.query(db.func.max(EpicCredentials.updated_at)).filter(
+        EpicCredentials.org_id == organization_id
+    ).scalar()
+
+
+def get_fhir_service(organization_id: int):
+    """
+    Background EpicFHIRService for an organization.
+
+    Reuses the FHIR client this process authenticated for the organization in
+    an earlier job, as long as the organization's stored credentials have not
+    changed since (re-authorization, or a token refresh by another process).
+    Expired access tokens are still refreshed by ensure_authenticated().
+    Must be called inside an app context.
+    """
+    from services.epic_fhir_service import EpicFHIRService
+
+    version = _credentials_version(organization_id)
+    cached = _fhir_clients.get(organization_id)
+    if cached is not None and version is not None and cached[1] == version:
+        return EpicFHIRService(organization_id, background_context=True, fhir_client=cached[0])
+
+    _fhir_clients.pop(organization_id, None)
+    service = EpicFHIRService(organization_id, background_context=True)
+    if service.fhir_client is not None and service.fhir_client.access_token:
+        # Read after construction - loading the client updates last_used
+        _fhir_clients[organization_id] = (service.fhir_client, _credentials_version(organization_id))
+    return service
+
+
+def get_worker_stats() -> dict:
+    return {
+        'pid': os.getpid(),
+        'warmed': _warmed_pid is not None,
+        'cached_fhir_clients': len(_fhir_clients),
+    }
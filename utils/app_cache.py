@@ -1,57 +1,93 @@
 """
 Application-level cache for expensive queries.
-Uses in-memory dictionary with TTL for single-instance deployments.
-Thread-safe using threading locks.
+
+Backed by the two-tier cache in utils/cache.py: an in-process LRU in front of
+Redis, shared by all gunicorn and RQ workers, with pub/sub invalidation and
+single-flight recompute. Without Redis it behaves like the previous
+process-local TTL cache.
+
+Cached lookups (all keyed by organization):
+- priority_patients: patient IDs from AppointmentBasedPrioritization
+- prep_settings: PrepSheetSettings column values
+- screening_type_rules: active screening types' keywords and criteria metadata
+- universal_type_catalog: active universal type names and aliases (one global
+  key), the source of the fuzzy search index in services/screening_catalog.py
+- keyword_effectiveness: offline keyword reports (core/keyword_effectiveness.py),
+  keyed by organization and keyword-set version
+
+Invalidation is automatic: models.py collects the org_ids of committed
+Appointment / PrepSheetSettings / ScreeningType changes (and any
+UniversalType / UniversalTypeAlias change) and calls the invalidate_*
+functions after commit. Bulk updates that bypass the ORM
+(e.g. dormancy UPDATEs) must invalidate explicitly. Keyword reports need no
+invalidation: a keyword change changes the version in their key.
 """
 
-import threading
-from datetime import datetime, timedelta
-from typing import Optional, Set, Any
+from datetime import datetime
+from typing import Optional, Set, Any, Dict
 
 import logging
+import uuid
+
+from utils.cache import get_cache, get_all_cache_stats
 
 logger = logging.getLogger(__name__)
 
-_cache = {}
-_cache_lock = threading.Lock()
 _cache_ttl_seconds = 3600  # 1 hour default TTL
 
+_priority_patients_cache = get_cache(
+    'priority_patients',
+    ttl_seconds=_cache_ttl_seconds,
+    serializer=lambda ids: sorted(ids),
+    deserializer=set
+)
+_prep_settings_cache = get_cache('prep_settings', ttl_seconds=_cache_ttl_seconds)
+_screening_type_rules_cache = get_cache('screening_type_rules', ttl_seconds=_cache_ttl_seconds)
+_universal_type_catalog_cache = get_cache('universal_type_catalog', ttl_seconds=_cache_ttl_seconds)
+_keyword_effectiveness_cache = get_cache('keyword_effectiveness', ttl_seconds=24 * 3600)
+
+UNIVERSAL_TYPE_CATALOG_KEY = 'all'  # the catalog is global, not per organization
+
+
+# -----------------------------------------------------------------------------
+# Priority patients
+# -----------------------------------------------------------------------------
 
 def get_cached_priority_patients(org_id: int) -> Optional[Set[int]]:
     """
     Get cached priority patient IDs for an organization.
-    
+
     Returns:
         Set of patient IDs if cache is valid, None if cache is stale or missing
     """
-    cache_key = f'priority_patients_{org_id}'
-    
-    with _cache_lock:
-        if cache_key in _cache:
-            entry = _cache[cache_key]
-            if datetime.utcnow() - entry['timestamp'] < timedelta(seconds=_cache_ttl_seconds):
-                return entry['data']
-            else:
-                del _cache[cache_key]
-    
-    return None
+    return _priority_patients_cache.get(org_id)
 
 
 def set_cached_priority_patients(org_id: int, patient_ids: Set[int]) -> None:
     """
     Cache priority patient IDs for an organization.
-    
+
     Args:
         org_id: Organization ID
         patient_ids: Set of patient IDs to cache
     """
-    cache_key = f'priority_patients_{org_id}'
-    
-    with _cache_lock:
-        _cache[cache_key] = {
-            'data': patient_ids,
-            'timestamp': datetime.utcnow()
-        }
+    _priority_patients_cache.set(org_id, set(patient_ids))
+
+
+def get_priority_patient_ids(org_id: int) -> Set[int]:
+    """
+    Get priority patient IDs for an organization, computing them once on a miss.
+
+    Concurrent requests from any worker share a single recompute.
+    """
+    def compute():
+        from services.appointment_prioritization import AppointmentBasedPrioritization
+        prioritization_service = AppointmentBasedPrioritization(org_id)
+        patient_ids = set(prioritization_service.get_priority_patients())
+        logger.info(f"Refreshed priority patients cache for org {org_id}: {len(patient_ids)} patients")
+        return patient_ids
+
+    return _priority_patients_cache.get_or_compute(org_id, compute)
 
 
 def invalidate_priority_patients_cache(org_id: int) -> None:
@@ -59,25 +95,158 @@ def invalidate_priority_patients_cache(org_id: int) -> None:
     Invalidate the priority patients cache for an organization.
     Call this when appointments are synced or updated.
     """
-    cache_key = f'priority_patients_{org_id}'
-    
-    with _cache_lock:
-        if cache_key in _cache:
-            del _cache[cache_key]
-            logger.info(f"Invalidated priority patients cache for org {org_id}")
+    _priority_patients_cache.invalidate(org_id)
+    logger.info(f"Invalidated priority patients cache for org {org_id}")
+
+
+# -----------------------------------------------------------------------------
+# Prep sheet settings
+# -----------------------------------------------------------------------------
+
+PREP_SETTINGS_FIELDS = (
+    'id', 'org_id', 'labs_cutoff_months', 'imaging_cutoff_months',
+    'consults_cutoff_months', 'hospital_cutoff_months',
+    'consults_keywords', 'hospital_keywords',
+)
+
+
+def get_prep_settings_values(org_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Get PrepSheetSettings column values for an organization.
+
+    Returns None when the organization has no settings row yet (the caller
+    decides whether to create one).
+    """
+    def compute():
+        from models import PrepSheetSettings
+        settings = PrepSheetSettings.query.filter_by(org_id=org_id).first()
+        if settings is None:
+            return None
+        return {field: getattr(settings, field) for field in PREP_SETTINGS_FIELDS}
+
+    values = _prep_settings_cache.get_or_compute(org_id, compute)
+    return dict(values) if values is not None else None
+
+
+def invalidate_prep_settings_cache(org_id: int) -> None:
+    """Invalidate cached prep sheet settings for an organization"""
+    _prep_settings_cache.invalidate(org_id)
+
+
+# -----------------------------------------------------------------------------
+# Screening type rule sets
+# -----------------------------------------------------------------------------
+
+def get_screening_type_rules(org_id: int) -> Dict[str, Any]:
+    """
+    Get the active screening type rule set for an organization.
+
+    A plain-data snapshot (no ORM objects) for hot paths that only need
+    keywords and criteria metadata, not the full ScreeningType rows.
+
+    Returns:
+        {
+            'types': [{'id', 'name', 'base_name', 'keywords', 'criteria_signature',
+                       'criteria_last_changed_at'}, ...],
+            'latest_criteria_change': ISO timestamp or None
+        }
+    """
+    def compute():
+        from models import ScreeningType
+        screening_types = ScreeningType.query.filter_by(org_id=org_id, is_active=True).all()
+        types = []
+        latest_change = None
+        for st in screening_types:
+            changed_at = st.criteria_last_changed_at
+            if changed_at and (latest_change is None or changed_at > latest_change):
+                latest_change = changed_at
+            types.append({
+                'id': st.id,
+                'name': st.name,
+                'base_name': st.base_name,
+                'keywords': st.keywords_list,
+                'criteria_signature': st.criteria_signature,
+                'criteria_last_changed_at': changed_at.isoformat() if changed_at else None,
+            })
+        return {
+            'types': types,
+            'latest_criteria_change': latest_change.isoformat() if latest_change else None,
+        }
+
+    return _screening_type_rules_cache.get_or_compute(org_id, compute)
+
+
+def get_latest_criteria_change(org_id: int) -> Optional[datetime]:
+    """Most recent criteria_last_changed_at across the org's active screening types"""
+    latest = get_screening_type_rules(org_id).get('latest_criteria_change')
+    return datetime.fromisoformat(latest) if latest else None
+
+
+def invalidate_screening_type_rules_cache(org_id: int) -> None:
+    """Invalidate the cached screening type rule set for an organization"""
+    _screening_type_rules_cache.invalidate(org_id)
+
+
+# -----------------------------------------------------------------------------
+# Universal type catalog
+# -----------------------------------------------------------------------------
+
+def get_universal_type_catalog() -> Dict[str, Any]:
+    """
+    Get the active universal type catalog as plain data.
+
+    Two queries (types, then all their aliases) instead of one alias query
+    per type. Entries keep the order the fuzzy matcher has always scored them
+    in: each type's canonical name followed by its aliases.
+
+    Returns:
+        {
+            'version': token that changes whenever the catalog is recomputed,
+            'entries': [[universal_type_id, text, alias_confidence], ...]
+                       (alias_confidence is None for canonical names)
+        }
+    """
+    def compute():
+        from sqlalchemy.orm import selectinload
+        from models import UniversalType
+        universal_types = UniversalType.query.filter_by(status='active').options(
+            selectinload(UniversalType.aliases)
+        ).all()
+        entries = []
+        for ut in universal_types:
+            entries.append([ut.id, ut.canonical_name, None])
+            for alias in ut.aliases:
+                confidence = alias.confidence if alias.confidence is not None else 1.0
+                entries.append([ut.id, alias.alias, confidence])
+        logger.info(f"Refreshed universal type catalog cache: {len(universal_types)} types, {len(entries)} entries")
+        return {'version': uuid.uuid4().hex, 'entries': entries}
+
+    return _universal_type_catalog_cache.get_or_compute(UNIVERSAL_TYPE_CATALOG_KEY, compute)
+
+
+def invalidate_universal_type_catalog_cache(key: Any = UNIVERSAL_TYPE_CATALOG_KEY) -> None:
+    """Invalidate the cached universal type catalog (there is a single, global key)"""
+    _universal_type_catalog_cache.invalidate(UNIVERSAL_TYPE_CATALOG_KEY)
+
+
+# -----------------------------------------------------------------------------
+# Keyword effectiveness reports
+# -----------------------------------------------------------------------------
+
+def get_cached_keyword_report(org_id: int, version: str) -> Optional[Dict[str, Any]]:
+    """Cached keyword effectiveness report for an organization's keyword-set version, or None"""
+    return _keyword_effectiveness_cache.get(f"{org_id}:{version}")
+
+
+def set_cached_keyword_report(org_id: int, version: str, report: Dict[str, Any]) -> None:
+    """Cache a keyword effectiveness report (expires after a day, documents keep arriving)"""
+    _keyword_effectiveness_cache.set(f"{org_id}:{version}", report)
 
 
 def get_cache_stats() -> dict:
     """Get statistics about the cache for monitoring."""
-    with _cache_lock:
-        stats = {
-            'total_entries': len(_cache),
-            'entries': {}
-        }
-        for key, entry in _cache.items():
-            age_seconds = (datetime.utcnow() - entry['timestamp']).total_seconds()
-            stats['entries'][key] = {
-                'age_seconds': age_seconds,
-                'size': len(entry['data']) if hasattr(entry['data'], '__len__') else 1
-            }
-        return stats
+    stats = get_all_cache_stats()
+    return {
+        'total_entries': sum(ns['local_entries'] for ns in stats.values()),
+        'namespaces': stats
+    }
@@ -0,0 +1,606 @@
+"""
+Buffered audit sink for AdminLog and FHIRApiCall rows.
+
+log_admin_event() and FHIRApiCall.log_api_call() used to add one row to
+db.session and commit per event. During organization syncs and bulk prep sheet
+runs that meant thousands of synchronous commits - and each one also committed
+whatever unrelated state the caller had pending mid-operation.
+
+The sink decouples audit writes from the caller's transaction:
+- record() appends the event to a local append-only spool file, then puts it on
+  a bounded in-process queue. The caller's session is never touched.
+- A daemon writer thread drains the queue and bulk-inserts each batch
+  (executemany) on its own connection, then acknowledges the batch in the spool.
+- On shutdown (atexit) the queue is drained synchronously. flush() waits until
+  every recorded event is written, including a batch the writer has already
+  taken off the queue.
+
+HIPAA COMPLIANCE: no audit event is ever dropped.
+- Crash durability: an event is in the spool file before record() returns. A
+  spool left behind by a dead process (crash, SIGKILL, forked RQ work-horse that
+  exited with os._exit) is replayed by the next process that starts the sink;
+  events without an acknowledgement are inserted, then the file is removed.
+- Backpressure: when the queue is full, record() waits up to
+  AUDIT_SINK_BLOCK_SECONDS and then writes the event synchronously instead of
+  dropping it. Wait time and fallbacks are counted in get_stats().
+- A row that fails because its organization, user or patient was deleted
+  meanwhile (other processes and later spool replays may still hold events for
+  an organization that delete_organization / reject_organization removed) is
+  retried under the System Organization (org_id=0), with the dangling user and
+  patient references cleared - the same remapping those routes apply.
+- Rows that cannot be inserted even one at a time (e.g. a constraint violation)
+  are appended to a dead-letter file and logged as errors - never discarded.
+- Event timestamps (AdminLog.timestamp, FHIRApiCall.called_at) are taken when
+  the event is recorded, not when it is written.
+
+Callers that need the row ID (security incident tracking) pass sync=True to
+log_admin_event and keep the previous add + commit behavior.
+
+Configuration (environment):
+    AUDIT_SINK_ENABLED        'false' to write synchronously (default true)
+    AUDIT_SINK_QUEUE_SIZE     Max buffered events per process (default 10000)
+    AUDIT_SINK_BATCH_SIZE     Max rows per INSERT batch (default 200)
+    AUDIT_SINK_FLUSH_SECONDS  Max time an event waits in the buffer (default 1.0)
+    AUDIT_SINK_BLOCK_SECONDS  Max backpressure wait before sync write (default 0.5)
+    AUDIT_SPOOL_DIR           Spool directory (default <tmp>/healthprep_audit_spool)
+                              Created 0700 and must be owned by this user; spool
+                              and dead-letter files are 0600 and replayed spools
+                              are removed with secure deletion (they carry PHI)
+    AUDIT_SPOOL_FSYNC         'true' to fsync every spool append (default false:
+                              survives process crashes, not host power loss)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from utils.secure_delete import secure_delete_file
+
+logger = logging.getLogger(__name__)
+
+KIND_ADMIN_LOG = 'admin_log'
+KIND_FHIR_API_CALL = 'fhir_api_call'
+
+# Event time column per kind - serialized as ISO text in the spool
+_TIMESTAMP_COLUMNS = {
+    KIND_ADMIN_LOG: 'timestamp',
+    KIND_FHIR_API_CALL: 'called_at',
+}
+
+# Foreign keys that can dangle once an organization is deleted: (column, table)
+_REFERENCE_COLUMNS = (
+    ('org_id', 'organizations'),
+    ('user_id', 'users'),
+    ('patient_id', 'patient'),
+)
+
+SPOOL_PREFIX = 'audit-'
+SPOOL_SUFFIX = '.jsonl'
+DEAD_LETTER_FILE = 'audit-dead-letter.jsonl'
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _model_for_kind(kind: str):
+    from models import AdminLog, FHIRApiCall
+    return {KIND_ADMIN_LOG: AdminLog, KIND_FHIR_API_CALL: FHIRApiCall}[kind]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class AuditSink:
+    """Bounded audit event queue drained by a background bulk-insert writer"""
+
+    def __init__(self):
+        self.enabled = _env_flag('AUDIT_SINK_ENABLED', True)
+        self.queue_size = int(os.environ.get('AUDIT_SINK_QUEUE_SIZE', '10000'))
+        self.batch_size = int(os.environ.get('AUDIT_SINK_BATCH_SIZE', '200'))
+        self.flush_seconds = float(os.environ.get('AUDIT_SINK_FLUSH_SECONDS', '1.0'))
+        self.block_seconds = float(os.environ.get('AUDIT_SINK_BLOCK_SECONDS', '0.5'))
+        self.spool_dir = os.environ.get('AUDIT_SPOOL_DIR') or os.path.join(
+            tempfile.gettempdir(), 'healthprep_audit_spool'
+        )
+        self.spool_fsync = _env_flag('AUDIT_SPOOL_FSYNC', False)
+
+        self._pid = None
+        self._app = None
+        self._reset_process_state()
+
+    # ------------------------------------------------------------------
+    # Process lifecycle
+    # ------------------------------------------------------------------
+
+    def _reset_process_state(self):
+        """Fresh queue, locks, spool and writer for this process (also after fork)"""
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._lock = threading.Lock()
+        self._writer = None
+        self._stop = threading.Event()
+        self._spool_file = None
+        self._spool_path = None
+        self._outstanding = 0  # Spooled but not yet acknowledged
+        self._unwritten = 0  # Queued or in a batch being written
+        self._written_cond = threading.Condition()
+        self._pending_by_org = Counter()  # (kind, org_id) -> queued rows
+        self._stats = {
+            'recorded': 0,
+            'written': 0,
+            'batches': 0,
+            'sync_writes': 0,
+            'backpressure_waits': 0,
+            'backpressure_wait_seconds': 0.0,
+            'backpressure_fallbacks': 0,
+            'write_errors': 0,
+            'dead_lettered': 0,
+            'replayed': 0,
+            'max_queue_depth': 0,
+            'last_batch_ms': 0.0,
+            'last_flush_at': None,
+        }
+
+    def _ensure_started(self):
+        """Start the writer for this process (again after fork)"""
+        pid = os.getpid()
+        if self._pid == pid and self._writer is not None and self._writer.is_alive():
+            return
+        with _start_lock:
+            if self._pid != pid:
+                # First use, or a forked child: the parent's queued events belong to the parent
+                self._reset_process_state()
+                self._pid = pid
+                self._replay_orphaned_spools()
+                self._open_spool()
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name='audit-sink-writer', daemon=True)
+                self._writer.start()
+
+    def _bind_app(self):
+        """Remember the Flask app so the writer thread can open an app context"""
+        if self._app is None:
+            from flask import current_app
+            self._app = current_app._get_current_object()
+
+    # ------------------------------------------------------------------
+    # Spool (append-only crash log)
+    # ------------------------------------------------------------------
+
+    def _ensure_spool_dir(self):
+        """
+        Create the spool directory 0700, or refuse one that another user owns.
+
+        HIPAA COMPLIANCE: spooled events carry PHI and the default location is
+        under the shared temp directory.
+        """
+        os.makedirs(self.spool_dir, mode=0o700, exist_ok=True)
+        if os.path.islink(self.spool_dir):
+            raise OSError(f"spool directory {self.spool_dir} is a symlink")
+        if os.stat(self.spool_dir).st_uid != os.geteuid():
+            raise OSError(f"spool directory {self.spool_dir} is owned by another user")
+        os.chmod(self.spool_dir, 0o700)
+
+    def _open_private(self, path: str):
+        """Open for append, creating the file 0600"""
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        return os.fdopen(fd, 'a', encoding='utf-8')
+
+    def _open_spool(self):
+        try:
+            self._ensure_spool_dir()
+            self._spool_path = os.path.join(self.spool_dir, f'{SPOOL_PREFIX}{os.getpid()}{SPOOL_SUFFIX}')
+            self._spool_file = self._open_private(self._spool_path)
+        except OSError as e:
+            # Without a spool the sink still works; durability drops to "flushed on exit"
+            logger.error(f"Audit spool unavailable at {self.spool_dir}: {e}")
+            self._spool_file = None
+
+    def _spool_append(self, entry: Dict[str, Any]):
+        if self._spool_file is None:
+            return
+        try:
+            self._spool_file.write(json.dumps(entry, default=_json_default) + '\n')
+            self._spool_file.flush()
+            if self.spool_fsync:
+                os.fsync(self._spool_file.fileno())
+        except OSError as e:
+            # The event is still queued for the database; only crash durability is lost
+            logger.error(f"Audit spool append failed ({self._spool_path}): {e}")
+
+    def _spool_ack(self, event_ids: List[str]):
+        """Acknowledge written events; truncate the spool once nothing is outstanding"""
+        with self._lock:
+            self._outstanding -= len(event_ids)
+            if self._spool_file is None:
+                return
+            if self._outstanding <= 0:
+                self._outstanding = 0
+                self._spool_file.seek(0)
+                self._spool_file.truncate()
+            else:
+                self._spool_append({'op': 'ack', 'ids': event_ids})
+
+    def _replay_orphaned_spools(self):
+        """Insert unacknowledged events from spools of processes that are gone"""
+        try:
+            self._ensure_spool_dir()
+            names = os.listdir(self.spool_dir)
+        except OSError:
+            return
+
+        for name in names:
+            if not name.startswith(SPOOL_PREFIX) or name == DEAD_LETTER_FILE:
+                continue
+            # audit-<pid>.jsonl, or audit-<pid>.jsonl.replay-<pid> left by a replayer that died
+            base, _, replayer = name.partition('.replay-')
+            if not base.endswith(SPOOL_SUFFIX):
+                continue
+            try:
+                owner_pid = int(replayer or base[len(SPOOL_PREFIX):-len(SPOOL_SUFFIX)])
+            except ValueError:
+                continue
+            # Our own PID here is a previous incarnation (our spool is not open yet)
+            if owner_pid != os.getpid() and _pid_alive(owner_pid):
+                continue
+
+            path = os.path.join(self.spool_dir, name)
+            claimed = os.path.join(self.spool_dir, f'{base}.replay-{os.getpid()}')
+            try:
+                os.rename(path, claimed)  # Atomic claim - only one process replays a spool
+            except OSError:
+                continue
+
+            try:
+                self._replay_spool(claimed, name)
+            except Exception as e:
+                # Left in place under our claim; the next process after us retries it
+                logger.error(f"Audit spool replay failed for {name}: {e}")
+
+    def _replay_spool(self, claimed: str, name: str):
+        events, acked = {}, set()
+        with open(claimed, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn final line from a crash mid-write
+                if entry.get('op') == 'event':
+                    events[entry['id']] = entry
+                elif entry.get('op') == 'ack':
+                    acked.update(entry.get('ids', ()))
+
+        pending = [entry for event_id, entry in events.items() if event_id not in acked]
+        if pending:
+            logger.warning(f"Replaying {len(pending)} unwritten audit events from {name}")
+            self._write_batch(pending, spooled=False)
+            self._stats['replayed'] += len(pending)
+        secure_delete_file(claimed)
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(self, kind: str, values: Dict[str, Any]) -> bool:
+        """
+        Record an audit row. Returns True when buffered, False when the sink is
+        disabled (the caller writes synchronously instead).
+        """
+        if not self.enabled:
+            return False
+
+        self._bind_app()
+        self._ensure_started()
+
+        timestamp_column = _TIMESTAMP_COLUMNS[kind]
+        values.setdefault(timestamp_column, datetime.utcnow())
+        entry = {'op': 'event', 'id': uuid.uuid4().hex, 'kind': kind, 'values': values}
+
+        with self._lock:
+            self._spool_append(entry)
+            self._outstanding += 1
+            self._pending_by_org[(kind, values.get('org_id'))] += 1
+            self._stats['recorded'] += 1
+        with self._written_cond:
+            self._unwritten += 1
+
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._stats['backpressure_waits'] += 1
+            wait_start = time.monotonic()
+            try:
+                self._queue.put(entry, timeout=self.block_seconds)
+            except queue.Full:
+                # Never drop an audit event - write it on the caller's thread
+                self._stats['backpressure_fallbacks'] += 1
+                self._write_batch([entry])
+            finally:
+                self._stats['backpressure_wait_seconds'] += time.monotonic() - wait_start
+
+        depth = self._queue.qsize()
+        if depth > self._stats['max_queue_depth']:
+            self._stats['max_queue_depth'] = depth
+        return True
+
+    def pending_count(self, kind: str, org_id: int) -> int:
+        """Rows of this kind for an org recorded in this process but not yet written"""
+        with self._lock:
+            return self._pending_by_org.get((kind, org_id), 0)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch(self.flush_seconds)
+            if batch:
+                self._write_batch(batch)
+
+    def _take_batch(self, timeout: float) -> List[Dict[str, Any]]:
+        """Block for the first event, then gather up to batch_size without waiting"""
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _rows_by_kind(self, entries: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        grouped = {}
+        for entry in entries:
+            values = dict(entry['values'])
+            timestamp_column = _TIMESTAMP_COLUMNS[entry['kind']]
+            if isinstance(values.get(timestamp_column), str):
+                values[timestamp_column] = datetime.fromisoformat(values[timestamp_column])
+            grouped.setdefault(entry['kind'], []).append(values)
+        return grouped
+
+    def _insert(self, entries: List[Dict[str, Any]]):
+        """One executemany INSERT per kind, in a single transaction on its own connection"""
+        from app import db
+
+        with db.engine.begin() as conn:
+            for kind, rows in self._rows_by_kind(entries).items():
+                conn.execute(_model_for_kind(kind).__table__.insert(), rows)
+
+    def _write_batch(self, entries: List[Dict[str, Any]], spooled: bool = True):
+        """
+        Insert a batch; on failure retry row by row and dead-letter what still fails.
+
+        spooled: entries were recorded through this process's spool and queue
+        (False for replayed and synchronous writes - nothing to acknowledge).
+        """
+        start = time.monotonic()
+        try:
+            self._with_app_context(self._insert, entries)
+            written = len(entries)
+        except Exception as e:
+            self._stats['write_errors'] += 1
+            logger.error(f"Audit batch insert failed ({len(entries)} rows), retrying individually: {e}")
+            written = 0
+            for entry in entries:
+                try:
+                    self._with_app_context(self._insert, [entry])
+                    written += 1
+                except Exception as row_error:
+                    remapped = self._remap_deleted_references(entry)
+                    if remapped is not None:
+                        try:
+                            self._with_app_context(self._insert, [remapped])
+                            written += 1
+                            continue
+                        except Exception as remap_error:
+                            row_error = remap_error
+                    # Durably recorded in the dead-letter file - settled either way
+                    self._dead_letter(entry, row_error)
+
+        self._stats['written'] += written
+        self._stats['batches'] += 1
+        self._stats['last_batch_ms'] = round((time.monotonic() - start) * 1000, 2)
+        self._stats['last_flush_at'] = datetime.utcnow().isoformat()
+
+        if not spooled:
+            return
+        with self._lock:
+            for entry in entries:
+                key = (entry['kind'], entry['values'].get('org_id'))
+                self._pending_by_org[key] -= 1
+                if self._pending_by_org[key] <= 0:
+                    del self._pending_by_org[key]
+        self._spool_ack([entry['id'] for entry in entries])
+        with self._written_cond:
+            self._unwritten -= len(entries)
+            self._written_cond.notify_all()
+
+    def _remap_deleted_references(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Copy of entry moved to the System Organization if its organization, user
+        or patient no longer exists; None when every reference is still valid.
+        """
+        def find_missing():
+            from sqlalchemy import select
+            from app import db
+
+            missing = []
+            with db.engine.connect() as conn:
+                for column, table_name in _REFERENCE_COLUMNS:
+                    ref = entry['values'].get(column)
+                    table = db.metadata.tables.get(table_name)
+                    if ref is None or table is None:
+                        continue
+                    if conn.execute(select(table.c.id).where(table.c.id == ref)).first() is None:
+                        missing.append(column)
+            return missing
+
+        try:
+            missing = self._with_app_context(find_missing)
+        except Exception as e:
+            logger.error(f"Audit reference check failed for event {entry['id']}: {e}")
+            return None
+        if not missing:
+            return None
+
+        values = dict(entry['values'])
+        for column in missing:
+            values[column] = None
+        if 'org_id' in missing:
+            values['org_id'] = 0  # System Organization
+            if entry['kind'] == KIND_ADMIN_LOG:
+                values['action_details'] = (f"[ORG DELETED: org {entry['values']['org_id']}] "
+                                            + (values.get('action_details') or ""))
+        logger.warning(f"Audit event {entry['id']} references deleted rows ({', '.join(missing)}) - "
+                       f"retrying with those references remapped")
+        return dict(entry, values=values)
+
+    def _with_app_context(self, fn, *args):
+        from flask import has_app_context
+        if has_app_context() or self._app is None:
+            return fn(*args)
+        with self._app.app_context():
+            return fn(*args)
+
+    def _dead_letter(self, entry: Dict[str, Any], error: Exception):
+        self._stats['dead_lettered'] += 1
+        logger.error(f"AUDIT EVENT NOT WRITTEN ({entry['kind']}, id={entry['id']}): {error} - "
+                     f"preserved in {DEAD_LETTER_FILE}")
+        try:
+            self._ensure_spool_dir()
+            with self._open_private(os.path.join(self.spool_dir, DEAD_LETTER_FILE)) as f:
+                f.write(json.dumps(dict(entry, error=str(error)), default=_json_default) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            logger.critical(f"Audit dead-letter write failed: {e} - event: "
+                            f"{json.dumps(entry, default=_json_default)}")
+
+    def write_now(self, kind: str, values: Dict[str, Any]):
+        """Synchronous write bypassing the queue (sink disabled or backpressure)"""
+        values.setdefault(_TIMESTAMP_COLUMNS[kind], datetime.utcnow())
+        self._stats['sync_writes'] += 1
+        self._write_batch([{'op': 'event', 'id': uuid.uuid4().hex, 'kind': kind, 'values': values}],
+                          spooled=False)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Drain the queue on the calling thread, then wait for any batch the
+        writer thread is still inserting. Returns True once every event
+        recorded so far is written (or dead-lettered).
+
+        Use at the end of forked RQ jobs, before process exit and before
+        deleting rows audit events reference.
+        """
+        if self._pid != os.getpid():
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._queue.empty():
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            batch = self._take_batch(0)
+            if batch:
+                self._write_batch(batch)
+        with self._written_cond:
+            while self._unwritten > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._written_cond.wait(remaining)
+            return self._unwritten <= 0
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop the writer and flush everything still buffered"""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join(timeout=self.flush_seconds + 1)
+        if not self.flush(timeout=timeout):
+            logger.error(f"Audit sink shutdown with {self._unwritten} events unwritten - "
+                         f"they remain in the spool {self._spool_path} for replay")
+            return
+        with self._lock:
+            if self._spool_file is not None and self._outstanding == 0:
+                self._spool_file.close()
+                self._spool_file = None
+                secure_delete_file(self._spool_path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Throughput and backpressure metrics for monitoring"""
+        stats = dict(self._stats)
+        stats.update({
+            'enabled': self.enabled,
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self.queue_size,
+            'queue_utilization': round(self._queue.qsize() / self.queue_size, 4) if self.queue_size else 0.0,
+            'outstanding': self._outstanding,
+            'unwritten': self._unwritten,
+            'writer_alive': bool(self._writer and self._writer.is_alive()),
+            'spool_path': self._spool_path,
+        })
+        return stats
+
+
+_start_lock = threading.Lock()
+
+
+def _reset_start_lock_in_child():
+    # A lock held by another parent thread at fork time would never be released
+    global _start_lock
+    _start_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_start_lock_in_child)
+
+_sink = AuditSink()
+atexit.register(_sink.shutdown)
+
+
+def get_audit_sink() -> AuditSink:
+    """Process-wide audit sink"""
+    return _sink
+
+
+def record_audit_row(kind: str, values: Dict[str, Any]) -> bool:
+    """Buffer an audit row; False means the sink is disabled and the caller writes it"""
+    return _sink.record(kind, values)
+
+
+def flush_audit_sink(timeout: Optional[float] = None) -> bool:
+    """Write all buffered audit rows now"""
+    return _sink.flush(timeout)
+
+
+def get_audit_sink_stats() -> Dict[str, Any]:
+    return _sink.get_stats()
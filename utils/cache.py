@@ -0,0 +1,435 @@
+"""
+Two-tier cache: in-process LRU in front of Redis.
+
+Each gunicorn worker and RQ worker keeps a small LRU of hot values. Redis is the
+shared second tier, so a value computed by one process is reused by every other
+process, and an invalidation in one process reaches all of them.
+
+Design:
+- Versioned keys: every namespace has a schema version (bumped in code when the
+  cached value shape changes) and every key has a generation counter in Redis.
+  invalidate() increments the generation, so a value computed before the
+  invalidation can never be served after it - even if a slow recompute writes
+  it back late.
+- Pub/sub invalidation: invalidate() publishes on CACHE_CHANNEL; a daemon
+  thread in each process drops the matching local LRU entries. Local entries
+  also expire after local_ttl_seconds as a bound if a message is missed.
+- Stampede protection: get_or_compute() allows a single recompute per key -
+  in-process via an Event, across processes via a short Redis lock (SET NX PX).
+  Other callers wait for the leader's result instead of hitting the database.
+- Metrics: per-namespace hit/miss/compute/wait/error counters (get_stats()).
+
+Redis is optional. Without REDIS_URL (development) or when Redis errors, the
+cache degrades to the local LRU with the full TTL - the same behavior as the
+previous process-local dict cache. Values are stored as JSON (never pickle),
+so cached values must be JSON-serializable or use serializer/deserializer.
+
+Configuration (environment):
+    REDIS_URL               Shared Redis (also used by RQ and rate limiting)
+    APP_CACHE_REDIS_URL     Optional override for the cache only
+    APP_CACHE_LOCAL_TTL     Max seconds a local entry is trusted (default 60)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'hp:cache'
+CACHE_CHANNEL = 'hp:cache:invalidate'
+DEFAULT_LOCAL_TTL_SECONDS = int(os.environ.get('APP_CACHE_LOCAL_TTL', '60'))
+REDIS_RETRY_SECONDS = 30  # Back-off after a Redis error before trying again
+LOCK_TIMEOUT_MS = 10000  # Max time a recompute lock is held across processes
+GENERATION_TTL_SECONDS = 30 * 24 * 3600
+
+_MISSING = object()
+
+_registry: Dict[str, 'TwoTierCache'] = {}
+_registry_lock = threading.Lock()
+
+_redis_client = None
+_redis_retry_at = 0.0
+_redis_lock = threading.Lock()
+
+_subscriber_pid = None
+_instance_id = uuid.uuid4().hex
+
+
+def _get_redis_client():
+    """
+    Get the shared Redis client for the cache tier, or None when unavailable.
+
+    Uses short socket timeouts so a slow or unreachable Redis degrades to the
+    local tier instead of stalling requests.
+    """
+    global _redis_client, _redis_retry_at
+
+    if _redis_client:
+        return _redis_client
+    if time.monotonic() < _redis_retry_at:
+        return None
+
+    redis_url = os.environ.get('APP_CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+    if not redis_url:
+        _redis_retry_at = float('inf')  # Not configured - local tier only
+        return None
+
+    with _redis_lock:
+        if _redis_client:
+            return _redis_client
+        try:
+            import redis
+            client = redis.from_url(redis_url, decode_responses=True,
+                                    socket_timeout=0.5, socket_connect_timeout=0.5)
+            client.ping()
+            _redis_client = client
+            logger.info("Redis connected for shared application cache")
+        except ImportError:
+            logger.warning("Redis package not installed - application cache is process-local")
+            _redis_retry_at = float('inf')
+            return None
+        except Exception as e:
+            logger.warning(f"Redis unavailable for application cache, using local tier: {e}")
+            _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+            return None
+
+    _ensure_subscriber()
+    return _redis_client
+
+
+def _mark_redis_failed(error: Exception) -> None:
+    """Drop the Redis client after an error and back off before reconnecting"""
+    global _redis_client, _redis_retry_at
+    logger.warning(f"Application cache Redis error, falling back to local tier: {error}")
+    _redis_client = None
+    _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+def _ensure_subscriber() -> None:
+    """
+    Start the pub/sub invalidation listener for this process.
+
+    Checked by PID so that forked workers (gunicorn, RQ) each start their own
+    listener - threads do not survive fork().
+    """
+    global _subscriber_pid
+
+    pid = os.getpid()
+    if _subscriber_pid == pid:
+        return
+    _subscriber_pid = pid
+
+    thread = threading.Thread(target=_subscriber_loop, name='app-cache-invalidation', daemon=True)
+    thread.start()
+
+
+def _subscriber_loop() -> None:
+    redis_url = os.environ.get('APP_CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+    while True:
+        try:
+            import redis
+            client = redis.from_url(redis_url, decode_responses=True)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CACHE_CHANNEL)
+            for message in pubsub.listen():
+                _handle_invalidation_message(message.get('data'))
+        except Exception as e:
+            logger.warning(f"Application cache invalidation listener disconnected: {e}")
+            # Anything published while disconnected is missed - drop local entries
+            for cache in list(_registry.values()):
+                cache.clear_local()
+            time.sleep(REDIS_RETRY_SECONDS)
+
+
+def _handle_invalidation_message(data) -> None:
+    try:
+        payload = json.loads(data)
+    except (TypeError, ValueError):
+        return
+    if payload.get('origin') == _instance_id:
+        return  # Already applied locally by the publisher
+    cache = _registry.get(payload.get('ns'))
+    if cache is None:
+        return
+    cache._record('remote_invalidations')
+    if payload.get('key') is None:
+        cache.clear_local()
+    else:
+        cache._drop_local(str(payload['key']))
+
+
+class TwoTierCache:
+    """
+    Namespaced two-tier cache (local LRU + Redis).
+
+    Args:
+        namespace: Unique name, part of every Redis key
+        ttl_seconds: Lifetime of a value in Redis (and locally without Redis)
+        version: Schema version of cached values; bump when the shape changes
+        local_ttl_seconds: Max age of a local entry while Redis is available
+        max_local_entries: LRU capacity per process
+        serializer / deserializer: Convert values to/from JSON-compatible data
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: int = 3600, version: int = 1,
+                 local_ttl_seconds: Optional[int] = None, max_local_entries: int = 1024,
+                 serializer: Optional[Callable[[Any], Any]] = None,
+                 deserializer: Optional[Callable[[Any], Any]] = None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+        self.local_ttl_seconds = min(local_ttl_seconds or DEFAULT_LOCAL_TTL_SECONDS, ttl_seconds)
+        self.max_local_entries = max_local_entries
+        self._serialize = serializer or (lambda value: value)
+        self._deserialize = deserializer or (lambda value: value)
+
+        self._local: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._metrics = {
+            'local_hits': 0, 'redis_hits': 0, 'misses': 0, 'computes': 0,
+            'singleflight_waits': 0, 'invalidations': 0, 'remote_invalidations': 0,
+            'errors': 0, 'compute_ms_total': 0.0,
+        }
+
+    # ------------------------------------------------------------------ keys
+
+    def _value_key(self, key: str) -> str:
+        return f"{CACHE_KEY_PREFIX}:{self.namespace}:v{self.version}:{key}"
+
+    def _generation_key(self, key: str) -> str:
+        return f"{CACHE_KEY_PREFIX}:{self.namespace}:gen:{key}"
+
+    def _lock_key(self, key: str) -> str:
+        return f"{CACHE_KEY_PREFIX}:{self.namespace}:lock:{key}"
+
+    # --------------------------------------------------------------- metrics
+
+    def _record(self, metric: str, amount=1) -> None:
+        with self._lock:
+            self._metrics[metric] += amount
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters and local tier size for monitoring"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            local_entries = len(self._local)
+        lookups = metrics['local_hits'] + metrics['redis_hits'] + metrics['misses']
+        hits = metrics['local_hits'] + metrics['redis_hits']
+        metrics['compute_ms_total'] = round(metrics['compute_ms_total'], 1)
+        metrics.update({
+            'namespace': self.namespace,
+            'version': self.version,
+            'local_entries': local_entries,
+            'hit_rate': round(hits / lookups, 3) if lookups else None,
+            'redis_enabled': bool(_redis_client),
+        })
+        return metrics
+
+    # ----------------------------------------------------------- local tier
+
+    def _get_local(self, key: str):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._local[key]
+                return _MISSING
+            self._local.move_to_end(key)
+            return value
+
+    def _set_local(self, key: str, value) -> None:
+        ttl = self.local_ttl_seconds if _redis_client else self.ttl_seconds
+        with self._lock:
+            self._local[key] = (value, time.monotonic() + ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    def _drop_local(self, key: str) -> None:
+        with self._lock:
+            self._local.pop(key, None)
+
+    def clear_local(self) -> None:
+        """Drop every local entry of this namespace (Redis values are kept)"""
+        with self._lock:
+            self._local.clear()
+
+    # ---------------------------------------------------------- public API
+
+    def get(self, key, default=None):
+        """Return the cached value, or default on a miss"""
+        key = str(key)
+        value = self._get_local(key)
+        if value is not _MISSING:
+            self._record('local_hits')
+            return value
+
+        client = _get_redis_client()
+        if client is not None:
+            try:
+                raw, generation = client.mget(self._value_key(key), self._generation_key(key))
+                if raw is not None:
+                    payload = json.loads(raw)
+                    if payload.get('g') == int(generation or 0):
+                        value = self._deserialize(payload['v'])
+                        self._set_local(key, value)
+                        self._record('redis_hits')
+                        return value
+            except Exception as e:
+                self._record('errors')
+                _mark_redis_failed(e)
+
+        self._record('misses')
+        return default
+
+    def set(self, key, value, generation: Optional[int] = None) -> None:
+        """
+        Store a value in both tiers.
+
+        generation is the key generation observed before the value was computed;
+        if the key was invalidated since, the value is stored but never served.
+        """
+        key = str(key)
+        client = _get_redis_client()
+        if client is not None:
+            try:
+                if generation is None:
+                    generation = int(client.get(self._generation_key(key)) or 0)
+                payload = json.dumps({'g': generation, 'v': self._serialize(value)})
+                client.set(self._value_key(key), payload, ex=self.ttl_seconds)
+            except Exception as e:
+                self._record('errors')
+                _mark_redis_failed(e)
+        self._set_local(key, value)
+
+    def invalidate(self, key=None) -> None:
+        """
+        Invalidate one key (or the whole namespace when key is None) in every process.
+
+        Namespace-wide invalidation only clears local tiers; Redis values for the
+        namespace expire by TTL. Prefer per-key invalidation.
+        """
+        self._record('invalidations')
+        if key is None:
+            self.clear_local()
+        else:
+            key = str(key)
+            self._drop_local(key)
+
+        client = _get_redis_client()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline()
+            if key is not None:
+                pipe.incr(self._generation_key(key))
+                pipe.expire(self._generation_key(key), GENERATION_TTL_SECONDS)
+                pipe.delete(self._value_key(key))
+            pipe.publish(CACHE_CHANNEL, json.dumps({
+                'ns': self.namespace, 'key': key, 'origin': _instance_id
+            }))
+            pipe.execute()
+        except Exception as e:
+            self._record('errors')
+            _mark_redis_failed(e)
+
+    def get_or_compute(self, key, compute_fn: Callable[[], Any], wait_seconds: float = 10.0):
+        """
+        Return the cached value, computing it at most once across callers on a miss.
+
+        The first caller in a process becomes the leader; concurrent callers in the
+        same process wait on its Event. Across processes the leader takes a short
+        Redis lock and other processes poll for the stored value. If the leader
+        fails or the wait times out, callers compute the value themselves.
+        """
+        key = str(key)
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            event = self._inflight.get(key)
+            is_leader = event is None
+            if is_leader:
+                event = threading.Event()
+                self._inflight[key] = event
+
+        if not is_leader:
+            self._record('singleflight_waits')
+            event.wait(wait_seconds)
+            value = self._get_local(key)
+            return value if value is not _MISSING else compute_fn()
+
+        try:
+            return self._compute_as_leader(key, compute_fn, wait_seconds)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _compute_as_leader(self, key: str, compute_fn: Callable[[], Any], wait_seconds: float):
+        client = _get_redis_client()
+        lock_token = None
+        generation = None
+
+        if client is not None:
+            try:
+                generation = int(client.get(self._generation_key(key)) or 0)
+                token = uuid.uuid4().hex
+                if client.set(self._lock_key(key), token, nx=True, px=LOCK_TIMEOUT_MS):
+                    lock_token = token
+                else:
+                    # Another process is computing - wait for its result
+                    self._record('singleflight_waits')
+                    deadline = time.monotonic() + wait_seconds
+                    while time.monotonic() < deadline:
+                        time.sleep(0.05)
+                        raw = client.get(self._value_key(key))
+                        if raw is not None:
+                            payload = json.loads(raw)
+                            if payload.get('g') == generation:
+                                value = self._deserialize(payload['v'])
+                                self._set_local(key, value)
+                                return value
+            except Exception as e:
+                self._record('errors')
+                _mark_redis_failed(e)
+
+        try:
+            started = time.perf_counter()
+            value = compute_fn()
+            self._record('computes')
+            self._record('compute_ms_total', (time.perf_counter() - started) * 1000)
+            self.set(key, value, generation=generation)
+            return value
+        finally:
+            if lock_token is not None and _redis_client:
+                try:
+                    if _redis_client.get(self._lock_key(key)) == lock_token:
+                        _redis_client.delete(self._lock_key(key))
+                except Exception:
+                    pass
+
+
+def get_cache(namespace: str, **options) -> TwoTierCache:
+    """Get or create the process-wide cache for a namespace"""
+    with _registry_lock:
+        cache = _registry.get(namespace)
+        if cache is None:
+            cache = TwoTierCache(namespace, **options)
+            _registry[namespace] = cache
+        return cache
+
+
+def get_all_cache_stats() -> dict:
+    """Metrics for every registered namespace"""
+    return {namespace: cache.get_stats() for namespace, cache in list(_registry.items())}
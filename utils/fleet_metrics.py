@@ -0,0 +1,682 @@
+"""
+Fleet-wide job throughput metrics
+
+PerformanceMonitor (utils/performance.py) keeps its job history in process
+memory, so with several gunicorn and RQ workers each process only ever saw its
+own slice. Every process now also records counters and histograms here (OCR
+jobs and pages, screening refresh patients, FHIR request latency, RQ jobs) and
+a daemon thread pushes the deltas to Redis every FLEET_METRICS_PUSH_INTERVAL
+seconds:
+
+    hp:metrics:total            cumulative series -> value (Prometheus counters)
+    hp:metrics:w:<minute>       the same deltas per minute, kept for
+                                FLEET_METRICS_RETENTION seconds (windowed rates)
+    hp:metrics:procs            sorted set of live processes by last push
+    hp:metrics:proc:<id>        per-process gauges (role, CPU, RSS, active jobs)
+
+Series are stored under their Prometheus names (`name{label="value"}`,
+histograms as cumulative `_bucket{le=...}`, `_sum` and `_count`), so the
+fleet aggregate is a plain HINCRBYFLOAT and render_prometheus() only has to
+group and print. get_fleet_throughput() and get_fleet_processes() feed
+PerformanceMonitor's throughput and scaling recommendations; /api/metrics
+exposes render_prometheus() to a scraper.
+
+Redis is optional. Without REDIS_URL, or while Redis errors, every query falls
+back to this process's own numbers (reported as scope 'process'). RQ
+work-horses exit with os._exit(), so worker.py calls flush_fleet_metrics()
+after each job instead of relying on the push thread.
+
+Configuration (environment):
+    FLEET_METRICS_ENABLED       'false' disables recording and pushing
+    FLEET_METRICS_REDIS_URL     Optional override for REDIS_URL
+    FLEET_METRICS_PUSH_INTERVAL Seconds between pushes (default 15)
+    FLEET_METRICS_RETENTION     Seconds of per-minute windows kept (default 7200)
+"""
+
+import atexit
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY_PREFIX = 'hp:metrics'
+WINDOW_SECONDS = 60
+PUSH_INTERVAL_SECONDS = int(os.environ.get('FLEET_METRICS_PUSH_INTERVAL', '15'))
+RETENTION_SECONDS = int(os.environ.get('FLEET_METRICS_RETENTION', '7200'))
+PROCESS_TTL_SECONDS = max(60, PUSH_INTERVAL_SECONDS * 3)
+REDIS_RETRY_SECONDS = 30  # Back-off after a Redis error before trying again
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+JOB_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+
+@dataclass(frozen=True)
+class MetricSpec:
+    kind: str  # 'counter' or 'histogram'
+    help: str
+    labels: Tuple[str, ...] = ()
+    buckets: Tuple[float, ...] = ()
+
+
+JOBS_TOTAL = 'healthprep_jobs_total'
+JOB_DURATION = 'healthprep_job_duration_seconds'
+JOB_PAGES = 'healthprep_job_pages_total'
+JOB_BYTES = 'healthprep_job_bytes_total'
+REFRESH_PATIENTS = 'healthprep_refresh_patients_total'
+REFRESH_DURATION = 'healthprep_refresh_duration_seconds'
+FHIR_REQUEST_DURATION = 'healthprep_fhir_request_duration_seconds'
+RQ_JOBS_TOTAL = 'healthprep_rq_jobs_total'
+RQ_JOB_DURATION = 'healthprep_rq_job_duration_seconds'
+
+METRICS: Dict[str, MetricSpec] = {
+    JOBS_TOTAL: MetricSpec('counter', 'Tracked processing jobs completed (PerformanceMonitor)', ('job_type', 'status')),
+    JOB_DURATION: MetricSpec('histogram', 'Wall time of tracked processing jobs', ('job_type',), JOB_BUCKETS),
+    JOB_PAGES: MetricSpec('counter', 'Pages processed by tracked jobs', ('job_type',)),
+    JOB_BYTES: MetricSpec('counter', 'Bytes processed by tracked jobs', ('job_type',)),
+    REFRESH_PATIENTS: MetricSpec('counter', 'Patients evaluated by screening refreshes', ('status',)),
+    REFRESH_DURATION: MetricSpec('histogram', 'Wall time of screening refreshes', ('status',), JOB_BUCKETS),
+    FHIR_REQUEST_DURATION: MetricSpec('histogram', 'Epic FHIR HTTP request latency', ('resource', 'outcome'),
+                                      LATENCY_BUCKETS),
+    RQ_JOBS_TOTAL: MetricSpec('counter', 'RQ jobs performed', ('function', 'status')),
+    RQ_JOB_DURATION: MetricSpec('histogram', 'Wall time of RQ jobs', ('function',), JOB_BUCKETS),
+}
+
+_SERIES_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?$')
+_LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _unescape(value: str) -> str:
+    return value.replace('\\"', '"').replace('\\n', '\n').replace('\\\\', '\\')
+
+
+def series_key(name: str, labels: Optional[Dict[str, object]] = None) -> str:
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def parse_series(series: str) -> Tuple[str, Dict[str, str]]:
+    match = _SERIES_RE.match(series)
+    if not match:
+        return series, {}
+    return match.group(1), {key: _unescape(value) for key, value in _LABEL_RE.findall(match.group(2) or '')}
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class MetricsRegistry:
+    """
+    Per-process counters and histograms.
+
+    Keeps the deltas not yet pushed, this process's cumulative totals and its
+    own per-minute windows (the fallback when Redis is unavailable).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, float] = {}
+        self._totals: Dict[str, float] = {}
+        self._windows: 'OrderedDict[int, Dict[str, float]]' = OrderedDict()
+
+    def _add(self, series: str, amount: float, window: Dict[str, float]) -> None:
+        self._pending[series] = self._pending.get(series, 0.0) + amount
+        self._totals[series] = self._totals.get(series, 0.0) + amount
+        window[series] = window.get(series, 0.0) + amount
+
+    def _window(self) -> Dict[str, float]:
+        start = int(time.time()) // WINDOW_SECONDS * WINDOW_SECONDS
+        window = self._windows.get(start)
+        if window is None:
+            window = self._windows[start] = {}
+            cutoff = start - RETENTION_SECONDS
+            while self._windows and next(iter(self._windows)) < cutoff:
+                self._windows.popitem(last=False)
+        return window
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        series = series_key(name, labels)
+        with self._lock:
+            self._add(series, amount, self._window())
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        spec = METRICS[name]
+        with self._lock:
+            window = self._window()
+            for bound in spec.buckets + (float('inf'),):
+                if value <= bound:
+                    self._add(series_key(f'{name}_bucket', dict(labels, le=_format_bound(bound))), 1.0, window)
+            self._add(series_key(f'{name}_sum', labels), value, window)
+            self._add(series_key(f'{name}_count', labels), 1.0, window)
+
+    def take_pending(self) -> Dict[str, float]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def restore_pending(self, pending: Dict[str, float]) -> None:
+        """Put back deltas whose push failed so the next push carries them"""
+        with self._lock:
+            for series, amount in pending.items():
+                self._pending[series] = self._pending.get(series, 0.0) + amount
+
+    def totals(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._totals)
+
+    def window_since(self, start: int) -> Dict[str, float]:
+        merged: Dict[str, float] = {}
+        with self._lock:
+            for window_start, window in self._windows.items():
+                if window_start >= start:
+                    for series, amount in window.items():
+                        merged[series] = merged.get(series, 0.0) + amount
+        return merged
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._totals.clear()
+            self._windows.clear()
+
+
+_registry = MetricsRegistry()
+_gauge_providers: List[Callable[[], Dict[str, float]]] = []
+_process_role = os.environ.get('APP_PHASE', 'serve')
+
+_redis_client = None
+_redis_retry_at = 0.0
+_redis_lock = threading.Lock()
+
+_pusher_pid = None
+_pusher_lock = threading.Lock()
+_push_stats = {'pushes': 0, 'push_errors': 0, 'last_push': None}
+
+
+def fleet_metrics_enabled() -> bool:
+    return _env_flag('FLEET_METRICS_ENABLED', True)
+
+
+def configure_fleet_metrics(role: str) -> None:
+    """Label this process's gauges with its role (the create_app phase)"""
+    global _process_role
+    _process_role = role
+
+
+def register_gauge_provider(provider: Callable[[], Dict[str, float]]) -> None:
+    """provider() returns extra per-process gauges, pushed with CPU and memory"""
+    _gauge_providers.append(provider)
+
+
+def _instance_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _get_redis_client():
+    """Shared Redis client for the metrics store, or None when unavailable (see utils/cache.py)"""
+    global _redis_client, _redis_retry_at
+
+    if _redis_client:
+        return _redis_client
+    if time.monotonic() < _redis_retry_at:
+        return None
+
+    redis_url = os.environ.get('FLEET_METRICS_REDIS_URL') or os.environ.get('REDIS_URL')
+    if not redis_url:
+        _redis_retry_at = float('inf')  # Not configured - process-local metrics only
+        return None
+
+    with _redis_lock:
+        if _redis_client:
+            return _redis_client
+        try:
+            import redis
+            client = redis.from_url(redis_url, decode_responses=True,
+                                    socket_timeout=0.5, socket_connect_timeout=0.5)
+            client.ping()
+            _redis_client = client
+            logger.info("Redis connected for fleet metrics")
+        except ImportError:
+            logger.warning("Redis package not installed - fleet metrics are process-local")
+            _redis_retry_at = float('inf')
+        except Exception as e:
+            logger.warning(f"Redis unavailable for fleet metrics, using process-local metrics: {e}")
+            _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+    return _redis_client
+
+
+def _mark_redis_failed(error: Exception) -> None:
+    global _redis_client, _redis_retry_at
+    logger.warning(f"Fleet metrics Redis error, falling back to process-local metrics: {error}")
+    _redis_client = None
+    _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+# -----------------------------------------------------------------------------
+# Recording
+# -----------------------------------------------------------------------------
+
+def _record(fn, *args, **labels) -> None:
+    if not fleet_metrics_enabled():
+        return
+    try:
+        fn(*args, **labels)
+        _ensure_pusher()
+    except Exception as e:
+        logger.debug(f"Fleet metric not recorded: {e}")
+
+
+def record_job(job_type: str, seconds: float, success: bool, pages: int = 0, bytes_processed: int = 0) -> None:
+    """A PerformanceMonitor job (OCR document, FHIR sync, ...) finished"""
+    _record(_registry.inc, JOBS_TOTAL, 1, job_type=job_type, status='success' if success else 'failed')
+    _record(_registry.observe, JOB_DURATION, seconds, job_type=job_type)
+    if pages:
+        _record(_registry.inc, JOB_PAGES, pages, job_type=job_type)
+    if bytes_processed:
+        _record(_registry.inc, JOB_BYTES, bytes_processed, job_type=job_type)
+
+
+def record_screening_refresh(patients: int, seconds: float, success: bool) -> None:
+    status = 'success' if success else 'failed'
+    _record(_registry.inc, REFRESH_PATIENTS, patients, status=status)
+    _record(_registry.observe, REFRESH_DURATION, seconds, status=status)
+
+
+def record_fhir_request(resource: str, seconds: float, status_code: Optional[int]) -> None:
+    if status_code is None:
+        outcome = 'error'
+    elif status_code < 400:
+        outcome = 'success'
+    else:
+        outcome = f'{status_code // 100}xx'
+    _record(_registry.observe, FHIR_REQUEST_DURATION, seconds, resource=resource, outcome=outcome)
+
+
+def record_rq_job(function: str, seconds: float, success: bool) -> None:
+    _record(_registry.inc, RQ_JOBS_TOTAL, 1, function=function, status='success' if success else 'failed')
+    _record(_registry.observe, RQ_JOB_DURATION, seconds, function=function)
+
+
+# -----------------------------------------------------------------------------
+# Pushing
+# -----------------------------------------------------------------------------
+
+def _process_gauges() -> Dict[str, object]:
+    gauges: Dict[str, object] = {'role': _process_role, 'host': socket.gethostname(), 'pid': os.getpid()}
+    try:
+        import psutil
+        gauges['cpu_percent'] = psutil.cpu_percent(interval=None)  # host-wide, since the previous push
+        gauges['memory_percent'] = psutil.virtual_memory().percent
+        gauges['rss_mb'] = round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+    except Exception as e:
+        logger.debug(f"Process gauges unavailable: {e}")
+    for provider in _gauge_providers:
+        try:
+            gauges.update(provider())
+        except Exception as e:
+            logger.debug(f"Gauge provider failed: {e}")
+    return gauges
+
+
+def push_metrics() -> bool:
+    """Push this process's deltas and gauges to Redis. Returns False when Redis is unavailable."""
+    client = _get_redis_client()
+    if client is None:
+        _registry.take_pending()  # already in the process-local totals and windows
+        return False
+
+    pending = _registry.take_pending()
+    now = time.time()
+    window_key = f'{METRICS_KEY_PREFIX}:w:{int(now) // WINDOW_SECONDS * WINDOW_SECONDS}'
+    instance = _instance_id()
+    try:
+        pipe = client.pipeline(transaction=False)
+        for series, amount in pending.items():
+            pipe.hincrbyfloat(f'{METRICS_KEY_PREFIX}:total', series, amount)
+            pipe.hincrbyfloat(window_key, series, amount)
+        if pending:
+            pipe.expire(window_key, RETENTION_SECONDS + WINDOW_SECONDS)
+        proc_key = f'{METRICS_KEY_PREFIX}:proc:{instance}'
+        pipe.hset(proc_key, mapping={key: str(value) for key, value in _process_gauges().items()})
+        pipe.expire(proc_key, PROCESS_TTL_SECONDS)
+        pipe.zadd(f'{METRICS_KEY_PREFIX}:procs', {instance: now})
+        pipe.zremrangebyscore(f'{METRICS_KEY_PREFIX}:procs', 0, now - PROCESS_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        _registry.restore_pending(pending)
+        _push_stats['push_errors'] += 1
+        _mark_redis_failed(e)
+        return False
+
+    _push_stats['pushes'] += 1
+    _push_stats['last_push'] = now
+    return True
+
+
+def flush_fleet_metrics() -> bool:
+    """Push now (end of an RQ job in a work-horse that exits without atexit)"""
+    if not fleet_metrics_enabled():
+        return False
+    return push_metrics()
+
+
+def _push_loop() -> None:
+    pid = os.getpid()
+    while _pusher_pid == pid:
+        time.sleep(PUSH_INTERVAL_SECONDS)
+        try:
+            push_metrics()
+        except Exception as e:
+            logger.warning(f"Fleet metrics push failed: {e}")
+
+
+def _ensure_pusher() -> None:
+    """Start the push thread, once per PID - threads do not survive fork()"""
+    global _pusher_pid
+    pid = os.getpid()
+    if _pusher_pid == pid:
+        return
+    with _pusher_lock:
+        if _pusher_pid == pid:
+            return
+        _pusher_pid = pid
+        threading.Thread(target=_push_loop, name='fleet-metrics-push', daemon=True).start()
+
+
+def _push_at_exit() -> None:
+    if _pusher_pid == os.getpid():
+        try:
+            push_metrics()
+        except Exception:
+            pass
+
+
+atexit.register(_push_at_exit)
+
+
+# -----------------------------------------------------------------------------
+# Querying
+# -----------------------------------------------------------------------------
+
+def _window_start(window_seconds: int, now: float) -> int:
+    """Start of the first minute window overlapping [now - window_seconds, now]"""
+    return int(now - window_seconds) // WINDOW_SECONDS * WINDOW_SECONDS
+
+
+def get_fleet_window(window_seconds: int = 300) -> Tuple[str, Dict[str, float], float]:
+    """
+    Series totals over roughly the last window_seconds.
+
+    Returns (scope, series, covered_seconds); scope is 'fleet' when read from
+    Redis, 'process' for this process's own windows.
+    """
+    now = time.time()
+    start = _window_start(window_seconds, now)
+    covered = max(now - start, 1.0)
+
+    client = _get_redis_client()
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for window in range(start, int(now) + 1, WINDOW_SECONDS):
+                pipe.hgetall(f'{METRICS_KEY_PREFIX}:w:{window}')
+            merged: Dict[str, float] = {}
+            for window in pipe.execute():
+                for series, amount in (window or {}).items():
+                    merged[series] = merged.get(series, 0.0) + float(amount)
+            return 'fleet', merged, covered
+        except Exception as e:
+            _mark_redis_failed(e)
+
+    return 'process', _registry.window_since(start), covered
+
+
+def get_fleet_processes() -> List[Dict[str, object]]:
+    """Gauges last pushed by each live process (this process only without Redis)"""
+    client = _get_redis_client()
+    if client is not None:
+        try:
+            instances = client.zrangebyscore(f'{METRICS_KEY_PREFIX}:procs', time.time() - PROCESS_TTL_SECONDS, '+inf')
+            pipe = client.pipeline(transaction=False)
+            for instance in instances:
+                pipe.hgetall(f'{METRICS_KEY_PREFIX}:proc:{instance}')
+            processes = []
+            for instance, gauges in zip(instances, pipe.execute()):
+                if gauges:
+                    processes.append(dict(_coerce_gauges(gauges), instance=instance))
+            return processes
+        except Exception as e:
+            _mark_redis_failed(e)
+    return [dict(_process_gauges(), instance=_instance_id())]
+
+
+def _coerce_gauges(gauges: Dict[str, str]) -> Dict[str, object]:
+    coerced: Dict[str, object] = {}
+    for key, value in gauges.items():
+        try:
+            coerced[key] = float(value) if key not in ('role', 'host') else value
+        except (TypeError, ValueError):
+            coerced[key] = value
+    return coerced
+
+
+def _sum_series(series: Dict[str, float], name: str, **match) -> float:
+    total = 0.0
+    for key, amount in series.items():
+        metric, labels = parse_series(key)
+        if metric == name and all(labels.get(label) == value for label, value in match.items()):
+            total += amount
+    return total
+
+
+def histogram_quantile(series: Dict[str, float], name: str, quantile: float, **match) -> Optional[float]:
+    """Quantile from cumulative buckets, interpolated linearly within the bucket (as Prometheus does)"""
+    buckets: Dict[float, float] = {}
+    for key, amount in series.items():
+        metric, labels = parse_series(key)
+        if metric != f'{name}_bucket':
+            continue
+        if not all(labels.get(label) == value for label, value in match.items()):
+            continue
+        bound = float(labels.get('le', '+Inf').replace('+Inf', 'inf'))
+        buckets[bound] = buckets.get(bound, 0.0) + amount
+
+    if not buckets:
+        return None
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]]
+    if total <= 0:
+        return None
+
+    rank = quantile * total
+    previous_bound, previous_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float('inf'):
+                return previous_bound
+            if count == previous_count:
+                return bound
+            return previous_bound + (bound - previous_bound) * (rank - previous_count) / (count - previous_count)
+        previous_bound, previous_count = bound, count
+    return previous_bound
+
+
+def get_fleet_throughput(window_seconds: int = 300) -> Dict[str, object]:
+    """
+    Throughput over the window across all processes (keys compatible with
+    PerformanceMonitor.get_throughput_metrics, plus fleet-only figures).
+    """
+    scope, series, covered = get_fleet_window(window_seconds)
+
+    jobs = _sum_series(series, JOBS_TOTAL)
+    failed = _sum_series(series, JOBS_TOTAL, status='failed')
+    job_seconds = _sum_series(series, f'{JOB_DURATION}_sum')
+    pages = _sum_series(series, JOB_PAGES)
+    bytes_processed = _sum_series(series, JOB_BYTES)
+    ocr_documents = _sum_series(series, JOBS_TOTAL, job_type='ocr')
+    refresh_patients = _sum_series(series, REFRESH_PATIENTS)
+    fhir_requests = _sum_series(series, f'{FHIR_REQUEST_DURATION}_count')
+    fhir_ok = _sum_series(series, f'{FHIR_REQUEST_DURATION}_count', outcome='success')
+    rq_jobs = _sum_series(series, RQ_JOBS_TOTAL)
+
+    def per_second(value):
+        return round(value / covered, 3)
+
+    def milliseconds(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    by_job_type: Dict[str, Dict[str, float]] = {}
+    for key, amount in series.items():
+        metric, labels = parse_series(key)
+        if metric == JOBS_TOTAL:
+            entry = by_job_type.setdefault(labels.get('job_type', 'unknown'), {'jobs': 0, 'failed': 0})
+            entry['jobs'] += int(amount)
+            if labels.get('status') == 'failed':
+                entry['failed'] += int(amount)
+
+    return {
+        'scope': scope,
+        'window_seconds': window_seconds,
+        'covered_seconds': round(covered, 1),
+        'jobs_completed': int(jobs),
+        'jobs_failed': int(failed),
+        'pages_processed': int(pages),
+        'bytes_processed': int(bytes_processed),
+        'avg_job_time': round(job_seconds / jobs, 2) if jobs else 0,
+        'p95_job_time': histogram_quantile(series, JOB_DURATION, 0.95),
+        'pages_per_second': per_second(pages),
+        'bytes_per_second': round(bytes_processed / covered, 0),
+        'documents_per_second': per_second(ocr_documents),
+        'refresh_patients_per_second': per_second(refresh_patients),
+        'success_rate': round((jobs - failed) / jobs * 100, 1) if jobs else 0,
+        'by_job_type': by_job_type,
+        'rq': {
+            'jobs': int(rq_jobs),
+            'jobs_per_second': per_second(rq_jobs),
+            'failed': int(_sum_series(series, RQ_JOBS_TOTAL, status='failed')),
+            'p95_seconds': histogram_quantile(series, RQ_JOB_DURATION, 0.95),
+        },
+        'fhir': {
+            'requests': int(fhir_requests),
+            'requests_per_second': per_second(fhir_requests),
+            'error_rate': round((fhir_requests - fhir_ok) / fhir_requests * 100, 1) if fhir_requests else 0,
+            'p50_ms': milliseconds(histogram_quantile(series, FHIR_REQUEST_DURATION, 0.5)),
+            'p95_ms': milliseconds(histogram_quantile(series, FHIR_REQUEST_DURATION, 0.95)),
+        },
+    }
+
+
+def render_prometheus(extra_gauges: Optional[Dict[str, Tuple[str, Dict[str, float]]]] = None) -> str:
+    """
+    Prometheus text exposition (format 0.0.4) of the fleet totals and the live
+    processes' gauges. extra_gauges maps a metric name to (help, {series: value}).
+    """
+    client = _get_redis_client()
+    totals = None
+    if client is not None:
+        try:
+            totals = {series: float(value) for series, value in client.hgetall(f'{METRICS_KEY_PREFIX}:total').items()}
+        except Exception as e:
+            _mark_redis_failed(e)
+    scope = 'fleet' if totals is not None else 'process'
+    if totals is None:
+        totals = _registry.totals()
+
+    families: Dict[str, List[Tuple[str, float]]] = {}
+    for series, value in totals.items():
+        metric, _ = parse_series(series)
+        family = re.sub(r'_(bucket|sum|count)$', '', metric) if metric not in METRICS else metric
+        families.setdefault(family, []).append((series, value))
+
+    lines = []
+    for family in sorted(families):
+        spec = METRICS.get(family)
+        if spec is not None:
+            lines.append(f'# HELP {family} {spec.help}')
+            lines.append(f'# TYPE {family} {spec.kind}')
+        for series, value in sorted(families[family], key=_exposition_order):
+            lines.append(f'{series} {_format_value(value)}')
+
+    processes = get_fleet_processes()
+    lines.append('# HELP healthprep_metrics_processes Processes that pushed metrics recently')
+    lines.append('# TYPE healthprep_metrics_processes gauge')
+    lines.append(f'healthprep_metrics_processes{{scope="{scope}"}} {len(processes)}')
+    for gauge, help_text in (('cpu_percent', 'Host CPU utilisation seen by the process'),
+                             ('rss_mb', 'Process resident memory in MB'),
+                             ('active_jobs', 'Tracked jobs in progress')):
+        name = f'healthprep_process_{gauge}'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for process in processes:
+            if gauge in process:
+                labels = {'host': process.get('host'), 'pid': int(float(process.get('pid', 0))),
+                          'role': process.get('role')}
+                lines.append(f'{series_key(name, labels)} {_format_value(float(process[gauge]))}')
+
+    for name, (help_text, values) in (extra_gauges or {}).items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for series, value in values.items():
+            lines.append(f'{series} {_format_value(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def _exposition_order(item):
+    metric, labels = parse_series(item[0])
+    bound = labels.pop('le', None)
+    return (sorted(labels.items()), metric.endswith('_count'), metric.endswith('_sum'),
+            float(bound.replace('+Inf', 'inf')) if bound else 0.0)
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def get_fleet_metrics_stats() -> Dict[str, object]:
+    return {
+        'enabled': fleet_metrics_enabled(),
+        'redis': _redis_client is not None,
+        'push_interval_seconds': PUSH_INTERVAL_SECONDS,
+        **_push_stats,
+    }
+
+
+def reset_fleet_metrics() -> None:
+    """Clear this process's metrics (tests and benchmarks)"""
+    _registry.reset()
+
+
+def _reset_in_child():
+    """
+    A forked child (RQ work-horse, gunicorn worker) must not push the deltas it
+    inherited - the parent pushes those - and must not inherit a held lock.
+    """
+    global _pusher_lock, _redis_lock
+    _pusher_lock = threading.Lock()
+    _redis_lock = threading.Lock()
+    _registry._lock = threading.Lock()
+    _registry._pending = {}
+
+
+os.register_at_fork(after_in_child=_reset_in_child)
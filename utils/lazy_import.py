@@ -0,0 +1,65 @@
+"""
+Deferred imports for heavy optional modules
+
+PERFORMANCE: Stripe, PyMuPDF and the Tesseract bindings each take tens to
+hundreds of milliseconds to import (pytesseract pulls in pandas/numpy when
+installed) but most processes that import the modules using them never call
+them. lazy_module() returns a stand-in that imports the real module on first
+attribute access, so `stripe.Customer.create(...)` keeps working unchanged.
+"""
+
+import importlib
+import importlib.util
+import threading
+from types import ModuleType
+from typing import Callable, Optional
+
+
+class _LazyModule(ModuleType):
+    def __init__(self, name: str, on_import: Optional[Callable[[ModuleType], None]] = None):
+        super().__init__(name)
+        self.__dict__['_lazy_on_import'] = on_import
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    on_import = self.__dict__['_lazy_on_import']
+                    if on_import is not None:
+                        on_import(module)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_module(name: str, on_import: Optional[Callable[[ModuleType], None]] = None) -> ModuleType:
+    """Module proxy importing `name` on first use; on_import(module) runs once after the import"""
+    return _LazyModule(name, on_import)
+
+
+def module_available(name: str) -> bool:
+    """Whether `name` is importable, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def load_module(module: ModuleType) -> ModuleType:
+    """Force the import behind a lazy_module() proxy (e.g. to warm a worker before forking)"""
+    if isinstance(module, _LazyModule):
+        return module._load()
+    return module
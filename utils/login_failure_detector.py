@@ -0,0 +1,310 @@
+"""
+Sliding-window login failure detector
+
+Brute-force and password-spray detection used to query admin_logs /
+ip_blocklist on every failed login, so each attempt during a credential
+stuffing attack triggered a larger scan than the one before. This detector
+keeps the counts itself:
+
+    loginfail:ip:<ip>             attempts from an IP            (brute force)
+    loginfail:ip_users:<ip>       distinct usernames from an IP  (password spray)
+    loginfail:user:<username>     attempts against a username
+    loginfail:org:<org_id>        attempts against an organization
+
+Each window is a Redis sorted set scored by timestamp: one pipelined
+ZADD / ZREMRANGEBYSCORE / ZCARD round trip per failure, O(log n), with the key
+expiring after its window. Attempt sets are capped at MAX_EVENTS_PER_KEY
+members so a flood cannot grow them without bound. Without Redis (or when it
+errors) the same windows are kept in process memory - correct for one
+instance, per-instance in a multi-instance deployment.
+
+Alerts are deduplicated with claim_alert(): one alert per kind and subject
+per cooldown period, across all instances.
+
+The detector never touches the database; the login_failed AdminLog row is
+still written, asynchronously, through the audit sink (utils/audit_sink.py).
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'loginfail'
+MAX_EVENTS_PER_KEY = 10000
+MAX_MEMORY_KEYS = 50000
+REDIS_RETRY_SECONDS = 30
+
+# Window lengths in seconds (overridable per deployment)
+WINDOWS = {
+    'ip': int(os.environ.get('LOGIN_FAILURE_IP_WINDOW_SECONDS', 300)),
+    'ip_users': int(os.environ.get('LOGIN_FAILURE_SPRAY_WINDOW_SECONDS', 900)),
+    'user': int(os.environ.get('LOGIN_FAILURE_USER_WINDOW_SECONDS', 900)),
+    'org': int(os.environ.get('LOGIN_FAILURE_ORG_WINDOW_SECONDS', 300)),
+}
+
+
+@dataclass
+class FailureSnapshot:
+    """Window counts right after recording one failed login"""
+    ip_address: str
+    ip_attempts: int = 0
+    ip_usernames: List[str] = field(default_factory=list)
+    username_attempts: int = 0
+    org_attempts: int = 0
+
+    @property
+    def ip_distinct_usernames(self) -> int:
+        return len(self.ip_usernames)
+
+
+class _MemoryWindows:
+    """Process-local sliding windows (fallback when Redis is unavailable)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events: 'OrderedDict[str, deque]' = OrderedDict()
+        self._members: 'OrderedDict[str, Dict[str, float]]' = OrderedDict()
+        self._alerts: Dict[str, float] = {}
+
+    def _touch(self, store: OrderedDict, key: str, factory):
+        if key in store:
+            store.move_to_end(key)
+        else:
+            store[key] = factory()
+            while len(store) > MAX_MEMORY_KEYS:
+                store.popitem(last=False)
+        return store[key]
+
+    def add_event(self, key: str, now: float, window: int) -> int:
+        with self._lock:
+            events = self._touch(self._events, key, lambda: deque(maxlen=MAX_EVENTS_PER_KEY))
+            events.append(now)
+            while events and events[0] <= now - window:
+                events.popleft()
+            return len(events)
+
+    def count_events(self, key: str, now: float, window: int) -> int:
+        with self._lock:
+            events = self._events.get(key)
+            if not events:
+                return 0
+            return sum(1 for ts in events if ts > now - window)
+
+    def add_member(self, key: str, member: str, now: float, window: int) -> List[str]:
+        with self._lock:
+            members = self._touch(self._members, key, dict)
+            members[member] = now
+            for stale in [m for m, ts in members.items() if ts <= now - window]:
+                del members[stale]
+            return sorted(members, key=members.get)
+
+    def claim(self, key: str, now: float, ttl: int) -> bool:
+        with self._lock:
+            if self._alerts.get(key, 0) > now:
+                return False
+            if len(self._alerts) > MAX_MEMORY_KEYS:
+                self._alerts = {k: v for k, v in self._alerts.items() if v > now}
+            self._alerts[key] = now + ttl
+            return True
+
+    def is_claimed(self, key: str, now: float) -> bool:
+        with self._lock:
+            return self._alerts.get(key, 0) > now
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._alerts.pop(key, None)
+
+
+class LoginFailureDetector:
+    """Records failed logins and reports per-IP / username / org window counts"""
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self._redis_url = redis_url if redis_url is not None else (
+            os.environ.get('LOGIN_FAILURE_REDIS_URL') or os.environ.get('REDIS_URL')
+        )
+        self._redis = None
+        self._redis_retry_at = 0.0 if self._redis_url else float('inf')
+        self._redis_lock = threading.Lock()
+        self._memory = _MemoryWindows()
+
+    # -------------------------------------------------------------------------
+    # Redis connection
+    # -------------------------------------------------------------------------
+
+    def _get_redis(self):
+        if self._redis:
+            return self._redis
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        with self._redis_lock:
+            if self._redis:
+                return self._redis
+            try:
+                import redis
+                client = redis.from_url(self._redis_url, decode_responses=True,
+                                        socket_timeout=0.5, socket_connect_timeout=0.5)
+                client.ping()
+                self._redis = client
+                logger.info("Redis connected for login failure detection")
+            except ImportError:
+                logger.warning("Redis package not installed - login failure windows are process-local")
+                self._redis_retry_at = float('inf')
+            except Exception as e:
+                logger.warning(f"Redis unavailable for login failure detection, using process-local windows: {e}")
+                self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+        return self._redis
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(f"Login failure detector Redis error, using process-local windows: {error}")
+        self._redis = None
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    @staticmethod
+    def _key(kind: str, subject) -> str:
+        return f"{KEY_PREFIX}:{kind}:{subject}"
+
+    # -------------------------------------------------------------------------
+    # Recording
+    # -------------------------------------------------------------------------
+
+    def record_failure(self, ip_address: str, username: Optional[str], org_id: Optional[int]) -> FailureSnapshot:
+        """Add one failed login to every window and return the updated counts"""
+        now = time.time()
+        username = (username or 'unknown').strip().lower()[:150] or 'unknown'
+        ip_address = ip_address or 'unknown'
+
+        client = self._get_redis()
+        if client:
+            try:
+                return self._record_redis(client, ip_address, username, org_id, now)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._record_memory(ip_address, username, org_id, now)
+
+    def _record_redis(self, client, ip_address, username, org_id, now) -> FailureSnapshot:
+        event_id = f"{now:.6f}:{uuid.uuid4().hex[:8]}"
+        event_keys = [('ip', ip_address), ('user', username)]
+        if org_id is not None:
+            event_keys.append(('org', org_id))
+
+        pipe = client.pipeline(transaction=True)
+        for kind, subject in event_keys:
+            key = self._key(kind, subject)
+            window = WINDOWS[kind]
+            pipe.zadd(key, {event_id: now})
+            pipe.zremrangebyscore(key, '-inf', now - window)
+            pipe.zremrangebyrank(key, 0, -(MAX_EVENTS_PER_KEY + 1))
+            pipe.zcard(key)
+            pipe.expire(key, window)
+
+        users_key = self._key('ip_users', ip_address)
+        pipe.zadd(users_key, {username: now})
+        pipe.zremrangebyscore(users_key, '-inf', now - WINDOWS['ip_users'])
+        pipe.zremrangebyrank(users_key, 0, -(MAX_EVENTS_PER_KEY + 1))
+        pipe.zrange(users_key, 0, -1)
+        pipe.expire(users_key, WINDOWS['ip_users'])
+        results = pipe.execute()
+
+        counts = {kind: results[index * 5 + 3] for index, (kind, _) in enumerate(event_keys)}
+        return FailureSnapshot(
+            ip_address=ip_address,
+            ip_attempts=counts['ip'],
+            ip_usernames=list(results[len(event_keys) * 5 + 3]),
+            username_attempts=counts['user'],
+            org_attempts=counts.get('org', 0),
+        )
+
+    def _record_memory(self, ip_address, username, org_id, now) -> FailureSnapshot:
+        memory = self._memory
+        return FailureSnapshot(
+            ip_address=ip_address,
+            ip_attempts=memory.add_event(self._key('ip', ip_address), now, WINDOWS['ip']),
+            ip_usernames=memory.add_member(self._key('ip_users', ip_address), username, now, WINDOWS['ip_users']),
+            username_attempts=memory.add_event(self._key('user', username), now, WINDOWS['user']),
+            org_attempts=(memory.add_event(self._key('org', org_id), now, WINDOWS['org'])
+                          if org_id is not None else 0),
+        )
+
+    def ip_attempts(self, ip_address: str) -> int:
+        """Failed logins from an IP in the brute-force window (read only)"""
+        now = time.time()
+        key = self._key('ip', ip_address or 'unknown')
+        client = self._get_redis()
+        if client:
+            try:
+                return client.zcount(key, now - WINDOWS['ip'], '+inf')
+            except Exception as e:
+                self._redis_failed(e)
+        return self._memory.count_events(key, now, WINDOWS['ip'])
+
+    # -------------------------------------------------------------------------
+    # Alert deduplication and block markers
+    # -------------------------------------------------------------------------
+
+    def claim_alert(self, kind: str, subject, cooldown_seconds: int) -> bool:
+        """True for the first caller per kind/subject within the cooldown"""
+        key = self._key(f'alerted:{kind}', subject)
+        client = self._get_redis()
+        if client:
+            try:
+                return bool(client.set(key, '1', nx=True, ex=cooldown_seconds))
+            except Exception as e:
+                self._redis_failed(e)
+        return self._memory.claim(key, time.time(), cooldown_seconds)
+
+    def mark_blocked(self, ip_address: str, duration_seconds: int) -> None:
+        """Remember an IP block so blocked requests are rejected without a DB lookup"""
+        self.claim_alert('blocked', ip_address, duration_seconds)
+
+    def is_marked_blocked(self, ip_address: str) -> bool:
+        key = self._key('alerted:blocked', ip_address)
+        client = self._get_redis()
+        if client:
+            try:
+                return bool(client.exists(key))
+            except Exception as e:
+                self._redis_failed(e)
+        return self._memory.is_claimed(key, time.time())
+
+    def clear_blocked(self, ip_address: str) -> None:
+        """Drop the block marker and the spray alert claim after an unblock or expiry"""
+        keys = [self._key('alerted:blocked', ip_address),
+                self._key('alerted:password_spray', ip_address)]
+        client = self._get_redis()
+        if client:
+            try:
+                client.delete(*keys)
+                return
+            except Exception as e:
+                self._redis_failed(e)
+        for key in keys:
+            self._memory.release(key)
+
+    def get_stats(self) -> Dict:
+        return {
+            'backend': 'redis' if self._redis else 'memory',
+            'windows_seconds': dict(WINDOWS),
+            'memory_keys': len(self._memory._events) + len(self._memory._members),
+        }
+
+
+_detector: Optional[LoginFailureDetector] = None
+_detector_lock = threading.Lock()
+
+
+def get_login_failure_detector() -> LoginFailureDetector:
+    """Process-wide detector instance"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = LoginFailureDetector()
+    return _detector
@@ -8,6 +8,10 @@ Provides:
 - Pages-per-second throughput metrics
 - Memory usage tracking
 - Scalability analysis
+
+Completed jobs are also recorded in utils/fleet_metrics.py, which aggregates
+every gunicorn and RQ process through Redis; throughput and scaling
+recommendations are computed from that fleet-wide data when it is available.
 """
 import os
 import time
@@ -124,6 +128,9 @@ class PerformanceMonitor:
         self._process = psutil.Process()
         self._cpu_count = psutil.cpu_count() or 1
         
+        from utils.fleet_metrics import register_gauge_provider
+        register_gauge_provider(lambda: {'active_jobs': len(self._active_jobs)})
+        
         logger.info(f"PerformanceMonitor initialized with {self._cpu_count} CPU cores")
     
     def start_job(self, job_id: str, job_type: str = 'ocr') -> JobMetrics:
@@ -173,6 +180,10 @@ class PerformanceMonitor:
             
             self._completed_jobs.append(metrics)
         
+        from utils.fleet_metrics import record_job
+        record_job(metrics.job_type, metrics.wall_time_seconds, success,
+                   pages=metrics.pages_processed, bytes_processed=metrics.bytes_processed)
+        
         logger.info(
             f"Job {job_id} completed: {metrics.wall_time_seconds:.2f}s wall, "
             f"{metrics.pages_processed} pages, {metrics.pages_per_second:.1f} pps"
@@ -267,8 +278,22 @@ class PerformanceMonitor:
             logger.warning(f"Could not get queue metrics: {e}")
             return {'error': str(e)}
     
-    def get_throughput_metrics(self, window_seconds: int = 300) -> Dict[str, Any]:
-        """Get throughput metrics for the specified time window"""
+    def get_throughput_metrics(self, window_seconds: int = 300, scope: str = 'fleet') -> Dict[str, Any]:
+        """Get throughput metrics for the specified time window
+        
+        Args:
+            window_seconds: Time window to aggregate
+            scope: 'fleet' for all processes (utils/fleet_metrics.py - this
+                   process only when Redis is unavailable, see the returned
+                   'scope'), 'process' for this process's job history
+        """
+        if scope == 'fleet':
+            try:
+                from utils.fleet_metrics import get_fleet_throughput
+                return get_fleet_throughput(window_seconds)
+            except Exception as e:
+                logger.warning(f"Fleet throughput unavailable, using process metrics: {e}")
+        
         cutoff = time.time() - window_seconds
         
         with self._lock:
@@ -279,6 +304,7 @@ class PerformanceMonitor:
         
         if not recent_jobs:
             return {
+                'scope': 'process',
                 'window_seconds': window_seconds,
                 'jobs_completed': 0,
                 'pages_processed': 0,
@@ -294,6 +320,7 @@ class PerformanceMonitor:
         successful = sum(1 for j in recent_jobs if j.success)
         
         return {
+            'scope': 'process',
             'window_seconds': window_seconds,
             'jobs_completed': len(recent_jobs),
             'pages_processed': total_pages,
@@ -304,21 +331,64 @@ class PerformanceMonitor:
             'success_rate': round(successful / len(recent_jobs) * 100, 1) if recent_jobs else 0
         }
     
+    def get_fleet_resources(self) -> Dict[str, Any]:
+        """CPU and memory per host across the processes pushing fleet metrics"""
+        try:
+            from utils.fleet_metrics import get_fleet_processes
+            processes = get_fleet_processes()
+        except Exception as e:
+            logger.warning(f"Fleet process metrics unavailable: {e}")
+            processes = []
+        
+        hosts: Dict[str, Dict[str, Any]] = {}
+        for process in processes:
+            host = hosts.setdefault(process.get('host', 'unknown'), {
+                'processes': 0, 'workers': 0, 'cpu_percent': 0.0, 'memory_percent': 0.0, 'active_jobs': 0
+            })
+            host['processes'] += 1
+            if process.get('role') == 'worker':
+                host['workers'] += 1
+            # Host-wide figures - every process on a host reports the same machine
+            host['cpu_percent'] = max(host['cpu_percent'], float(process.get('cpu_percent', 0) or 0))
+            host['memory_percent'] = max(host['memory_percent'], float(process.get('memory_percent', 0) or 0))
+            host['active_jobs'] += int(float(process.get('active_jobs', 0) or 0))
+        
+        return {
+            'hosts': hosts,
+            'processes': len(processes),
+            'workers': sum(host['workers'] for host in hosts.values()),
+            'active_jobs': sum(host['active_jobs'] for host in hosts.values()),
+            'cpu_percent': round(sum(h['cpu_percent'] for h in hosts.values()) / len(hosts), 1) if hosts else None,
+            'memory_percent': max((h['memory_percent'] for h in hosts.values()), default=None),
+        }
+    
     def get_scaling_recommendations(self) -> Dict[str, Any]:
-        """Analyze performance and provide scaling recommendations"""
-        system = self.get_system_metrics()
+        """Analyze performance and provide scaling recommendations
+        
+        Uses fleet-wide throughput and per-host CPU/memory from the processes
+        pushing fleet metrics; falls back to this process and host when Redis
+        is unavailable.
+        """
+        fleet = self.get_fleet_resources()
         throughput = self.get_throughput_metrics(60)  # Last minute
+        throughput_5min = self.get_throughput_metrics(300)
         queue = self.get_queue_metrics()
         
         recommendations = []
         scaling_factor = 1.0
         
-        # CPU-based recommendations
-        cpu_percent = system.get('cpu_percent', 0)
+        # CPU-based recommendations (mean across hosts)
+        cpu_percent = fleet.get('cpu_percent')
+        memory_percent = fleet.get('memory_percent')
+        if cpu_percent is None or memory_percent is None:
+            system = self.get_system_metrics()
+            cpu_percent = system.get('cpu_percent', 0) if cpu_percent is None else cpu_percent
+            memory_percent = system.get('memory_percent', 0) if memory_percent is None else memory_percent
+        
         if cpu_percent > 80:
             recommendations.append({
                 'type': 'scale_up',
-                'reason': f'High CPU utilization ({cpu_percent}%)',
+                'reason': f'High CPU utilization ({cpu_percent}% across {len(fleet["hosts"]) or 1} host(s))',
                 'action': 'Add more worker instances or increase OCR_MAX_WORKERS'
             })
             scaling_factor = 1.5
@@ -329,15 +399,21 @@ class PerformanceMonitor:
                 'action': 'Consider increasing parallel workers to improve throughput'
             })
         
-        # Queue depth recommendations
+        # Queue depth recommendations - size the fleet from its measured drain rate
         pending = queue.get('total_pending', 0)
+        jobs_per_second = (throughput_5min.get('rq') or {}).get('jobs_per_second', 0)
+        drain_seconds = round(pending / jobs_per_second) if pending and jobs_per_second else None
         if pending > 100:
             recommendations.append({
                 'type': 'scale_up',
-                'reason': f'High queue depth ({pending} pending jobs)',
+                'reason': f'High queue depth ({pending} pending jobs'
+                          + (f', ~{drain_seconds}s to drain at the current rate)' if drain_seconds else ')'),
                 'action': 'Add more worker instances to reduce backlog'
             })
             scaling_factor = max(scaling_factor, 2.0)
+            if drain_seconds:
+                # Capacity multiple that drains the backlog within 10 minutes at the measured rate
+                scaling_factor = max(scaling_factor, round(min(drain_seconds / 600.0, 4.0), 1))
         
         # Throughput recommendations
         avg_job_time = throughput.get('avg_job_time', 0)
@@ -348,8 +424,7 @@ class PerformanceMonitor:
                 'action': 'Consider page-level parallelism for large documents'
             })
         
-        # Memory recommendations
-        memory_percent = system.get('memory_percent', 0)
+        # Memory recommendations (worst host)
         if memory_percent > 85:
             recommendations.append({
                 'type': 'memory',
@@ -358,12 +433,19 @@ class PerformanceMonitor:
             })
         
         return {
+            'scope': throughput.get('scope', 'process'),
             'current_state': {
                 'cpu_percent': cpu_percent,
                 'memory_percent': memory_percent,
                 'queue_depth': pending,
                 'avg_job_time': avg_job_time,
-                'pages_per_second': throughput.get('pages_per_second', 0)
+                'pages_per_second': throughput.get('pages_per_second', 0),
+                'documents_per_second': throughput_5min.get('documents_per_second', 0),
+                'refresh_patients_per_second': throughput_5min.get('refresh_patients_per_second', 0),
+                'fhir_p95_ms': (throughput_5min.get('fhir') or {}).get('p95_ms'),
+                'queue_drain_seconds': drain_seconds,
+                'processes': fleet.get('processes'),
+                'workers': fleet.get('workers'),
             },
             'recommendations': recommendations,
             'suggested_scaling_factor': scaling_factor,
@@ -385,8 +467,39 @@ class PerformanceMonitor:
                 'bytes_processed': self._total_bytes_processed,
                 'total_processing_time': round(self._total_processing_time, 2)
             },
-            'active_jobs': len(self._active_jobs)
+            'active_jobs': len(self._active_jobs),
+            'audit_sink': self._get_audit_sink_metrics(),
+            'sql': self._get_query_profiler_metrics(),
+            'fleet': self._get_fleet_metrics()
         }
+    
+    def _get_audit_sink_metrics(self) -> Dict[str, Any]:
+        """Buffered audit writer throughput and backpressure (this process)"""
+        try:
+            from utils.audit_sink import get_audit_sink_stats
+            return get_audit_sink_stats()
+        except Exception as e:
+            logger.debug(f"Audit sink metrics unavailable: {e}")
+            return {}
+
+
+    def _get_fleet_metrics(self) -> Dict[str, Any]:
+        """Processes pushing fleet metrics and the push pipeline's own health"""
+        try:
+            from utils.fleet_metrics import get_fleet_metrics_stats
+            return dict(self.get_fleet_resources(), pipeline=get_fleet_metrics_stats())
+        except Exception as e:
+            logger.debug(f"Fleet metrics unavailable: {e}")
+            return {}
+
+    def _get_query_profiler_metrics(self) -> Dict[str, Any]:
+        """Per-request / per-job query counts and N+1 suspects (this process)"""
+        try:
+            from utils.query_profiler import get_query_profiler_report
+            return get_query_profiler_report(limit=10)
+        except Exception as e:
+            logger.debug(f"Query profiler metrics unavailable: {e}")
+            return {}
 
 
 # Decorator for automatic job tracking
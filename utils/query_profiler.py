@@ -0,0 +1,385 @@
+"""
+Per-request / per-job SQL profiler and N+1 detector
+
+SQLAlchemy engine events record every statement executed while a unit of work
+(one HTTP request or one RQ job) is active: query count, total database time,
+and how often each statement *fingerprint* repeated. A fingerprint is the SQL
+with whitespace collapsed and literals and IN-lists replaced by placeholders,
+so `SELECT ... WHERE condition.patient_id = %(pk_1)s` run once per patient is a
+single fingerprint with a large count - the signature of lazy-loaded
+relationships in a loop (N+1). Literals are removed, so fingerprints carry no
+PHI and can be logged.
+
+When a unit finishes past its thresholds a warning is logged naming the
+endpoint or job, the counts and the repeated statements with the application
+frame that first issued them. Aggregates per endpoint/job and the top N+1
+fingerprints are kept per process (bounded) and reported through
+PerformanceMonitor.get_full_report() and /admin/api/query-profile.
+
+Environment:
+    QUERY_PROFILER_ENABLED       true (default) / false
+    QUERY_PROFILER_REQUEST_WARN  "queries,db_ms,repeats" for requests (default 100,1000,20)
+    QUERY_PROFILER_JOB_WARN      same for RQ jobs (default 5000,60000,500)
+
+Queries issued from threads started inside a unit (e.g. OCR worker threads)
+are not attributed to it - context variables are not inherited by threads.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_UNITS = 200          # Distinct endpoints / job names aggregated
+MAX_TRACKED_FINGERPRINTS = 200   # Distinct N+1 fingerprints aggregated
+MAX_FINGERPRINTS_PER_UNIT = 1000
+RECENT_WARNINGS = 50
+REPORTED_REPEATS = 5             # Repeated statements listed per warning
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_IGNORED_FRAMES = (os.path.join('utils', 'query_profiler.py'), 'site-packages', 'dist-packages')
+
+
+@dataclass(frozen=True)
+class Thresholds:
+    queries: int
+    db_ms: float
+    repeats: int
+
+
+def _thresholds_from_env(name: str, default: Thresholds) -> Thresholds:
+    raw = os.environ.get(name)
+    if not raw:
+        return default
+    try:
+        queries, db_ms, repeats = (value.strip() for value in raw.split(','))
+        return Thresholds(int(queries), float(db_ms), int(repeats))
+    except ValueError:
+        logger.warning(f"Ignoring malformed {name}={raw!r} (expected 'queries,db_ms,repeats')")
+        return default
+
+
+THRESHOLDS = {
+    'request': _thresholds_from_env('QUERY_PROFILER_REQUEST_WARN', Thresholds(100, 1000.0, 20)),
+    'job': _thresholds_from_env('QUERY_PROFILER_JOB_WARN', Thresholds(5000, 60000.0, 500)),
+}
+
+
+# -----------------------------------------------------------------------------
+# Fingerprinting
+# -----------------------------------------------------------------------------
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w$%])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\([^)]+\)s|:\w+|\$\d+)\s*,?)+\)", re.IGNORECASE)
+_BIND_PARAM = re.compile(r"%\([^)]+\)s|:\w+|\$\d+|\?")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Normalized statement: literals, bind parameters and IN-lists replaced by '?'"""
+    sql = _WHITESPACE.sub(' ', statement).strip()
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _BIND_PARAM.sub('?', sql)
+    return sql
+
+
+def _call_site() -> Optional[str]:
+    """Innermost application frame (file:line function) outside SQLAlchemy and this module"""
+    for frame in reversed(traceback.extract_stack(limit=60)):
+        filename = frame.filename
+        if not filename.startswith(_APP_ROOT) or any(part in filename for part in _IGNORED_FRAMES):
+            continue
+        return f"{os.path.relpath(filename, _APP_ROOT)}:{frame.lineno} {frame.name}"
+    return None
+
+
+# -----------------------------------------------------------------------------
+# Units of work
+# -----------------------------------------------------------------------------
+
+@dataclass
+class QueryProfile:
+    """Queries issued during one request or job"""
+    name: str
+    kind: str = 'request'
+    queries: int = 0
+    db_seconds: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+    fingerprints: Counter = field(default_factory=Counter)
+    fingerprint_seconds: Dict[str, float] = field(default_factory=dict)
+    call_sites: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def thresholds(self) -> Thresholds:
+        return THRESHOLDS.get(self.kind, THRESHOLDS['request'])
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        key = fingerprint(statement)
+        if key not in self.fingerprints and len(self.fingerprints) >= MAX_FINGERPRINTS_PER_UNIT:
+            return
+        self.fingerprints[key] += 1
+        self.fingerprint_seconds[key] = self.fingerprint_seconds.get(key, 0.0) + seconds
+        # The stack walk is paid once per fingerprint, when it turns into a suspect
+        if self.fingerprints[key] == self.thresholds.repeats:
+            site = _call_site()
+            if site:
+                self.call_sites[key] = site
+
+    def repeated(self, minimum: int) -> List[dict]:
+        return [
+            {
+                'fingerprint': key,
+                'count': count,
+                'db_ms': round(self.fingerprint_seconds.get(key, 0.0) * 1000, 1),
+                'call_site': self.call_sites.get(key),
+            }
+            for key, count in self.fingerprints.most_common()
+            if count >= minimum
+        ]
+
+    def summary(self) -> dict:
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'queries': self.queries,
+            'db_ms': round(self.db_seconds * 1000, 1),
+            'wall_ms': round((time.perf_counter() - self.started_at) * 1000, 1),
+            'distinct_statements': len(self.fingerprints),
+        }
+
+
+_current: ContextVar[Optional[QueryProfile]] = ContextVar('query_profile', default=None)
+
+
+def current_profile() -> Optional[QueryProfile]:
+    return _current.get()
+
+
+class QueryProfilerStats:
+    """Process-wide aggregates of finished units (bounded)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._units: 'OrderedDict[str, dict]' = OrderedDict()
+        self._suspects: 'OrderedDict[str, dict]' = OrderedDict()
+        self._warnings: deque = deque(maxlen=RECENT_WARNINGS)
+        self.units_profiled = 0
+        self.queries_profiled = 0
+
+    def add(self, profile: QueryProfile, summary: dict, suspects: List[dict], warned: bool) -> None:
+        key = f"{profile.kind}:{profile.name}"
+        with self._lock:
+            self.units_profiled += 1
+            self.queries_profiled += profile.queries
+
+            unit = self._units.pop(key, None) or {
+                'name': profile.name, 'kind': profile.kind, 'count': 0,
+                'queries': 0, 'db_ms': 0.0, 'max_queries': 0, 'max_db_ms': 0.0, 'warnings': 0,
+            }
+            unit['count'] += 1
+            unit['queries'] += profile.queries
+            unit['db_ms'] += summary['db_ms']
+            unit['max_queries'] = max(unit['max_queries'], profile.queries)
+            unit['max_db_ms'] = max(unit['max_db_ms'], summary['db_ms'])
+            unit['warnings'] += 1 if warned else 0
+            self._units[key] = unit
+            while len(self._units) > MAX_TRACKED_UNITS:
+                self._units.popitem(last=False)
+
+            for suspect in suspects:
+                entry = self._suspects.pop(suspect['fingerprint'], None) or {
+                    'fingerprint': suspect['fingerprint'], 'units': 0, 'max_repeats': 0,
+                    'total_repeats': 0, 'call_site': None, 'seen_in': [],
+                }
+                entry['units'] += 1
+                entry['total_repeats'] += suspect['count']
+                entry['max_repeats'] = max(entry['max_repeats'], suspect['count'])
+                entry['call_site'] = suspect['call_site'] or entry['call_site']
+                if key not in entry['seen_in'] and len(entry['seen_in']) < 10:
+                    entry['seen_in'].append(key)
+                self._suspects[suspect['fingerprint']] = entry
+            while len(self._suspects) > MAX_TRACKED_FINGERPRINTS:
+                self._suspects.popitem(last=False)
+
+            if warned:
+                self._warnings.append(dict(summary, repeated=suspects[:REPORTED_REPEATS],
+                                           at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())))
+
+    def report(self, limit: int = 20) -> dict:
+        with self._lock:
+            units = [dict(unit, avg_queries=round(unit['queries'] / unit['count'], 1),
+                          avg_db_ms=round(unit['db_ms'] / unit['count'], 1), db_ms=round(unit['db_ms'], 1))
+                     for unit in self._units.values()]
+            suspects = [dict(entry) for entry in self._suspects.values()]
+            warnings = list(self._warnings)
+            units_profiled = self.units_profiled
+            queries_profiled = self.queries_profiled
+
+        return {
+            'enabled': profiler_enabled(),
+            'pid': os.getpid(),
+            'thresholds': {kind: vars(value) for kind, value in THRESHOLDS.items()},
+            'units_profiled': units_profiled,
+            'queries_profiled': queries_profiled,
+            'slowest': sorted(units, key=lambda unit: unit['db_ms'], reverse=True)[:limit],
+            'n_plus_one': sorted(suspects, key=lambda entry: entry['total_repeats'], reverse=True)[:limit],
+            'recent_warnings': warnings[-limit:],
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._units.clear()
+            self._suspects.clear()
+            self._warnings.clear()
+            self.units_profiled = 0
+            self.queries_profiled = 0
+
+
+_stats = QueryProfilerStats()
+
+
+def profiler_enabled() -> bool:
+    return os.environ.get('QUERY_PROFILER_ENABLED', 'true').lower() != 'false'
+
+
+def start_profile(name: str, kind: str = 'request'):
+    """Begin attributing queries on this thread/context to a new unit; returns a reset token"""
+    if not profiler_enabled():
+        return None
+    return _current.set(QueryProfile(name=name, kind=kind))
+
+
+def finish_profile(token) -> Optional[dict]:
+    """End the unit started with start_profile(), log past thresholds and aggregate"""
+    if token is None:
+        return None
+    profile = _current.get()
+    _current.reset(token)
+    if profile is None:
+        return None
+
+    limits = profile.thresholds
+    summary = profile.summary()
+    suspects = profile.repeated(limits.repeats)
+    warned = bool(profile.queries >= limits.queries or summary['db_ms'] >= limits.db_ms or suspects)
+    if warned:
+        details = '; '.join(
+            f"{suspect['count']}x [{suspect['call_site'] or 'unknown'}] {suspect['fingerprint'][:200]}"
+            for suspect in suspects[:REPORTED_REPEATS]
+        )
+        logger.warning(
+            f"SQL profile {profile.kind} '{profile.name}': {profile.queries} queries, "
+            f"{summary['db_ms']:.0f} ms DB of {summary['wall_ms']:.0f} ms"
+            + (f"; repeated statements (possible N+1): {details}" if details else '')
+        )
+    _stats.add(profile, summary, suspects, warned)
+    return summary
+
+
+@contextmanager
+def profile_queries(name: str, kind: str = 'job'):
+    """Profile the queries issued inside the block as one unit (RQ jobs, scripts)"""
+    token = start_profile(name, kind)
+    try:
+        yield current_profile()
+    finally:
+        finish_profile(token)
+
+
+def get_query_profiler_report(limit: int = 20) -> dict:
+    return _stats.report(limit)
+
+
+def reset_query_profiler() -> None:
+    _stats.reset()
+
+
+# -----------------------------------------------------------------------------
+# SQLAlchemy and Flask wiring
+# -----------------------------------------------------------------------------
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('query_profiler_start', []).append(time.perf_counter())
+        if context is not None:
+            context._query_profiler_started = True
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and not getattr(context, '_query_profiler_started', False):
+        return  # started before the profile did
+    starts = conn.info.get('query_profiler_start')
+    if not starts:
+        return
+    started = starts.pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    """A failed statement never reaches after_cursor_execute: drop its start time"""
+    context = exception_context.execution_context
+    conn = exception_context.connection
+    if conn is None or context is None or not getattr(context, '_query_profiler_started', False):
+        return
+    starts = conn.info.get('query_profiler_start')
+    if starts:
+        starts.pop()
+
+
+def install_query_listeners() -> None:
+    """Attach the cursor-execute listeners to every SQLAlchemy engine (idempotent)"""
+    global _installed
+    if _installed:
+        return
+    with _install_lock:
+        if _installed:
+            return
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _installed = True
+
+
+def init_query_profiler(app) -> None:
+    """Install the engine listeners and profile each request of `app`"""
+    install_query_listeners()
+    token_key = '_query_profile_token'
+
+    @app.before_request
+    def _start_request_profile():
+        from flask import g, request
+        setattr(g, token_key, start_profile(request.endpoint or request.path, 'request'))
+
+    @app.teardown_request
+    def _finish_request_profile(exc):
+        from flask import g
+        token = g.pop(token_key, None)
+        if token is not None:
+            try:
+                finish_profile(token)
+            except Exception as e:
+                logger.debug(f"Query profile not recorded: {e}")
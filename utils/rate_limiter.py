@@ -3,178 +3,328 @@ Rate Limiting Utility for Prep Sheet Generation
 
 Provides organization-scoped rate limiting to prevent Epic API abuse
 and excessive resource consumption from PDF generation.
+
+PERFORMANCE: Limits are enforced with GCRA (generic cell rate algorithm, the
+token bucket expressed as a single "theoretical arrival time" per key), so a
+check is O(1) and stores one number per organization and limit. Backends:
+
+    memory  Process-local dict. Limits are per process - with N gunicorn
+            workers an organization effectively gets N times the limit.
+    redis   One Lua script call per check, evaluated atomically on the Redis
+            server using the server clock, so the limit holds across every
+            worker and instance.
+
+PREP_SHEET_RATE_LIMIT_BACKEND selects 'memory' or 'redis'; by default Redis
+is used when REDIS_URL is set and reachable. A Redis error falls back to the
+memory backend for that check rather than failing the request.
 """
 import logging
+import math
+import os
 import time
 from functools import wraps
-from collections import defaultdict
 from threading import Lock
+from typing import Dict, NamedTuple
 from flask import request, jsonify
 from flask_login import current_user
 
 logger = logging.getLogger(__name__)
 
+REDIS_RETRY_SECONDS = 30
+MEMORY_PRUNE_THRESHOLD = 10000
+
+
+class RateLimitRule(NamedTuple):
+    """limit requests per window_seconds, with bursts of up to limit"""
+    limit: int
+    window_seconds: int
+
+    @property
+    def interval(self) -> float:
+        """Seconds of budget one request consumes"""
+        return self.window_seconds / self.limit
+
+
+class GCRAResult(NamedTuple):
+    allowed: bool
+    used: int              # Requests currently counted against the window
+    retry_after: float     # Seconds until the next request is allowed (0 if allowed)
+
+
+def _used_from_backlog(backlog_seconds: float, rule: RateLimitRule) -> int:
+    """Requests still 'in the bucket' given how far the TAT is ahead of now"""
+    if backlog_seconds <= 0:
+        return 0
+    return min(rule.limit, math.ceil(backlog_seconds / rule.interval - 1e-9))
+
+
+class MemoryGCRABackend:
+    """Process-local GCRA state: key -> theoretical arrival time (epoch seconds)"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._tat: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def _prune(self, now: float) -> None:
+        # Keys whose TAT has passed carry no state
+        self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+
+    def acquire(self, key: str, rule: RateLimitRule) -> GCRAResult:
+        now = time.time()
+        with self._lock:
+            tat = max(self._tat.get(key, now), now)
+            new_tat = tat + rule.interval
+            allow_at = new_tat - rule.window_seconds
+            if allow_at > now:
+                return GCRAResult(False, _used_from_backlog(tat - now, rule), allow_at - now)
+            self._tat[key] = new_tat
+            if len(self._tat) > MEMORY_PRUNE_THRESHOLD:
+                self._prune(now)
+            return GCRAResult(True, _used_from_backlog(new_tat - now, rule), 0.0)
+
+    def peek(self, key: str, rule: RateLimitRule) -> int:
+        now = time.time()
+        with self._lock:
+            return _used_from_backlog(self._tat.get(key, now) - now, rule)
+
+
+# KEYS[1] = TAT key; ARGV = interval_ms, window_ms, cost (1 = consume, 0 = peek)
+# Returns {allowed, backlog_ms, retry_after_ms}; times come from the Redis server
+# clock so every caller agrees on "now".
+_GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+if cost == 0 then
+    return {1, tat - now, 0}
+end
+local new_tat = tat + interval * cost
+local allow_at = new_tat - window
+if allow_at > now then
+    return {0, tat - now, allow_at - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, new_tat - now, 0}
+"""
+
+
+class RedisGCRABackend:
+    """GCRA state in Redis, updated atomically by a Lua script"""
+
+    name = 'redis'
+
+    def __init__(self, client):
+        self._client = client
+        self._script = client.register_script(_GCRA_LUA)
+
+    def _call(self, key: str, rule: RateLimitRule, cost: int):
+        interval_ms = max(1, int(rule.interval * 1000))
+        return self._script(keys=[key], args=[interval_ms, rule.window_seconds * 1000, cost])
+
+    def acquire(self, key: str, rule: RateLimitRule) -> GCRAResult:
+        allowed, backlog_ms, retry_ms = self._call(key, rule, 1)
+        return GCRAResult(bool(allowed), _used_from_backlog(int(backlog_ms) / 1000.0, rule),
+                          int(retry_ms) / 1000.0)
+
+    def peek(self, key: str, rule: RateLimitRule) -> int:
+        _, backlog_ms, _ = self._call(key, rule, 0)
+        return _used_from_backlog(int(backlog_ms) / 1000.0, rule)
+
 
 class PrepSheetRateLimiter:
     """
-    In-memory rate limiter for prep sheet generation.
-    
+    Rate limiter for prep sheet generation.
+
     Limits:
     - Individual generation: 30 per minute per organization
     - Bulk generation: 5 bulk requests per minute per organization
     - Epic writeback: 10 per minute per organization
-    
-    Thread-safe using locks.
+
+    All three share one GCRA implementation on a pluggable backend (see module
+    docstring). Thread-safe.
     """
-    
-    def __init__(self):
-        self._individual_requests = defaultdict(list)
-        self._bulk_requests = defaultdict(list)
-        self._writeback_requests = defaultdict(list)
-        self._lock = Lock()
-        
+
+    KEY_PREFIX = 'ratelimit:prep_sheet'
+
+    def __init__(self, backend=None):
         # Rate limits (requests per window)
         self.INDIVIDUAL_LIMIT = 30
         self.BULK_LIMIT = 5
         self.WRITEBACK_LIMIT = 10
         self.WINDOW_SECONDS = 60
-    
-    def _cleanup_old_requests(self, request_list: list, window_seconds: int) -> list:
-        """Remove requests older than the window."""
-        cutoff = time.time() - window_seconds
-        return [t for t in request_list if t > cutoff]
-    
-    def _check_rate_limit(self, request_dict: dict, org_id: int, limit: int) -> tuple:
+
+        self.rules = {
+            'individual': RateLimitRule(self.INDIVIDUAL_LIMIT, self.WINDOW_SECONDS),
+            'bulk': RateLimitRule(self.BULK_LIMIT, self.WINDOW_SECONDS),
+            'writeback': RateLimitRule(self.WRITEBACK_LIMIT, self.WINDOW_SECONDS),
+        }
+
+        self._memory = MemoryGCRABackend()
+        self._backend = backend
+        self._redis_retry_at = 0.0
+        self._backend_lock = Lock()
+
+    def _get_backend(self):
+        """Configured backend, resolving Redis lazily (memory when unavailable)"""
+        if self._backend is not None:
+            return self._backend
+        if time.monotonic() < self._redis_retry_at:
+            return self._memory
+
+        choice = os.environ.get('PREP_SHEET_RATE_LIMIT_BACKEND', '').lower()
+        redis_url = os.environ.get('REDIS_URL')
+        if choice == 'memory' or not redis_url:
+            if choice == 'redis':
+                logger.warning("PREP_SHEET_RATE_LIMIT_BACKEND=redis but REDIS_URL is not set - using memory backend")
+            self._backend = self._memory
+            return self._backend
+
+        with self._backend_lock:
+            if self._backend is not None:
+                return self._backend
+            try:
+                import redis
+                client = redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+                client.ping()
+                self._backend = RedisGCRABackend(client)
+                logger.info("Prep sheet rate limits enforced through Redis")
+            except ImportError:
+                logger.warning("Redis package not installed - prep sheet rate limits are per process")
+                self._backend = self._memory
+            except Exception as e:
+                logger.warning(f"Redis unavailable for prep sheet rate limiting, using per-process limits: {e}")
+                self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+                return self._memory
+        return self._backend
+
+    def _backend_failed(self, error: Exception) -> None:
+        logger.warning(f"Prep sheet rate limiter Redis error, using per-process limits: {error}")
+        if self._backend is not self._memory:
+            self._backend = None
+            self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def _key(self, kind: str, org_id: int) -> str:
+        return f"{self.KEY_PREFIX}:{kind}:{org_id}"
+
+    def _check_rate_limit(self, kind: str, org_id: int) -> tuple:
         """
-        Check if organization is within rate limit.
-        
+        Check if organization is within rate limit, consuming one request if so.
+
         Returns:
             tuple: (allowed: bool, remaining: int, reset_seconds: int)
         """
-        with self._lock:
-            key = org_id
-            request_dict[key] = self._cleanup_old_requests(request_dict[key], self.WINDOW_SECONDS)
-            
-            current_count = len(request_dict[key])
-            remaining = max(0, limit - current_count)
-            
-            if current_count >= limit:
-                oldest = min(request_dict[key]) if request_dict[key] else time.time()
-                reset_seconds = int(self.WINDOW_SECONDS - (time.time() - oldest))
-                return False, 0, max(1, reset_seconds)
-            
-            request_dict[key].append(time.time())
-            return True, remaining - 1, self.WINDOW_SECONDS
-    
+        rule = self.rules[kind]
+        key = self._key(kind, org_id)
+        backend = self._get_backend()
+        try:
+            result = backend.acquire(key, rule)
+        except Exception as e:
+            self._backend_failed(e)
+            result = self._memory.acquire(key, rule)
+
+        if not result.allowed:
+            return False, 0, max(1, math.ceil(result.retry_after))
+        return True, max(0, rule.limit - result.used), self.WINDOW_SECONDS
+
     def check_individual_limit(self, org_id: int) -> tuple:
         """Check rate limit for individual prep sheet generation."""
-        return self._check_rate_limit(self._individual_requests, org_id, self.INDIVIDUAL_LIMIT)
-    
+        return self._check_rate_limit('individual', org_id)
+
     def check_bulk_limit(self, org_id: int) -> tuple:
         """Check rate limit for bulk prep sheet generation."""
-        return self._check_rate_limit(self._bulk_requests, org_id, self.BULK_LIMIT)
-    
+        return self._check_rate_limit('bulk', org_id)
+
     def check_writeback_limit(self, org_id: int) -> tuple:
         """Check rate limit for Epic writeback operations."""
-        return self._check_rate_limit(self._writeback_requests, org_id, self.WRITEBACK_LIMIT)
-    
+        return self._check_rate_limit('writeback', org_id)
+
+    def _peek_used(self, kind: str, org_id: int) -> int:
+        rule = self.rules[kind]
+        key = self._key(kind, org_id)
+        backend = self._get_backend()
+        try:
+            return backend.peek(key, rule)
+        except Exception as e:
+            self._backend_failed(e)
+            return self._memory.peek(key, rule)
+
     def get_usage_stats(self, org_id: int) -> dict:
         """Get current rate limit usage for an organization."""
-        with self._lock:
-            individual = self._cleanup_old_requests(self._individual_requests[org_id], self.WINDOW_SECONDS)
-            bulk = self._cleanup_old_requests(self._bulk_requests[org_id], self.WINDOW_SECONDS)
-            writeback = self._cleanup_old_requests(self._writeback_requests[org_id], self.WINDOW_SECONDS)
-            
-            return {
-                'individual': {
-                    'used': len(individual),
-                    'limit': self.INDIVIDUAL_LIMIT,
-                    'remaining': max(0, self.INDIVIDUAL_LIMIT - len(individual))
-                },
-                'bulk': {
-                    'used': len(bulk),
-                    'limit': self.BULK_LIMIT,
-                    'remaining': max(0, self.BULK_LIMIT - len(bulk))
-                },
-                'writeback': {
-                    'used': len(writeback),
-                    'limit': self.WRITEBACK_LIMIT,
-                    'remaining': max(0, self.WRITEBACK_LIMIT - len(writeback))
-                },
-                'window_seconds': self.WINDOW_SECONDS
+        stats = {}
+        for kind in ('individual', 'bulk', 'writeback'):
+            used = self._peek_used(kind, org_id)
+            limit = self.rules[kind].limit
+            stats[kind] = {
+                'used': used,
+                'limit': limit,
+                'remaining': max(0, limit - used)
             }
+        stats['window_seconds'] = self.WINDOW_SECONDS
+        return stats
 
 
 # Global rate limiter instance
 prep_sheet_limiter = PrepSheetRateLimiter()
 
 
-def rate_limit_individual(f):
-    """Decorator to rate limit individual prep sheet generation."""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated:
-            return f(*args, **kwargs)
-        
-        org_id = current_user.org_id
-        allowed, remaining, reset = prep_sheet_limiter.check_individual_limit(org_id)
-        
-        if not allowed:
-            logger.warning(f"Rate limit exceeded for org {org_id}: individual prep sheet generation")
-            from flask import flash, redirect, url_for
-            flash(f'Rate limit exceeded. Please wait {reset} seconds before generating more prep sheets.', 'warning')
-            return redirect(url_for('main.dashboard'))
-        
-        response = f(*args, **kwargs)
-        return response
-    
-    return decorated_function
-
-
-def rate_limit_bulk(f):
-    """Decorator to rate limit bulk prep sheet generation."""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated:
-            return f(*args, **kwargs)
-        
-        org_id = current_user.org_id
-        allowed, remaining, reset = prep_sheet_limiter.check_bulk_limit(org_id)
-        
-        if not allowed:
-            logger.warning(f"Rate limit exceeded for org {org_id}: bulk prep sheet generation")
-            from flask import flash
-            flash(f'Bulk generation rate limit exceeded. Please wait {reset} seconds before starting another batch.', 'warning')
-            from flask import redirect, url_for
-            return redirect(url_for('prep_sheet.batch_generate'))
-        
-        response = f(*args, **kwargs)
-        return response
-    
-    return decorated_function
-
-
-def rate_limit_writeback(f):
-    """Decorator to rate limit Epic writeback operations (JSON API endpoints)."""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated:
+def _rate_limited(kind: str, on_exceeded):
+    """Build a decorator enforcing one prep_sheet_limiter rule per organization."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_user.is_authenticated:
+                return f(*args, **kwargs)
+
+            org_id = current_user.org_id
+            allowed, remaining, reset = prep_sheet_limiter._check_rate_limit(kind, org_id)
+
+            if not allowed:
+                return on_exceeded(org_id, reset)
+
             return f(*args, **kwargs)
-        
-        org_id = current_user.org_id
-        allowed, remaining, reset = prep_sheet_limiter.check_writeback_limit(org_id)
-        
-        if not allowed:
-            logger.warning(f"Rate limit exceeded for org {org_id}: Epic writeback")
-            return jsonify({
-                'success': False,
-                'error': f'Epic writeback rate limit exceeded. Please wait {reset} seconds to prevent API throttling.',
-                'retry_after': reset,
-                'limit': prep_sheet_limiter.WRITEBACK_LIMIT,
-                'window': prep_sheet_limiter.WINDOW_SECONDS
-            }), 429
-        
-        response = f(*args, **kwargs)
-        return response
-    
-    return decorated_function
+
+        return decorated_function
+    return decorator
+
+
+def _individual_exceeded(org_id, reset):
+    logger.warning(f"Rate limit exceeded for org {org_id}: individual prep sheet generation")
+    from flask import flash, redirect, url_for
+    flash(f'Rate limit exceeded. Please wait {reset} seconds before generating more prep sheets.', 'warning')
+    return redirect(url_for('main.dashboard'))
+
+
+def _bulk_exceeded(org_id, reset):
+    logger.warning(f"Rate limit exceeded for org {org_id}: bulk prep sheet generation")
+    from flask import flash, redirect, url_for
+    flash(f'Bulk generation rate limit exceeded. Please wait {reset} seconds before starting another batch.', 'warning')
+    return redirect(url_for('prep_sheet.batch_generate'))
+
+
+def _writeback_exceeded(org_id, reset):
+    logger.warning(f"Rate limit exceeded for org {org_id}: Epic writeback")
+    return jsonify({
+        'success': False,
+        'error': f'Epic writeback rate limit exceeded. Please wait {reset} seconds to prevent API throttling.',
+        'retry_after': reset,
+        'limit': prep_sheet_limiter.WRITEBACK_LIMIT,
+        'window': prep_sheet_limiter.WINDOW_SECONDS
+    }), 429
+
+
+# Decorator to rate limit individual prep sheet generation.
+rate_limit_individual = _rate_limited('individual', _individual_exceeded)
+
+# Decorator to rate limit bulk prep sheet generation.
+rate_limit_bulk = _rate_limited('bulk', _bulk_exceeded)
+
+# Decorator to rate limit Epic writeback operations (JSON API endpoints).
+rate_limit_writeback = _rate_limited('writeback', _writeback_exceeded)
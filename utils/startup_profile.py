@@ -0,0 +1,62 @@
+"""
+Startup phase timing
+
+Set STARTUP_PROFILE=true to log how long each phase of create_app() and the
+bootstrap takes (and the modules imported by each), e.g. to compare the
+serve, worker and bootstrap phases or check a change did not pull a heavy
+import back into worker start-up. Disabled, phase() costs one perf_counter
+call.
+"""
+
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get('STARTUP_PROFILE', 'false').lower() in ('1', 'true', 'yes')
+
+
+class StartupProfile:
+    """Records (phase, seconds, modules imported) for one start-up"""
+
+    def __init__(self, label: str, enabled: bool = None):
+        self.label = label
+        self.enabled = profiling_enabled() if enabled is None else enabled
+        self.phases: List[Tuple[str, float, int]] = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        modules_before = len(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start, len(sys.modules) - modules_before))
+
+    @property
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self._start
+
+    def as_dict(self) -> dict:
+        return {
+            'label': self.label,
+            'total_ms': round(self.total_seconds * 1000, 1),
+            'phases': [
+                {'phase': name, 'ms': round(seconds * 1000, 1), 'modules_imported': modules}
+                for name, seconds, modules in self.phases
+            ],
+        }
+
+    def log(self) -> None:
+        if not self.enabled:
+            return
+        lines = [f"  {name:<28} {seconds * 1000:9.1f} ms  +{modules} modules"
+                 for name, seconds, modules in self.phases]
+        logger.info(f"Startup profile ({self.label}): {self.total_seconds * 1000:.1f} ms total\n" + "\n".join(lines))
@@ -0,0 +1,347 @@
+"""
+Transparent compression for large Text columns
+
+OCR text and raw FHIR JSON are the largest values in the database. They are
+written once, read mostly in matching/OCR paths, and compress 3-6x. This module
+provides a CompressedText column type that compresses on write and
+decompresses on read, so the existing hybrid properties (PHI filtering) and all
+callers keep working with plain strings.
+
+Storage format (the column stays TEXT, so no DDL change is required):
+    <MAGIC><version><codec><payload>
+
+    MAGIC    2 chars, '\\x1eZ' - never produced by OCR or JSON output
+    version  '1' = base64-encoded compressed bytes
+    codec    'z' = zlib, 's' = zstd (optional 'zstandard' package),
+             'n' = not compressed (escapes plain text that starts with MAGIC)
+
+Rows without the MAGIC prefix are legacy plaintext and are returned unchanged,
+so compressed and uncompressed rows can coexist while the background backfill
+(backfill_compressed_columns) runs.
+
+Values shorter than TEXT_COMPRESSION_MIN_BYTES (default 1024) are stored as-is:
+short text gains little and stays directly searchable with SQL LIKE.
+
+Configuration (environment):
+    TEXT_COMPRESSION_ENABLED    'true' (default) / 'false' - write path only;
+                                compressed rows are always readable
+    TEXT_COMPRESSION_CODEC      'zstd' or 'zlib' (default: zstd if installed)
+    TEXT_COMPRESSION_MIN_BYTES  Minimum UTF-8 size to compress (default 1024)
+    TEXT_COMPRESSION_LEVEL      Codec level (default 6 for zlib, 3 for zstd)
+    SEARCH_COMPRESSED_MAX_SCAN  Compressed rows a search request may inspect,
+                                most recent first (default 2000)
+"""
+
+import base64
+import logging
+import os
+import zlib
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Text
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard as _zstd
+except ImportError:  # zstd is optional - zlib is always available
+    _zstd = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = '\x1eZ'
+FORMAT_VERSION = '1'
+CODEC_ZLIB = 'z'
+CODEC_ZSTD = 's'
+CODEC_NONE = 'n'
+HEADER_LENGTH = len(MAGIC) + 2
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _default_codec() -> str:
+    configured = os.environ.get('TEXT_COMPRESSION_CODEC', '').strip().lower()
+    if configured == 'zlib':
+        return CODEC_ZLIB
+    if configured == 'zstd' and _zstd is None:
+        logger.warning("TEXT_COMPRESSION_CODEC=zstd but 'zstandard' is not installed - using zlib")
+        return CODEC_ZLIB
+    return CODEC_ZSTD if _zstd is not None else CODEC_ZLIB
+
+
+COMPRESSION_ENABLED = _env_flag('TEXT_COMPRESSION_ENABLED', True)
+COMPRESSION_CODEC = _default_codec()
+COMPRESSION_MIN_BYTES = int(os.environ.get('TEXT_COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_LEVEL = int(os.environ.get(
+    'TEXT_COMPRESSION_LEVEL', '3' if COMPRESSION_CODEC == CODEC_ZSTD else '6'
+))
+
+
+def is_compressed(value: Optional[str]) -> bool:
+    """Check whether a stored column value uses the compressed storage format"""
+    return bool(value) and value.startswith(MAGIC)
+
+
+def compress_text(value: Optional[str], codec: Optional[str] = None,
+                  min_bytes: Optional[int] = None, level: Optional[int] = None) -> Optional[str]:
+    """
+    Encode a string for storage.
+
+    Returns the value unchanged when it is None, below the size threshold, or
+    when compression would not make it smaller.
+    """
+    if value is None:
+        return None
+
+    codec = codec or COMPRESSION_CODEC
+    min_bytes = COMPRESSION_MIN_BYTES if min_bytes is None else min_bytes
+    raw = value.encode('utf-8')
+
+    if COMPRESSION_ENABLED and len(raw) >= min_bytes:
+        if codec == CODEC_ZSTD and _zstd is not None:
+            compressed = _zstd.ZstdCompressor(level=level or COMPRESSION_LEVEL).compress(raw)
+        else:
+            codec = CODEC_ZLIB
+            compressed = zlib.compress(raw, level or COMPRESSION_LEVEL)
+        encoded = MAGIC + FORMAT_VERSION + codec + base64.b64encode(compressed).decode('ascii')
+        if len(encoded) < len(value):
+            return encoded
+
+    if value.startswith(MAGIC):
+        # Plain text that happens to start with the marker must be escaped
+        return MAGIC + FORMAT_VERSION + CODEC_NONE + value
+    return value
+
+
+def decompress_text(value: Optional[str]) -> Optional[str]:
+    """Decode a stored column value; legacy plaintext is returned unchanged"""
+    if not value or not value.startswith(MAGIC) or not _is_valid_header(value):
+        return value
+
+    codec = value[len(MAGIC) + 1]
+    payload = value[HEADER_LENGTH:]
+
+    if codec == CODEC_NONE:
+        return payload
+
+    raw = base64.b64decode(payload)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(raw).decode('utf-8')
+    if codec == CODEC_ZSTD:
+        if _zstd is None:
+            raise RuntimeError(
+                "Column value is zstd-compressed but the 'zstandard' package is not installed"
+            )
+        return _zstd.ZstdDecompressor().decompress(raw).decode('utf-8')
+
+    raise ValueError(f"Unknown text compression codec: {codec!r}")
+
+
+def _is_valid_header(value: str) -> bool:
+    return (len(value) >= HEADER_LENGTH
+            and value[len(MAGIC)] == FORMAT_VERSION
+            and value[len(MAGIC) + 1] in (CODEC_ZLIB, CODEC_ZSTD, CODEC_NONE))
+
+
+class CompressedText(TypeDecorator):
+    """
+    TEXT column that is transparently compressed at rest.
+
+    Works for ORM attribute access and Core statements (e.g. the
+    INSERT ... ON CONFLICT upserts in comprehensive_emr_sync), because encoding
+    happens in the bind/result processors.
+
+    Comparisons (isnot(None), != '', contains()) are evaluated against the
+    stored value with plain TEXT semantics - the compared literal is never
+    compressed. NULL and short values are stored as-is, so NULL/empty checks
+    are unaffected. Substring search on long (compressed) values must use
+    scan_compressed_matches().
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        try:
+            return decompress_text(value)
+        except Exception as e:
+            logger.error(f"Failed to decompress column value: {str(e)}")
+            raise
+
+    def coerce_compared_value(self, op, value):
+        return Text()
+
+
+def compressed_rows_filter(column):
+    """SQL filter selecting rows whose stored value is compressed"""
+    return column.like(MAGIC + '%')
+
+
+def get_search_max_scan() -> int:
+    """Row budget for scan_compressed_matches in search routes"""
+    return max(int(os.environ.get('SEARCH_COMPRESSED_MAX_SCAN', '2000')), 1)
+
+
+def scan_compressed_matches(query, column, needle: str, limit: int,
+                            text_getter: Callable, exclude_ids: Iterable[int] = (),
+                            max_scan: Optional[int] = None,
+                            chunk_size: int = 200) -> Tuple[List, bool]:
+    """
+    Substring search over rows whose text is compressed.
+
+    SQL LIKE only sees plain rows; this complements it by decompressing
+    compressed candidates in chunks (most recent first) and matching in Python.
+    By default every compressed row of the query is covered, so callers should
+    pass a query already scoped to the organization. Rows that do not match are
+    expunged from the session as the scan goes, keeping memory flat.
+
+    Args:
+        query: Base ORM query (already scoped, with the text column undeferred)
+        column: The underlying CompressedText column attribute (e.g. Document._ocr_text)
+        needle: Substring to find
+        limit: Maximum number of matches to return
+        text_getter: Callable returning the decompressed text for a row
+        exclude_ids: Row ids already returned by the SQL search
+        max_scan: Optional maximum number of compressed rows to inspect
+
+    Returns:
+        (matches, complete) - complete is False when max_scan stopped the scan
+        before every candidate row was inspected, i.e. results may be missing.
+    """
+    if limit <= 0 or not needle:
+        return [], True
+
+    entity = query.column_descriptions[0]['entity']
+    session = query.session
+    exclude_ids = set(exclude_ids)
+    matches = []
+    scanned = 0
+    complete = True
+
+    candidates = query.filter(compressed_rows_filter(column))
+    if exclude_ids:
+        candidates = candidates.filter(~entity.id.in_(exclude_ids))
+    candidates = candidates.order_by(entity.id.desc())
+    if max_scan is not None:
+        # One extra row tells a finished scan apart from a truncated one
+        candidates = candidates.limit(max_scan + 1)
+
+    for row in candidates.yield_per(chunk_size):
+        if max_scan is not None and scanned >= max_scan:
+            complete = False
+            break
+        scanned += 1
+        text = text_getter(row)
+        if text and needle in text:
+            matches.append(row)
+            if len(matches) >= limit:
+                break
+        else:
+            session.expunge(row)
+
+    logger.debug(f"Compressed text scan: {scanned} rows inspected, {len(matches)} matches"
+                 f"{'' if complete else ' (row budget reached)'}")
+    return matches, complete
+
+
+# Columns stored with CompressedText: (table name, column name)
+COMPRESSED_COLUMNS = (
+    ('document', 'ocr_text'),
+    ('document', 'content'),
+    ('fhir_documents', 'ocr_text'),
+    ('fhir_documents', 'fhir_document_reference'),
+    ('patient', 'fhir_patient_resource'),
+)
+
+
+def backfill_compressed_columns(batch_size: int = 500, dry_run: bool = False,
+                                columns=COMPRESSED_COLUMNS, max_batches: Optional[int] = None,
+                                progress_callback: Optional[Callable] = None) -> dict:
+    """
+    Compress existing plaintext rows in place.
+
+    Walks each table by primary key (keyset pagination) and rewrites values
+    that are not yet compressed and exceed the size threshold. Each batch is
+    committed separately so the job can be stopped and resumed at any time -
+    already compressed rows are skipped on the next run.
+
+    Must be called inside an application context.
+
+    Returns:
+        Dict with per-column rows_compressed, bytes_before, bytes_after
+    """
+    from sqlalchemy import bindparam, cast, func, select
+    from app import db
+
+    results = {}
+    metadata_tables = db.metadata.tables
+
+    for table_name, column_name in columns:
+        table = metadata_tables.get(table_name)
+        if table is None or column_name not in table.c:
+            logger.warning(f"Compression backfill: {table_name}.{column_name} not found, skipping")
+            continue
+
+        column = table.c[column_name]
+        plain_column = cast(column, Text)  # raw stored value, no result processing
+        stats = {'rows_scanned': 0, 'rows_compressed': 0, 'bytes_before': 0, 'bytes_after': 0}
+        last_id = 0
+        batches = 0
+
+        update_stmt = table.update().where(
+            table.c.id == bindparam('b_id')
+        ).values({column_name: bindparam('b_value', type_=CompressedText())})
+
+        while max_batches is None or batches < max_batches:
+            rows = db.session.execute(
+                select(table.c.id, plain_column.label('stored'))
+                .where(table.c.id > last_id)
+                .where(column.isnot(None))
+                .where(~compressed_rows_filter(column))
+                .where(func.length(column) >= COMPRESSION_MIN_BYTES // 4)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            last_id = rows[-1].id
+            batches += 1
+            updates = []
+            for row in rows:
+                stats['rows_scanned'] += 1
+                encoded = compress_text(row.stored)
+                if encoded == row.stored:
+                    continue
+                stats['rows_compressed'] += 1
+                stats['bytes_before'] += len(row.stored.encode('utf-8'))
+                stats['bytes_after'] += len(encoded)
+                updates.append({'b_id': row.id, 'b_value': row.stored})
+
+            if updates and not dry_run:
+                try:
+                    db.session.execute(update_stmt, updates)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Compression backfill failed for {table_name}.{column_name} "
+                                 f"near id {last_id}: {str(e)}")
+                    stats['error'] = str(e)
+                    break
+
+            if progress_callback:
+                progress_callback(table_name, column_name, last_id, stats)
+
+        results[f"{table_name}.{column_name}"] = stats
+        logger.info(f"Compression backfill {table_name}.{column_name}: "
+                    f"{stats['rows_compressed']} rows, "
+                    f"{stats['bytes_before']:,} -> {stats['bytes_after']:,} bytes"
+                    f"{' (dry run)' if dry_run else ''}")
+
+    return results
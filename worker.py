@@ -8,22 +8,32 @@ In a containerized environment, this enables:
 - Running OCR workers on cost-effective Spot instances
 - Independent resource allocation and monitoring
 
+The worker warms the application, job modules, PHI patterns, OCR bindings and
+database connection before taking jobs (services/worker_context.py). In the
+default fork mode every job's work-horse starts from that warm state; simple
+mode runs jobs in-process so connections and per-org FHIR clients are reused
+too, and recycles the process after --max-jobs jobs.
+
 Usage:
     python worker.py                    # Run single worker
     python worker.py --queues high,default  # Run with specific queues
     python worker.py --burst            # Process queue then exit (for batch jobs)
+    python worker.py --mode simple --max-jobs 200
 
 Environment Variables:
     REDIS_URL: Redis connection URL (default: redis://localhost:6379/0)
     OCR_MAX_WORKERS: Max parallel OCR threads per worker process
     RQ_WORKER_NAME: Custom worker name for monitoring
     RQ_QUEUES: Comma-separated queue names (default: fhir_processing,fhir_priority)
+    RQ_WORKER_MODE: fork (default) or simple
+    RQ_WORKER_MAX_JOBS: Jobs before a simple-mode worker exits (default: 500)
 """
 
 import os
 import sys
 import logging
 import argparse
+import time
 from datetime import datetime
 
 logging.basicConfig(
@@ -32,6 +42,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger('rq_worker')
 
+WORKER_MODES = ('fork', 'simple')
+DEFAULT_SIMPLE_MAX_JOBS = 500
+
 
 def get_redis_connection():
     """Get Redis connection from environment or default."""
@@ -61,7 +74,7 @@ def get_queues(queue_names=None):
     return queues
 
 
-def run_worker(queues, burst=False, worker_name=None):
+def run_worker(queues, burst=False, worker_name=None, mode='fork', max_jobs=None):
     """
     Run the RQ worker with Flask app context.
     
@@ -69,9 +82,13 @@ def run_worker(queues, burst=False, worker_name=None):
         queues: List of Queue objects to listen on
         burst: If True, process queue and exit when empty
         worker_name: Custom name for this worker instance
+        mode: 'fork' (work-horse per job) or 'simple' (jobs run in-process)
+        max_jobs: Exit after this many jobs (None = no limit)
     """
-    from rq import Worker
-    from app import app
+    from rq import Worker, SimpleWorker
+    from app import get_app
+    from services.worker_context import warm_worker, prepare_job_process
+    from utils.query_profiler import profile_queries
     
     if worker_name is None:
         worker_name = os.environ.get('RQ_WORKER_NAME')
@@ -81,17 +98,51 @@ def run_worker(queues, burst=False, worker_name=None):
     
     logger.info(f"Starting RQ worker: {worker_name}")
     logger.info(f"Burst mode: {burst}")
+    logger.info(f"Worker mode: {mode}, max jobs: {max_jobs or 'unlimited'}")
     logger.info(f"OCR_MAX_WORKERS: {os.environ.get('OCR_MAX_WORKERS', 'auto-detect')}")
     
+    from utils.audit_sink import flush_audit_sink
+    from utils.fleet_metrics import flush_fleet_metrics, record_rq_job
+
+    base_worker = SimpleWorker if mode == 'simple' else Worker
+
+    class AuditFlushingWorker(base_worker):
+        """
+        Flush buffered audit rows at the end of every job.
+        
+        In fork mode RQ runs each job in a forked work-horse that exits with
+        os._exit(), which skips atexit handlers - without this the job's audit
+        rows would wait in the spool until the next process start replays them.
+        The job's fleet metrics (utils/fleet_metrics.py) are pushed for the
+        same reason.
+        """
+        def perform_job(self, job, queue):
+            prepare_job_process()
+            start = time.perf_counter()
+            success = False
+            try:
+                with profile_queries(job.func_name, kind='job'):
+                    success = super().perform_job(job, queue)
+                    return success
+            finally:
+                elapsed = time.perf_counter() - start
+                flush_audit_sink(timeout=30.0)
+                record_rq_job(job.func_name.rsplit('.', 1)[-1], elapsed, bool(success))
+                flush_fleet_metrics()
+                logger.info(f"Job {job.id} ({job.func_name}) took {elapsed * 1000:.0f} ms")
+    
+    app = get_app()
+    warm_worker(app)
+    
     with app.app_context():
-        worker = Worker(
+        worker = AuditFlushingWorker(
             queues,
             connection=get_redis_connection(),
             name=worker_name
         )
         
         logger.info(f"Worker {worker_name} started at {datetime.utcnow().isoformat()}")
-        worker.work(burst=burst)
+        worker.work(burst=burst, max_jobs=max_jobs)
 
 
 def get_queue_info():
@@ -148,6 +199,20 @@ def main():
         help='Worker name for monitoring'
     )
     
+    parser.add_argument(
+        '--mode', '-m',
+        choices=WORKER_MODES,
+        default=os.environ.get('RQ_WORKER_MODE', 'fork'),
+        help='fork: work-horse per job (default); simple: run jobs in-process'
+    )
+    
+    parser.add_argument(
+        '--max-jobs',
+        type=int,
+        default=None,
+        help=f'Exit after this many jobs (simple mode default: {DEFAULT_SIMPLE_MAX_JOBS})'
+    )
+    
     parser.add_argument(
         '--info', '-i',
         action='store_true',
@@ -168,8 +233,14 @@ def main():
             print(f"  Failed: {stats['failed_count']}")
         return
     
+    max_jobs = args.max_jobs
+    if max_jobs is None and os.environ.get('RQ_WORKER_MAX_JOBS'):
+        max_jobs = int(os.environ['RQ_WORKER_MAX_JOBS'])
+    if max_jobs is None and args.mode == 'simple':
+        max_jobs = DEFAULT_SIMPLE_MAX_JOBS
+    
     queues = get_queues(args.queues)
-    run_worker(queues, burst=args.burst, worker_name=args.name)
+    run_worker(queues, burst=args.burst, worker_name=args.name, mode=args.mode, max_jobs=max_jobs)
 
 
 if __name__ == '__main__':